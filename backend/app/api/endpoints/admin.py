@@ -1,4 +1,5 @@
 import re
+from collections import defaultdict
 
 from fastapi import APIRouter, Depends, HTTPException, status, Body
 from sqlalchemy.orm import Session
@@ -9,6 +10,8 @@ from datetime import datetime, timezone, timedelta
 from passlib.hash import bcrypt
 
 from app.core.logging import logger
+from app.core.metrics import outline_server_label
+from app.core.query_budget import query_budget
 from app.core.security import get_api_key
 from app.db.session import get_db
 from app.db.models import AdminAuth, User, Device, Subscription, Blacklist, Payment, Admin, Promocode, \
@@ -110,6 +113,7 @@ async def get_users_summary(
     return {"total": total, "active": active}
 
 @router.get("/users", status_code=status.HTTP_200_OK)
+@query_budget(4)
 async def get_users(
     skip: int = 0,
     limit: int = 20,
@@ -139,20 +143,29 @@ async def get_users(
         )
     
     users = query_db.offset(skip).limit(limit).all()
+    user_ids = [user.user_id for user in users]
     
     # Prepare response
     current_time = datetime.now(timezone.utc)
+    # One query per table for the whole page instead of three per user
+    subscriptions_by_user = defaultdict(list)
+    for sub in db.query(Subscription).filter(
+        Subscription.user_id.in_(user_ids),
+        Subscription.end_date > current_time,
+        Subscription.is_active == True
+    ).all():
+        subscriptions_by_user[sub.user_id].append(sub)
+    devices_by_user = defaultdict(list)
+    for device in db.query(Device).filter(Device.user_id.in_(user_ids)).all():
+        devices_by_user[device.user_id].append(device)
+    blacklisted = {
+        row.user_id for row in db.query(Blacklist.user_id).filter(Blacklist.user_id.in_(user_ids)).all()
+    }
+    
     result = []
     for user in users:
-        # Fetch active subscriptions
-        subscriptions = db.query(Subscription).filter(
-            Subscription.user_id == user.user_id,
-            Subscription.end_date > current_time,
-            Subscription.is_active == True
-        ).all()
-        
-        # Fetch devices
-        devices = db.query(Device).filter(Device.user_id == user.user_id).all()
+        subscriptions = subscriptions_by_user[user.user_id]
+        devices = devices_by_user[user.user_id]
         
         # Form subscription data
         subscription = {
@@ -187,7 +200,7 @@ async def get_users(
             "email_address": user.email_address,
             "balance": user.balance,
             "created_at": user.created_at.strftime("%Y-%m-%d %H:%M"),
-            "is_blacklisted": bool(db.query(Blacklist).filter(Blacklist.user_id == user.user_id).first())
+            "is_blacklisted": user.user_id in blacklisted
         })
     
     logger.info(f"Returning {len(result)} users")
@@ -261,7 +274,8 @@ async def get_devices(
     db: Session = Depends(get_db),
     api_key: str = Depends(get_api_key)
 ):
-    logger.info(f"Fetching devices: skip={skip}, limit={limit}, vpn_key={vpn_key}")
+    # vpn_key is the Outline key id; access keys themselves are never logged
+    logger.info(f"Fetching devices: skip={skip}, limit={limit}, outline_key_id={vpn_key}")
     
     query = db.query(Device).order_by(Device.created_at.desc())
     if vpn_key is not None:
@@ -292,7 +306,7 @@ async def get_device_history(
     db: Session = Depends(get_db),
     api_key: str = Depends(get_api_key)
 ):
-    logger.info(f"Fetching history for vpn_key={vpn_key}")
+    logger.info(f"Fetching history for outline_key_id={vpn_key}")
     
     devices = db.query(Device).filter(Device.outline_key_id == vpn_key).order_by(Device.created_at.desc()).all()
     
@@ -307,7 +321,7 @@ async def get_device_history(
         for device in devices
     ]
     
-    logger.info(f"Returning {len(result)} history entries for vpn_key={vpn_key}")
+    logger.info(f"Returning {len(result)} history entries for outline_key_id={vpn_key}")
     return result
 
 @router.get("/payments/summary")
@@ -485,6 +499,7 @@ async def check_blacklist(
     return {"is_blacklisted": is_blacklisted}
 
 @router.get("/promocodes")
+@query_budget(2)
 async def get_promocodes(
     skip: int = 0,
     limit: int = 20,
@@ -499,15 +514,18 @@ async def get_promocodes(
         query = query.filter(Promocode.code == code)
     
     promocodes = query.offset(skip).limit(limit).all()
+    usage_counts = dict(
+        db.query(PromocodeUsage.promocode_code, func.count())
+        .filter(PromocodeUsage.promocode_code.in_([promocode.code for promocode in promocodes]))
+        .group_by(PromocodeUsage.promocode_code)
+        .all()
+    )
     result = []
     for promocode in promocodes:
-        usage_count = db.query(PromocodeUsage).filter(
-            PromocodeUsage.promocode_code == promocode.code
-        ).count()
         result.append({
             "code": promocode.code,
             "type": promocode.type,
-            "usage_count": usage_count,
+            "usage_count": usage_counts.get(promocode.code, 0),
             "max_usage": promocode.max_usage,
             "is_active": promocode.is_active,
             "created_at": promocode.created_at.strftime("%Y-%m-%d %H:%M")
@@ -649,11 +667,12 @@ async def create_outline_server(
     db: Session = Depends(get_db),
     api_key: str = Depends(get_api_key)
 ):
-    logger.info(f"Creating outline server: {server.api_url} with key_limit={server.key_limit}")
-    
     api_url_str = str(server.api_url)
+    # The path of the API URL is the server's secret: log host:port only
+    logger.info(f"Creating outline server: {outline_server_label(api_url_str)} with key_limit={server.key_limit}")
+    
     if db.query(OutlineServer).filter(OutlineServer.api_url == api_url_str).first():
-        logger.error(f"Server already exists: {api_url_str}")
+        logger.error(f"Server already exists: {outline_server_label(api_url_str)}")
         raise HTTPException(
             status_code=400,
             detail="Server with this URL already exists"
@@ -670,7 +689,7 @@ async def create_outline_server(
     db.commit()
     db.refresh(db_server)
     
-    logger.info(f"Outline server created: {api_url_str} with key_limit={server.key_limit}")
+    logger.info(f"Outline server created: {outline_server_label(api_url_str)} with key_limit={server.key_limit}")
     return {"status": "success", "server_id": db_server.id}
 
 @router.get("/outline/servers")
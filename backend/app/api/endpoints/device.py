@@ -5,6 +5,7 @@ from datetime import datetime, timezone, timedelta
 from zoneinfo import ZoneInfo
 
 from app.core.logging import logger
+from app.core.query_budget import query_budget
 from app.core.security import get_api_key
 from app.db.session import get_db
 from app.db.models import User, Device, Subscription, OutlineServer
@@ -95,7 +96,7 @@ async def generate_key(
 
     vpn_key, outline_key_id = await create_outline_key(server.api_url, server.cert_sha256)
     # vpn_key, outline_key_id = 'ss://Y2hhY2hhMjAtaWV0Zi1wb2x5MTMwNTpGT3Y4dlV6NWFVZUNyUk1uN0hBeEtZ@31.128.48.13:26247/?outline=1', '1'
-    logger.info(f"Access key: {vpn_key}; key_id: {outline_key_id}")
+    logger.info(f"Outline key {outline_key_id} created on server {server.id}")
 
     server.key_count += 1
     db.add(server)
@@ -120,6 +121,7 @@ async def generate_key(
     return {"key": vpn_key}
 
 @router.get("/active/{user_id}", response_model=UserDevicesResponse)
+@query_budget(1)
 async def get_user_devices(
     user_id: int,
     db: Session = Depends(get_db),
@@ -0,0 +1,44 @@
+import asyncio
+
+from fastapi import APIRouter, HTTPException, Query, status
+from fastapi.responses import PlainTextResponse
+
+from app.core.logging import logger
+from app.core.profiling import (MAX_SECONDS, MIN_INTERVAL, ProfilerBusy, dump_tasks, heap_snapshot, heap_start,
+                                heap_stop, profile_cpu)
+
+# Each worker process profiles only itself; with several workers, repeat the
+# call to reach the others
+router = APIRouter()
+
+@router.get("/cpu", response_class=PlainTextResponse)
+async def cpu_profile(
+    seconds: float = Query(10, gt=0, le=MAX_SECONDS),
+    interval: float = Query(0.01, ge=MIN_INTERVAL, le=1)
+):
+    """Collapsed stacks sampled for `seconds`, for flamegraph.pl or speedscope."""
+    logger.info(f"CPU profile for {seconds} s, every {interval * 1000:.0f} ms")
+    try:
+        return await profile_cpu(seconds, interval)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+@router.post("/heap/start", response_class=PlainTextResponse)
+async def start_heap_tracing():
+    logger.info("Heap tracing started")
+    return heap_start()
+
+@router.post("/heap/stop", response_class=PlainTextResponse)
+async def stop_heap_tracing():
+    logger.info("Heap tracing stopped")
+    return await asyncio.to_thread(heap_stop)
+
+@router.get("/heap", response_class=PlainTextResponse)
+async def get_heap_snapshot(limit: int = Query(20, ge=1, le=200)):
+    """Top allocating lines and the change since the previous snapshot."""
+    return await asyncio.to_thread(heap_snapshot, limit)
+
+@router.get("/tasks", response_class=PlainTextResponse)
+async def get_tasks():
+    """Await chains of the worker's asyncio tasks."""
+    return dump_tasks()
@@ -6,6 +6,7 @@ from typing import Any
 from pydantic import EmailStr
 
 from app.core.logging import logger
+from app.core.query_budget import query_budget
 from app.core.security import get_api_key
 from app.db.session import get_db
 from app.db.models import User
@@ -14,6 +15,7 @@ from app.schemas.user import UserCreate, UserResponse, UserContact, UserContactU
 router = APIRouter()
 
 @router.get("/{user_id}", response_model=UserResponse)
+@query_budget(1)
 async def get_user(
     user_id: int,
     db: Session = Depends(get_db),
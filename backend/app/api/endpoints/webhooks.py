@@ -0,0 +1,150 @@
+import hashlib
+import hmac
+import ipaddress
+import json
+
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, status
+from sqlalchemy.orm import Session
+from typing import Any, Dict, Optional
+
+from app.core.config import get_app_config
+from app.core.logging import logger
+from app.db.session import get_db
+from app.db.models import Invoice
+from app.services.payments import complete_invoice
+from app.services.telegram import send_message
+
+router = APIRouter()
+
+config = get_app_config()
+
+PAYMENT_SUCCESS_TEXT = "Оплата успешна 🎉"
+
+YOOKASSA_NETWORKS = [ipaddress.ip_network(net) for net in config.webhooks.yookassa_allowed_ips]
+
+def client_ip(request: Request) -> Optional[str]:
+    if config.webhooks.trust_forwarded_for:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            hops = [entry.strip() for entry in forwarded.split(",")]
+            hop_count = config.webhooks.forwarded_hops
+            # Fewer entries than trusted proxies: the header did not come through them
+            return hops[-hop_count] if 0 < hop_count <= len(hops) else None
+    return request.client.host if request.client else None
+
+def is_yookassa_ip(ip: Optional[str]) -> bool:
+    if not ip:
+        return False
+    try:
+        address = ipaddress.ip_address(ip)
+    except ValueError:
+        return False
+    return any(address in network for network in YOOKASSA_NETWORKS)
+
+def verify_cryptobot_signature(body: bytes, signature: Optional[str], token: str) -> bool:
+    """
+    Check the crypto-pay-api-signature header.
+
+    The signature is HMAC-SHA256 of the raw body keyed with SHA256 of the API token.
+    """
+    if not signature:
+        return False
+    secret = hashlib.sha256(token.encode()).digest()
+    expected = hmac.new(secret, body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+def apply_paid_invoice(
+        db: Session, invoice_id: str, background_tasks: BackgroundTasks
+) -> Dict[str, Any]:
+    """Complete an invoice and schedule the user notification if it was applied now."""
+    invoice, applied = complete_invoice(db, invoice_id)
+    if applied:
+        background_tasks.add_task(send_message, invoice.user_id, PAYMENT_SUCCESS_TEXT)
+    return {"status": "ok", "applied": applied}
+
+@router.post("/yookassa", status_code=status.HTTP_200_OK)
+async def yookassa_webhook(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db)
+):
+    ip = client_ip(request)
+    if not is_yookassa_ip(ip):
+        logger.error(f"YooKassa webhook from untrusted address {ip}")
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
+
+    try:
+        notification = json.loads(await request.body())
+        event = notification["event"]
+        payment = notification["object"]
+        invoice_id = str(payment["id"])
+    except (ValueError, KeyError, TypeError):
+        logger.error("YooKassa webhook: malformed notification")
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Malformed notification")
+
+    logger.info(f"YooKassa webhook: event={event}, invoice_id={invoice_id}")
+
+    invoice = db.query(Invoice).filter(Invoice.invoice_id == invoice_id).first()
+    if not invoice:
+        # Not ours (or created by another shop), acknowledge so it is not redelivered
+        logger.warning(f"YooKassa webhook for unknown invoice {invoice_id}")
+        return {"status": "ignored"}
+
+    if event == "payment.succeeded":
+        amount = payment.get("amount", {})
+        metadata = payment.get("metadata") or {}
+        if not payment.get("paid") or payment.get("status") != "succeeded":
+            logger.error(f"YooKassa webhook: payment {invoice_id} is not paid")
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Payment is not paid")
+        if amount.get("currency") != invoice.currency or round(float(amount.get("value", 0)), 2) != round(invoice.amount, 2):
+            logger.error(f"YooKassa webhook: amount mismatch for invoice {invoice_id}: {amount}")
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Amount mismatch")
+        if metadata.get("payload", invoice.payload) != invoice.payload:
+            logger.error(f"YooKassa webhook: payload mismatch for invoice {invoice_id}")
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Payload mismatch")
+        return apply_paid_invoice(db, invoice_id, background_tasks)
+
+    if event == "payment.canceled":
+        if invoice.status == "active":
+            invoice.status = "canceled"
+            db.commit()
+            logger.info(f"YooKassa invoice {invoice_id} canceled")
+        return {"status": "ok", "applied": False}
+
+    logger.info(f"YooKassa webhook: ignoring event {event}")
+    return {"status": "ignored"}
+
+@router.post("/cryptobot", status_code=status.HTTP_200_OK)
+async def cryptobot_webhook(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db)
+):
+    token = config.webhooks.cryptobot_token
+    if not token:
+        logger.error("CryptoBot webhook received but webhooks.cryptobot_token is not configured")
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Not configured")
+
+    body = await request.body()
+    if not verify_cryptobot_signature(body, request.headers.get("crypto-pay-api-signature"), token):
+        logger.error("CryptoBot webhook: invalid signature")
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid signature")
+
+    try:
+        update = json.loads(body)
+        update_type = update["update_type"]
+        invoice_id = str(update["payload"]["invoice_id"])
+    except (ValueError, KeyError, TypeError):
+        logger.error("CryptoBot webhook: malformed update")
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Malformed update")
+
+    logger.info(f"CryptoBot webhook: update_type={update_type}, invoice_id={invoice_id}")
+
+    if update_type != "invoice_paid":
+        return {"status": "ignored"}
+
+    if not db.query(Invoice).filter(Invoice.invoice_id == invoice_id).first():
+        logger.warning(f"CryptoBot webhook for unknown invoice {invoice_id}")
+        return {"status": "ignored"}
+
+    return apply_paid_invoice(db, invoice_id, background_tasks)
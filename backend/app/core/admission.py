@@ -0,0 +1,193 @@
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.config import AdmissionConfig
+
+logger = logging.getLogger(__name__)
+
+# (methods or None for any, path prefix, group); first match wins
+ROUTE_GROUPS: List[Tuple[Optional[Tuple[str, ...]], str, str]] = [
+    (("POST", "PUT"), "/devices/key", "keys"),
+    (None, "/devices", "devices"),
+    (None, "/payments", "payments"),
+    (None, "/webhooks", "payments"),
+    (None, "/admin", "admin"),
+    (None, "/raffles", "raffles"),
+]
+DEFAULT_GROUP = "default"
+# Never queued or shed: health checks and the metrics themselves
+EXEMPT_PATHS = ("/", "/admission", "/metrics")
+# Profiling is needed most when the server is saturated
+EXEMPT_PREFIXES = ("/profile/",)
+
+
+def route_group(method: str, path: str) -> str:
+    for methods, prefix, group in ROUTE_GROUPS:
+        if path.startswith(prefix) and (methods is None or method in methods):
+            return group
+    return DEFAULT_GROUP
+
+
+class AdmissionGroup:
+    def __init__(self, name: str, limit: int, queue_size: int, critical: bool):
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.critical = critical
+        self.active = 0
+        self.waiters: Deque[asyncio.Future] = deque()
+        self.admitted = 0
+        self.queued = 0
+        self.shed = 0
+        self.timed_out = 0
+        # Requests admitted after queueing, and their waits
+        self.waited = 0
+        self.max_wait = 0.0
+        self.total_wait = 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "queue_size": self.queue_size,
+            "critical": self.critical,
+            "active": self.active,
+            "waiting": len(self.waiters),
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "shed": self.shed,
+            "timed_out": self.timed_out,
+            "avg_wait_ms": round(self.total_wait / self.waited * 1000, 1) if self.waited else 0.0,
+            "max_wait_ms": round(self.max_wait * 1000, 1),
+        }
+
+
+class AdmissionController:
+    """
+    Concurrency limits per route group in front of the database.
+
+    At most `max_concurrency` requests run at once, so they do not queue
+    inside the SQLAlchemy pool where every request gets slower. Each group
+    also has its own limit, and the last `reserved` slots are only given
+    to critical groups (payments and key issuance), so a flood of
+    admin or raffle calls cannot starve them. A request over its limits
+    waits in a short per-group FIFO for up to `queue_timeout` seconds; when
+    the queue is full or the wait runs out it is rejected at once with
+    503 and Retry-After.
+    """
+
+    def __init__(self, config: AdmissionConfig):
+        self.max_concurrency = config.max_concurrency
+        self.reserved = config.reserved
+        self.queue_timeout = config.queue_timeout
+        self.retry_after = config.retry_after
+        self.groups = {
+            name: AdmissionGroup(name, group.limit, group.queue_size, group.critical)
+            for name, group in config.groups.items()
+        }
+        if DEFAULT_GROUP not in self.groups:
+            self.groups[DEFAULT_GROUP] = AdmissionGroup(DEFAULT_GROUP, config.max_concurrency, 0, False)
+        # Critical groups are woken first when a slot frees up
+        self.wake_order = sorted(self.groups.values(), key=lambda group: not group.critical)
+        self.active = 0
+
+    def can_enter(self, group: AdmissionGroup) -> bool:
+        capacity = self.max_concurrency if group.critical else self.max_concurrency - self.reserved
+        return group.active < group.limit and self.active < capacity
+
+    def enter(self, group: AdmissionGroup) -> None:
+        group.active += 1
+        group.admitted += 1
+        self.active += 1
+
+    async def acquire(self, group: AdmissionGroup) -> bool:
+        """Take a slot for a request of `group`; False if the request must be shed."""
+        if not group.waiters and self.can_enter(group):
+            self.enter(group)
+            return True
+        if len(group.waiters) >= group.queue_size:
+            group.shed += 1
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        group.waiters.append(waiter)
+        group.queued += 1
+        start = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except asyncio.TimeoutError:
+            if waiter.done():
+                # Admitted just as the timeout fired
+                return self.record_wait(group, start)
+            group.waiters.remove(waiter)
+            group.timed_out += 1
+            group.shed += 1
+            return False
+        except asyncio.CancelledError:
+            if waiter.done():
+                self.release(group)
+            else:
+                group.waiters.remove(waiter)
+            raise
+        return self.record_wait(group, start)
+
+    def record_wait(self, group: AdmissionGroup, start: float) -> bool:
+        waited = time.monotonic() - start
+        group.waited += 1
+        group.total_wait += waited
+        group.max_wait = max(group.max_wait, waited)
+        return True
+
+    def release(self, group: AdmissionGroup) -> None:
+        group.active -= 1
+        self.active -= 1
+        for candidate in self.wake_order:
+            while candidate.waiters and self.can_enter(candidate):
+                waiter = candidate.waiters.popleft()
+                self.enter(candidate)
+                waiter.set_result(None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "reserved": self.reserved,
+            "active": self.active,
+            "groups": {name: group.stats() for name, group in self.groups.items()},
+        }
+
+
+class AdmissionMiddleware:
+    """ASGI middleware applying an AdmissionController to HTTP requests."""
+
+    def __init__(self, app: ASGIApp, controller: AdmissionController):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] in EXEMPT_PATHS or scope["path"].startswith(EXEMPT_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+
+        group = self.controller.groups.get(route_group(scope["method"], scope["path"]))
+        if group is None:
+            group = self.controller.groups[DEFAULT_GROUP]
+        if not await self.controller.acquire(group):
+            logger.warning(f"Shed {scope['method']} {scope['path']} ({group.name}: "
+                           f"{group.active} active, {len(group.waiters)} waiting)")
+            response = JSONResponse(
+                {"detail": "Server is busy, retry later"},
+                status_code=503,
+                headers={"Retry-After": str(math.ceil(self.controller.retry_after))}
+            )
+            await response(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(group)
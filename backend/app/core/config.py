@@ -1,5 +1,5 @@
 from functools import lru_cache
-from typing import TypeVar, Type, Optional, List
+from typing import TypeVar, Type, Optional, List, Dict
 from pydantic import BaseModel, Field
 from yaml import load, SafeLoader
 
@@ -23,11 +23,110 @@ class ServerConfig(BaseModel):
 class ApiConfig(BaseModel):
     token: str
 
+class WebhookConfig(BaseModel):
+    # CryptoBot API token, used to verify the crypto-pay-api-signature header
+    cryptobot_token: Optional[str] = None
+    # Published YooKassa notification sources
+    yookassa_allowed_ips: List[str] = [
+        "185.71.76.0/27",
+        "185.71.77.0/27",
+        "77.75.153.0/25",
+        "77.75.156.11",
+        "77.75.156.35",
+        "77.75.154.128/25",
+        "2a02:5180::/32",
+    ]
+    # Take the client address from X-Forwarded-For (only behind a trusted proxy)
+    trust_forwarded_for: bool = False
+    # Trusted proxies that append to X-Forwarded-For; the client address is
+    # this many entries from the right, anything further left is client-sent
+    forwarded_hops: int = 1
+
+class TelegramConfig(BaseModel):
+    # Bot token used to notify users about payments applied by the backend
+    bot_token: Optional[str] = None
+
+class LeaderConfig(BaseModel):
+    # postgres (advisory locks) or file (flock, single host only)
+    backend: str = "postgres"
+    lock_dir: str = "/tmp"
+    # A dead leader is replaced within retry_interval seconds
+    retry_interval: float = 5
+    check_interval: float = 5
+
+class AdmissionGroupConfig(BaseModel):
+    # Requests of the group running at once
+    limit: int
+    # Requests of the group waiting for a slot; more are rejected with 503
+    queue_size: int
+    # May use the reserved slots
+    critical: bool = False
+
+class AdmissionConfig(BaseModel):
+    enabled: bool = True
+    # Requests running at once per worker; keep within the database pool
+    # (pool_size + max_overflow, 15 by default)
+    max_concurrency: int = 15
+    # Slots only critical groups may take
+    reserved: int = 4
+    queue_timeout: float = 2
+    # Seconds sent in Retry-After with a 503
+    retry_after: float = 1
+    groups: Dict[str, AdmissionGroupConfig] = {
+        "payments": AdmissionGroupConfig(limit=8, queue_size=50, critical=True),
+        "keys": AdmissionGroupConfig(limit=6, queue_size=30, critical=True),
+        "devices": AdmissionGroupConfig(limit=6, queue_size=30),
+        "admin": AdmissionGroupConfig(limit=3, queue_size=10),
+        "raffles": AdmissionGroupConfig(limit=4, queue_size=30),
+        "default": AdmissionGroupConfig(limit=8, queue_size=50),
+    }
+
+class QueryBudgetConfig(BaseModel):
+    # Statements per request for routes without @query_budget; None for no limit
+    default_max_queries: Optional[int] = None
+    # log: warn once the request is done; raise: fail the first statement over
+    # budget with QueryBudgetExceeded (for tests and staging)
+    mode: str = "log"
+    # The same statement this many times in one request is reported as an N+1
+    repeat_threshold: int = 5
+    # Add X-DB-Queries and X-DB-Time to responses
+    debug_headers: bool = False
+    # Statements slower than this many seconds are logged with their plan
+    slow_statement: float = 0.25
+    explain: bool = True
+    # Seconds before the same slow statement is explained again
+    explain_interval: float = 300
+
+class TracingConfig(BaseModel):
+    # Share of traces started here (webhooks, direct API calls); requests
+    # from the bot follow the bot's sampling decision
+    sample_ratio: float = 0.05
+    # JSON lines file and/or OTLP/HTTP collector (http://collector:4318/v1/traces);
+    # with neither, tracing is off
+    path: Optional[str] = None
+    otlp_endpoint: Optional[str] = None
+
+class LoggingConfig(BaseModel):
+    # text: the usual one-line format; json: one object per line, for log collectors
+    format: str = "text"
+    # Share of INFO/DEBUG records kept per logger and its children, for
+    # chatty ones: {"uvicorn.access": 0.1}
+    sample: Dict[str, float] = {}
+    # Records waiting to be written; more are dropped rather than blocking requests
+    queue_size: int = 10000
+
 class AppConfig(BaseModel):
     database: DatabaseConfig
     outline: OutlineConfig
     server: ServerConfig
     api: ApiConfig
+    webhooks: WebhookConfig = WebhookConfig()
+    telegram: TelegramConfig = TelegramConfig()
+    leader: LeaderConfig = LeaderConfig()
+    admission: AdmissionConfig = AdmissionConfig()
+    query_budget: QueryBudgetConfig = QueryBudgetConfig()
+    tracing: TracingConfig = TracingConfig()
+    logging: LoggingConfig = LoggingConfig()
 
 @lru_cache(maxsize=1)
 def parse_config_file() -> dict:
@@ -62,5 +161,12 @@ def get_app_config() -> AppConfig:
         database=DatabaseConfig.model_validate(config_dict["database"]),
         outline=OutlineConfig.model_validate(config_dict["outline"]),
         server=ServerConfig.model_validate(config_dict["server"]),
-        api=ApiConfig.model_validate(config_dict["api"])
+        api=ApiConfig.model_validate(config_dict["api"]),
+        webhooks=WebhookConfig.model_validate(config_dict.get("webhooks") or {}),
+        telegram=TelegramConfig.model_validate(config_dict.get("telegram") or {}),
+        leader=LeaderConfig.model_validate(config_dict.get("leader") or {}),
+        admission=AdmissionConfig.model_validate(config_dict.get("admission") or {}),
+        query_budget=QueryBudgetConfig.model_validate(config_dict.get("query_budget") or {}),
+        tracing=TracingConfig.model_validate(config_dict.get("tracing") or {}),
+        logging=LoggingConfig.model_validate(config_dict.get("logging") or {})
     )
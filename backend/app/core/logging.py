@@ -1,29 +1,165 @@
+import atexit
+import json
 import logging
+import queue
+import random
 import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+
 from app.core.config import get_app_config
 
 config = get_app_config()
 
+# Loggers uvicorn configures with handlers of its own, writing from the event loop
+UVICORN_LOGGERS = ("uvicorn", "uvicorn.error", "uvicorn.access")
+
+TEXT_FORMAT = ('%(filename)s:%(lineno)d #%(levelname)-8s '
+               '[%(asctime)s] - %(name)s - %(message)s')
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with the trace id when the record was made inside a sampled span."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "location": f"{record.filename}:{record.lineno}",
+        }
+        trace_id = getattr(record, "trace_id", None)
+        if trace_id:
+            entry["trace_id"] = trace_id
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        if record.stack_info:
+            entry["stack"] = record.stack_info
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps only a share of the records below WARNING of chatty loggers.
+
+    A ratio applies to the logger and its children ("aiogram" covers
+    "aiogram.event"), the most specific one winning; warnings and errors
+    always pass.
+    """
+
+    def __init__(self, ratios: Dict[str, float]):
+        super().__init__()
+        self.ratios = ratios
+        # logger name -> ratio, resolved on first use
+        self.resolved: Dict[str, float] = {}
+        self.dropped = 0
+
+    def ratio(self, name: str) -> float:
+        ratio = self.resolved.get(name)
+        if ratio is None:
+            ratio, candidate = 1.0, name
+            while candidate:
+                if candidate in self.ratios:
+                    ratio = self.ratios[candidate]
+                    break
+                candidate = candidate.rpartition(".")[0]
+            self.resolved[name] = ratio
+        return ratio
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        ratio = self.ratio(record.name)
+        if ratio >= 1 or random.random() < ratio:
+            return True
+        self.dropped += 1
+        return False
+
+
+class LazyQueueHandler(QueueHandler):
+    """
+    Hands records to the writer thread without formatting them.
+
+    The stock QueueHandler formats each record in the calling thread, that
+    is on the event loop; here only the message is merged with its args
+    (which may change once the call returns), and timestamps, JSON and
+    tracebacks are formatted by the listener. A full queue drops the record
+    rather than blocking.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.args:
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+listener: Optional[QueueListener] = None
+
+
+def stop_logging() -> None:
+    """Write out queued records and stop the writer thread."""
+    global listener
+    if listener is not None:
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+        listener = None
+
+
+atexit.register(stop_logging)
+
+
 # Configure logging
 def setup_logging():
+    """
+    Route every record through a queue to one writer thread on stdout.
+
+    Runs on import; uvicorn's loggers are taken over at startup by
+    route_uvicorn_logs, once uvicorn is done configuring them.
+    """
+    global listener
+    stop_logging()
     log_level = getattr(logging, config.server.log_level.upper(), logging.INFO)
-    
-    logger = logging.getLogger("vpn_service")
-    logger.setLevel(log_level)
-    
-    # Create console handler
+
     handler = logging.StreamHandler(sys.stdout)
-    handler.setLevel(log_level)
-    
-    # Create formatter
-    formatter = logging.Formatter('%(filename)s:%(lineno)d #%(levelname)-8s '
-                                  '[%(asctime)s] - %(name)s - %(message)s')
-
-    handler.setFormatter(formatter)
-    
-    # Add handler to logger
-    logger.addHandler(handler)
-    
-    return logger
+    if config.logging.format == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+
+    log_queue: queue.Queue = queue.Queue(maxsize=config.logging.queue_size)
+    queue_handler = LazyQueueHandler(log_queue)
+    if config.logging.sample:
+        queue_handler.addFilter(SamplingFilter(config.logging.sample))
+    root = logging.getLogger()
+    for existing in root.handlers[:]:
+        root.removeHandler(existing)
+    root.addHandler(queue_handler)
+    root.setLevel(log_level)
+
+    listener = QueueListener(log_queue, handler, respect_handler_level=True)
+    listener.start()
+    return logging.getLogger("vpn_service")
+
+
+def route_uvicorn_logs() -> None:
+    """Send uvicorn's records, access log included, through the queue instead of its own handlers."""
+    for name in UVICORN_LOGGERS:
+        uvicorn_logger = logging.getLogger(name)
+        uvicorn_logger.handlers.clear()
+        uvicorn_logger.propagate = True
 
 logger = setup_logging()
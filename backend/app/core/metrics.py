@@ -0,0 +1,267 @@
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Tuple
+from urllib.parse import urlsplit
+
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY, Counter, Gauge, Histogram, disable_created_metrics,
+                               generate_latest)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.admission import DEFAULT_GROUP, ROUTE_GROUPS, AdmissionController, route_group
+from app.core.query_budget import (RequestStats, check_budget, config as budget_config, current_request,
+                                   explain_slow_statement, report_request)
+
+# Latency buckets in seconds, from a cached lookup to a slow Outline call
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SQL_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+HTTP_METHODS = ("GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS")
+# Route label of requests no route matched (404s, scanners)
+UNMATCHED_ROUTE = "unmatched"
+
+# *_created series double the scrape size and nothing here uses them
+disable_created_metrics()
+
+HTTP_DURATION = Histogram(
+    "http_request_duration_seconds", "Time to handle a request, admission wait included",
+    ["method", "route"], buckets=LATENCY_BUCKETS
+)
+HTTP_ERRORS = Counter(
+    "http_request_errors_total", "Requests answered with a 5xx status or an exception",
+    ["method", "route"]
+)
+HTTP_IN_FLIGHT = Gauge(
+    "http_requests_in_flight", "Requests being handled, by admission group", ["group"]
+)
+DB_STATEMENTS = Counter(
+    "db_statements_total", "SQL statements executed while handling requests", ["method", "route"]
+)
+DB_REQUEST_STATEMENTS = Histogram(
+    "db_request_statements", "SQL statements per request", ["method", "route"], buckets=STATEMENT_BUCKETS
+)
+DB_REQUEST_TIME = Histogram(
+    "db_request_time_seconds", "Time spent in SQL per request", ["method", "route"], buckets=LATENCY_BUCKETS
+)
+DB_STATEMENT_DURATION = Histogram(
+    "db_statement_duration_seconds", "Duration of a single SQL statement", buckets=SQL_BUCKETS
+)
+DB_POOL_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds", "Time spent waiting for a connection from the pool", buckets=SQL_BUCKETS
+)
+OUTLINE_DURATION = Histogram(
+    "outline_request_duration_seconds", "Outline Management API call latency",
+    ["server", "operation"], buckets=LATENCY_BUCKETS
+)
+OUTLINE_ERRORS = Counter(
+    "outline_request_errors_total", "Failed Outline Management API calls", ["server", "operation"]
+)
+JOB_DURATION = Histogram(
+    "scheduler_job_duration_seconds", "Duration of scheduled jobs", ["job"],
+    buckets=(0.1, 0.5, 1, 5, 10, 30, 60, 300, 900)
+)
+JOB_FAILURES = Counter("scheduler_job_failures_total", "Scheduled jobs that raised", ["job"])
+DB_OVER_BUDGET = Counter(
+    "db_query_budget_exceeded_total", "Requests that ran more statements than their route's budget",
+    ["method", "route"]
+)
+DB_REPEATED = Counter(
+    "db_repeated_statements_total", "Statements repeated repeat_threshold times or more in a request (N+1)",
+    ["method", "route"]
+)
+
+
+class RouteMetrics:
+    """Label children of one route and method, bound once and reused for every request."""
+    __slots__ = ("duration", "errors", "statements", "request_statements", "sql_time", "over_budget", "repeated")
+
+    def __init__(self, method: str, route: str):
+        self.duration = HTTP_DURATION.labels(method, route)
+        self.errors = HTTP_ERRORS.labels(method, route)
+        self.statements = DB_STATEMENTS.labels(method, route)
+        self.request_statements = DB_REQUEST_STATEMENTS.labels(method, route)
+        self.sql_time = DB_REQUEST_TIME.labels(method, route)
+        self.over_budget = DB_OVER_BUDGET.labels(method, route)
+        self.repeated = DB_REPEATED.labels(method, route)
+
+    def observe(self, duration: float, failed: bool, stats: RequestStats) -> None:
+        self.duration.observe(duration)
+        if failed:
+            self.errors.inc()
+        if stats.statements:
+            self.statements.inc(stats.statements)
+            over_budget, repeated = report_request(stats)
+            if over_budget:
+                self.over_budget.inc()
+            if repeated:
+                self.repeated.inc(repeated)
+        self.request_statements.observe(stats.statements)
+        self.sql_time.observe(stats.sql_time)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing requests per route template ("/devices/{device_id}").
+
+    The route is only known once the router has matched it, so children are
+    looked up after the response in a dict keyed by template and method and
+    created on first use; after warm-up a request costs two dict lookups and
+    a few observations. Unknown methods are counted as OTHER so clients cannot
+    create label sets.
+
+    Requests over their query budget or repeating statements are logged
+    from here (see app.core.query_budget); with debug_headers on, responses
+    carry X-DB-Queries and X-DB-Time.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        groups = {group for _, _, group in ROUTE_GROUPS} | {DEFAULT_GROUP}
+        self.in_flight = {group: HTTP_IN_FLIGHT.labels(group) for group in groups}
+        self.routes: Dict[str, Dict[str, RouteMetrics]] = {}
+
+    def route_metrics(self, scope: Scope) -> RouteMetrics:
+        route = getattr(scope.get("route"), "path", UNMATCHED_ROUTE)
+        method = scope["method"] if scope["method"] in HTTP_METHODS else "OTHER"
+        by_method = self.routes.get(route)
+        if by_method is None:
+            by_method = self.routes[route] = {}
+        metrics = by_method.get(method)
+        if metrics is None:
+            metrics = by_method[method] = RouteMetrics(method, route)
+        return metrics
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if budget_config.debug_headers:
+                    message["headers"] = [*message.get("headers", ()), *stats.debug_headers()]
+            await send(message)
+
+        in_flight = self.in_flight[route_group(scope["method"], scope["path"])]
+        stats = RequestStats(scope)
+        token = current_request.set(stats)
+        in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            duration = time.perf_counter() - start
+            in_flight.dec()
+            current_request.reset(token)
+            self.route_metrics(scope).observe(duration, status_code >= 500, stats)
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool recording how long each checkout waited for a free connection."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_WAIT.observe(time.perf_counter() - start)
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Time SQL statements, attribute them to the request being handled and enforce query budgets."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        check_budget(statement)
+        context.metrics_start = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context.metrics_start
+        DB_STATEMENT_DURATION.observe(elapsed)
+        stats = current_request.get()
+        if stats is not None:
+            stats.record(statement, elapsed)
+        if elapsed >= budget_config.slow_statement and not executemany:
+            explain_slow_statement(conn, statement, parameters, elapsed)
+
+    pool = engine.pool
+    Gauge("db_pool_size", "Connections the pool keeps open").set_function(pool.size)
+    Gauge("db_pool_checked_out", "Connections in use").set_function(pool.checkedout)
+    Gauge("db_pool_overflow", "Connections open beyond the pool size").set_function(pool.overflow)
+
+
+# api_url -> (server label, operation -> (duration child, errors child))
+outline_children: Dict[str, Tuple[str, Dict[str, Tuple[Any, Any]]]] = {}
+
+
+def outline_server_label(api_url: str) -> str:
+    # host:port only; the path of the API URL is the server's secret
+    return urlsplit(api_url).netloc or "unknown"
+
+
+@contextmanager
+def outline_call(api_url: str, operation: str) -> Iterator[None]:
+    """Time an Outline API call; any exception counts as an error of the server."""
+    entry = outline_children.get(api_url)
+    if entry is None:
+        entry = outline_children[api_url] = (outline_server_label(api_url), {})
+    server, operations = entry
+    children = operations.get(operation)
+    if children is None:
+        children = operations[operation] = (
+            OUTLINE_DURATION.labels(server, operation),
+            OUTLINE_ERRORS.labels(server, operation),
+        )
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        children[1].inc()
+        raise
+    finally:
+        children[0].observe(time.perf_counter() - start)
+
+
+class AdmissionCollector:
+    """Exports AdmissionController counters at scrape time."""
+
+    def __init__(self, controller: AdmissionController):
+        self.controller = controller
+
+    def collect(self):
+        active = GaugeMetricFamily("admission_active", "Requests holding an admission slot", labels=["group"])
+        waiting = GaugeMetricFamily("admission_waiting", "Requests queued for a slot", labels=["group"])
+        counters = {
+            name: CounterMetricFamily(f"admission_{name}", description, labels=["group"])
+            for name, description in (
+                ("admitted", "Requests given a slot"),
+                ("queued", "Requests that had to wait for a slot"),
+                ("shed", "Requests rejected with 503"),
+                ("timed_out", "Requests rejected after waiting queue_timeout"),
+            )
+        }
+        for name, group in self.controller.groups.items():
+            active.add_metric([name], group.active)
+            waiting.add_metric([name], len(group.waiters))
+            for counter, family in counters.items():
+                family.add_metric([name], getattr(group, counter))
+        yield active
+        yield waiting
+        yield from counters.values()
+
+
+def register_admission(controller: AdmissionController) -> None:
+    REGISTRY.register(AdmissionCollector(controller))
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """Current metrics in the Prometheus text format, with its content type."""
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -0,0 +1,168 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from typing import Any, Dict, List, Optional, Tuple
+
+# Longest CPU profile and shortest sampling interval accepted
+MAX_SECONDS = 60
+MIN_INTERVAL = 0.001
+# Frames kept per allocation; one is enough to group by line and is the cheapest
+HEAP_FRAMES = 1
+HEAP_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+class ProfilerBusy(Exception):
+    """A CPU profile is already being recorded in this process."""
+
+
+cpu_lock = threading.Lock()
+heap_lock = threading.Lock()
+previous_snapshot: Optional[tracemalloc.Snapshot] = None
+# code object -> frame label, for the profile being recorded
+labels: Dict[Any, str] = {}
+
+
+def frame_label(code) -> str:
+    label = labels.get(code)
+    if label is None:
+        # ";" separates frames in the collapsed format
+        label = labels[code] = f"{code.co_qualname} ({os.path.basename(code.co_filename)})".replace(";", ",")
+    return label
+
+
+def sample_stacks(seconds: float, interval: float) -> Dict[str, int]:
+    """Stack of every other thread each `interval` for `seconds`: collapsed stack -> samples."""
+    own = threading.get_ident()
+    names = {thread.ident: thread.name for thread in threading.enumerate()}
+    stacks: Dict[str, int] = {}
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            frames = []
+            while frame is not None:
+                frames.append(frame_label(frame.f_code))
+                frame = frame.f_back
+            frames.append(names.get(ident) or f"thread-{ident}")
+            frames.reverse()
+            stack = ";".join(frames)
+            stacks[stack] = stacks.get(stack, 0) + 1
+        time.sleep(interval)
+    return stacks
+
+
+async def profile_cpu(seconds: float, interval: float = 0.01) -> str:
+    """
+    Sample the stacks of all threads for `seconds` and return them collapsed.
+
+    One "thread;outer;...;inner samples" line per distinct stack, as read by
+    flamegraph.pl, speedscope and inferno. Sampling runs in a thread of its
+    own and only reads frames, so requests keep being served; only one
+    profile runs at a time and the duration is capped at MAX_SECONDS. An idle
+    event loop shows up as time in select/epoll.
+    """
+    seconds = min(seconds, MAX_SECONDS)
+    interval = max(interval, MIN_INTERVAL)
+    if not cpu_lock.acquire(blocking=False):
+        raise ProfilerBusy("A CPU profile is already running")
+    try:
+        stacks = await asyncio.to_thread(sample_stacks, seconds, interval)
+    finally:
+        labels.clear()
+        cpu_lock.release()
+    return "".join(f"{stack} {count}\n" for stack, count in sorted(stacks.items(), key=lambda item: -item[1]))
+
+
+def heap_start() -> str:
+    """Start tracing allocations; every allocation costs more until heap_stop."""
+    if tracemalloc.is_tracing():
+        return "Heap tracing is already on"
+    tracemalloc.start(HEAP_FRAMES)
+    return "Heap tracing started; only allocations made from now on are seen"
+
+
+def heap_stop() -> str:
+    global previous_snapshot
+    with heap_lock:
+        previous_snapshot = None
+        if not tracemalloc.is_tracing():
+            return "Heap tracing is off"
+        tracemalloc.stop()
+    return "Heap tracing stopped, snapshots dropped"
+
+
+def heap_snapshot(limit: int = 20) -> str:
+    """
+    Lines holding the most traced memory, and what changed since the previous snapshot.
+
+    Taking a snapshot copies every trace; call it from a thread so the event
+    loop keeps running meanwhile.
+    """
+    global previous_snapshot
+    if not tracemalloc.is_tracing():
+        return "Heap tracing is off; start it first"
+    with heap_lock:
+        snapshot = tracemalloc.take_snapshot().filter_traces(HEAP_FILTERS)
+        current, peak = tracemalloc.get_traced_memory()
+        lines = [
+            f"Traced {current / 2 ** 20:.1f} MiB, peak {peak / 2 ** 20:.1f} MiB, "
+            f"tracemalloc itself {tracemalloc.get_tracemalloc_memory() / 2 ** 20:.1f} MiB",
+            "",
+            f"Top {limit} lines:",
+        ]
+        lines += [str(stat) for stat in snapshot.statistics("lineno")[:limit]]
+        if previous_snapshot is not None:
+            lines += ["", f"Top {limit} changes since the previous snapshot:"]
+            lines += [str(stat) for stat in snapshot.compare_to(previous_snapshot, "lineno")[:limit]]
+        previous_snapshot = snapshot
+    return "\n".join(lines)
+
+
+def coroutine_stack(coro: Any) -> List[str]:
+    """
+    Frames of a suspended coroutine down to what it awaits.
+
+    Task.get_stack() only returns the outermost frame of a suspended task,
+    so the await chain is followed here instead.
+    """
+    frames = []
+    while coro is not None:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None) or getattr(coro, "ag_frame", None)
+        if frame is None:
+            # A future awaited through its iterator, a socket read for instance
+            name = type(coro).__name__
+            frames.append(f"awaiting {'Future' if name == 'FutureIter' else name}")
+            break
+        code = frame.f_code
+        frames.append(f"{code.co_qualname} ({code.co_filename}:{frame.f_lineno})")
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None) or getattr(coro, "ag_await", None)
+    return frames
+
+
+def dump_tasks() -> str:
+    """
+    Await chain of every task of the running loop, grouping tasks stuck at the same place.
+
+    Must be called on the event loop; it only reads frames.
+    """
+    groups: Dict[Tuple[str, ...], List[str]] = {}
+    tasks = asyncio.all_tasks()
+    for task in tasks:
+        stack = tuple(coroutine_stack(task.get_coro()))
+        groups.setdefault(stack, []).append(task.get_name())
+
+    lines = [f"{len(tasks)} tasks, {len(groups)} distinct stacks"]
+    for stack, names in sorted(groups.items(), key=lambda item: -len(item[1])):
+        shown = ", ".join(sorted(names)[:5]) + (", ..." if len(names) > 5 else "")
+        lines += ["", f"{len(names)} x {shown}"]
+        lines += [f"  {frame}" for frame in stack]
+    return "\n".join(lines)
@@ -0,0 +1,167 @@
+import logging
+import time
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy.engine import Connection
+from starlette.types import Scope
+
+from app.core.config import get_app_config
+
+logger = logging.getLogger(__name__)
+
+config = get_app_config().query_budget
+
+# Budget of a request whose route has not been looked up yet
+UNRESOLVED = -1
+
+
+class QueryBudgetExceeded(Exception):
+    """A request ran more SQL statements than its route allows (mode: raise)."""
+
+
+def query_budget(max_queries: int) -> Callable:
+    """
+    Declare how many SQL statements an endpoint may run per request.
+
+    Put it below the router decorator:
+
+        @router.get("/users")
+        @query_budget(5)
+        async def get_users(...):
+    """
+    def decorator(endpoint: Callable) -> Callable:
+        endpoint.query_budget = max_queries
+        return endpoint
+    return decorator
+
+
+class RequestStats:
+    """SQL work of the request being handled, filled in by the engine listeners."""
+    __slots__ = ("scope", "statements", "sql_time", "shapes", "budget")
+
+    def __init__(self, scope: Scope):
+        self.scope = scope
+        self.statements = 0
+        self.sql_time = 0.0
+        # statement text -> executions; bound parameters are not part of the text
+        self.shapes: Optional[Dict[str, int]] = None
+        self.budget: Optional[int] = UNRESOLVED
+
+    @property
+    def route(self) -> str:
+        return getattr(self.scope.get("route"), "path", self.scope["path"])
+
+    def route_budget(self) -> Optional[int]:
+        # The route is matched before any statement runs, so this is resolved once
+        if self.budget == UNRESOLVED:
+            endpoint = getattr(self.scope.get("route"), "endpoint", None)
+            self.budget = getattr(endpoint, "query_budget", config.default_max_queries)
+        return self.budget
+
+    def record(self, statement: str, elapsed: float) -> None:
+        self.statements += 1
+        self.sql_time += elapsed
+        shapes = self.shapes
+        if shapes is None:
+            shapes = self.shapes = {}
+        shapes[statement] = shapes.get(statement, 0) + 1
+
+    def over_budget(self) -> bool:
+        budget = self.route_budget()
+        return budget is not None and self.statements > budget
+
+    def repeated(self) -> List[Tuple[str, int]]:
+        """Statements run at least repeat_threshold times, most repeated first."""
+        if not self.shapes:
+            return []
+        repeated = [(shape, count) for shape, count in self.shapes.items() if count >= config.repeat_threshold]
+        return sorted(repeated, key=lambda item: -item[1])
+
+    def debug_headers(self) -> List[Tuple[bytes, bytes]]:
+        return [
+            (b"x-db-queries", str(self.statements).encode()),
+            (b"x-db-time", f"{self.sql_time * 1000:.1f}ms".encode()),
+        ]
+
+
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+
+def check_budget(statement: str) -> None:
+    """Called before each statement; raises in raise mode once the budget is spent."""
+    if config.mode != "raise":
+        return
+    stats = current_request.get()
+    if stats is None:
+        return
+    budget = stats.route_budget()
+    if budget is not None and stats.statements >= budget:
+        raise QueryBudgetExceeded(
+            f"{stats.scope['method']} {stats.route} exceeded its budget of {budget} queries "
+            f"with: {statement[:200]}"
+        )
+
+
+def report_request(stats: RequestStats) -> Tuple[bool, int]:
+    """
+    Log a finished request that went over budget or repeated statements.
+
+    Returns:
+        Whether it was over budget, and how many statement shapes repeated
+    """
+    over_budget = stats.over_budget()
+    if over_budget:
+        logger.warning(f"{stats.scope['method']} {stats.route} ran {stats.statements} queries "
+                       f"({stats.sql_time * 1000:.1f} ms), budget {stats.budget}")
+    repeated = stats.repeated()
+    for shape, count in repeated[:3]:
+        logger.warning(f"Possible N+1 in {stats.scope['method']} {stats.route}: "
+                       f"{count}x {' '.join(shape.split())[:300]}")
+    return over_budget, len(repeated)
+
+
+# statement -> when it was last explained
+explained: Dict[str, float] = {}
+
+
+def explain_slow_statement(conn: Connection, statement: str, parameters: Any, elapsed: float) -> None:
+    """
+    Log a slow statement, with its PostgreSQL plan for SELECTs.
+
+    The plan comes from a separate pooled connection, so a failing EXPLAIN
+    cannot abort the request's transaction; each statement is explained at
+    most once per explain_interval. This runs on the event loop, so it is
+    skipped when no pooled connection is idle rather than waiting for one.
+    """
+    route = ""
+    stats = current_request.get()
+    if stats is not None:
+        route = f" in {stats.scope['method']} {stats.route}"
+    logger.warning(f"Slow statement{route} ({elapsed * 1000:.1f} ms): {' '.join(statement.split())[:500]}")
+
+    if (not config.explain or conn.dialect.name != "postgresql"
+            or not statement.lstrip().upper().startswith("SELECT")):
+        return
+    pool = conn.engine.pool
+    if hasattr(pool, "checkedout") and pool.checkedout() >= pool.size():
+        logger.warning(f"Not explaining the slow statement{route}: no idle database connection")
+        return
+    now = time.monotonic()
+    if now - explained.get(statement, float("-inf")) < config.explain_interval:
+        return
+    if len(explained) > 1000:
+        explained.clear()
+    explained[statement] = now
+
+    raw = conn.engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        cursor.execute(f"EXPLAIN {statement}", parameters)
+        plan = "\n".join(row[0] for row in cursor.fetchall())
+        cursor.close()
+        logger.warning(f"Plan of the slow statement{route}:\n{plan}")
+    except Exception as e:
+        logger.error(f"Could not explain slow statement: {e}")
+    finally:
+        raw.close()
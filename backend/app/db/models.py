@@ -1,5 +1,5 @@
 from sqlalchemy import Column, BigInteger, Boolean, Integer, String, Float, \
-        DateTime, ForeignKey, JSON, ARRAY
+        DateTime, ForeignKey, JSON, ARRAY, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from .base import Base
@@ -36,6 +36,11 @@ class Invoice(Base):
     payload = Column(String, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+    __table_args__ = (
+        # Used by the expiry sweep: status = 'active' AND created_at < cutoff
+        Index("ix_invoices_status_created_at", "status", "created_at"),
+    )
+
 class Payment(Base):
     __tablename__ = "payments"
     
@@ -1,16 +1,22 @@
 import uvicorn
-from fastapi import FastAPI, Depends
+from fastapi import FastAPI, Depends, Response
 from fastapi.middleware.cors import CORSMiddleware
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
+import asyncio
 import logging
 
-from app.api.endpoints import admin, user, referral, payment, device, raffles
+from app.api.endpoints import admin, user, referral, payment, device, raffles, webhooks, profiling
 from app.core.security import get_api_key
 from app.core.config import get_app_config
+from app.core.admission import AdmissionController, AdmissionMiddleware
+from app.core.metrics import JOB_DURATION, JOB_FAILURES, MetricsMiddleware, register_admission, render_metrics
+from app.core.tracing import TracingMiddleware, get_tracer, setup_tracing
+from app.core.logging import route_uvicorn_logs
 from app.db.base import Base
 from app.db.session import engine, SessionLocal
 from app.services.subscription_cleanup import cleanup_expired_subscriptions
+from app.services.leader import run_as_leader
 
 logger = logging.getLogger(__name__)
 
@@ -21,6 +27,11 @@ config = get_app_config()
 
 app = FastAPI(title="VPN Service API")
 
+# Admission control; added first so it runs inside CORS and 503s keep CORS headers
+admission = AdmissionController(config.admission)
+if config.admission.enabled:
+    app.add_middleware(AdmissionMiddleware, controller=admission)
+
 # Set up CORS
 app.add_middleware(
     CORSMiddleware,
@@ -30,6 +41,19 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Metrics outermost, so request latency includes admission waits and 503s
+app.add_middleware(MetricsMiddleware)
+register_admission(admission)
+
+# Tracing wraps everything, continuing the bot's traceparent
+setup_tracing(
+    "backend",
+    sample_ratio=config.tracing.sample_ratio,
+    path=config.tracing.path,
+    otlp_endpoint=config.tracing.otlp_endpoint
+)
+app.add_middleware(TracingMiddleware)
+
 # Include routers with authentication
 app.include_router(user.router, prefix="/users", tags=["users"], dependencies=[Depends(get_api_key)])
 app.include_router(referral.router, prefix="/referrals", tags=["referrals"], dependencies=[Depends(get_api_key)])
@@ -37,21 +61,43 @@ app.include_router(payment.router, prefix="/payments", tags=["payments"], depend
 app.include_router(device.router, prefix="/devices", tags=["devices"], dependencies=[Depends(get_api_key)])
 app.include_router(admin.router, prefix="/admin", tags=["admin"], dependencies=[Depends(get_api_key)])
 app.include_router(raffles.router, prefix="/raffles", tags=["raffles"], dependencies=[Depends(get_api_key)])
+app.include_router(profiling.router, prefix="/profile", tags=["profiling"], dependencies=[Depends(get_api_key)])
+# Provider webhooks authenticate with their own signatures, not the API token
+app.include_router(webhooks.router, prefix="/webhooks", tags=["webhooks"])
 
 # Initialize scheduler
 scheduler = AsyncIOScheduler(timezone="UTC")
 
+cleanup_duration = JOB_DURATION.labels("subscription_cleanup")
+cleanup_failures = JOB_FAILURES.labels("subscription_cleanup")
+
+async def run_cleanup():
+    # Create a new database session for the scheduler
+    db = SessionLocal()
+    try:
+        with cleanup_duration.time():
+            stats = await cleanup_expired_subscriptions(db)
+        logger.info(f"Subscription cleanup completed: {stats}")
+    except Exception as e:
+        cleanup_failures.inc()
+        logger.error(f"Subscription cleanup failed: {e}")
+    finally:
+        db.close()
+
+async def run_scheduler():
+    """Run the scheduler while this worker is the leader."""
+    scheduler.start()
+    logger.info("Scheduler started")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        scheduler.shutdown(wait=False)
+        logger.info("Scheduler stopped")
+
 @app.on_event("startup")
 async def startup_event():
-    # Create a new database session for the scheduler
-    async def run_cleanup():
-        async with SessionLocal() as db:
-            try:
-                stats = await cleanup_expired_subscriptions(db)
-                logger.info(f"Subscription cleanup completed: {stats}")
-            except Exception as e:
-                logger.error(f"Subscription cleanup failed: {e}")
-    
+    # uvicorn has configured its loggers by now
+    route_uvicorn_logs()
     # Schedule daily cleanup at 00:00 UTC
     scheduler.add_job(
         run_cleanup,
@@ -59,18 +105,38 @@ async def startup_event():
         id="subscription_cleanup",
         replace_existing=True
     )
-    scheduler.start()
-    logger.info("Scheduler started")
+    # Every uvicorn worker campaigns, only the leader runs scheduled jobs
+    app.state.scheduler_election = asyncio.create_task(run_as_leader(
+        "scheduler",
+        run_scheduler,
+        backend=config.leader.backend,
+        lock_dir=config.leader.lock_dir,
+        retry_interval=config.leader.retry_interval,
+        check_interval=config.leader.check_interval
+    ))
 
 @app.on_event("shutdown")
 async def shutdown_event():
-    scheduler.shutdown()
-    logger.info("Scheduler stopped")
+    election = app.state.scheduler_election
+    election.cancel()
+    await asyncio.gather(election, return_exceptions=True)
+    # Flush spans still queued for export
+    await asyncio.to_thread(get_tracer().shutdown)
 
 @app.get("/")
 async def root():
     return {"message": "Welcome to VPN Service API"}
 
+@app.get("/admission", dependencies=[Depends(get_api_key)])
+async def admission_stats():
+    return admission.stats()
+
+@app.get("/metrics", dependencies=[Depends(get_api_key)])
+async def metrics():
+    # Scrape with the API token as a bearer credential
+    content, content_type = render_metrics()
+    return Response(content=content, media_type=content_type)
+
 if __name__ == "__main__":
     uvicorn.run(
         "app.main:app",
@@ -57,3 +57,15 @@ class InvoiceResponse(InvoiceBase):
 
 class InvoiceUpdate(BaseModel):
     status: str
+
+class InvoiceExpire(BaseModel):
+    older_than_minutes: int = 15
+
+class ExpiredInvoiceResponse(BaseModel):
+    invoice_id: str
+    user_id: int
+
+class InvoiceCompleteResponse(BaseModel):
+    invoice_id: str
+    status: str
+    applied: bool
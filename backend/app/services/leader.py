@@ -0,0 +1,162 @@
+import asyncio
+import fcntl
+import hashlib
+import logging
+import os
+from typing import Awaitable, Callable, Optional
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import NullPool
+
+from app.db.session import DATABASE_URL
+
+logger = logging.getLogger(__name__)
+
+# Lease connections are never pooled: closing one must really release the lock
+lease_engine = create_engine(
+    DATABASE_URL,
+    poolclass=NullPool,
+    connect_args={
+        "connect_timeout": 5,
+        "keepalives": 1,
+        "keepalives_idle": 5,
+        "keepalives_interval": 2,
+        "keepalives_count": 3,
+    }
+)
+
+
+def lock_key(name: str) -> int:
+    """Stable signed 64-bit advisory lock key for a job name."""
+    return int.from_bytes(hashlib.sha256(name.encode()).digest()[:8], "big", signed=True)
+
+
+class PostgresLease:
+    """
+    Leadership held as a session-level Postgres advisory lock.
+
+    The lock lives as long as the connection, so it is released as soon as
+    the leader's worker process exits or its connection drops.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.key = lock_key(name)
+        self.conn = None
+
+    def _acquire(self) -> bool:
+        if self.conn is None:
+            self.conn = lease_engine.connect()
+        acquired = self.conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": self.key}).scalar()
+        self.conn.commit()
+        return bool(acquired)
+
+    def _check(self) -> bool:
+        # A session lock is held for as long as its session is alive
+        try:
+            self.conn.execute(text("SELECT 1"))
+            self.conn.commit()
+            return True
+        except Exception as e:
+            logger.error(f"Leader check for {self.name} failed: {e}")
+            return False
+
+    def _release(self) -> None:
+        if self.conn is not None:
+            try:
+                self.conn.close()
+            except Exception as e:
+                logger.error(f"Error closing lease connection for {self.name}: {e}")
+            self.conn = None
+
+    async def acquire(self) -> bool:
+        return await asyncio.to_thread(self._acquire)
+
+    async def check(self) -> bool:
+        return await asyncio.to_thread(self._check)
+
+    async def release(self) -> None:
+        await asyncio.to_thread(self._release)
+
+
+class FileLease:
+    """Leadership held as an exclusive flock, for workers on one host."""
+
+    def __init__(self, lock_dir: str, name: str):
+        self.path = os.path.join(lock_dir, f"{name}.lock")
+        self.name = name
+        self.fd: Optional[int] = None
+
+    async def acquire(self) -> bool:
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        self.fd = fd
+        return True
+
+    async def check(self) -> bool:
+        # The kernel releases the lock only when the process exits
+        return self.fd is not None
+
+    async def release(self) -> None:
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+async def run_as_leader(
+    name: str,
+    job: Callable[[], Awaitable[None]],
+    backend: str = "postgres",
+    lock_dir: str = "/tmp",
+    retry_interval: float = 5,
+    check_interval: float = 5
+) -> None:
+    """
+    Run `job` in exactly one worker among all that call this with `name`.
+
+    Every worker campaigns for the lease; the holder runs the job while the
+    others retry every `retry_interval` seconds. The holder re-checks the
+    lease every `check_interval` seconds and cancels the job as soon as it
+    can no longer confirm it.
+
+    Args:
+        name: Job name, the lock key is derived from it
+        job: Coroutine function that runs until cancelled
+        backend: "postgres" for advisory locks or "file" for a local flock
+        lock_dir: Directory for file locks
+        retry_interval: Seconds between attempts to become leader
+        check_interval: Seconds between lease checks while leading
+    """
+    lease = FileLease(lock_dir, name) if backend == "file" else PostgresLease(name)
+    while True:
+        try:
+            acquired = await lease.acquire()
+        except Exception as e:
+            logger.error(f"Could not campaign for {name}: {e}")
+            await lease.release()
+            acquired = False
+        if not acquired:
+            await asyncio.sleep(retry_interval)
+            continue
+
+        logger.info(f"Worker {os.getpid()} became leader for {name}")
+        task = asyncio.create_task(job(), name=name)
+        try:
+            while not task.done():
+                await asyncio.wait({task}, timeout=check_interval)
+                if not task.done() and not await lease.check():
+                    logger.error(f"Lost leadership for {name}, stopping job")
+                    break
+        finally:
+            if not task.done():
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+            await lease.release()
+
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Job {name} failed: {task.exception()}")
+        await asyncio.sleep(retry_interval)
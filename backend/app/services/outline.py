@@ -2,6 +2,8 @@ import httpx
 from typing import Tuple
 from fastapi import HTTPException, status
 from app.core.logging import logger
+from app.core.metrics import outline_call, outline_server_label
+from app.core.tracing import KIND_CLIENT, get_tracer
 
 async def create_outline_key(
         api_url: str, 
@@ -28,12 +30,14 @@ async def create_outline_key(
         try:
             # url = "https://195.133.64.129:53470/IT1hLCPJJRgkP9C8aNe3gA/access-keys"
             url = f"{api_url}/access-keys"
-            response = await client.post(
-                url,
-                headers=headers,
-                json={}
-            )
-            response.raise_for_status()
+            with outline_call(api_url, "create_key"), \
+                    get_tracer().span("outline create_key", KIND_CLIENT, server=outline_server_label(api_url)):
+                response = await client.post(
+                    url,
+                    headers=headers,
+                    json={}
+                )
+                response.raise_for_status()
             
             data = response.json()
             access_key = data.get("accessUrl")
@@ -46,7 +50,7 @@ async def create_outline_key(
                     detail="Failed to generate VPN key: invalid response"
                 )
             
-            logger.info(f"Generated Outline key: id={key_id}, access_key={access_key}")
+            logger.info(f"Generated Outline key: id={key_id}")
             return access_key, key_id
             
         except httpx.HTTPStatusError as e:
@@ -81,11 +85,13 @@ async def delete_outline_key(api_url: str, cert_sha256: str, outline_key_id: str
     
     async with httpx.AsyncClient(verify=False) as client:
         try:
-            response = await client.delete(
-                f"{api_url}/access-keys/{outline_key_id}",
-                headers=headers
-            )
-            response.raise_for_status()
+            with outline_call(api_url, "delete_key"), \
+                    get_tracer().span("outline delete_key", KIND_CLIENT, server=outline_server_label(api_url)):
+                response = await client.delete(
+                    f"{api_url}/access-keys/{outline_key_id}",
+                    headers=headers
+                )
+                response.raise_for_status()
             
             logger.info(f"Deleted Outline key: id={outline_key_id}")
             
@@ -0,0 +1,374 @@
+from typing import Optional, Tuple
+from datetime import datetime, timedelta, timezone
+
+from fastapi import HTTPException, status
+from sqlalchemy.orm import Session
+
+from app.core.logging import logger
+from app.db.models import User, Payment, Invoice, Subscription, Raffle, Ticket
+from app.schemas.payment import BalancePaymentCreate
+
+MONTH_PRICE = {
+    "device": {"0": 0.0, "1": 100.0, "3": 240.0, "6": 420.0, "12": 600.0},
+    "router": {"0": 0.0, "1": 250.0, "3": 600.0, "6": 1000.0, "12": 1500.0},
+    "combo": {
+        "0": {"0": 0.0},
+        "5": {"0": 0.0, "1": 500.0, "3": 1200.0, "6": 2100.0, "12": 3000.0},
+        "10": {"0": 0.0, "1": 850.0, "3": 2000.0, "6": 3500.0, "12": 5000.0}
+    }
+}
+
+# Invoices in these states can still be applied: a payment may land right
+# after the expiry sweep has closed the invoice
+PAYABLE_INVOICE_STATUSES = ("active", "expired")
+
+def apply_balance_payment(db: Session, payment: BalancePaymentCreate, payment_id: Optional[str] = None) -> None:
+    """
+    Apply a payment to the user's balance, subscriptions or raffle tickets.
+
+    Changes are added to the session but not committed, so the caller can
+    commit them together with its own updates.
+
+    Args:
+        db: SQLAlchemy session
+        payment: Payment data
+        payment_id: Provider invoice id stored with the payment record
+
+    Raises:
+        HTTPException: If the user is unknown or the payment data is invalid
+    """
+    logger.info(f"Processing balance payment: user_id={payment.user_id}, amount={payment.amount}, "
+                f"device_type={payment.device_type}, device={payment.device}, "
+                f"payment_type={payment.payment_type}, method={payment.method}")
+    
+    # Проверка существования пользователя
+    user = db.query(User).filter(User.user_id == payment.user_id).first()
+    if not user:
+        logger.error(f"User with ID {payment.user_id} not found")
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+    
+    # Обработка add_balance
+    if payment.payment_type == "add_balance":
+        if payment.amount <= 0:
+            logger.error(f"Invalid amount for add_balance: {payment.amount}")
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Amount must be positive for add_balance"
+            )
+        
+        user.balance = (user.balance or 0) + payment.amount
+        db_payment = Payment(
+            user_id=payment.user_id,
+            amount=payment.amount,
+            period=payment.period,
+            device_type=payment.device_type,
+            device=payment.device,
+            payment_type=payment.payment_type,
+            method=payment.method,
+            status="succeeded",
+            payment_id=payment_id
+        )
+        db.add(db_payment)
+        
+        logger.info(f"Balance added successfully: user_id={payment.user_id}, amount={payment.amount}")
+        return
+    
+    # Обработка покупки билетов
+    if payment.payment_type == "ticket":
+        try:
+            raffle_id = int(payment.device)  # device содержит raffle_id
+        except ValueError:
+            logger.error(f"Invalid raffle_id: {payment.device}")
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid raffle_id"
+            )
+        
+        raffle = db.query(Raffle).filter(Raffle.id == raffle_id).first()
+        if not raffle or not raffle.is_active or raffle.type != "ticket":
+            logger.error(f"Invalid or inactive raffle: raffle_id={raffle_id}")
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid or inactive raffle"
+            )
+        
+        # Проверяем, что сумма соответствует цене билетов
+        if raffle.ticket_price is None or raffle.ticket_price <= 0:
+            logger.error(f"Invalid ticket price for raffle: raffle_id={raffle_id}")
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid ticket price"
+            )
+        
+        ticket_count = payment.amount // raffle.ticket_price
+        if ticket_count <= 0 or payment.amount % raffle.ticket_price != 0:
+            logger.error(f"Invalid amount for tickets: amount={payment.amount}, ticket_price={raffle.ticket_price}")
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Amount must be a multiple of ticket price"
+            )
+        
+        # Начисляем билеты
+        try:
+            db_ticket = db.query(Ticket).filter(
+                Ticket.raffle_id == raffle_id,
+                Ticket.user_id == int(payment.user_id)  # Явное приведение к int
+            ).first()
+            if db_ticket:
+                db_ticket.count += ticket_count
+            else:
+                db_ticket = Ticket(
+                    raffle_id=raffle_id,
+                    user_id=int(payment.user_id),  # Явное приведение к int
+                    count=ticket_count
+                )
+                db.add(db_ticket)
+        except Exception as e:
+            logger.error(f"Error creating/updating ticket: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Error processing tickets"
+            )
+        
+        # Создаём запись платежа
+        db_payment = Payment(
+            user_id=payment.user_id,
+            amount=payment.amount,
+            period=payment.period,
+            device_type=payment.device_type,
+            device=payment.device,
+            payment_type=payment.payment_type,
+            method=payment.method,
+            status="succeeded",
+            payment_id=payment_id
+        )
+        db.add(db_payment)
+        
+        logger.info(f"Tickets purchased successfully: user_id={payment.user_id}, raffle_id={raffle_id}, count={ticket_count}")
+        return
+    
+    # Валидация цены подписки
+    expected_price = 0
+    combo_size = 0
+    current_time = datetime.now(timezone.utc)
+
+    if payment.device_type == "combo":
+        subscription = db.query(Subscription).filter(
+            Subscription.user_id == payment.user_id,
+            Subscription.type == "combo",
+            Subscription.end_date > current_time,
+            Subscription.is_active == True
+        ).first()
+        
+        if subscription:
+            combo_size = subscription.combo_size
+        else:
+            last_subscription = db.query(Subscription).filter(
+                Subscription.user_id == payment.user_id,
+                Subscription.type == "combo"
+            ).order_by(Subscription.end_date.desc()).first()
+            combo_size = last_subscription.combo_size if last_subscription else 5
+            combo_size = 10 if payment.device == "10" else combo_size
+        try:
+            expected_price = MONTH_PRICE["combo"][str(combo_size)][str(payment.period)]
+        except KeyError:
+            logger.error(f"Invalid combo size or period: combo_size={combo_size}, period={payment.period}")
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid combo size or period"
+            )
+    else:
+        try:
+            expected_price = MONTH_PRICE[payment.device_type][str(payment.period)]
+        except KeyError:
+            logger.error(f"Invalid device type or period: {payment.device_type}, {payment.period}")
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid device type or period"
+            )
+
+    if payment.amount != expected_price and payment.method != 'promo':
+        logger.error(f"Amount mismatch: provided={payment.amount}, expected={expected_price}")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Amount does not match expected price"
+        )
+    
+    if payment.method == "balance":
+        if user.balance < payment.amount:
+            logger.error(f"Insufficient balance for user {payment.user_id}: {user.balance} < {payment.amount}")
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Insufficient balance"
+            )
+        user.balance -= payment.amount
+    
+    # Создание записи платежа
+    db_payment = Payment(
+        user_id=payment.user_id,
+        amount=payment.amount,
+        period=payment.period,
+        device_type=payment.device_type,
+        device=payment.device,
+        payment_type=payment.payment_type,
+        method=payment.method,
+        status="succeeded",
+        payment_id=payment_id
+    )
+    db.add(db_payment)
+    
+    # Обновление или создание подписки
+    current_time = datetime.now(timezone.utc)
+    duration_days = int(payment.period) * 30
+    
+    if payment.device_type == "combo":
+        subscription = db.query(Subscription).filter(
+            Subscription.user_id == payment.user_id,
+            Subscription.type == "combo",
+            Subscription.combo_size == combo_size,
+            Subscription.end_date > current_time,
+            Subscription.is_active == True
+        ).first()
+        
+        if subscription:
+            subscription.end_date += timedelta(days=duration_days)
+            subscription.is_active = True
+        else:
+            last_subscription = db.query(Subscription).filter(
+                Subscription.user_id == payment.user_id,
+                Subscription.type == "combo",
+                Subscription.combo_size == combo_size
+            ).order_by(Subscription.end_date.desc()).first()
+            
+            start_date = current_time
+            if last_subscription and last_subscription.end_date > current_time:
+                start_date = last_subscription.end_date
+            
+            subscription = Subscription(
+                user_id=payment.user_id,
+                type=payment.device_type,
+                combo_size=combo_size,
+                start_date=start_date,
+                end_date=start_date + timedelta(days=duration_days),
+                is_active=True
+            )
+            db.add(subscription)
+    else:
+        last_subscription = db.query(Subscription).filter(
+            Subscription.user_id == payment.user_id,
+            Subscription.type == payment.device_type
+        ).order_by(Subscription.end_date.desc()).first()
+        
+        start_date = current_time
+        subscription = Subscription(
+            user_id=payment.user_id,
+            type=payment.device_type,
+            combo_size=0,
+            start_date=start_date,
+            end_date=start_date + timedelta(days=duration_days),
+            is_active=True,
+            paused_at=start_date
+        )
+        db.add(subscription)
+    
+    # Начисление билетов для активных розыгрышей типа "subscription"
+    active_raffles = db.query(Raffle).filter(
+        Raffle.type == "subscription",
+        Raffle.is_active == True,
+        Raffle.start_date <= current_time,
+        Raffle.end_date > current_time
+    ).all()
+    
+    ticket_count = int(payment.period) if payment.device_type != "combo" else combo_size + 1
+    
+    for raffle in active_raffles:
+        if current_time >= raffle.start_date:
+            ticket = db.query(Ticket).filter(
+                Ticket.raffle_id == raffle.id,
+                Ticket.user_id == int(payment.user_id)
+            ).first()
+            if ticket:
+                ticket.count += ticket_count
+            else:
+                ticket = Ticket(
+                    raffle_id=raffle.id,
+                    user_id=int(payment.user_id),
+                    count=ticket_count
+                )
+                db.add(ticket)
+    
+    logger.info(f"Balance payment processed successfully: user_id={payment.user_id}, amount={payment.amount}")
+
+def parse_invoice_payload(invoice: Invoice) -> BalancePaymentCreate:
+    """
+    Build payment data from an invoice payload.
+
+    The payload format is user_id:amount:period:device_type:device:payment_type:method,
+    as created by the bot payment handlers.
+    """
+    try:
+        _, amount, period, device_type, device, payment_type, method = invoice.payload.split(":")
+        return BalancePaymentCreate(
+            user_id=invoice.user_id,
+            amount=float(amount),
+            period=int(period),
+            device_type=device_type,
+            device=device,
+            payment_type=payment_type,
+            method=method
+        )
+    except ValueError:
+        logger.error(f"Invalid payload format for invoice {invoice.invoice_id}: {invoice.payload}")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid invoice payload"
+        )
+
+def complete_invoice(db: Session, invoice_id: str) -> Tuple[Invoice, bool]:
+    """
+    Apply a paid invoice exactly once.
+
+    The invoice row is locked for the duration of the transaction, so
+    concurrent webhook deliveries and the bot poller cannot apply the same
+    invoice twice.
+
+    Args:
+        db: SQLAlchemy session
+        invoice_id: Provider invoice id
+
+    Returns:
+        Tuple of (invoice, applied). applied is False if the invoice was
+        already completed before this call.
+
+    Raises:
+        HTTPException: If the invoice is unknown, closed or its payload is invalid
+    """
+    invoice = db.query(Invoice).filter(Invoice.invoice_id == invoice_id).with_for_update().first()
+    if not invoice:
+        logger.error(f"Invoice {invoice_id} not found")
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Invoice not found")
+
+    if invoice.status == "completed":
+        db.rollback()
+        logger.info(f"Invoice {invoice_id} already completed, skipping")
+        return invoice, False
+
+    if invoice.status not in PAYABLE_INVOICE_STATUSES:
+        db.rollback()
+        logger.error(f"Invoice {invoice_id} is {invoice.status}, cannot complete")
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Invoice is {invoice.status}")
+
+    try:
+        apply_balance_payment(db, parse_invoice_payload(invoice), payment_id=invoice_id)
+    except HTTPException:
+        db.rollback()
+        raise
+    invoice.status = "completed"
+    db.commit()
+    db.refresh(invoice)
+
+    logger.info(f"Invoice {invoice_id} completed for user_id={invoice.user_id}")
+    return invoice, True
@@ -0,0 +1,35 @@
+import httpx
+from app.core.config import get_app_config
+from app.core.logging import logger
+
+TELEGRAM_API_URL = "https://api.telegram.org"
+
+async def send_message(chat_id: int, text: str) -> bool:
+    """
+    Send a message to a user on behalf of the bot.
+
+    Args:
+        chat_id: Telegram chat ID
+        text: Message text
+
+    Returns:
+        True if the message was sent, False if the bot token is not configured
+        or Telegram rejected the request
+    """
+    bot_token = get_app_config().telegram.bot_token
+    if not bot_token:
+        logger.warning(f"Telegram bot token is not configured, message to {chat_id} not sent")
+        return False
+
+    url = f"{TELEGRAM_API_URL}/bot{bot_token}/sendMessage"
+    async with httpx.AsyncClient(timeout=10.0) as client:
+        try:
+            response = await client.post(url, json={"chat_id": chat_id, "text": text})
+            response.raise_for_status()
+            return True
+        except httpx.HTTPStatusError as e:
+            logger.error(f"Telegram API error for chat {chat_id}: {e.response.status_code} - {e.response.text}")
+            return False
+        except httpx.RequestError as e:
+            logger.error(f"Telegram API connection error for chat {chat_id}: {e}")
+            return False
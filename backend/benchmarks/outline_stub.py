@@ -0,0 +1,97 @@
+"""
+Local stand-in for the Outline management API, for load tests.
+
+Creates and deletes access keys like an Outline server would, answering
+after --latency ms plus up to --jitter ms and failing --error-rate of the
+calls with a 500:
+
+    python -m benchmarks.outline_stub --port 8090 --latency 150 --jitter 100 --error-rate 0.02
+
+Register http://127.0.0.1:8090/<secret> as an Outline server (api_url);
+the secret path segment is accepted and ignored. Plain HTTP is fine, the
+backend does not verify Outline certificates.
+"""
+import argparse
+import asyncio
+import random
+import threading
+import time
+import uuid
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+class OutlineStub:
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0):
+        # Seconds
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.keys = {}
+        self.stats = {"created": 0, "deleted": 0, "failed": 0}
+
+    async def respond(self) -> bool:
+        """Wait like a remote server would; False when this call should fail."""
+        await asyncio.sleep(self.latency + random.uniform(0, self.jitter))
+        if random.random() < self.error_rate:
+            self.stats["failed"] += 1
+            return False
+        return True
+
+    async def create_key(self, request: Request) -> Response:
+        if not await self.respond():
+            return JSONResponse({"code": "InternalError", "message": "Injected failure"}, status_code=500)
+        key_id = str(self.stats["created"] + 1)
+        password = uuid.uuid4().hex[:22]
+        self.keys[key_id] = password
+        self.stats["created"] += 1
+        return JSONResponse({
+            "id": key_id,
+            "name": "",
+            "password": password,
+            "port": 26247,
+            "method": "chacha20-ietf-poly1305",
+            "accessUrl": f"ss://Y2hhY2hhMjAtaWV0Zi1wb2x5MTMwNTo{password}@127.0.0.1:26247/?outline=1"
+        }, status_code=201)
+
+    async def delete_key(self, request: Request) -> Response:
+        if not await self.respond():
+            return JSONResponse({"code": "InternalError", "message": "Injected failure"}, status_code=500)
+        if self.keys.pop(request.path_params["key_id"], None) is None:
+            return JSONResponse({"code": "NotFound", "message": "No such access key"}, status_code=404)
+        self.stats["deleted"] += 1
+        return Response(status_code=204)
+
+    def app(self) -> Starlette:
+        return Starlette(routes=[
+            Route("/{secret}/access-keys", self.create_key, methods=["POST"]),
+            Route("/{secret}/access-keys/{key_id}", self.delete_key, methods=["DELETE"]),
+        ])
+
+def start_in_thread(stub: OutlineStub, port: int) -> uvicorn.Server:
+    """Serve the stub on 127.0.0.1 from a daemon thread; stop it with server.should_exit = True."""
+    server = uvicorn.Server(uvicorn.Config(stub.app(), host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    deadline = time.monotonic() + 10
+    while not server.started:
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"Outline stub did not start on port {port}")
+        time.sleep(0.05)
+    return server
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency", type=float, default=150, help="Base response time, ms")
+    parser.add_argument("--jitter", type=float, default=100, help="Random extra response time, up to this many ms")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of calls answered with a 500")
+    args = parser.parse_args()
+
+    stub = OutlineStub(args.latency / 1000, args.jitter / 1000, args.error_rate)
+    uvicorn.run(stub.app(), host="127.0.0.1", port=args.port, log_level="info")
+
+if __name__ == "__main__":
+    main()
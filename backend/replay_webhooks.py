@@ -0,0 +1,101 @@
+"""
+Replay recorded provider webhook bodies against a running backend.
+
+Stands in for YooKassa and CryptoBot when testing webhook ingestion locally:
+
+    python replay_webhooks.py --url http://localhost:8081 --api-token TOKEN \
+        --cryptobot-token CRYPTO_TOKEN --seed webhook_samples/*.json
+
+CryptoBot bodies are signed with --cryptobot-token, which must match
+webhooks.cryptobot_token in config.yaml. YooKassa is authenticated by source
+address, so YooKassa bodies are sent with X-Forwarded-For set to one of its
+published addresses; enable webhooks.trust_forwarded_for for local runs.
+Each file is sent twice to check that the second delivery is not applied.
+"""
+import argparse
+import hashlib
+import hmac
+import json
+import sys
+
+import httpx
+
+YOOKASSA_SOURCE_IP = "185.71.76.1"
+
+def detect_provider(body: dict) -> str:
+    if "update_type" in body:
+        return "cryptobot"
+    if body.get("type") == "notification":
+        return "yookassa"
+    raise ValueError("Unknown webhook body")
+
+def invoice_from_body(provider: str, body: dict) -> dict:
+    """Build the active invoice the bot would have saved for this webhook."""
+    if provider == "cryptobot":
+        invoice = body["payload"]
+        invoice_id, amount, currency = invoice["invoice_id"], invoice["amount"], invoice["asset"]
+        payload = invoice["payload"]
+    else:
+        payment = body["object"]
+        invoice_id, amount = payment["id"], payment["amount"]["value"]
+        currency = payment["amount"]["currency"]
+        payload = payment["metadata"]["payload"]
+    return {
+        "user_id": int(payload.split(":")[0]),
+        "invoice_id": str(invoice_id),
+        "amount": float(amount),
+        "currency": currency,
+        "status": "active",
+        "payload": payload
+    }
+
+def sign_cryptobot(raw: bytes, token: str) -> str:
+    secret = hashlib.sha256(token.encode()).digest()
+    return hmac.new(secret, raw, hashlib.sha256).hexdigest()
+
+def replay(client: httpx.Client, args: argparse.Namespace, path: str) -> bool:
+    with open(path, "rb") as file:
+        raw = file.read()
+    body = json.loads(raw)
+    provider = detect_provider(body)
+
+    if args.seed:
+        invoice = invoice_from_body(provider, body)
+        response = client.post(
+            "/payments/invoices/", json=invoice,
+            headers={"Authorization": f"Bearer {args.api_token}"}
+        )
+        print(f"{path}: seeded invoice {invoice['invoice_id']} -> {response.status_code}")
+
+    headers = {"Content-Type": "application/json"}
+    if provider == "cryptobot":
+        headers["crypto-pay-api-signature"] = sign_cryptobot(raw, args.cryptobot_token or "")
+    else:
+        headers["X-Forwarded-For"] = YOOKASSA_SOURCE_IP
+
+    ok = True
+    for attempt in (1, 2):
+        response = client.post(f"/webhooks/{provider}", content=raw, headers=headers)
+        print(f"{path}: delivery {attempt} -> {response.status_code} {response.text}")
+        if response.status_code != 200:
+            ok = False
+        elif attempt == 2 and response.json().get("applied"):
+            print(f"{path}: duplicate delivery was applied again")
+            ok = False
+    return ok
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Replay recorded webhook bodies")
+    parser.add_argument("files", nargs="+", help="Recorded webhook JSON bodies")
+    parser.add_argument("--url", default="http://localhost:8081", help="Backend base URL")
+    parser.add_argument("--api-token", default="", help="Backend API token, needed for --seed")
+    parser.add_argument("--cryptobot-token", default="", help="CryptoBot API token used for signatures")
+    parser.add_argument("--seed", action="store_true", help="Create the matching active invoice first")
+    args = parser.parse_args()
+
+    with httpx.Client(base_url=args.url, timeout=10.0) as client:
+        results = [replay(client, args, path) for path in args.files]
+    return 0 if all(results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+USER_ID = 7_000_000_001
+# Enough users on one admin page for a per-user query to blow the budget
+OTHER_USERS = 10
+PROMOCODES = 5
+
+
+@pytest.fixture(scope="module")
+def seeded(app):
+    from app.db.models import Blacklist, Device, Payment, Promocode, PromocodeUsage, Raffle, Subscription, User
+    from app.db.session import SessionLocal
+
+    now = datetime.now(timezone.utc)
+    db = SessionLocal()
+    users = [User(user_id=USER_ID, first_name="Ivan", last_name="Petrov", username="ivan_budget", balance=1000.0)]
+    users += [
+        User(user_id=USER_ID + number, first_name="Ivan", last_name="Sidorov", username=f"ivan_{number}", balance=0.0)
+        for number in range(1, OTHER_USERS + 1)
+    ]
+    db.add_all(users)
+    db.flush()
+    for user in users:
+        # All three kinds, so per-subscription queries run as often as they can
+        for kind, combo_size in (("device", 0), ("router", 0), ("combo", 5)):
+            db.add(Subscription(user_id=user.user_id, type=kind, combo_size=combo_size, start_date=now,
+                                end_date=now + timedelta(days=30), is_active=True))
+            db.add(Device(user_id=user.user_id, device=kind, device_type="android", device_name=f"{kind}-1",
+                          vpn_key="ss://test", outline_key_id="1", start_date=now, end_date=now + timedelta(days=30)))
+            db.add(Payment(user_id=user.user_id, amount=100.0, period=1, device_type=kind,
+                           device=str(combo_size) if kind == "combo" else kind, payment_type="buy_subscription",
+                           method="ukassa", status="succeeded"))
+    db.add(Blacklist(user_id=USER_ID + 1))
+    db.add(Raffle(type="subscription", name="Budget raffle", start_date=now - timedelta(days=1),
+                  end_date=now + timedelta(days=10), is_active=True))
+    for number in range(PROMOCODES):
+        db.add(Promocode(code=f"BUDGET{number}", type="device_promo", max_usage=10))
+    db.flush()
+    for user in users[:3]:
+        db.add(PromocodeUsage(user_id=user.user_id, promocode_code="BUDGET0"))
+    db.commit()
+    db.close()
+
+
+def query_count(response) -> int:
+    assert response.status_code == 200, response.text
+    return int(response.headers["x-db-queries"])
+
+
+def test_get_user(client, seeded):
+    assert query_count(client.get(f"/users/{USER_ID}")) <= 1
+
+
+def test_active_devices(client, seeded):
+    assert query_count(client.get(f"/devices/active/{USER_ID}")) <= 1
+
+
+def test_subscriptions(client, seeded):
+    response = client.get(f"/payments/subscriptions/{USER_ID}")
+    assert query_count(response) <= 7
+    assert len(response.json()) == 3
+
+
+def test_admin_users_page(client, seeded):
+    response = client.get("/admin/users", params={"query": "ivan", "limit": 20})
+    assert query_count(response) <= 4
+    users = {user["user_id"]: user for user in response.json()}
+    assert len(users) == OTHER_USERS + 1
+    assert users[USER_ID + 1]["is_blacklisted"] and not users[USER_ID]["is_blacklisted"]
+    assert users[USER_ID]["subscription"]["combo"]["type"] == 5
+    assert users[USER_ID]["subscription"]["router"]["devices"] == ["router-1"]
+
+
+def test_promocodes(client, seeded):
+    response = client.get("/admin/promocodes", params={"limit": 20})
+    assert query_count(response) <= 2
+    usage = {promocode["code"]: promocode["usage_count"] for promocode in response.json()}
+    assert usage["BUDGET0"] == 3 and usage["BUDGET1"] == 0
+
+
+def test_balance_payment(client, seeded):
+    # Combo renewal with an active subscription raffle: the longest path
+    response = client.post("/payments/balance", json={
+        "user_id": USER_ID, "amount": 500.0, "period": 1, "device_type": "combo", "device": "5",
+        "payment_type": "buy_subscription", "method": "balance"
+    })
+    assert query_count(response) <= 12
+
+
+def test_raise_mode_fails_the_first_statement_over_budget(client, seeded, monkeypatch):
+    from app.api.endpoints.user import get_user
+    from app.core.query_budget import QueryBudgetExceeded
+    monkeypatch.setattr(get_user, "query_budget", 0)
+    with pytest.raises(QueryBudgetExceeded):
+        client.get(f"/users/{USER_ID}")
@@ -0,0 +1,26 @@
+from starlette.requests import Request
+
+
+def make_request(forwarded_for: str) -> Request:
+    return Request({
+        "type": "http",
+        "headers": [(b"x-forwarded-for", forwarded_for.encode())],
+        "client": ("10.0.0.2", 50000),
+    })
+
+
+def test_client_sent_forwarded_for_is_not_trusted(app, monkeypatch):
+    from app.api.endpoints import webhooks
+    monkeypatch.setattr(webhooks.config.webhooks, "trust_forwarded_for", True)
+    # The client claims a YooKassa address, the proxy appends the real one
+    ip = webhooks.client_ip(make_request("185.71.76.1, 203.0.113.7"))
+    assert ip == "203.0.113.7"
+    assert not webhooks.is_yookassa_ip(ip)
+
+
+def test_forwarded_hops_skip_trusted_proxies(app, monkeypatch):
+    from app.api.endpoints import webhooks
+    monkeypatch.setattr(webhooks.config.webhooks, "trust_forwarded_for", True)
+    monkeypatch.setattr(webhooks.config.webhooks, "forwarded_hops", 2)
+    assert webhooks.client_ip(make_request("185.71.76.1, 203.0.113.7, 10.0.0.1")) == "203.0.113.7"
+    assert webhooks.client_ip(make_request("203.0.113.7")) is None
@@ -1,29 +1,171 @@
 import asyncio
 from asyncio.events import BaseDefaultEventLoopPolicy
 import logging
+import secrets
 
 from aiogram import Bot, Dispatcher
 from aiogram.enums import ParseMode
 from aiogram.client.default import DefaultBotProperties
+from aiohttp import web
 from fluentogram import TranslatorHub, TranslatorRunner
 
 import middlewares
 from utils import TranslatorHub, create_translator_hub
-from middlewares import TranslatorRunnerMiddleware, BlacklistMiddleware
+from middlewares import (TranslatorRunnerMiddleware, BlacklistMiddleware, UpdateOrderingMiddleware,
+                         ThrottlingMiddleware, HandlerMetricsMiddleware, TracingMiddleware, setup_update_ordering)
 from handlers import (main_router, devices_router, payment_router, 
                       admin_router, another_router, unknown_router)
-from config import get_config, BotConfig
-from services.services import on_startup
+from config import (get_config, get_optional_config, BotConfig, Webhook, FsmStorage, Updates, Sharding,
+                    Throttling, Metrics, Tracing, Logging)
+from services.services import on_startup, on_shutdown
+from services.session import add_trace_config, close_session
+from utils.webhook import run_webhook, run_socket_worker, serve_until_stopped, wait_for_stop_signal
+from utils.sharding import ShardRouter, create_front_app, run_front_polling
+from utils.fsm_storage import create_fsm_storage
+from keyboards.cache import warm_up_keyboards
+from utils.metrics import start_metrics_server
+from utils.tracing import create_tracing_config, setup_tracing
+from utils.logs import configure_logging
 
 
 logger = logging.getLogger(__name__)
 
-async def main():
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(filename)s:%(lineno)d #%(levelname)-8s '
-               '[%(asctime)s] - %(name)s - %(message)s'
+def setup_logging() -> None:
+    logging_config = get_optional_config(Logging, "logging")
+    configure_logging(
+        level=logging_config.level,
+        json_format=logging_config.format == "json",
+        sample=logging_config.sample,
+        files=logging_config.files,
+        queue_size=logging_config.queue_size
+    )
+
+def start_metrics(port_offset: int = 0) -> None:
+    metrics_config = get_optional_config(Metrics, "metrics")
+    if metrics_config.enabled:
+        start_metrics_server(metrics_config.host, metrics_config.port + port_offset)
+
+def start_tracing() -> None:
+    tracing_config = get_optional_config(Tracing, "tracing")
+    tracer = setup_tracing(
+        "bot",
+        sample_ratio=tracing_config.sample_ratio,
+        path=tracing_config.path,
+        otlp_endpoint=tracing_config.otlp_endpoint
+    )
+    if tracer.enabled:
+        add_trace_config(create_tracing_config())
+
+def create_bot(bot_config: BotConfig) -> Bot:
+    return Bot(token=bot_config.token.get_secret_value(),
+               default=DefaultBotProperties(parse_mode=ParseMode.HTML))
+
+def create_dispatcher() -> Dispatcher:
+    fsm_config = get_optional_config(FsmStorage, "fsm")
+    dp = Dispatcher(storage=create_fsm_storage(
+        backend=fsm_config.backend,
+        dsn=fsm_config.dsn,
+        state_ttl=fsm_config.state_ttl,
+        max_states=fsm_config.max_states,
+        cache_size=fsm_config.cache_size,
+        cache_ttl=fsm_config.cache_ttl,
+        flush_interval=fsm_config.flush_interval
+    ))
+
+    # Routers, dialogs, middlewares
+    dp.include_routers(main_router, devices_router, payment_router, admin_router, another_router, unknown_router)
+    # Different users are handled concurrently, each user's updates in order
+    updates_config = get_optional_config(Updates, "updates")
+    dp.update.outer_middleware(TracingMiddleware())
+    # Before the state is loaded, so a queued update sees what the previous one set
+    setup_update_ordering(dp, UpdateOrderingMiddleware(concurrency=updates_config.concurrency))
+    dp.update.middleware(TranslatorRunnerMiddleware())
+    # First inner middleware of every event type: handler latency includes throttling and the blacklist check
+    handler_metrics = HandlerMetricsMiddleware()
+    for update_type in dp.resolve_used_update_types():
+        dp.observers[update_type].middleware(handler_metrics)
+    # Before the blacklist check, which asks the backend on every update
+    throttling_config = get_optional_config(Throttling, "throttling")
+    throttling = ThrottlingMiddleware(
+        rate=throttling_config.rate,
+        burst=throttling_config.burst,
+        duplicate_window=throttling_config.duplicate_window,
+        max_users=throttling_config.max_users
+    )
+    dp.message.middleware(throttling)
+    dp.callback_query.middleware(throttling)
+    # Set once for /throttle_stats instead of on every update
+    dp["throttling"] = throttling
+    dp.message.middleware(BlacklistMiddleware())
+    dp.callback_query.middleware(BlacklistMiddleware())
+    dp.startup.register(on_startup)
+    dp.shutdown.register(on_shutdown)
+    dp.shutdown.register(close_session)
+    return dp
+
+async def run_shard(shard: int, shards: int, socket_path: str, secret_token: str):
+    """Worker process of sharded mode: full Dispatcher fed by the front process."""
+    setup_logging()
+    logger.info(f'Starting shard {shard}/{shards}')
+    start_metrics(port_offset=1 + shard)
+    start_tracing()
+    bot_config = get_config(BotConfig, "bot")
+    webhook = get_optional_config(Webhook, "webhook")
+    bot = create_bot(bot_config)
+    dp = create_dispatcher()
+    translator_hub = create_translator_hub()
+    warm_up_keyboards(translator_hub, list(translator_hub.locales_map))
+    await run_socket_worker(
+        bot, dp,
+        socket_path=socket_path,
+        secret_token=secret_token,
+        max_pending=webhook.max_pending,
+        drain_timeout=webhook.drain_timeout,
+        _translator_hub=translator_hub
     )
+
+def shard_worker(shard: int, shards: int, socket_path: str, secret_token: str):
+    asyncio.run(run_shard(shard, shards, socket_path, secret_token))
+
+async def run_front(bot: Bot, bot_config: BotConfig, sharding: Sharding):
+    """Front process of sharded mode: receives updates and routes them to shards by user id."""
+    webhook = get_optional_config(Webhook, "webhook")
+    secret_token = webhook.secret or secrets.token_urlsafe(32)
+    # Only used to find the update types the handlers need
+    allowed_updates = create_dispatcher().resolve_used_update_types()
+
+    router = ShardRouter(sharding.shards, sharding.socket_dir, secret_token, shard_worker)
+    await router.start()
+    supervisor = asyncio.create_task(router.supervise())
+    try:
+        if webhook.url:
+            app = create_front_app(router, webhook.path, secret_token)
+            await bot.set_webhook(
+                url=f"{webhook.url.rstrip('/')}{webhook.path}",
+                secret_token=secret_token,
+                allowed_updates=allowed_updates,
+                drop_pending_updates=False
+            )
+            runner = web.AppRunner(app)
+            await runner.setup()
+            await web.TCPSite(runner, host=webhook.host, port=webhook.port).start()
+            logger.info(f"Front webhook on {webhook.host}:{webhook.port}{webhook.path}, {sharding.shards} shards")
+            await serve_until_stopped(runner)
+        else:
+            await bot.delete_webhook(drop_pending_updates=True)
+            logger.info(f"Front polling, {sharding.shards} shards")
+            polling = asyncio.create_task(run_front_polling(
+                router, bot_config.token.get_secret_value(), allowed_updates
+            ))
+            await wait_for_stop_signal()
+            polling.cancel()
+    finally:
+        supervisor.cancel()
+        await router.close()
+        await bot.session.close()
+
+async def main():
+    setup_logging()
     logger.info('Starting Bot')
 
     # Init Bot in Dispatcher
@@ -33,25 +175,44 @@ async def main():
         logger.error("Bot token is missing in the configuration.")
         return
     
-    bot = Bot(token=bot_config.token.get_secret_value(),
-              default=DefaultBotProperties(parse_mode=ParseMode.HTML))
-    dp = Dispatcher()
+    bot = create_bot(bot_config)
+
+    start_metrics()
+    start_tracing()
+
+    # Several worker processes behind one front process
+    sharding = get_optional_config(Sharding, "sharding")
+    if sharding.shards > 1:
+        await run_front(bot, bot_config, sharding)
+        return bot
+
+    dp = create_dispatcher()
 
     # i18n init
     translator_hub: TranslatorHub = create_translator_hub()
-
-    # Routers, dialogs, middlewares
-    dp.include_routers(main_router, devices_router, payment_router, admin_router, another_router, unknown_router)
-    dp.update.middleware(TranslatorRunnerMiddleware())
-    dp.message.middleware(BlacklistMiddleware())
-    dp.callback_query.middleware(BlacklistMiddleware())
-    dp.startup.register(on_startup)
+    warm_up_keyboards(translator_hub, list(translator_hub.locales_map))
  
+    # Webhook delivery when a public URL is configured, polling otherwise (development)
+    webhook = get_optional_config(Webhook, "webhook")
+    if webhook.url:
+        await run_webhook(
+            bot, dp,
+            base_url=webhook.url,
+            path=webhook.path,
+            host=webhook.host,
+            port=webhook.port,
+            secret_token=webhook.secret or secrets.token_urlsafe(32),
+            max_pending=webhook.max_pending,
+            drain_timeout=webhook.drain_timeout,
+            _translator_hub=translator_hub
+        )
+        return bot
+
     # Skipping old updates
     await bot.delete_webhook(drop_pending_updates=True)
     logger.info("Webhook deleted, ready for polling.")
     
-    await dp.start_polling(bot, _translator_hub=translator_hub)
+    await dp.start_polling(bot, handle_as_tasks=True, _translator_hub=translator_hub)
     return bot
 
 if __name__ == '__main__':
@@ -0,0 +1,107 @@
+"""
+i18n cost at startup and per update: stock fluentogram hub vs utils.i18n.
+
+Cold start compares compiling both .ftl catalogs (what create_translator_hub
+used to do) with loading the compiled artifacts. Per update resolves a
+runner from a Telegram language code, as TranslatorRunnerMiddleware does,
+and formats `--messages` argument-free texts plus one with arguments:
+
+    python bot/benchmarks/i18n_overhead.py --updates 20000 --messages 5
+
+Run from the repository root; catalog paths are relative to it.
+"""
+import argparse
+import importlib.util
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from fluent_compiler.bundle import FluentBundle
+from fluentogram import FluentTranslator, TranslatorHub
+
+I18N_PATH = os.path.join(os.path.dirname(__file__), "..", "utils", "i18n.py")
+LANGUAGE_CODES = ("ru", "en", "ru-RU", "en-US", "uk", None)
+MESSAGES = ("main-menu-button", "devices-button", "support-button", "invite-button",
+            "unknown-message", "connect-vpn-button", "back-devices-button", "add-device-button")
+
+
+def load_i18n_module():
+    # Loaded by path: the utils package imports config, which needs bot/config.yaml
+    spec = importlib.util.spec_from_file_location("i18n", I18N_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def stock_hub(i18n) -> TranslatorHub:
+    return TranslatorHub(
+        i18n.LOCALES_MAP,
+        [
+            FluentTranslator(
+                locale=locale,
+                translator=FluentBundle.from_files(locale=bundle_locale, filenames=[i18n.catalog_path(locale)])
+            )
+            for locale, bundle_locale in i18n.CATALOG_LOCALES.items()
+        ]
+    )
+
+
+def timed(build, repeat: int):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = build()
+    return result, round((time.perf_counter() - start) / repeat * 1000, 2)
+
+
+def per_update(hub, updates: int, messages: int) -> dict:
+    keys = MESSAGES[:messages]
+    start = time.perf_counter()
+    for number in range(updates):
+        i18n = hub.get_translator_by_locale(LANGUAGE_CODES[number % len(LANGUAGE_CODES)])
+        for key in keys:
+            i18n.get(key)
+        i18n.balance.button(balance=number)
+    elapsed = time.perf_counter() - start
+    return {"us_per_update": round(elapsed / updates * 1e6, 2), "updates_per_second": round(updates / elapsed)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--updates", type=int, default=20000)
+    parser.add_argument("--messages", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    i18n = load_i18n_module()
+    cache_dir = tempfile.mkdtemp()
+    try:
+        _, first_start_ms = timed(
+            lambda: [i18n.load_bundle(locale, cache_dir) for locale in i18n.CATALOG_LOCALES], 1
+        )
+        stock, compile_ms = timed(lambda: stock_hub(i18n), args.repeat)
+        _, artifact_ms = timed(
+            lambda: [i18n.load_bundle(locale, cache_dir) for locale in i18n.CATALOG_LOCALES], args.repeat
+        )
+    finally:
+        shutil.rmtree(cache_dir)
+    cached = i18n.create_translator_hub()
+
+    results = {
+        "updates": args.updates,
+        "messages_per_update": min(args.messages, len(MESSAGES)) + 1,
+        "cold_start_ms": {
+            "compile": compile_ms,
+            "compile_and_write_artifact": first_start_ms,
+            "load_artifact": artifact_ms,
+        },
+        "stock_hub": per_update(stock, args.updates, args.messages),
+        "cached_hub": per_update(cached, args.updates, args.messages),
+        "cached_hub_stats": cached.stats(),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
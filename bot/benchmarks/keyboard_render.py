@@ -0,0 +1,106 @@
+"""
+Cost of rendering keyboards per update: building markups vs keyboards.cache.
+
+Renders the keyboards the main menu and devices handlers send on every
+update, once through the uncached builders and once through the cache, for
+both locales:
+
+    python bot/benchmarks/keyboard_render.py --renders 20000
+"""
+import argparse
+import importlib
+import importlib.util
+import json
+import os
+import sys
+import time
+
+from fluent_compiler.bundle import FluentBundle
+from fluentogram import FluentTranslator, TranslatorHub
+
+BOT_DIR = os.path.join(os.path.dirname(__file__), "..")
+KEYBOARDS_DIR = os.path.join(BOT_DIR, "keyboards")
+LOCALES = ("ru", "en")
+
+
+def load_keyboards():
+    # keyboards/__init__ pulls in payment_kb, which reads bot/config.yaml; register
+    # a bare package so the relative imports of the other modules still resolve
+    spec = importlib.util.spec_from_loader("keyboards", loader=None, is_package=True)
+    package = importlib.util.module_from_spec(spec)
+    package.__path__ = [KEYBOARDS_DIR]
+    sys.modules["keyboards"] = package
+    return {
+        name: importlib.import_module(f"keyboards.{name}")
+        for name in ("cache", "main_kb", "devices_kb", "raffle_kb")
+    }
+
+
+def create_hub() -> TranslatorHub:
+    return TranslatorHub(
+        {"ru": ("ru", "en"), "en": ("en", "ru")},
+        [
+            FluentTranslator(
+                locale=locale,
+                translator=FluentBundle.from_files(
+                    locale=locale,
+                    filenames=[os.path.join(BOT_DIR, "locales", locale, "LC_MESSAGES", "txt.ftl")]
+                )
+            )
+            for locale in LOCALES
+        ]
+    )
+
+
+def render_set(modules: dict, i18n, user: int, uncached: bool) -> None:
+    main_kb, devices_kb, raffle_kb = modules["main_kb"], modules["devices_kb"], modules["raffle_kb"]
+
+    def call(keyboard, *args):
+        return (keyboard.__wrapped__ if uncached else keyboard)(*args)
+
+    # A handful of distinct balances, as in a real user base
+    call(main_kb.main_kb, i18n, True, float(user % 50 * 100), 30)
+    call(main_kb.back_inline_kb, i18n)
+    call(devices_kb.my_devices_kb, i18n, ["phone", "laptop"], (0, []), False)
+    call(devices_kb.add_device_kb, i18n)
+    call(devices_kb.devices_list_kb, i18n, "device")
+    call(devices_kb.period_select_kb, i18n)
+    call(raffle_kb.ticket_purchase_kb, i18n)
+
+
+def measure(modules: dict, hub: TranslatorHub, renders: int, uncached: bool) -> dict:
+    start = time.perf_counter()
+    for number in range(renders):
+        # The middleware hands every update a fresh runner
+        i18n = hub.get_translator_by_locale(LOCALES[number % len(LOCALES)])
+        render_set(modules, i18n, number, uncached)
+    elapsed = time.perf_counter() - start
+    return {"us_per_update": round(elapsed / renders * 1e6, 2), "updates_per_second": round(renders / elapsed)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--renders", type=int, default=20000)
+    args = parser.parse_args()
+
+    modules = load_keyboards()
+    hub = create_hub()
+    cache = modules["cache"]
+
+    start = time.perf_counter()
+    cache.warm_up_keyboards(hub, list(LOCALES))
+    warm_up_ms = (time.perf_counter() - start) * 1000
+
+    results = {
+        "renders": args.renders,
+        "keyboards_per_update": 7,
+        "warm_up_ms": round(warm_up_ms, 2),
+        "uncached": measure(modules, hub, args.renders, uncached=True),
+        "cached": measure(modules, hub, args.renders, uncached=False),
+        "cache": cache.keyboard_cache.stats(),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Event loop stalls caused by logging: a blocking stream handler vs utils.logs.
+
+Simulated update handlers log `--records` INFO records each while a probe
+measures how late the loop wakes up. The sink sleeps `--write-latency` ms
+per write, like a stdout pipe the log collector is slow to drain. Blocking
+is what the per-module basicConfig calls set up; queue is
+configure_logging, formatting and writing in its listener thread:
+
+    python bot/benchmarks/logging_stall.py --updates 2000 --records 3 --write-latency 0.2
+
+CPU time per record on the calling thread is also measured, with a sink
+that never blocks.
+"""
+import argparse
+import asyncio
+import importlib.util
+import io
+import json
+import logging
+import os
+import statistics
+import time
+
+LOGS_PATH = os.path.join(os.path.dirname(__file__), "..", "utils", "logs.py")
+UPDATE_INTERVAL = 0.01
+
+
+def load_logs_module():
+    # Loaded by path: the utils package imports config, which needs bot/config.yaml
+    spec = importlib.util.spec_from_file_location("logs", LOGS_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class SlowStream(io.TextIOBase):
+    """Text sink taking `latency` seconds per write."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.writes = 0
+
+    def write(self, text: str) -> int:
+        if self.latency:
+            time.sleep(self.latency)
+        self.writes += 1
+        return len(text)
+
+
+def blocking_logging(logs, stream) -> None:
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(logging.Formatter(logs.TEXT_FORMAT))
+    root.addHandler(handler)
+    root.setLevel(logging.INFO)
+
+
+async def measure_loop(stop: asyncio.Event) -> list:
+    """How late the loop wakes a sleeping task, in ms."""
+    delays = []
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + UPDATE_INTERVAL
+        await asyncio.sleep(UPDATE_INTERVAL)
+        delays.append((loop.time() - expected) * 1000)
+    return delays
+
+
+async def run_updates(updates: int, records: int, concurrency: int) -> dict:
+    logger = logging.getLogger("handlers.devices")
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def handle(number: int) -> None:
+        async with semaphore:
+            for record in range(records):
+                logger.info(f"User {number} opened devices, step {record}")
+                await asyncio.sleep(0)
+
+    stop = asyncio.Event()
+    probe = asyncio.create_task(measure_loop(stop))
+    await asyncio.sleep(0.05)
+    start = time.perf_counter()
+    await asyncio.gather(*(handle(number) for number in range(updates)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    delays = sorted(await probe)
+    return {
+        "updates_per_second": round(updates / elapsed),
+        "loop_lag_p50_ms": round(statistics.median(delays), 2),
+        "loop_lag_p99_ms": round(delays[min(len(delays) - 1, int(len(delays) * 0.99))], 2),
+        "loop_lag_max_ms": round(delays[-1], 2),
+    }
+
+
+def caller_cost(records: int) -> float:
+    # CPU time of this thread only: the listener formats and writes in parallel
+    logger = logging.getLogger("handlers.devices")
+    start = time.thread_time()
+    for number in range(records):
+        logger.info(f"User {number} opened devices")
+    return round((time.thread_time() - start) / records * 1e6, 2)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--updates", type=int, default=2000)
+    parser.add_argument("--records", type=int, default=3, help="Records logged per update")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--write-latency", type=float, default=0.2, help="Sink latency per write, ms")
+    args = parser.parse_args()
+
+    logs = load_logs_module()
+    latency = args.write_latency / 1000
+    results = {"updates": args.updates, "records_per_update": args.records, "write_latency_ms": args.write_latency}
+
+    blocking_logging(logs, SlowStream(latency))
+    results["blocking"] = asyncio.run(run_updates(args.updates, args.records, args.concurrency))
+    blocking_logging(logs, SlowStream(0))
+    results["blocking"]["caller_us_per_record"] = caller_cost(20000)
+
+    logs.configure_logging(stream=SlowStream(latency))
+    results["queue"] = asyncio.run(run_updates(args.updates, args.records, args.concurrency))
+    results["queue"]["dropped"] = logs.logging_stats()["dropped"]
+    logs.stop_logging()
+    logs.configure_logging(stream=SlowStream(0), queue_size=100000)
+    results["queue"]["caller_us_per_record"] = caller_cost(20000)
+    logs.stop_logging()
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
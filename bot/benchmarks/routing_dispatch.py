@@ -0,0 +1,93 @@
+"""
+Dispatch cost of the last-registered handler: aiogram's linear scan vs the index.
+
+Registers `--handlers` callback handlers the way bot/handlers does (half exact
+`F.data == ...`, half `F.data.startswith(...)`) on a plain Router, and the
+same set with utils.routing filters on an IndexedRouter, then times feeding a
+callback query that only the last handler matches:
+
+    python bot/benchmarks/routing_dispatch.py --handlers 120 --updates 20000
+"""
+import argparse
+import asyncio
+import importlib.util
+import json
+import os
+import time
+
+from aiogram import Bot, Dispatcher, F, Router
+
+ROUTING_PATH = os.path.join(os.path.dirname(__file__), "..", "utils", "routing.py")
+FAKE_TOKEN = "123456:AAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAA"
+
+def load_routing_module():
+    # Loaded by path: the utils package imports config, which needs bot/config.yaml
+    spec = importlib.util.spec_from_file_location("routing", ROUTING_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def make_update(update_id: int, data: str) -> dict:
+    user = {"id": 1000, "is_bot": False, "first_name": "Bench"}
+    return {
+        "update_id": update_id,
+        "callback_query": {
+            "id": str(update_id),
+            "from": user,
+            "chat_instance": "1",
+            "data": data,
+            "message": {"message_id": 1, "date": 0, "chat": {"id": 1000, "type": "private"}, "from": user},
+        }
+    }
+
+def build(indexed: bool, handlers: int, hits: list) -> Router:
+    routing = load_routing_module()
+    router = routing.IndexedRouter() if indexed else Router()
+    for number in range(handlers):
+        if number % 2:
+            name = f"handler_{number}"
+            callback_filter = routing.Data(name) if indexed else F.data == name
+        else:
+            name = f"handler_{number}_"
+            callback_filter = routing.DataPrefix(name) if indexed else F.data.startswith(name)
+
+        async def handler(callback, number=number) -> None:
+            hits.append(number)
+
+        router.callback_query.register(handler, callback_filter)
+    return router
+
+async def measure(indexed: bool, handlers: int, updates: int) -> dict:
+    hits: list = []
+    dp = Dispatcher()
+    dp.include_router(build(indexed, handlers, hits))
+    bot = Bot(token=FAKE_TOKEN)
+    last = handlers - 1
+    data = f"handler_{last}" if last % 2 else f"handler_{last}_42"
+    raw = [make_update(update_id, data) for update_id in range(updates)]
+
+    start = time.perf_counter()
+    for update in raw:
+        await dp.feed_raw_update(bot, update)
+    elapsed = time.perf_counter() - start
+    await bot.session.close()
+
+    assert hits == [last] * updates, "wrong handler dispatched"
+    return {"us_per_update": round(elapsed / updates * 1e6, 2), "updates_per_second": round(updates / elapsed)}
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--handlers", type=int, default=120)
+    parser.add_argument("--updates", type=int, default=20000)
+    args = parser.parse_args()
+
+    results = {
+        "handlers": args.handlers,
+        "updates": args.updates,
+        "linear_router": asyncio.run(measure(False, args.handlers, args.updates)),
+        "indexed_router": asyncio.run(measure(True, args.handlers, args.updates)),
+    }
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Throughput of sharded mode as the number of worker processes grows.
+
+Each update hits a handler that burns `--work-ms` of CPU (standing in for
+Fluent formatting and keyboard building). For every shard count, a
+utils.sharding.ShardRouter starts that many workers running
+utils.webhook.run_socket_worker and the flood is forwarded to them by user id:
+
+    python bot/benchmarks/shard_scaling.py --updates 4000 --work-ms 2 --shards 1 2 4
+
+Scaling is bounded by the number of cores, which is printed with the results.
+"""
+import argparse
+import asyncio
+import importlib.util
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+
+SHARDING_PATH = os.path.join(os.path.dirname(__file__), "..", "utils", "sharding.py")
+WEBHOOK_PATH = os.path.join(os.path.dirname(__file__), "..", "utils", "webhook.py")
+SECRET = "benchmark-secret"
+FAKE_TOKEN = "123456:AAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAA"
+IN_FLIGHT = 200
+
+def load_module(name: str, path: str):
+    # Loaded by path: the utils package imports config, which needs bot/config.yaml
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def make_update(update_id: int) -> dict:
+    user_id = 1000 + update_id % 500
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "Bench"},
+            "text": "Balance"
+        }
+    }
+
+def worker(shard: int, shards: int, socket_path: str, secret_token: str, work_ms: float, processed) -> None:
+    from aiogram import Bot, Dispatcher, Router
+    from aiogram.types import Message
+
+    router = Router()
+
+    @router.message()
+    async def handler(message: Message) -> None:
+        deadline = time.perf_counter() + work_ms / 1000
+        while time.perf_counter() < deadline:
+            pass
+        with processed.get_lock():
+            processed.value += 1
+
+    dp = Dispatcher()
+    dp.include_router(router)
+    webhook = load_module("webhook", WEBHOOK_PATH)
+    asyncio.run(webhook.run_socket_worker(
+        Bot(token=FAKE_TOKEN), dp, socket_path=socket_path, secret_token=secret_token,
+        max_pending=100000, drain_timeout=5
+    ))
+
+async def run(shards: int, updates: int, work_ms: float) -> dict:
+    sharding = load_module("sharding", SHARDING_PATH)
+    processed = multiprocessing.get_context("spawn").Value("i", 0)
+    with tempfile.TemporaryDirectory() as socket_dir:
+        router = sharding.ShardRouter(shards, socket_dir, SECRET, worker, worker_args=(work_ms, processed))
+        await router.start()
+        # Warm up: wait until every worker accepts updates
+        await asyncio.gather(*(router.forward(json.dumps(make_update(i)).encode(), make_update(i))
+                               for i in range(shards * 10)))
+        while processed.value < shards * 10:
+            await asyncio.sleep(0.01)
+
+        start = time.perf_counter()
+        semaphore = asyncio.Semaphore(IN_FLIGHT)
+
+        async def send(update_id: int) -> None:
+            update = make_update(update_id)
+            async with semaphore:
+                await router.forward(json.dumps(update).encode(), update)
+
+        await asyncio.gather(*(send(update_id) for update_id in range(updates)))
+        while processed.value < shards * 10 + updates:
+            await asyncio.sleep(0.01)
+        elapsed = time.perf_counter() - start
+        await router.close()
+    return {"seconds": round(elapsed, 3), "updates_per_second": round(updates / elapsed, 1),
+            "per_shard": router.forwarded}
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--updates", type=int, default=4000)
+    parser.add_argument("--work-ms", type=float, default=2.0, help="CPU time per update, milliseconds")
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+
+    results = {"updates": args.updates, "work_ms": args.work_ms, "cpus": os.cpu_count(), "runs": {}}
+    for shards in args.shards:
+        results["runs"][shards] = asyncio.run(run(shards, args.updates, args.work_ms))
+    base = results["runs"][args.shards[0]]["updates_per_second"]
+    for shards, run_result in results["runs"].items():
+        run_result["speedup"] = round(run_result["updates_per_second"] / base, 2)
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
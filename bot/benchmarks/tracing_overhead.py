@@ -0,0 +1,73 @@
+"""
+Per update cost of utils.tracing: off, on but not sampled, and sampled.
+
+Each update opens the root span, as TracingMiddleware does, two child spans
+for backend calls with their traceparent header, and sets the handler
+attribute. Sampled spans are exported to a temporary JSON lines file:
+
+    python bot/benchmarks/tracing_overhead.py --updates 50000
+
+Run from the repository root.
+"""
+import argparse
+import importlib.util
+import json
+import os
+import shutil
+import tempfile
+import time
+
+TRACING_PATH = os.path.join(os.path.dirname(__file__), "..", "utils", "tracing.py")
+
+
+def load_tracing_module():
+    # Loaded by path: the utils package imports config, which needs bot/config.yaml
+    spec = importlib.util.spec_from_file_location("tracing", TRACING_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def per_update(tracing, tracer, updates: int) -> dict:
+    headers = {}
+    start = time.perf_counter()
+    for number in range(updates):
+        with tracer.span("update message", tracing.KIND_SERVER) as root:
+            if root.sampled:
+                root.set_attribute("update_id", number)
+            span = tracing.current_span.get()
+            if span is not None:
+                span.set_attribute("handler", "user.main_menu")
+            for _ in range(2):
+                call = tracer.start_span("HTTP GET", tracing.KIND_CLIENT)
+                if call is not tracing.NOOP_SPAN:
+                    headers[tracing.TRACEPARENT] = call.traceparent()
+                    call.set_attribute("http.status_code", 200)
+                call.end()
+    elapsed = time.perf_counter() - start
+    return {"us_per_update": round(elapsed / updates * 1e6, 2), "updates_per_second": round(updates / elapsed)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--updates", type=int, default=50000)
+    args = parser.parse_args()
+
+    tracing = load_tracing_module()
+    results = {"updates": args.updates, "spans_per_update": 3}
+    results["off"] = per_update(tracing, tracing.Tracer(), args.updates)
+    spans_dir = tempfile.mkdtemp()
+    try:
+        for name, ratio in (("not_sampled", 0.0), ("sampled_5%", 0.05), ("sampled_all", 1.0)):
+            tracer = tracing.setup_tracing("bot", ratio, path=os.path.join(spans_dir, "spans.jsonl"))
+            results[name] = per_update(tracing, tracer, args.updates)
+            tracer.shutdown()
+            results[name]["exported"] = tracer.exporter.exported
+            results[name]["dropped"] = tracer.exporter.dropped
+    finally:
+        shutil.rmtree(spans_dir)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
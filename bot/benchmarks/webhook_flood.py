@@ -0,0 +1,162 @@
+"""
+Update throughput under a synthetic flood: serial polling vs webhook delivery.
+
+Each update hits a handler that waits `--latency` seconds (a backend round
+trip). The same flood is processed:
+
+* serially, one update at a time, as a single polling consumer does;
+* by a webhook that answers only after the handler finished;
+* by utils.webhook.WorkerRequestHandler, which acknowledges immediately,
+  with middlewares.ordering.UpdateOrderingMiddleware bounding concurrency
+  and keeping each user's updates in order.
+
+`--hot-users` makes that many users send a tenth of the flood each, to show
+that their queues do not hold up everybody else.
+
+    python bot/benchmarks/webhook_flood.py --updates 2000 --latency 0.05
+"""
+import argparse
+import asyncio
+import importlib.util
+import json
+import os
+import time
+
+import aiohttp
+from aiogram import Bot, Dispatcher, Router
+from aiogram.types import Message
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler
+from aiohttp import web
+
+WEBHOOK_PATH = os.path.join(os.path.dirname(__file__), "..", "utils", "webhook.py")
+ORDERING_PATH = os.path.join(os.path.dirname(__file__), "..", "middlewares", "ordering.py")
+SECRET = "benchmark-secret"
+FAKE_TOKEN = "123456:AAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAA"
+
+def load_module(name: str, path: str):
+    # Loaded by path: the utils and middlewares packages import config, which needs bot/config.yaml
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def make_update(update_id: int, hot_users: int = 0) -> dict:
+    if hot_users and update_id % 10 == 0:
+        user_id = 1 + update_id // 10 % hot_users
+    else:
+        user_id = 1000 + update_id % 500
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "Bench"},
+            "text": "Balance"
+        }
+    }
+
+def make_dispatcher(latency: float, processed: list, ordering=None) -> Dispatcher:
+    router = Router()
+    last_seen: dict = {}
+
+    @router.message()
+    async def handler(message: Message) -> None:
+        user_id = message.from_user.id
+        if ordering is not None and last_seen.get(user_id, -1) > message.message_id:
+            raise AssertionError(f"Update {message.message_id} of user {user_id} handled out of order")
+        last_seen[user_id] = message.message_id
+        await asyncio.sleep(latency)
+        processed.append((user_id, time.perf_counter()))
+
+    dp = Dispatcher()
+    if ordering is not None:
+        dp.update.outer_middleware(ordering)
+    dp.include_router(router)
+    return dp
+
+async def run_serial(updates: int, latency: float) -> dict:
+    processed: list = []
+    dp = make_dispatcher(latency, processed)
+    bot = Bot(token=FAKE_TOKEN)
+    start = time.perf_counter()
+    for update_id in range(updates):
+        await dp.feed_raw_update(bot, make_update(update_id))
+    elapsed = time.perf_counter() - start
+    await bot.session.close()
+    return {"ack_seconds": round(elapsed, 3), "processed_seconds": round(elapsed, 3),
+            "updates_per_second": round(updates / elapsed, 1)}
+
+async def run_webhook(updates: int, latency: float, port: int, background: bool, workers: int,
+                      hot_users: int = 0) -> dict:
+    processed: list = []
+    ordering = None
+    if background:
+        ordering = load_module("ordering", ORDERING_PATH).UpdateOrderingMiddleware(concurrency=workers)
+    dp = make_dispatcher(latency, processed, ordering)
+    bot = Bot(token=FAKE_TOKEN)
+    app = web.Application()
+    if background:
+        handler = load_module("webhook", WEBHOOK_PATH).WorkerRequestHandler(
+            dispatcher=dp, bot=bot, secret_token=SECRET,
+            max_pending=updates + 1, drain_timeout=60
+        )
+    else:
+        handler = SimpleRequestHandler(dispatcher=dp, bot=bot, handle_in_background=False, secret_token=SECRET)
+    handler.register(app, path="/webhook")
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+
+    # Telegram keeps up to max_connections (default 40) requests in flight
+    connector = aiohttp.TCPConnector(limit=40)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        start = time.perf_counter()
+
+        async def send(update_id: int) -> None:
+            async with session.post(f"http://127.0.0.1:{port}/webhook", json=make_update(update_id, hot_users),
+                                    headers={"X-Telegram-Bot-Api-Secret-Token": SECRET}) as response:
+                await response.read()
+
+        await asyncio.gather(*(send(update_id) for update_id in range(updates)))
+        acked = time.perf_counter() - start
+        while len(processed) < updates:
+            await asyncio.sleep(0.01)
+        done = time.perf_counter() - start
+
+    await runner.cleanup()
+    result = {"ack_seconds": round(acked, 3), "processed_seconds": round(done, 3),
+              "updates_per_second": round(updates / done, 1)}
+    if hot_users:
+        # When did ordinary users' updates finish, compared with the hot users' backlog
+        cold = [at - start for user_id, at in processed if user_id >= 1000]
+        hot = [at - start for user_id, at in processed if user_id < 1000]
+        result["cold_users_done_seconds"] = round(max(cold), 3)
+        result["hot_users_done_seconds"] = round(max(hot), 3)
+    if ordering is not None:
+        result["queue"] = ordering.stats()
+    return result
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--updates", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0.05, help="Handler latency, seconds")
+    parser.add_argument("--workers", type=int, default=64)
+    parser.add_argument("--hot-users", type=int, default=0, help="Users sending a tenth of all updates")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--skip-serial", action="store_true", help="Serial run takes updates * latency seconds")
+    args = parser.parse_args()
+
+    results = {"updates": args.updates, "latency_s": args.latency, "workers": args.workers,
+               "hot_users": args.hot_users}
+    if not args.skip_serial:
+        results["serial_polling"] = asyncio.run(run_serial(args.updates, args.latency))
+    results["webhook_blocking"] = asyncio.run(
+        run_webhook(args.updates, args.latency, args.port, background=False, workers=args.workers))
+    results["webhook_workers"] = asyncio.run(
+        run_webhook(args.updates, args.latency, args.port + 1, background=True, workers=args.workers,
+                    hot_users=args.hot_users))
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
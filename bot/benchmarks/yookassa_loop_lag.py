@@ -0,0 +1,144 @@
+"""
+Event loop latency while ЮKassa invoices are being created.
+
+Starts a fake ЮKassa API (in its own thread, with configurable latency) and
+measures how late a stream of simulated update handlers runs while N payments
+are created, first with blocking `requests` calls (what the yookassa SDK does)
+and then with services.yookassa_client on a shared aiohttp session:
+
+    python bot/benchmarks/yookassa_loop_lag.py --invoices 50 --latency 0.2
+"""
+import argparse
+import asyncio
+import importlib.util
+import json
+import os
+import statistics
+import threading
+import time
+import uuid
+
+import aiohttp
+import requests
+from aiohttp import web
+
+CLIENT_PATH = os.path.join(os.path.dirname(__file__), "..", "services", "yookassa_client.py")
+UPDATE_INTERVAL = 0.01
+
+def load_client_module():
+    # Loaded by path: importing the services package would require bot/config.yaml
+    spec = importlib.util.spec_from_file_location("yookassa_client", CLIENT_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def start_fake_yookassa(port: int, latency: float) -> None:
+    async def create_payment(request: web.Request) -> web.Response:
+        await asyncio.sleep(latency)
+        payment_id = str(uuid.uuid4())
+        return web.json_response({
+            "id": payment_id,
+            "status": "pending",
+            "paid": False,
+            "amount": (await request.json())["amount"],
+            "confirmation": {"type": "redirect", "confirmation_url": f"https://yoomoney.ru/checkout/{payment_id}"}
+        })
+
+    async def serve() -> None:
+        app = web.Application()
+        app.router.add_post("/v3/payments", create_payment)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, "127.0.0.1", port).start()
+        await asyncio.Event().wait()
+
+    threading.Thread(target=lambda: asyncio.run(serve()), daemon=True).start()
+    time.sleep(0.5)
+
+def payment_data() -> dict:
+    return {
+        "amount": {"value": "100.00", "currency": "RUB"},
+        "confirmation": {"type": "redirect", "return_url": "https://t.me/JeskoVPN_bot"},
+        "capture": True,
+        "description": "Subscription payment",
+        "receipt": {
+            "customer": {"email": "user@example.com"},
+            "items": [{
+                "description": "VPN", "quantity": "1",
+                "amount": {"value": "100.00", "currency": "RUB"},
+                "vat_code": 1, "payment_subject": "service", "payment_mode": "full_payment"
+            }]
+        }
+    }
+
+async def measure_updates(stop: asyncio.Event) -> list:
+    """Simulated update handlers: record how late each one starts, in ms."""
+    delays = []
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + UPDATE_INTERVAL
+        await asyncio.sleep(UPDATE_INTERVAL)
+        delays.append((loop.time() - expected) * 1000)
+    return delays
+
+def summarize(delays: list, elapsed: float) -> dict:
+    delays = sorted(delays)
+    return {
+        "updates": len(delays),
+        "p50_ms": round(statistics.median(delays), 2),
+        "p99_ms": round(delays[min(len(delays) - 1, int(len(delays) * 0.99))], 2),
+        "max_ms": round(delays[-1], 2),
+        "create_seconds": round(elapsed, 2),
+    }
+
+async def run_blocking(base_url: str, invoices: int) -> dict:
+    stop = asyncio.Event()
+    probe = asyncio.create_task(measure_updates(stop))
+    await asyncio.sleep(0.05)
+    start = time.perf_counter()
+
+    async def create() -> None:
+        # Same as calling the synchronous SDK inside a coroutine
+        requests.post(f"{base_url}/payments", json=payment_data(), auth=("shop", "key"),
+                      headers={"Idempotence-Key": str(uuid.uuid4())}, timeout=15)
+
+    await asyncio.gather(*(create() for _ in range(invoices)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    return summarize(await probe, elapsed)
+
+async def run_async(base_url: str, invoices: int) -> dict:
+    client_module = load_client_module()
+    session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=100))
+    client = client_module.YookassaClient("shop", "key", session_getter=lambda: session, base_url=base_url)
+
+    stop = asyncio.Event()
+    probe = asyncio.create_task(measure_updates(stop))
+    await asyncio.sleep(0.05)
+    start = time.perf_counter()
+    await asyncio.gather(*(client.create_payment(payment_data(), str(uuid.uuid4())) for _ in range(invoices)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    result = summarize(await probe, elapsed)
+    await session.close()
+    return result
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--invoices", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.2, help="Fake ЮKassa response time, seconds")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    start_fake_yookassa(args.port, args.latency)
+    base_url = f"http://127.0.0.1:{args.port}/v3"
+    results = {
+        "invoices": args.invoices,
+        "latency_s": args.latency,
+        "blocking_sdk": asyncio.run(run_blocking(base_url, args.invoices)),
+        "async_client": asyncio.run(run_async(base_url, args.invoices)),
+    }
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,5 @@
 from functools import lru_cache
-from typing import TypeVar, Type
+from typing import Dict, TypeVar, Type, Optional
 
 from pydantic import BaseModel, SecretStr
 from yaml import load, SafeLoader
@@ -31,6 +31,108 @@ class Channel(BaseModel):
 class ResetPassword(BaseModel):
     password: str
 
+class Webhook(BaseModel):
+    # Public HTTPS base URL, the webhook is registered at url + path; long
+    # polling when not set. Not bot.url, which is the bot's t.me link
+    url: Optional[str] = None
+    path: str = "/webhook"
+    host: str = "0.0.0.0"
+    port: int = 8080
+    # Generated on every start when not set
+    secret: Optional[str] = None
+    max_pending: int = 10000
+    drain_timeout: float = 30
+
+class Updates(BaseModel):
+    # Updates handled at once; each user's updates are still handled in order
+    concurrency: int = 64
+
+class Throttling(BaseModel):
+    # Per user: tokens per second and bucket size; handlers cost 1 token
+    # unless flagged with throttle_cost
+    rate: float = 2
+    burst: int = 10
+    # Repeated taps on the same button within this many seconds are dropped
+    duplicate_window: float = 1.0
+    max_users: int = 100000
+
+class Sharding(BaseModel):
+    # Worker processes; with more than one, updates are routed by user_id % shards
+    shards: int = 1
+    socket_dir: str = "/tmp"
+
+class FsmStorage(BaseModel):
+    # memory, postgres or sqlite
+    backend: str = "memory"
+    # Postgres DSN or SQLite file path
+    dsn: Optional[str] = None
+    # Abandoned states are deleted after this many seconds
+    state_ttl: int = 86400
+    # Memory backend: at most this many users keep a state
+    max_states: int = 100000
+    cache_size: int = 10000
+    cache_ttl: float = 60
+    flush_interval: float = 0.5
+
+class Leader(BaseModel):
+    # Postgres DSN for advisory locks; without it replicas must share lock_dir
+    dsn: Optional[str] = None
+    lock_dir: str = "/tmp"
+    # A dead leader is replaced within retry_interval seconds
+    retry_interval: float = 5
+    check_interval: float = 5
+
+class Outbox(BaseModel):
+    # Messages per second for the whole bot; Telegram allows about 30
+    rate: float = 25
+    burst: int = 30
+    # Seconds between messages to one private chat / group or channel
+    chat_interval: float = 1.0
+    group_interval: float = 3.0
+    concurrency: int = 16
+    max_attempts: int = 3
+    max_queue: int = 100000
+    dead_letter_size: int = 1000
+    # Queued messages get this long to go out on shutdown
+    drain_timeout: float = 10
+
+class Membership(BaseModel):
+    # Channel subscription checks; the positive TTL can be long when the bot
+    # is a channel admin and receives chat_member updates
+    positive_ttl: float = 600
+    negative_ttl: float = 30
+    max_size: int = 100000
+
+class Metrics(BaseModel):
+    # Prometheus scrape endpoint; keep it on localhost or a private network.
+    # In sharded mode the front uses port and shard n uses port + 1 + n
+    enabled: bool = True
+    host: str = "127.0.0.1"
+    port: int = 9101
+
+class Tracing(BaseModel):
+    # Spans of sampled updates go to a JSON lines file and/or an OTLP/HTTP
+    # collector (http://collector:4318/v1/traces); with neither, tracing is off
+    sample_ratio: float = 0.05
+    path: Optional[str] = None
+    otlp_endpoint: Optional[str] = None
+
+class Logging(BaseModel):
+    level: str = "INFO"
+    # text: the usual one-line format; json: one object per line, for log collectors
+    format: str = "text"
+    # Share of INFO/DEBUG records kept per logger and its children, for
+    # chatty ones: {"aiogram.event": 0.1}
+    sample: Dict[str, float] = {}
+    # Logger -> file also receiving its records
+    files: Dict[str, str] = {"admin_actions": "admin_actions.log"}
+    # Records waiting to be written; more are dropped rather than blocking handlers
+    queue_size: int = 10000
+
+class Payments(BaseModel):
+    # Provider webhooks are configured on the backend, polling only reconciles
+    webhooks: bool = False
+
 @lru_cache(maxsize=1)
 def parse_config_file() -> dict:
     try:
@@ -56,3 +158,9 @@ def get_config(model: Type[ConfigType], root_key: str) -> ConfigType:
     config_dict = parse_config_file()
     validate_config_data(config_dict, root_key, model)  # Передаем model
     return model.model_validate(config_dict[root_key])
+
+@lru_cache
+def get_optional_config(model: Type[ConfigType], root_key: str) -> ConfigType:
+    """Like get_config, but missing sections and keys fall back to the model defaults."""
+    config_dict = parse_config_file()
+    return model.model_validate(config_dict.get(root_key) or {})
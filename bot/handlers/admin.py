@@ -1,21 +1,36 @@
+import asyncio
+import html
 import logging
 import re
 import json
 import os
 
-from aiogram import Router, F, Bot
+from aiogram import F, Bot
 from aiogram.fsm.context import FSMContext
-from aiogram.types import CallbackQuery, Message, InlineKeyboardButton, InlineKeyboardMarkup
+from aiogram.methods import SendMessage, SendPhoto
+from aiogram.types import BufferedInputFile, CallbackQuery, Message, InlineKeyboardButton, InlineKeyboardMarkup
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from fluentogram import TranslatorRunner
 from datetime import datetime, timezone
+from typing import Set
 
 from services import admin_req, payment_req, raffle_req, AdminAuthStates, RaffleAdminStates
 from utils.admin_auth import is_admin
+from utils.routing import IndexedRouter, Data, Text, TextPrefix
 from keyboards import admin_kb
+from keyboards.callbacks import AdminKeyCb, AdminPageCb, AdminPromocodeCb, AdminServerCb, AdminUserCb, RaffleCb, \
+        RaffleFieldCb, RaffleParticipantsCb, RaffleTypeCb, RemoveAdminCb
+from keyboards.cache import keyboard_cache
+from utils.outbox import Priority, enqueue, get_outbox
+from utils.membership import membership_cache
+from utils.metrics import HANDLER_DURATION, HANDLER_ERRORS, counter_totals, histogram_summary
+from utils.logs import logging_stats
+from utils.profiling import MAX_SECONDS, ProfilerBusy, dump_tasks, heap_snapshot, heap_start, heap_stop, profile_cpu
+from services.session import HTTP_DURATION, HTTP_RESPONSES
+from services.services import poll_metrics
 from config import get_config, Admin, Channel, BotConfig, ResetPassword
 
-admin_router = Router()
+admin_router = IndexedRouter()
 admin = get_config(Admin, "admin")
 channel = get_config(Channel, "channel")
 bot_config = get_config(BotConfig, "bot")
@@ -27,21 +42,10 @@ BOT_URL = bot_config.url
 RESET_PASSWORD = reset_password.password
 logger = logging.getLogger(__name__)
 admin_logger = logging.getLogger("admin_actions")
+# The loop only keeps weak references to tasks; these must outlive the handler
+broadcast_reports: Set[asyncio.Task] = set()
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(filename)s:%(lineno)d #%(levelname)-8s "
-           "[%(asctime)s] - %(name)s - %(message)s"
-)
-admin_handler = logging.FileHandler("admin_actions.log")
-admin_handler.setFormatter(logging.Formatter(
-    "%(asctime)s [%(levelname)s] %(message)s"
-))
-admin_logger.addHandler(admin_handler)
-admin_logger.setLevel(logging.INFO)
-
-@admin_router.message(F.text == "/admin")
+@admin_router.message(Text("/admin"))
 async def admin_entry(
         message: Message, 
         state: FSMContext,
@@ -102,7 +106,7 @@ async def admin_check_password(
     else:
         await message.answer("Неверный пароль. Попробуйте ещё раз.")
 
-@admin_router.message(F.text == "/reset_password")
+@admin_router.message(Text("/reset_password"))
 async def admin_reset_password(message: Message, state: FSMContext, i18n: TranslatorRunner):
     user_id = message.from_user.id
     is_admin_check = await is_admin(str(user_id), admin_id)
@@ -118,7 +122,245 @@ async def admin_reset_password(message: Message, state: FSMContext, i18n: Transl
     await state.set_state(AdminAuthStates.waiting_for_reset_password)
     admin_logger.info(f"Admin {message.from_user.id} initiated admin password reset")
 
-@admin_router.callback_query(F.data == "admin_cancel_reset")
+@admin_router.message(Text("/fsm_stats"))
+async def admin_fsm_stats(message: Message, state: FSMContext, i18n: TranslatorRunner):
+    user_id = message.from_user.id
+    is_admin_check = await is_admin(str(user_id), admin_id)
+    if not is_admin_check:
+        logger.info(f'not admin. user_id: {user_id}, admin_id: {admin_id}')
+        await message.answer(text=i18n.unknown.message())
+        return
+
+    stats = getattr(state.storage, "stats", None)
+    if stats is None:
+        await message.answer(f"Хранилище состояний {type(state.storage).__name__} не ведёт статистику.")
+        return
+    lines = [f"{name}: {value}" for name, value in stats().items()]
+    await message.answer("📊 Хранилище состояний (FSM)\n\n" + "\n".join(lines))
+    admin_logger.info(f"Admin {user_id} requested FSM storage stats")
+
+@admin_router.message(Text("/update_stats"))
+async def admin_update_stats(message: Message, i18n: TranslatorRunner, update_queue=None):
+    user_id = message.from_user.id
+    is_admin_check = await is_admin(str(user_id), admin_id)
+    if not is_admin_check:
+        logger.info(f'not admin. user_id: {user_id}, admin_id: {admin_id}')
+        await message.answer(text=i18n.unknown.message())
+        return
+
+    if update_queue is None:
+        await message.answer("Очередь обновлений не подключена.")
+        return
+    lines = [f"{name}: {value}" for name, value in update_queue.stats().items()]
+    await message.answer("📥 Очередь обновлений\n\n" + "\n".join(lines))
+    admin_logger.info(f"Admin {user_id} requested update queue stats")
+
+@admin_router.message(Text("/keyboard_stats"))
+async def admin_keyboard_stats(message: Message, i18n: TranslatorRunner):
+    user_id = message.from_user.id
+    is_admin_check = await is_admin(str(user_id), admin_id)
+    if not is_admin_check:
+        logger.info(f'not admin. user_id: {user_id}, admin_id: {admin_id}')
+        await message.answer(text=i18n.unknown.message())
+        return
+
+    lines = [f"{name}: {value}" for name, value in keyboard_cache.stats().items()]
+    await message.answer("⌨️ Кэш клавиатур\n\n" + "\n".join(lines))
+    admin_logger.info(f"Admin {user_id} requested keyboard cache stats")
+
+@admin_router.message(Text("/throttle_stats"))
+async def admin_throttle_stats(message: Message, i18n: TranslatorRunner, throttling=None):
+    user_id = message.from_user.id
+    is_admin_check = await is_admin(str(user_id), admin_id)
+    if not is_admin_check:
+        logger.info(f'not admin. user_id: {user_id}, admin_id: {admin_id}')
+        await message.answer(text=i18n.unknown.message())
+        return
+
+    if throttling is None:
+        await message.answer("Ограничение частоты запросов не подключено.")
+        return
+    lines = [f"{name}: {value}" for name, value in throttling.stats().items()]
+    await message.answer("🚦 Ограничение частоты запросов\n\n" + "\n".join(lines))
+    admin_logger.info(f"Admin {user_id} requested throttling stats")
+
+@admin_router.message(Text("/membership_stats"))
+async def admin_membership_stats(message: Message, i18n: TranslatorRunner):
+    user_id = message.from_user.id
+    is_admin_check = await is_admin(str(user_id), admin_id)
+    if not is_admin_check:
+        logger.info(f'not admin. user_id: {user_id}, admin_id: {admin_id}')
+        await message.answer(text=i18n.unknown.message())
+        return
+
+    lines = [f"{name}: {value}" for name, value in membership_cache.stats().items()]
+    await message.answer("👥 Проверки подписки на канал\n\n" + "\n".join(lines))
+    admin_logger.info(f"Admin {user_id} requested membership cache stats")
+
+@admin_router.message(Text("/outbox_stats"))
+async def admin_outbox_stats(message: Message, i18n: TranslatorRunner):
+    user_id = message.from_user.id
+    is_admin_check = await is_admin(str(user_id), admin_id)
+    if not is_admin_check:
+        logger.info(f'not admin. user_id: {user_id}, admin_id: {admin_id}')
+        await message.answer(text=i18n.unknown.message())
+        return
+
+    outbox = get_outbox()
+    if outbox is None:
+        await message.answer("Очередь исходящих сообщений не запущена.")
+        return
+    lines = [f"{name}: {value}" for name, value in outbox.stats().items()]
+    failures = [f"{letter.chat_id}: {reason}" for _, letter, reason in list(outbox.dead_letters)[-5:]]
+    if failures:
+        lines += ["", "Последние ошибки:"] + failures
+    await message.answer("📤 Исходящие сообщения\n\n" + "\n".join(lines))
+    admin_logger.info(f"Admin {user_id} requested outbox stats")
+
+@admin_router.message(Text("/poll_stats"))
+async def admin_poll_stats(message: Message, i18n: TranslatorRunner):
+    user_id = message.from_user.id
+    is_admin_check = await is_admin(str(user_id), admin_id)
+    if not is_admin_check:
+        logger.info(f'not admin. user_id: {user_id}, admin_id: {admin_id}')
+        await message.answer(text=i18n.unknown.message())
+        return
+
+    lines = [
+        f"{name}: {round(value, 3) if isinstance(value, float) else value}"
+        for name, value in poll_metrics.items()
+    ]
+    await message.answer("🧾 Проверка оплаты счетов\n\n" + "\n".join(lines))
+    admin_logger.info(f"Admin {user_id} requested invoice polling stats")
+
+@admin_router.message(Text("/outbox_retry"))
+async def admin_outbox_retry(message: Message, i18n: TranslatorRunner):
+    user_id = message.from_user.id
+    is_admin_check = await is_admin(str(user_id), admin_id)
+    if not is_admin_check:
+        logger.info(f'not admin. user_id: {user_id}, admin_id: {admin_id}')
+        await message.answer(text=i18n.unknown.message())
+        return
+
+    outbox = get_outbox()
+    if outbox is None:
+        await message.answer("Очередь исходящих сообщений не запущена.")
+        return
+    count = outbox.requeue_dead_letters()
+    await message.answer(f"Повторно поставлено в очередь: {count}")
+    admin_logger.info(f"Admin {user_id} requeued {count} dead letters")
+
+def format_latency(item: dict) -> str:
+    p95 = "> 30 с" if item["p95_ms"] == float("inf") else f"≤ {item['p95_ms']:.0f} мс"
+    line = f"{item['name']}: {item['count']}, ср. {item['avg_ms']} мс, p95 {p95}"
+    if item["errors"]:
+        line += f", ошибок {item['errors']}"
+    return line
+
+@admin_router.message(Text("/latency_stats"))
+async def admin_latency_stats(message: Message, i18n: TranslatorRunner):
+    user_id = message.from_user.id
+    is_admin_check = await is_admin(str(user_id), admin_id)
+    if not is_admin_check:
+        logger.info(f'not admin. user_id: {user_id}, admin_id: {admin_id}')
+        await message.answer(text=i18n.unknown.message())
+        return
+
+    # Slowest by total time spent, since the process started
+    handlers = histogram_summary(HANDLER_DURATION, HANDLER_ERRORS)[:10]
+    endpoints = histogram_summary(HTTP_DURATION)[:10]
+    statuses = counter_totals(HTTP_RESPONSES, "status")
+    lines = ["Обработчики:"] + [format_latency(item) for item in handlers]
+    lines += ["", "Запросы к бэкенду и платёжным сервисам:"] + [format_latency(item) for item in endpoints]
+    lines += ["", "Ответы: " + ", ".join(f"{status}: {count}" for status, count in sorted(statuses.items()))]
+    log_stats = logging_stats()
+    if log_stats:
+        lines.append(f"Логи: в очереди {log_stats['queued']}, потеряно {log_stats['dropped']}, "
+                     f"отброшено выборкой {log_stats['sampled_out']}")
+    await message.answer("⏱ Задержки\n\n" + "\n".join(lines))
+    admin_logger.info(f"Admin {user_id} requested latency stats")
+
+PROFILE_USAGE = (
+    "🔬 Профилирование\n\n"
+    "/profile cpu [секунды] — CPU профиль (collapsed stacks для flamegraph.pl, speedscope)\n"
+    "/profile heap [start|stop] — снимок памяти tracemalloc и изменения с прошлого снимка\n"
+    "/profile tasks — стеки asyncio задач, чтобы найти зависшие\n\n"
+    "Добавьте backend, чтобы профилировать бэкенд, а не бота. "
+    "Пока включён heap, каждое выделение памяти медленнее — не забудьте stop."
+)
+
+async def profile_bot(kind: str, argument: str) -> dict:
+    """The same reports as the backend's /profile endpoints, for this process."""
+    try:
+        if kind == "cpu":
+            report = await profile_cpu(float(argument))
+        elif kind == "heap":
+            if argument == "start":
+                report = heap_start()
+            elif argument == "stop":
+                report = await asyncio.to_thread(heap_stop)
+            else:
+                report = await asyncio.to_thread(heap_snapshot)
+        else:
+            report = dump_tasks()
+    except ProfilerBusy as e:
+        return {"success": False, "error": str(e)}
+    return {"success": True, "report": report}
+
+@admin_router.message(TextPrefix("/profile"))
+async def admin_profile(message: Message, i18n: TranslatorRunner):
+    user_id = message.from_user.id
+    is_admin_check = await is_admin(str(user_id), admin_id)
+    if not is_admin_check:
+        logger.info(f'not admin. user_id: {user_id}, admin_id: {admin_id}')
+        await message.answer(text=i18n.unknown.message())
+        return
+
+    args = message.text.split()[1:]
+    target = "backend" if "backend" in args else "bot"
+    args = [arg for arg in args if arg != "backend"]
+    kind = args[0] if args else None
+    argument = args[1] if len(args) > 1 else ""
+    if kind == "cpu":
+        try:
+            argument = str(min(max(float(argument or 10), 1), MAX_SECONDS))
+        except ValueError:
+            kind = None
+    elif kind == "heap":
+        argument = argument or "snapshot"
+        if argument not in ("snapshot", "start", "stop"):
+            kind = None
+    elif kind == "tasks" and argument:
+        kind = None
+    if kind not in ("cpu", "heap", "tasks"):
+        await message.answer(PROFILE_USAGE)
+        return
+
+    if kind == "cpu":
+        await message.answer(f"⏳ Записываю CPU профиль {target}, {float(argument):g} с...")
+    if target == "backend":
+        if kind == "cpu":
+            result = await admin_req.profile_cpu(float(argument))
+        elif kind == "heap":
+            result = await admin_req.profile_heap(argument)
+        else:
+            result = await admin_req.profile_tasks()
+    else:
+        result = await profile_bot(kind, argument)
+    admin_logger.info(f"Admin {user_id} profiled {target}: {kind} {argument}")
+    if not result["success"]:
+        await message.answer(f"Ошибка: {result['error']}")
+        return
+
+    report = result["report"]
+    if kind != "cpu" and len(report) < 3500:
+        await message.answer(f"<pre>{html.escape(report)}</pre>")
+        return
+    suffix = "collapsed" if kind == "cpu" else "txt"
+    filename = f"{target}-{kind}-{datetime.now(timezone.utc):%Y%m%d-%H%M%S}.{suffix}"
+    await message.answer_document(BufferedInputFile(report.encode(), filename=filename))
+
+@admin_router.callback_query(Data("admin_cancel_reset"))
 async def admin_cancel_reset(callback: CallbackQuery, state: FSMContext):
     await callback.message.edit_text("Сброс паролей отменён.")
     admin_logger.info(f"Admin {callback.from_user.id} cancelled password reset")
@@ -148,7 +390,7 @@ async def process_reset_password(message: Message, state: FSMContext):
     
     await state.clear()
 
-@admin_router.message(F.text == "👤 Пользователи")
+@admin_router.message(Text("👤 Пользователи"))
 async def admin_users_menu(
         message: Message, 
         state: FSMContext
@@ -169,11 +411,12 @@ async def admin_users_menu(
     )
     admin_logger.info(f"Admin {message.from_user.id} viewed users list")
 
-@admin_router.callback_query(F.data.startswith("admin_users_page_"))
+@admin_router.callback_query(AdminPageCb.filter(F.section == "users"))
 async def admin_users_pagination(
-        callback: CallbackQuery
+        callback: CallbackQuery,
+        callback_data: AdminPageCb
 ) -> None:
-    page = int(callback.data.split("_")[-1])
+    page = callback_data.page
     skip = page * PER_PAGE
     users = await admin_req.get_users(skip=skip, limit=PER_PAGE)
     await callback.message.edit_reply_markup(
@@ -182,9 +425,9 @@ async def admin_users_pagination(
     admin_logger.info(f"Admin {callback.from_user.id} viewed users page {page+1}")
     await callback.answer()
 
-@admin_router.callback_query(F.data.startswith("admin_user_profile_"))
-async def admin_user_profile(callback: CallbackQuery):
-    user_id = int(callback.data.split("_")[-1])
+@admin_router.callback_query(AdminUserCb.filter(F.action == "profile"))
+async def admin_user_profile(callback: CallbackQuery, callback_data: AdminUserCb):
+    user_id = callback_data.user_id
     users = await admin_req.get_users(user_id=user_id)
     if not users:
         await callback.message.answer("Пользователь не найден.")
@@ -216,9 +459,9 @@ async def admin_user_profile(callback: CallbackQuery):
     admin_logger.info(f"Admin {callback.from_user.id} viewed profile of user {user_id}")
     await callback.answer()
 
-@admin_router.callback_query(F.data.startswith("admin_add_balance_"))
-async def admin_add_balance_start(callback: CallbackQuery, state: FSMContext):
-    user_id = int(callback.data.split("_")[-1])
+@admin_router.callback_query(AdminUserCb.filter(F.action == "add_balance"))
+async def admin_add_balance_start(callback: CallbackQuery, callback_data: AdminUserCb, state: FSMContext):
+    user_id = callback_data.user_id
     await state.update_data(user_id=user_id)
     await callback.message.answer("Введите сумму для пополнения баланса (например, 1000.50):")
     await state.set_state(AdminAuthStates.add_balance)
@@ -243,7 +486,7 @@ async def admin_add_balance_amount(message: Message, state: FSMContext):
     # Клавиатура подтверждения
     confirm_kb = InlineKeyboardMarkup(inline_keyboard=[
         [
-            InlineKeyboardButton(text="✅ Да", callback_data=f"admin_confirm_balance_{user_id}"),
+            InlineKeyboardButton(text="✅ Да", callback_data=AdminUserCb(action="confirm_balance", user_id=user_id).pack()),
             InlineKeyboardButton(text="❌ Нет", callback_data="admin_cancel_balance")
         ]
     ])
@@ -252,9 +495,9 @@ async def admin_add_balance_amount(message: Message, state: FSMContext):
         reply_markup=confirm_kb
     )
 
-@admin_router.callback_query(F.data.startswith("admin_confirm_balance_"))
-async def admin_confirm_balance(callback: CallbackQuery, state: FSMContext):
-    user_id = int(callback.data.split("_")[-1])
+@admin_router.callback_query(AdminUserCb.filter(F.action == "confirm_balance"))
+async def admin_confirm_balance(callback: CallbackQuery, callback_data: AdminUserCb, state: FSMContext):
+    user_id = callback_data.user_id
     data = await state.get_data()
     amount = data.get("amount")
     
@@ -312,15 +555,15 @@ async def admin_confirm_balance(callback: CallbackQuery, state: FSMContext):
     await state.clear()
     await callback.answer()
 
-@admin_router.callback_query(F.data == "admin_cancel_balance")
+@admin_router.callback_query(Data("admin_cancel_balance"))
 async def admin_cancel_balance(callback: CallbackQuery, state: FSMContext):
     await callback.message.answer("Пополнение баланса отменено.")
     await state.clear()
     await callback.answer()
 
-@admin_router.callback_query(F.data.startswith("admin_unblock_user_"))
-async def admin_unblock_user(callback: CallbackQuery):
-    user_id = int(callback.data.split("_")[-1])
+@admin_router.callback_query(AdminUserCb.filter(F.action == "unblock"))
+async def admin_unblock_user(callback: CallbackQuery, callback_data: AdminUserCb):
+    user_id = callback_data.user_id
     
     success = await admin_req.remove_from_blacklist(user_id)
     if success:
@@ -358,9 +601,9 @@ async def admin_unblock_user(callback: CallbackQuery):
         )
     await callback.answer()
 
-@admin_router.callback_query(F.data.startswith("admin_block_user_"))
-async def admin_block_user(callback: CallbackQuery):
-    user_id = int(callback.data.split("_")[-1])
+@admin_router.callback_query(AdminUserCb.filter(F.action == "block"))
+async def admin_block_user(callback: CallbackQuery, callback_data: AdminUserCb):
+    user_id = callback_data.user_id
     
     success = await admin_req.block_user(user_id)
     if success:
@@ -398,9 +641,9 @@ async def admin_block_user(callback: CallbackQuery):
         )
     await callback.answer()
 
-@admin_router.callback_query(F.data.startswith("admin_delete_user_"))
-async def admin_delete_user(callback: CallbackQuery):
-    user_id = int(callback.data.split("_")[-1])
+@admin_router.callback_query(AdminUserCb.filter(F.action == "delete"))
+async def admin_delete_user(callback: CallbackQuery, callback_data: AdminUserCb):
+    user_id = callback_data.user_id
     if str(user_id) == admin_id:
         await callback.message.answer("Нельзя удалить администратора.")
         return
@@ -411,7 +654,7 @@ async def admin_delete_user(callback: CallbackQuery):
     admin_logger.info(f"Admin {callback.from_user.id} deleted user {user_id}")
     await callback.answer()
 
-@admin_router.callback_query(F.data == "admin_back_to_users")
+@admin_router.callback_query(Data("admin_back_to_users"))
 async def admin_back_to_users(callback: CallbackQuery):
     summary = await admin_req.get_users_summary()
     if not summary:
@@ -431,7 +674,7 @@ async def admin_back_to_users(callback: CallbackQuery):
     admin_logger.info(f"Admin {callback.from_user.id} returned to users list")
     await callback.answer()
 
-@admin_router.callback_query(F.data == "admin_back_to_main")
+@admin_router.callback_query(Data("admin_back_to_main"))
 async def admin_back_to_main(callback: CallbackQuery):
     await callback.message.answer(
         "Админ-панель",
@@ -440,7 +683,7 @@ async def admin_back_to_main(callback: CallbackQuery):
     admin_logger.info(f"Admin {callback.from_user.id} returned to main menu")
     await callback.answer()
 
-@admin_router.message(F.text == "🔑 Ключи")
+@admin_router.message(Text("🔑 Ключи"))
 async def admin_keys_menu(message: Message, state: FSMContext):
     keys = await admin_req.get_keys(skip=0, limit=PER_PAGE)
     if not keys:
@@ -452,9 +695,9 @@ async def admin_keys_menu(message: Message, state: FSMContext):
     )
     admin_logger.info(f"Admin {message.from_user.id} viewed keys list")
 
-@admin_router.callback_query(F.data.startswith("admin_keys_page_"))
-async def admin_keys_pagination(callback: CallbackQuery):
-    page = int(callback.data.split("_")[-1])
+@admin_router.callback_query(AdminPageCb.filter(F.section == "keys"))
+async def admin_keys_pagination(callback: CallbackQuery, callback_data: AdminPageCb):
+    page = callback_data.page
     skip = page * PER_PAGE
     keys = await admin_req.get_keys(skip=skip, limit=PER_PAGE)
     await callback.message.edit_reply_markup(
@@ -463,10 +706,10 @@ async def admin_keys_pagination(callback: CallbackQuery):
     admin_logger.info(f"Admin {callback.from_user.id} viewed keys page {page+1}")
     await callback.answer()
 
-@admin_router.callback_query(F.data.startswith("admin_key_profile_"))
-async def admin_key_profile(callback: CallbackQuery):
-    vpn_key = callback.data.split("_")[-1]
-    keys = await admin_req.get_keys(vpn_key=vpn_key)
+@admin_router.callback_query(AdminKeyCb.filter(F.action == "profile"))
+async def admin_key_profile(callback: CallbackQuery, callback_data: AdminKeyCb):
+    outline_key_id = callback_data.key_id
+    keys = await admin_req.get_keys(vpn_key=outline_key_id)
     if not keys:
         await callback.message.answer("Ключ не найден.")
         return
@@ -483,19 +726,19 @@ async def admin_key_profile(callback: CallbackQuery):
     )
     await callback.message.answer(
         text,
-        reply_markup=admin_kb.key_profile_kb(vpn_key)
+        reply_markup=admin_kb.key_profile_kb(outline_key_id)
     )
-    admin_logger.info(f"Admin {callback.from_user.id} viewed key {vpn_key}")
+    admin_logger.info(f"Admin {callback.from_user.id} viewed key with Outline id {outline_key_id}")
     await callback.answer()
 
-@admin_router.callback_query(F.data.startswith("admin_key_history_"))
-async def admin_key_history(callback: CallbackQuery):
-    vpn_key = callback.data.split("_")[-1]
-    history = await admin_req.get_key_history(vpn_key)
+@admin_router.callback_query(AdminKeyCb.filter(F.action == "history"))
+async def admin_key_history(callback: CallbackQuery, callback_data: AdminKeyCb):
+    outline_key_id = callback_data.key_id
+    history = await admin_req.get_key_history(outline_key_id)
     if not history:
         await callback.message.answer("История для этого ключа не найдена.")
         return
-    text = f"📜 История ключа {vpn_key}:\n\n"
+    text = f"📜 История ключа {outline_key_id}:\n\n"
     for idx, entry in enumerate(history, 1):
         text += (
             f"Запись {idx}:\n"
@@ -506,10 +749,10 @@ async def admin_key_history(callback: CallbackQuery):
             f"\n📅 Окончание: {entry['end_date']}\n\n"
         )
     await callback.message.answer(text)
-    admin_logger.info(f"Admin {callback.from_user.id} viewed history of key {vpn_key}")
+    admin_logger.info(f"Admin {callback.from_user.id} viewed history of key with Outline id {outline_key_id}")
     await callback.answer()
 
-@admin_router.callback_query(F.data == "admin_back_to_keys")
+@admin_router.callback_query(Data("admin_back_to_keys"))
 async def admin_back_to_keys(callback: CallbackQuery):
     keys = await admin_req.get_keys(skip=0, limit=PER_PAGE)
     if not keys:
@@ -522,7 +765,7 @@ async def admin_back_to_keys(callback: CallbackQuery):
     admin_logger.info(f"Admin {callback.from_user.id} returned to keys list")
     await callback.answer()
 
-@admin_router.message(F.text == "💰 Финансы")
+@admin_router.message(Text("💰 Финансы"))
 async def admin_finance_menu(message: Message, state: FSMContext):
     summary = await admin_req.get_payments_summary()
     if not summary:
@@ -558,7 +801,7 @@ async def admin_finance_menu(message: Message, state: FSMContext):
     )
     admin_logger.info(f"Admin {message.from_user.id} viewed finance summary")
 
-@admin_router.message(F.text == "📢 Рассылка")
+@admin_router.message(Text("📢 Рассылка"))
 async def admin_broadcast_menu(
         message: Message, 
         state: FSMContext
@@ -612,7 +855,7 @@ async def admin_broadcast_receive_image(
     await state.set_state(AdminAuthStates.waiting_for_broadcast_confirmation)
     admin_logger.info(f"Admin {message.from_user.id} previewed broadcast with image")
 
-@admin_router.callback_query(F.data == "skip_broadcast_image", AdminAuthStates.waiting_for_broadcast_image)
+@admin_router.callback_query(Data("skip_broadcast_image"), AdminAuthStates.waiting_for_broadcast_image)
 async def admin_broadcast_skip_image(
         callback: CallbackQuery, 
         state: FSMContext, 
@@ -629,7 +872,7 @@ async def admin_broadcast_skip_image(
     admin_logger.info(f"Admin {callback.from_user.id} previewed broadcast without image")
     await callback.answer()
 
-@admin_router.callback_query(F.data == "admin_broadcast_confirm", AdminAuthStates.waiting_for_broadcast_confirmation)
+@admin_router.callback_query(Data("admin_broadcast_confirm"), AdminAuthStates.waiting_for_broadcast_confirmation)
 async def admin_broadcast_confirm(callback: CallbackQuery, state: FSMContext, bot: Bot):
     state_data = await state.get_data()
     text = state_data.get("broadcast_text")
@@ -642,41 +885,43 @@ async def admin_broadcast_confirm(callback: CallbackQuery, state: FSMContext, bo
         await callback.answer()
         return
     
-    success_count = 0
-    fail_count = 0
+    # Sent by the outbox behind payment and other notices; the report comes when all are done
+    deliveries = []
     for user_id in user_ids:
-        try:
-            if photo_id:
-                await bot.send_photo(
-                    chat_id=user_id,
-                    photo=photo_id,
-                    caption=text
-                )
-            else:
-                await bot.send_message(
-                    chat_id=user_id,
-                    text=text
-                )
-            success_count += 1
-        except Exception as e:
-            admin_logger.error(f"Broadcast to user {user_id} failed: {e}")
-            fail_count += 1
-    
-    await callback.message.answer(
-        f"Рассылка завершена:\n✅ Успешно: {success_count}\n❌ Неуспешно: {fail_count}"
-    )
-    admin_logger.info(f"Admin {callback.from_user.id} sent broadcast {'with image' if photo_id else 'without image'}: {success_count} success, {fail_count} failed")
+        if photo_id:
+            method = SendPhoto(chat_id=user_id, photo=photo_id, caption=text)
+        else:
+            method = SendMessage(chat_id=user_id, text=text)
+        deliveries.append(enqueue(method, Priority.MARKETING))
+    task = asyncio.create_task(report_broadcast(callback.from_user.id, deliveries, photo_id is not None))
+    broadcast_reports.add(task)
+    task.add_done_callback(broadcast_reports.discard)
+
+    await callback.message.answer(f"Рассылка поставлена в очередь: {len(deliveries)} получателей.")
     await state.clear()
     await callback.answer()
 
-@admin_router.callback_query(F.data == "admin_broadcast_cancel", AdminAuthStates.waiting_for_broadcast_confirmation)
+async def report_broadcast(admin_user_id: int, deliveries: list, with_image: bool) -> None:
+    results = await asyncio.gather(*deliveries)
+    success_count = sum(results)
+    fail_count = len(results) - success_count
+    enqueue(
+        SendMessage(
+            chat_id=admin_user_id,
+            text=f"Рассылка завершена:\n✅ Успешно: {success_count}\n❌ Неуспешно: {fail_count}"
+        ),
+        Priority.NOTIFICATION
+    )
+    admin_logger.info(f"Admin {admin_user_id} sent broadcast {'with image' if with_image else 'without image'}: {success_count} success, {fail_count} failed")
+
+@admin_router.callback_query(Data("admin_broadcast_cancel"), AdminAuthStates.waiting_for_broadcast_confirmation)
 async def admin_broadcast_cancel(callback: CallbackQuery, state: FSMContext):
     await callback.message.answer("Рассылка отменена.")
     admin_logger.info(f"Admin {callback.from_user.id} cancelled broadcast")
     await state.clear()
     await callback.answer()
 
-@admin_router.message(F.text == "🛡 Безопасность")
+@admin_router.message(Text("🛡 Безопасность"))
 async def admin_security_menu(message: Message):
     admins = await admin_req.get_admins()
     if not admins:
@@ -692,7 +937,7 @@ async def admin_security_menu(message: Message):
         )
     admin_logger.info(f"Admin {message.from_user.id} viewed admins list")
 
-@admin_router.callback_query(F.data == "admin_add_admin")
+@admin_router.callback_query(Data("admin_add_admin"))
 async def admin_add_admin_start(callback: CallbackQuery, state: FSMContext):
     await callback.message.answer(
         "Введите user_id нового админа:",
@@ -725,9 +970,9 @@ async def admin_add_admin_receive_id(message: Message, state: FSMContext):
     )
     await state.clear()
 
-@admin_router.callback_query(F.data.startswith("admin_remove_admin_"))
-async def admin_remove_admin(callback: CallbackQuery):
-    admin_id = int(callback.data.split("_")[-1])
+@admin_router.callback_query(RemoveAdminCb.filter())
+async def admin_remove_admin(callback: CallbackQuery, callback_data: RemoveAdminCb):
+    admin_id = callback_data.admin_id
     if admin_id == callback.from_user.id:
         await callback.message.answer("Нельзя удалить самого себя.")
         await callback.answer()
@@ -749,7 +994,7 @@ async def admin_remove_admin(callback: CallbackQuery):
     )
     await callback.answer()
 
-@admin_router.callback_query(F.data == "admin_cancel_add_admin")
+@admin_router.callback_query(Data("admin_cancel_add_admin"))
 async def admin_cancel_add_admin(callback: CallbackQuery, state: FSMContext):
     admins = await admin_req.get_admins()
     await callback.message.answer(
@@ -760,7 +1005,7 @@ async def admin_cancel_add_admin(callback: CallbackQuery, state: FSMContext):
     await state.clear()
     await callback.answer()
 
-@admin_router.message(F.text == "🔍 Поиск")
+@admin_router.message(Text("🔍 Поиск"))
 async def admin_search_users_start(message: Message, state: FSMContext):
     await message.answer("Введите запрос для поиска (username, ID, email, имя, телефон):")
     await state.set_state(AdminAuthStates.search_users)
@@ -787,7 +1032,7 @@ async def admin_search_users_process(message: Message, state: FSMContext):
     await state.clear()
 
 
-@admin_router.message(F.text == "🎟 Промокоды")
+@admin_router.message(Text("🎟 Промокоды"))
 async def admin_promocodes_start(message: Message):
     promocodes = await admin_req.get_promocodes(skip=0, limit=20)
     if not promocodes:
@@ -807,9 +1052,9 @@ async def admin_promocodes_start(message: Message):
         parse_mode="HTML"
     )
 
-@admin_router.callback_query(F.data.startswith("admin_promocodes_page_"))
-async def admin_promocodes_page(callback: CallbackQuery):
-    page = int(callback.data.split("_")[-1])
+@admin_router.callback_query(AdminPageCb.filter(F.section == "promocodes"))
+async def admin_promocodes_page(callback: CallbackQuery, callback_data: AdminPageCb):
+    page = callback_data.page
     promocodes = await admin_req.get_promocodes(skip=page * 20, limit=20)
     if not promocodes:
         await callback.message.edit_text(
@@ -828,7 +1073,7 @@ async def admin_promocodes_page(callback: CallbackQuery):
     )
     await callback.answer()
 
-@admin_router.callback_query(F.data == "admin_add_promocode")
+@admin_router.callback_query(Data("admin_add_promocode"))
 async def admin_add_promocode_start(callback: CallbackQuery, state: FSMContext):
     await callback.message.answer("Введите код промокода (только буквы и цифры):")
     await state.set_state(AdminAuthStates.add_promo_code)
@@ -912,9 +1157,9 @@ async def admin_add_promocode_max_usage(message: Message, state: FSMContext):
     
     await state.clear()
 
-@admin_router.callback_query(F.data.startswith("admin_promocode_profile_"))
-async def admin_promocode_profile(callback: CallbackQuery):
-    code = callback.data.split("_")[-1]
+@admin_router.callback_query(AdminPromocodeCb.filter(F.action == "profile"))
+async def admin_promocode_profile(callback: CallbackQuery, callback_data: AdminPromocodeCb):
+    code = callback_data.code
     promocodes = await admin_req.get_promocodes(code=code)
     if not promocodes:
         await callback.message.edit_text("Промокод не найден.", parse_mode="HTML")
@@ -940,9 +1185,9 @@ async def admin_promocode_profile(callback: CallbackQuery):
     admin_logger.info(f"Admin {callback.from_user.id} viewed promocode {code}")
     await callback.answer()
 
-@admin_router.callback_query(F.data.startswith("admin_deactivate_promocode_"))
-async def admin_deactivate_promocode(callback: CallbackQuery):
-    code = callback.data.split("_")[-1]
+@admin_router.callback_query(AdminPromocodeCb.filter(F.action == "delete"))
+async def admin_deactivate_promocode(callback: CallbackQuery, callback_data: AdminPromocodeCb):
+    code = callback_data.code
     result = await admin_req.delete_promocode(code)
     
     if result["success"]:
@@ -962,7 +1207,7 @@ async def admin_deactivate_promocode(callback: CallbackQuery):
     
     await callback.answer()
 
-@admin_router.message(F.text == "🖥 Серверы")
+@admin_router.message(Text("🖥 Серверы"))
 async def admin_outline_servers(
         message: Message
 ) -> None:
@@ -982,7 +1227,7 @@ async def admin_outline_servers(
     
     admin_logger.info(f"Admin {message.from_user.id} viewed outline servers")
 
-@admin_router.callback_query(F.data == "admin_add_outline_server")
+@admin_router.callback_query(Data("admin_add_outline_server"))
 async def admin_add_outline_server(
         callback: CallbackQuery, 
         state: FSMContext
@@ -1062,12 +1307,13 @@ async def process_key_limit(
     
     await state.clear()
 
-@admin_router.callback_query(F.data.startswith("admin_delete_outline_server_"))
+@admin_router.callback_query(AdminServerCb.filter(F.action == "delete"))
 async def admin_delete_outline_server(
-        callback: CallbackQuery
+        callback: CallbackQuery,
+        callback_data: AdminServerCb
 ) -> None:
 
-    server_id = int(callback.data.split("_")[-1])
+    server_id = callback_data.server_id
     result = await admin_req.delete_outline_server(server_id)
     if result["success"]:
         await callback.message.edit_text(
@@ -1079,12 +1325,13 @@ async def admin_delete_outline_server(
     
     await callback.answer()
 
-@admin_router.callback_query(F.data.startswith("admin_view_server_"))
+@admin_router.callback_query(AdminServerCb.filter(F.action == "view"))
 async def admin_view_server(
-        callback: CallbackQuery
+        callback: CallbackQuery,
+        callback_data: AdminServerCb
 ) -> None:
 
-    server_id = int(callback.data.split("_")[-1])
+    server_id = callback_data.server_id
     servers = await admin_req.get_outline_servers()
     server = next((s for s in servers if s["id"] == server_id), None)
     
@@ -1111,15 +1358,15 @@ async def admin_view_server(
     await callback.message.edit_text(
         text,
         parse_mode="HTML",
-        reply_markup=admin_kb.outline_server_menu_kb(str(server['id']))
+        reply_markup=admin_kb.outline_server_menu_kb(server['id'])
     )
     
     admin_logger.info(f"Admin {callback.from_user.id} viewed outline server {server_id}")
     await callback.answer()
 
-@admin_router.callback_query(F.data.startswith("admin_edit_server_limit_"))
-async def admin_edit_server_limit(callback: CallbackQuery, state: FSMContext):
-    server_id = int(callback.data.split("_")[-1])
+@admin_router.callback_query(AdminServerCb.filter(F.action == "edit_limit"))
+async def admin_edit_server_limit(callback: CallbackQuery, callback_data: AdminServerCb, state: FSMContext):
+    server_id = callback_data.server_id
     servers = await admin_req.get_outline_servers()
     server = next((s for s in servers if s["id"] == server_id), None)
     
@@ -1183,7 +1430,7 @@ async def process_edit_key_limit(message: Message, state: FSMContext):
 # RAFFLES #
 ###########
 
-@admin_router.message(F.text == "🎉 Розыгрыш")
+@admin_router.message(Text("🎉 Розыгрыш"))
 async def raffles_menu(
         message: Message
 ) -> None:
@@ -1192,7 +1439,7 @@ async def raffles_menu(
         reply_markup=admin_kb.admin_raffle_menu_kb()
     )
 
-@admin_router.callback_query(F.data == "admin_create_raffle")
+@admin_router.callback_query(Data("admin_create_raffle"))
 async def create_raffle_start(
         callback: CallbackQuery, 
         state: FSMContext
@@ -1204,12 +1451,13 @@ async def create_raffle_start(
     await state.set_state(RaffleAdminStates.select_type)
     await callback.answer()
 
-@admin_router.callback_query(F.data.startswith("raffle_type_"))
+@admin_router.callback_query(RaffleTypeCb.filter())
 async def process_raffle_type(
         callback: CallbackQuery, 
+        callback_data: RaffleTypeCb,
         state: FSMContext
 ) -> None:
-    raffle_type = callback.data.split("_")[-1]
+    raffle_type = callback_data.kind
     await state.update_data(raffle_type=raffle_type)
     await callback.message.answer("Введите название розыгрыша")
     await state.set_state(RaffleAdminStates.enter_name)
@@ -1306,14 +1554,14 @@ async def process_images(
         logger.error(f"Error downloading image: {e}")
         await message.answer("Ошибка при загрузке изображения")
 
-@admin_router.callback_query(F.data == "upload_another")
+@admin_router.callback_query(Data("upload_another"))
 async def upload_another_image(
         callback: CallbackQuery
 ) -> None:
     await callback.message.answer("Загрузите изображение для розыгрыша")
     await callback.answer()
 
-@admin_router.callback_query(F.data == "finish_upload")
+@admin_router.callback_query(Data("finish_upload"))
 async def finish_upload(
         callback: CallbackQuery, 
         state: FSMContext
@@ -1348,7 +1596,7 @@ async def finish_upload(
     logger.info(f"Admin {callback.from_user.id} previewed raffle")
     await callback.answer()
 
-@admin_router.callback_query(F.data == "admin_raffle_edit_text", RaffleAdminStates.waiting_for_raffle_confirmation)
+@admin_router.callback_query(Data("admin_raffle_edit_text"), RaffleAdminStates.waiting_for_raffle_confirmation)
 async def admin_edit_raffle_text(callback: CallbackQuery, state: FSMContext) -> None:
     await callback.message.edit_text(
         "Введите новый текст для подписи к розыгрышу:",
@@ -1381,7 +1629,7 @@ async def process_edited_raffle_text(message: Message, state: FSMContext) -> Non
     await state.set_state(RaffleAdminStates.waiting_for_raffle_confirmation)
     logger.info(f"Admin {message.from_user.id} edited raffle text")
 
-@admin_router.callback_query(F.data == "admin_raffle_confirm", RaffleAdminStates.waiting_for_raffle_confirmation)
+@admin_router.callback_query(Data("admin_raffle_confirm"), RaffleAdminStates.waiting_for_raffle_confirmation)
 async def raffle_confirm(callback: CallbackQuery, state: FSMContext):
     data = await state.get_data()
     raffle = data.get("raffle")
@@ -1391,16 +1639,20 @@ async def raffle_confirm(callback: CallbackQuery, state: FSMContext):
         # Отправка поста в канал
         channel_id = CHANNEL_ID
         text = f"Новый розыгрыш: {raffle['name']}"
-        await callback.message.bot.send_photo(
+        delivered = await enqueue(SendPhoto(
             chat_id=channel_id,
             photo=raffle["images"][0],
             caption=text,
             reply_markup=InlineKeyboardMarkup(inline_keyboard=[
                 [InlineKeyboardButton(text="Участвовать", url=BOT_URL)]
             ])
-        )
-        await callback.message.answer("Розыгрыш создан и отправлен в канал!")
-        logger.info(f"Admin {callback.from_user.id} created and sent raffle: {raffle['name']}")
+        ), Priority.NOTIFICATION)
+        if delivered:
+            await callback.message.answer("Розыгрыш создан и отправлен в канал!")
+            logger.info(f"Admin {callback.from_user.id} created and sent raffle: {raffle['name']}")
+        else:
+            await callback.message.answer("Розыгрыш создан, но пост в канал не отправлен.")
+            logger.error(f"Admin {callback.from_user.id} created raffle {raffle['name']}, channel post failed")
     else:
         await callback.message.answer("Ошибка при создании розыгрыша")
         logger.error(f"Admin {callback.from_user.id} failed to create raffle")
@@ -1408,14 +1660,14 @@ async def raffle_confirm(callback: CallbackQuery, state: FSMContext):
     await state.clear()
     await callback.answer()
 
-@admin_router.callback_query(F.data == "admin_raffle_cancel", RaffleAdminStates.waiting_for_raffle_confirmation)
+@admin_router.callback_query(Data("admin_raffle_cancel"), RaffleAdminStates.waiting_for_raffle_confirmation)
 async def raffle_cancel(callback: CallbackQuery, state: FSMContext):
     await callback.message.edit_text("Создание розыгрыша отменено.")
     logger.info(f"Admin {callback.from_user.id} cancelled raffle")
     await state.clear()
     await callback.answer()
 
-@admin_router.callback_query(F.data == "admin_edit_raffle")
+@admin_router.callback_query(Data("admin_edit_raffle"))
 async def edit_raffle_start(
         callback: CallbackQuery, 
         state: FSMContext
@@ -1432,7 +1684,7 @@ async def edit_raffle_start(
             builder.row(
                 InlineKeyboardButton(
                     text=f"{raffle['name']} (ID: {raffle['id']})",
-                    callback_data=f"edit_raffle_{raffle['id']}"
+                    callback_data=RaffleCb(action="edit", raffle_id=raffle['id']).pack()
                 )
             )
         builder.row(
@@ -1446,12 +1698,13 @@ async def edit_raffle_start(
         await callback.message.answer("Произошла ошибка при получении розыгрышей")
         await callback.answer()
 
-@admin_router.callback_query(F.data.startswith("edit_raffle_"))
+@admin_router.callback_query(RaffleCb.filter(F.action == "edit"))
 async def select_raffle_to_edit(
         callback: CallbackQuery, 
+        callback_data: RaffleCb,
         state: FSMContext
 ) -> None:
-    raffle_id = int(callback.data.split("_")[-1])
+    raffle_id = callback_data.raffle_id
     await state.update_data(raffle_id=raffle_id)
     
     try:
@@ -1479,12 +1732,12 @@ async def select_raffle_to_edit(
         
         # Создаём клавиатуру
         keyboard = InlineKeyboardMarkup(inline_keyboard=[
-            [InlineKeyboardButton(text="Название", callback_data="edit_name")],
-            [InlineKeyboardButton(text="Цена билета", callback_data="edit_ticket_price")],
-            [InlineKeyboardButton(text="Дата начала", callback_data="edit_start_date")],
-            [InlineKeyboardButton(text="Дата окончания", callback_data="edit_end_date")],
-            [InlineKeyboardButton(text="Изображения", callback_data="edit_images")],
-            [InlineKeyboardButton(text="Статус активности", callback_data="edit_is_active")]
+            [InlineKeyboardButton(text="Название", callback_data=RaffleFieldCb(field="name").pack())],
+            [InlineKeyboardButton(text="Цена билета", callback_data=RaffleFieldCb(field="ticket_price").pack())],
+            [InlineKeyboardButton(text="Дата начала", callback_data=RaffleFieldCb(field="start_date").pack())],
+            [InlineKeyboardButton(text="Дата окончания", callback_data=RaffleFieldCb(field="end_date").pack())],
+            [InlineKeyboardButton(text="Изображения", callback_data=RaffleFieldCb(field="images").pack())],
+            [InlineKeyboardButton(text="Статус активности", callback_data=RaffleFieldCb(field="is_active").pack())]
         ])
         
         # Отправляем сообщение с фото или без
@@ -1508,33 +1761,15 @@ async def select_raffle_to_edit(
         await callback.message.answer("Произошла ошибка при получении данных розыгрыша")
         await callback.answer()
 
-@admin_router.callback_query(F.data.startswith("edit_"))
+@admin_router.callback_query(RaffleFieldCb.filter())
 async def process_edit_field(
         callback: CallbackQuery, 
+        callback_data: RaffleFieldCb,
         state: FSMContext
 ) -> None:
-    field = callback.data.split("_")[-1]
-    logger.debug(f"Processing edit field: {field}")
-    
-    # Маппинг для устаревших или некорректных callback_data
-    field_map = {
-        "price": "ticket_price",
-        "date": "start_date",  # По умолчанию редактируем start_date
-        "start_date": "start_date",
-        "end_date": "end_date",
-        "active": "is_active",
-        "is_active": "is_active",
-        "name": "name",
-        "images": "images"
-    }
+    field_key = callback_data.field
+    logger.debug(f"Processing edit field: {field_key}")
     
-    if field not in field_map:
-        logger.error(f"Unknown edit field: {field}")
-        await callback.message.answer("Ошибка: неизвестное поле для редактирования")
-        await callback.answer()
-        return
-    
-    field_key = field_map[field]
     messages = {
         "name": "Введите новое название розыгрыша",
         "ticket_price": "Введите новую цену билета (в рублях)",
@@ -1544,6 +1779,12 @@ async def process_edit_field(
         "is_active": "Укажите статус активности (1 - активен, 0 - неактивен)"
     }
     
+    if field_key not in messages:
+        logger.error(f"Unknown edit field: {field_key}")
+        await callback.message.answer("Ошибка: неизвестное поле для редактирования")
+        await callback.answer()
+        return
+    
     try:
         await callback.message.answer(messages[field_key])
         await state.update_data(edit_field=field_key)
@@ -1612,7 +1853,7 @@ async def process_edit_value(
         logger.error(f"Error in process_edit_value: {e}")
         await message.answer("Произошла ошибка")
 
-@admin_router.callback_query(F.data == "admin_set_winners")
+@admin_router.callback_query(Data("admin_set_winners"))
 async def set_winners_start(
         callback: CallbackQuery, 
         state: FSMContext
@@ -1628,7 +1869,7 @@ async def set_winners_start(
         builder.row(
             InlineKeyboardButton(
                 text=f"{raffle['name']} (ID: {raffle['id']})",
-                callback_data=f"set_winner_raffle_{raffle['id']}"
+                callback_data=RaffleCb(action="set_winner", raffle_id=raffle['id']).pack()
             )
         )
 
@@ -1636,12 +1877,13 @@ async def set_winners_start(
     await state.set_state(RaffleAdminStates.select_raffle)
     await callback.answer()
 
-@admin_router.callback_query(F.data.startswith("set_winner_raffle_"))
+@admin_router.callback_query(RaffleCb.filter(F.action == "set_winner"))
 async def select_winner_raffle(
         callback: CallbackQuery, 
+        callback_data: RaffleCb,
         state: FSMContext
 ) -> None:
-    raffle_id = int(callback.data.split("_")[-1])
+    raffle_id = callback_data.raffle_id
     await state.update_data(raffle_id=raffle_id)
     await callback.message.answer("Введите user_id победителя")
     await state.set_state(RaffleAdminStates.select_winner)
@@ -1680,7 +1922,7 @@ async def process_winner(
         logger.error(f"Error in process_winner: {e}")
         await message.answer("Произошла ошибка")
 
-@admin_router.callback_query(F.data == "admin_add_tickets")
+@admin_router.callback_query(Data("admin_add_tickets"))
 async def add_tickets_start(
         callback: CallbackQuery, 
         state: FSMContext
@@ -1696,7 +1938,7 @@ async def add_tickets_start(
         builder.row(
             InlineKeyboardButton(
                 text=f"{raffle['name']} (ID: {raffle['id']})",
-                callback_data=f"add_tickets_raffle_{raffle['id']}"
+                callback_data=RaffleCb(action="add_tickets", raffle_id=raffle['id']).pack()
             )
         )
 
@@ -1704,12 +1946,13 @@ async def add_tickets_start(
     await state.set_state(RaffleAdminStates.select_raffle)
     await callback.answer()
 
-@admin_router.callback_query(F.data.startswith("add_tickets_raffle_"))
+@admin_router.callback_query(RaffleCb.filter(F.action == "add_tickets"))
 async def select_tickets_raffle(
         callback: CallbackQuery, 
+        callback_data: RaffleCb,
         state: FSMContext
 ) -> None:
-    raffle_id = int(callback.data.split("_")[-1])
+    raffle_id = callback_data.raffle_id
     await state.update_data(raffle_id=raffle_id)
     await callback.message.answer("Введите user_id и количество билетов (формат: user_id количество)")
     await state.set_state(RaffleAdminStates.add_tickets)
@@ -1741,7 +1984,7 @@ async def process_add_tickets(
         logger.error(f"Error in process_add_tickets: {e}")
         await message.answer("Произошла ошибка")
 
-@admin_router.callback_query(F.data == "admin_view_participants")
+@admin_router.callback_query(Data("admin_view_participants"))
 async def view_participants_start(
         callback: CallbackQuery, 
         state: FSMContext
@@ -1757,7 +2000,7 @@ async def view_participants_start(
         builder.row(
             InlineKeyboardButton(
                 text=f"{raffle['name']} (ID: {raffle['id']})",
-                callback_data=f"view_participants_{raffle['id']}"
+                callback_data=RaffleParticipantsCb(raffle_id=raffle['id']).pack()
             )
         )
 
@@ -1765,15 +2008,15 @@ async def view_participants_start(
     await state.set_state(RaffleAdminStates.select_raffle)
     await callback.answer()
 
-@admin_router.callback_query(F.data.startswith("view_participants_") | F.data.startswith("admin_participants_"))
+@admin_router.callback_query(RaffleParticipantsCb.filter())
 async def view_participants(
         callback: CallbackQuery, 
+        callback_data: RaffleParticipantsCb,
         state: FSMContext
 ) -> None:
     try:
-        parts = callback.data.split("_")
-        raffle_id = int(parts[-2] if parts[0] == "admin_participants" else parts[-1])
-        page = int(parts[-1]) if parts[0] == "admin_participants" else 0
+        raffle_id = callback_data.raffle_id
+        page = callback_data.page
         per_page = 10
         
         tickets = await raffle_req.get_tickets(raffle_id, page, per_page)
@@ -1,17 +1,20 @@
 import logging
-from aiogram import Router, F, Bot
+from aiogram import Bot, flags
 from aiogram.exceptions import TelegramBadRequest
 from aiogram.fsm.context import FSMContext
 from aiogram.utils.deep_linking import create_start_link
-from aiogram.types import Message, CallbackQuery
+from aiogram.types import Message, CallbackQuery, ChatMemberUpdated
 from fluentogram import TranslatorRunner
 from datetime import datetime
 
 from services import services, raffle_req, user_req
 from keyboards import another_kb, main_kb, raffle_kb, payment_kb, devices_kb
+from keyboards.callbacks import TicketCountCb
+from utils.routing import IndexedRouter, Data, DataPrefix, Text, TextPrefix
+from utils.membership import is_chat, membership_cache
 from config import get_config, Admin, Channel
 
-another_router = Router()
+another_router = IndexedRouter()
 admin = get_config(Admin, "admin")  # Admin configuration
 channel = get_config(Channel, "channel")
 CHANNEL_ID = channel.id
@@ -19,15 +22,9 @@ admin_id = admin.id
 
 logger = logging.getLogger(__name__)
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(filename)s:%(lineno)d #%(levelname)-8s "
-           "[%(asctime)s] - %(name)s - %(message)s"
-)
-
-@another_router.message(F.text.startswith("До окончания") | F.text.startswith("Until")) 
-@another_router.message(F.text.in_(["Нет активной подписки 😔", "No active subscription 😔"]))
+@another_router.message(TextPrefix("До окончания", "Until")) 
+@another_router.message(Text("Нет активной подписки 😔", "No active subscription 😔"))
+@flags.throttle_cost(3)
 async def subscription_handler(
     message: Message,
     i18n: TranslatorRunner
@@ -85,7 +82,7 @@ async def subscription_handler(
         logger.error(f"Unexpected error for user {user_id}: {e}")
         await message.answer(text=i18n.error.unexpected())
 
-@another_router.message(F.text == 'Подписка активна, устройств нет  🕒')
+@another_router.message(Text('Подписка активна, устройств нет  🕒'))
 async def no_active_devices(
     message: Message,
     i18n: TranslatorRunner
@@ -95,14 +92,14 @@ async def no_active_devices(
             reply_markup=devices_kb.back_device_kb(i18n)
             )
 
-@another_router.message(F.text == '/privacy')
+@another_router.message(Text('/privacy'))
 async def privacy_handler(
     message: Message,
     i18n: TranslatorRunner
 ) -> None:
     await message.answer(text=i18n.privacy())
 
-@another_router.message(F.text.in_(["Тех. Поддержка 🛠️", "Tech Support 🛠️"]))
+@another_router.message(Text("Тех. Поддержка 🛠️", "Tech Support 🛠️"))
 async def support_handler(
     message: Message,
     state: FSMContext,
@@ -130,7 +127,7 @@ async def support_handler(
         logger.error(f"Unexpected error for user {user_id}: {e}")
         await message.answer(text=i18n.error.unexpected())
 
-@another_router.message(F.text.in_(["/friends", "Пригласить друга 👥", "Invite a Friend 👥"]))
+@another_router.message(Text("/friends", "Пригласить друга 👥", "Invite a Friend 👥"))
 async def referral_handler(
     message: Message,
     bot: Bot,
@@ -163,7 +160,7 @@ async def referral_handler(
         logger.error(f"Unexpected error for user {user_id}: {e}")
         await message.answer(text=i18n.error.unexpected())
 
-@another_router.message(F.text == "/gift")
+@another_router.message(Text("/gift"))
 async def cmd_gift(
         message: Message, 
         i18n: TranslatorRunner
@@ -205,7 +202,7 @@ async def cmd_gift(
         logger.error(f"Error in cmd_gift: {e}")
         await message.answer(i18n.error())
 
-@another_router.callback_query(F.data.startswith("raffle_buy_tickets_"))
+@another_router.callback_query(DataPrefix("raffle_buy_tickets_"))
 async def process_buy_tickets(
         callback: CallbackQuery, 
         state: FSMContext, 
@@ -224,12 +221,18 @@ async def process_buy_tickets(
         await callback.message.answer(i18n.error())
         await callback.answer()
 
-@another_router.callback_query(F.data == "check_subscription")
+@another_router.chat_member()
+async def channel_member_updated(event: ChatMemberUpdated) -> None:
+    # Only sent while the bot is a channel admin; keeps subscription checks local
+    if is_chat(event.chat, CHANNEL_ID):
+        membership_cache.update(event)
+
+@another_router.callback_query(Data("check_subscription"))
 async def check_subscription(callback: CallbackQuery, state: FSMContext, i18n: TranslatorRunner) -> None:
     user_id = callback.from_user.id
     try:
-        chat_member = await callback.bot.get_chat_member(chat_id=CHANNEL_ID, user_id=user_id)
-        if chat_member.status in ["member", "administrator", "creator"]:
+        # The user says they have subscribed, so a cached "no" is checked again
+        if await membership_cache.is_member(callback.bot, CHANNEL_ID, user_id, recheck_negative=True):
             await callback.message.edit_text("Вы подписаны на канал! Продолжите покупку билетов.")
             # Возвращаем пользователя к выбору количества билетов
             data = await state.get_data()
@@ -253,14 +256,15 @@ async def check_subscription(callback: CallbackQuery, state: FSMContext, i18n: T
         await callback.message.edit_text(i18n.error())
     await callback.answer()
 
-@another_router.callback_query(F.data.startswith("ticket_count_"))
+@another_router.callback_query(TicketCountCb.filter())
 async def process_ticket_count(
         callback: CallbackQuery, 
+        callback_data: TicketCountCb,
         state: FSMContext, 
         i18n: TranslatorRunner
 ) -> None:
     try:
-        _, _, count = callback.data.split('_')
+        count = callback_data.count
         if int(count) <= 0:
             await callback.message.answer(i18n.error.invalid.ticket.count())
             return
@@ -268,8 +272,7 @@ async def process_ticket_count(
         # Проверка подписки на канал
         user_id = callback.from_user.id
         try:
-            chat_member = await callback.bot.get_chat_member(chat_id=CHANNEL_ID, user_id=user_id)
-            if chat_member.status not in ["member", "administrator", "creator"]:
+            if not await membership_cache.is_member(callback.bot, CHANNEL_ID, user_id):
                 logger.info(f"User {user_id} attempted to buy tickets without channel subscription")
                 await callback.message.answer(
                     "Вы должны быть подписаны на канал для покупки билетов!",
@@ -322,7 +325,7 @@ async def process_ticket_count(
 
         text = i18n.select.contact(email=email, phone=phone)
 
-        logger.info(f'\n\nPAYLOAD: {payload}')
+        logger.debug("Contact selection payload: %s", payload)
 
         await callback.message.answer(text=text, reply_markup=keyboard)
         await callback.answer()
@@ -2,7 +2,7 @@ import logging
 import unicodedata
 
 from typing import Union
-from aiogram import Router, F
+from aiogram import flags
 from aiogram.utils.markdown import code
 from aiogram.exceptions import TelegramBadRequest
 from aiogram.fsm.context import FSMContext
@@ -12,20 +12,16 @@ from fluentogram import TranslatorRunner
 
 from services import services, vpn_req, admin_req, payment_req, PaymentSG, DevicesSG
 from keyboards import payment_kb, devices_kb, main_kb
+from keyboards.callbacks import InstructionCb, PeriodCb
+from utils.routing import IndexedRouter, Data, DataPrefix, Text, TextPrefix
 
-devices_router = Router()
+devices_router = IndexedRouter()
 
 logger = logging.getLogger(__name__)
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(filename)s:%(lineno)d #%(levelname)-8s '
-           '[%(asctime)s] - %(name)s - %(message)s'
-)
-
-@devices_router.message(F.text.in_(["🌐 Мои устройства 📱💻", "🌐 My devices 📱💻"]))
-@devices_router.callback_query(F.data == "devices_menu")
+@devices_router.message(Text("🌐 Мои устройства 📱💻", "🌐 My devices 📱💻"))
+@devices_router.callback_query(Data("devices_menu"))
+@flags.throttle_cost(3)
 async def devices_button_handler(
     event: Union[CallbackQuery, Message],
     i18n: TranslatorRunner
@@ -105,7 +101,7 @@ async def devices_button_handler(
         else:
             await event.answer(text=i18n.error.unexpected())
 
-@devices_router.message(F.text == "/help")
+@devices_router.message(Text("/help"))
 async def select_instructions_handler_text(
     message: Message,
     state: FSMContext,
@@ -120,7 +116,7 @@ async def select_instructions_handler_text(
                 device_type='device'
                 ))
 
-@devices_router.callback_query(F.data.startswith("select_instruction"))
+@devices_router.callback_query(DataPrefix("select_instruction"))
 async def select_instructions_handler(
     callback: CallbackQuery,
     state: FSMContext,
@@ -136,7 +132,8 @@ async def select_instructions_handler(
                 ))
     await callback.answer()
 
-@devices_router.callback_query(F.data.startswith("selected_device_"))
+@devices_router.callback_query(DataPrefix("selected_device_"))
+@flags.throttle_cost(2)
 async def select_devices_handler(
     callback: CallbackQuery,
     state: FSMContext,
@@ -172,10 +169,10 @@ async def select_devices_handler(
         cleaned_key = "".join(c for c in vpn_key if unicodedata.category(c)[0] != "C")
         escaped_key = services.escape_markdown_v2(cleaned_key)
         if not cleaned_key.startswith("ss://"):
-            logger.error(f"Invalid VPN key format: {cleaned_key}")
+            logger.error(f"Invalid VPN key format for user {user_id}, device {device}: "
+                         f"starts with {cleaned_key[:5]!r}")
             await callback.answer("Error: Invalid VPN key format")
             return
-        logger.info(f'device_type: {device_data}')
         device_type = device_data.get("device_type")
         link = services.INSTUCTIONS[device_type]
         keyboard = devices_kb.device_kb(
@@ -204,7 +201,8 @@ async def select_devices_handler(
         await callback.message.edit_text(text=i18n.error.unexpected())
         await callback.answer()
 
-@devices_router.message(F.text.in_(['Подключить VPN 🚀', 'Connect VPN 🚀']))
+@devices_router.message(Text('Подключить VPN 🚀', 'Connect VPN 🚀'))
+@flags.throttle_cost(2)
 async def connect_vpn_handler(
     message: Message, 
     state: FSMContext,
@@ -259,8 +257,8 @@ async def connect_vpn_handler(
         logger.error(f"Unexpected error for user {user_id}: {e}")
         await message.answer(text=i18n.error.unexpected())
 
-@devices_router.message(F.text.in_(["Устройство", "Device", "Комбо набор", "Combo Package"]))
-@devices_router.callback_query(F.data.startswith("add_device"))
+@devices_router.message(Text("Устройство", "Device", "Комбо набор", "Combo Package"))
+@devices_router.callback_query(DataPrefix("add_device"))
 async def select_device_type(
     event: Union[CallbackQuery, Message],
     state: FSMContext,
@@ -317,7 +315,7 @@ async def select_device_type(
 
 @devices_router.message(
         StateFilter(DevicesSG.select_instruction),
-        F.text.in_(["Android 📱", "iPhone/iPad 📱", "Windows 💻", "MacOS 💻", "TV 📺", "Роутер 🌐", "Router 🌐"]))
+        Text("Android 📱", "iPhone/iPad 📱", "Windows 💻", "MacOS 💻", "TV 📺", "Роутер 🌐", "Router 🌐"))
 async def select_instruction_handler(
     message: Message,
     state: FSMContext,
@@ -330,14 +328,15 @@ async def select_instruction_handler(
     await message.answer(text=link, reply_markup=main_kb.back_to_devices_inline_kb(i18n))
     await state.clear()
 
-@devices_router.message(F.text == "TV 📺")
+@devices_router.message(Text("TV 📺"))
 async def select_tv_handler(
     message: Message
 ) -> None:
 
     await message.answer(text="В разработке, по всем вопросам обращайтесь в поддержку: @Jesko_support")
 
-@devices_router.message(F.text.in_(["Android 📱", "iPhone/iPad 📱", "Windows 💻", "MacOS 💻", "Роутер 🌐", "Router 🌐"]))
+@devices_router.message(Text("Android 📱", "iPhone/iPad 📱", "Windows 💻", "MacOS 💻", "Роутер 🌐", "Router 🌐"))
+@flags.throttle_cost(2)
 async def select_device_handler(
     message: Message,
     state: FSMContext,
@@ -435,7 +434,8 @@ async def select_device_handler(
             logger.error(f"Unexpected error for user {user_id}: {e}")
             await message.answer(text=i18n.error.unexpected())
 
-@devices_router.message(F.text.startswith('5 ') | F.text.startswith('10 '))
+@devices_router.message(TextPrefix('5 ', '10 '))
+@flags.throttle_cost(2)
 async def select_combo_handler(
     message: Message,
     state: FSMContext,
@@ -492,9 +492,11 @@ async def select_combo_handler(
         logger.error(f"Unexpected error for user {user_id}: {e}")
         await message.answer(text=i18n.error.unexpected())
 
-@devices_router.callback_query(F.data.startswith("month_"))
+@devices_router.callback_query(PeriodCb.filter())
+@flags.throttle_cost(2)
 async def select_period_handler(
     callback: CallbackQuery,
+    callback_data: PeriodCb,
     state: FSMContext,
     i18n: TranslatorRunner
 ) -> None:
@@ -535,7 +537,7 @@ async def select_period_handler(
         else:
             device_type = 'combo'
 
-        _, period = callback.data.split("_")
+        period = str(callback_data.months)
         payment_type = "buy_subscription"
     
         if device == '5' or device == '10':
@@ -613,7 +615,8 @@ async def fill_device_name(
             cleaned_key = "".join(c for c in vpn_key if unicodedata.category(c)[0] != "C")
             escaped_key = services.escape_markdown_v2(cleaned_key)
             if not cleaned_key.startswith("ss://"):
-                logger.error(f"Invalid VPN key format: {cleaned_key}")
+                logger.error(f"Invalid VPN key format for user {user_id}, device {device_name}: "
+                             f"starts with {cleaned_key[:5]!r}")
                 await message.answer("Error: Invalid VPN key format")
                 return
 
@@ -673,7 +676,8 @@ async def new_name_handler(
         cleaned_key = "".join(c for c in vpn_key if unicodedata.category(c)[0] != "C")
         escaped_key = services.escape_markdown_v2(cleaned_key)
         if not cleaned_key.startswith("ss://"):
-            logger.error(f"Invalid VPN key format: {cleaned_key}")
+            logger.error(f"Invalid VPN key format for user {user_id}, device {device_new_name}: "
+                         f"starts with {cleaned_key[:5]!r}")
             await message.answer("Error: Invalid VPN key format")
             return
 
@@ -698,7 +702,7 @@ async def new_name_handler(
         logger.error(f"Unexpected error for user {user_id}: {e}")
         await message.answer(text=i18n.error.unexpected())
 
-@devices_router.callback_query(F.data.startswith('rename_device_'))
+@devices_router.callback_query(DataPrefix('rename_device_'))
 async def rename_device_handler(
         callback: CallbackQuery,
         state: FSMContext,
@@ -712,7 +716,8 @@ async def rename_device_handler(
     await callback.message.edit_text(text=i18n.new.device.name())
     await state.set_state(DevicesSG.rename_device)
    
-@devices_router.callback_query(F.data.startswith('remove_device_'))
+@devices_router.callback_query(DataPrefix('remove_device_'))
+@flags.throttle_cost(2)
 async def remove_device_handler(
         callback: CallbackQuery,
         i18n: TranslatorRunner
@@ -737,17 +742,18 @@ async def remove_device_handler(
         logger.error(f"Unexpected error for user {user_id}: {e}")
         await callback.answer(text=i18n.error.unexpected())
 
-@devices_router.callback_query(F.data.startswith('instruction_'))
+@devices_router.callback_query(InstructionCb.filter())
 async def instruction_handler(
-        callback: CallbackQuery
+        callback: CallbackQuery,
+        callback_data: InstructionCb
 ) -> None:
     
-    _, device_type = callback.data.split('_')
+    device_type = callback_data.device_type
     instruction = services.INSTUCTIONS[device_type]
     await callback.message.answer(text=instruction)
     await callback.answer()
 
-@devices_router.message(F.text == "/promo")
+@devices_router.message(Text("/promo"))
 async def cmd_promo(
         message: Message, 
         state: FSMContext, 
@@ -757,6 +763,7 @@ async def cmd_promo(
     await state.set_state(DevicesSG.enter_promo)
 
 @devices_router.message(DevicesSG.enter_promo)
+@flags.throttle_cost(2)
 async def process_promo_code(
         message: Message, 
         state: FSMContext, 
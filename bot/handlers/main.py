@@ -1,6 +1,6 @@
 import logging
 from typing import Union
-from aiogram import Router, F
+from aiogram import flags
 from aiogram.utils.deep_linking import decode_payload
 from aiogram.exceptions import TelegramBadRequest
 from aiogram.fsm.context import FSMContext
@@ -10,19 +10,14 @@ from fluentogram import TranslatorRunner
 
 from services import user_req, services
 from keyboards import main_kb
+from utils.routing import IndexedRouter, Data, Text
 
-main_router = Router()
+main_router = IndexedRouter()
 
 logger = logging.getLogger(__name__)
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(filename)s:%(lineno)d #%(levelname)-8s '
-           '[%(asctime)s] - %(name)s - %(message)s'
-)
-
 @main_router.message(CommandStart(deep_link_encoded=True))
+@flags.throttle_cost(3)
 async def command_start_getter(
     message: Message,
     i18n: TranslatorRunner,
@@ -140,8 +135,9 @@ async def command_start_getter(
         logger.error(f"Unexpected error for user {user_id}: {e}")
         await message.answer(text=i18n.error.unexpected())
 
-@main_router.message(F.text.in_(["To Main Menu 🏠", "/menu", "В главное меню 🏠"]))
-@main_router.callback_query(F.data == "main_menu")
+@main_router.message(Text("To Main Menu 🏠", "/menu", "В главное меню 🏠"))
+@main_router.callback_query(Data("main_menu"))
+@flags.throttle_cost(3)
 async def main_menu_handler(
     event: Union[CallbackQuery, Message],
     state: FSMContext,
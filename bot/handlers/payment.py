@@ -2,7 +2,7 @@ import logging
 import re
 
 from typing import Union
-from aiogram import Router, F, Bot
+from aiogram import F, Bot, flags
 from aiogram.filters import StateFilter
 from aiogram.exceptions import TelegramBadRequest
 from aiogram.fsm.context import FSMContext
@@ -12,21 +12,17 @@ from fluentogram import TranslatorRunner
 from services import services, user_req, payment_req, PaymentSG, DevicesSG, \
                      START_PRICE, MONTH_PRICE_STARS 
 from keyboards import payment_kb, main_kb
+from keyboards.callbacks import BalanceAmountCb, ContactCb, PaymentMethodCb
+from utils.routing import IndexedRouter, Data, Text, TextPrefix
 
-payment_router = Router()
+payment_router = IndexedRouter()
 
 logger = logging.getLogger(__name__)
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(filename)s:%(lineno)d #%(levelname)-8s '
-           '[%(asctime)s] - %(name)s - %(message)s'
-)
-
-@payment_router.message(F.text.startswith("Баланс") | F.text.startswith("Balance") | 
-                        F.text.in_(['Пополнить баланс 💰', 'Top Up Balance 💰']))
-@payment_router.callback_query(F.data == "balance")
+@payment_router.message(TextPrefix("Баланс", "Balance"))
+@payment_router.message(Text('Пополнить баланс 💰', 'Top Up Balance 💰'))
+@payment_router.callback_query(Data("balance"))
+@flags.throttle_cost(3)
 async def balance_button_handler(
     event: Union[CallbackQuery, Message],
     state: FSMContext,
@@ -110,9 +106,11 @@ async def balance_button_handler(
         else:
             await event.answer(text=i18n.error.unexpected())
 
-@payment_router.callback_query(F.data.startswith("add_balance_"))
+@payment_router.callback_query(BalanceAmountCb.filter())
+@flags.throttle_cost(2)
 async def top_up_balance_handler(
     callback: CallbackQuery,
+    callback_data: BalanceAmountCb,
     state: FSMContext,
     i18n: TranslatorRunner
 ) -> None:
@@ -149,7 +147,7 @@ async def top_up_balance_handler(
             device_type="balance",
             period=0
         )
-        _, _, amount = callback.data.split("_")
+        amount = callback_data.amount
 
         # logger.info(f"User {user_id} adding balance: {amount}")
         
@@ -183,6 +181,7 @@ async def top_up_balance_handler(
         await callback.answer()
 
 @payment_router.message(PaymentSG.custom_balance)
+@flags.throttle_cost(2)
 async def custom_balance_handler(
     message: Message,
     state: FSMContext,
@@ -238,9 +237,10 @@ async def custom_balance_handler(
         logger.error(f"Unexpected error for user {user_id}: {e}")
         await message.answer(text=i18n.error.unexpected())
 
-@payment_router.callback_query(PaymentSG.buy_subscription, F.data.startswith("payment_"))
+@payment_router.callback_query(PaymentSG.buy_subscription, PaymentMethodCb.filter())
 async def buy_subscription_handler(
     callback: CallbackQuery,
+    callback_data: PaymentMethodCb,
     state: FSMContext,
     bot: Bot,
     i18n: TranslatorRunner
@@ -295,7 +295,7 @@ async def buy_subscription_handler(
             await callback.answer()
             return
 
-        _, method = callback.data.split("_")
+        method = callback_data.method
         payload = f"{user_id}:{amount}:{period}:{device_type}:{device}:{payment_type}:{method}"
 
         # UKASSA BUY SUBSCRIPTION
@@ -321,7 +321,12 @@ async def buy_subscription_handler(
         # CRYPTOBOT BUY SUBSCRIPTION
         elif method == "crypto":
             asset = 'TON'
-            rate = await payment_req.exchange_rate(asset)
+            rate = payment_req.get_exchange_rate(asset)
+            if rate is None:
+                logger.error(f"No {asset} exchange rate for user {user_id}")
+                await callback.message.edit_text(text=i18n.error.unexpected())
+                await callback.answer()
+                return
             rated_amount = amount / rate
             result = await payment_req.create_cryptobot_invoice(rated_amount, asset, payload)
             if result is not None:
@@ -408,9 +413,10 @@ async def buy_subscription_handler(
 
 @payment_router.callback_query(
         StateFilter(PaymentSG.add_balance), 
-        F.data.startswith("payment_"))
+        PaymentMethodCb.filter())
 async def add_balance_handler(
     callback: CallbackQuery,
+    callback_data: PaymentMethodCb,
     state: FSMContext,
     bot: Bot,
     i18n: TranslatorRunner
@@ -445,7 +451,7 @@ async def add_balance_handler(
             await callback.answer()
             return
 
-        _, method = callback.data.split("_")
+        method = callback_data.method
         payload = f"{user_id}:{amount}:{period}:{device_type}:{device}:{payment_type}:{method}"
         
         # UKASSA ADD BALANCE
@@ -470,7 +476,12 @@ async def add_balance_handler(
         # CRYPTOBOT ADD BALANCE
         elif method == "crypto":
             asset = 'TON'
-            rate = await payment_req.exchange_rate(asset)
+            rate = payment_req.get_exchange_rate(asset)
+            if rate is None:
+                logger.error(f"No {asset} exchange rate for user {user_id}")
+                await callback.message.edit_text(text=i18n.error.unexpected())
+                await callback.answer()
+                return
             rated_amount = amount / rate
             result = await payment_req.create_cryptobot_invoice(rated_amount, asset, payload)
             if result is not None:
@@ -519,14 +530,15 @@ async def add_balance_handler(
         await callback.message.edit_text(text=i18n.error.unexpected())
         await callback.answer()
 
-@payment_router.callback_query(F.data.startswith('add_contact_'))
+@payment_router.callback_query(ContactCb.filter(~F.known))
 async def add_contact_type_handler(
     callback: CallbackQuery,
+    callback_data: ContactCb,
     state: FSMContext,
     i18n: TranslatorRunner
 ) -> None:
     user_id = callback.from_user.id
-    contact_type = callback.data.split('_')[-1]  # 'email' или 'phone'
+    contact_type = callback_data.kind  # 'email' или 'phone'
     
     logger.info(f"User {user_id} started adding contact: {contact_type}")
     
@@ -641,14 +653,15 @@ async def phone_handler(
         logger.error(f"Unexpected error for user {user_id}: {e}")
         await message.answer(text=i18n.error.unexpected())
 
-@payment_router.callback_query(F.data.startswith('contact_'))
+@payment_router.callback_query(ContactCb.filter(F.known))
 async def process_ukassa_handler(
     callback: CallbackQuery,
+    callback_data: ContactCb,
     state: FSMContext,
     i18n: TranslatorRunner
 ) -> None:
     user_id = callback.from_user.id
-    contact_type = callback.data.split('_')[-1]  # 'email' или 'phone'
+    contact_type = callback_data.kind  # 'email' или 'phone'
     first_name = callback.from_user.first_name
     last_name = callback.from_user.last_name or ''
     username = callback.from_user.username or "User"
@@ -755,6 +768,7 @@ async def pre_checkout(
         await bot.answer_pre_checkout_query(pre_checkout_query.id, ok=False, error_message="Payment failed")
 
 @payment_router.message(F.content_type == "successful_payment")
+@flags.throttle_cost(0)
 async def process_payment(
     message: Message,
     state: FSMContext,
@@ -1,20 +1,14 @@
 import logging
-from aiogram import Router
 from aiogram.exceptions import TelegramBadRequest
 from aiogram.types import Message
 from aiogram.fsm.context import FSMContext
 from fluentogram import TranslatorRunner
 
-unknown_router = Router()
+from utils.routing import IndexedRouter
 
-logger = logging.getLogger(__name__)
+unknown_router = IndexedRouter()
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(filename)s:%(lineno)d #%(levelname)-8s "
-           "[%(asctime)s] - %(name)s - %(message)s"
-)
+logger = logging.getLogger(__name__)
 
 @unknown_router.message()
 async def send_answer(
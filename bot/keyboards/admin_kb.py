@@ -2,9 +2,13 @@ import logging
 from typing import Any, List, Dict
 from aiogram.types import ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.utils.keyboard import InlineKeyboardBuilder, ReplyKeyboardBuilder
+from .cache import cached_keyboard
+from .callbacks import AdminKeyCb, AdminPageCb, AdminPromocodeCb, AdminServerCb, AdminUserCb, RaffleParticipantsCb, \
+        RaffleTypeCb, RemoveAdminCb
 
 logger = logging.getLogger(__name__)
 
+@cached_keyboard(static=True)
 def admin_main_menu_kb() -> ReplyKeyboardMarkup:
     try:
         builder = ReplyKeyboardBuilder()
@@ -33,6 +37,7 @@ def admin_main_menu_kb() -> ReplyKeyboardMarkup:
         logger.error(f"Unexpected error in admin_main_menu_kb: {e}")
         return ReplyKeyboardMarkup()
 
+@cached_keyboard
 def users_list_kb(users, page: int, per_page: int) -> InlineKeyboardMarkup:
     try:
         builder = InlineKeyboardBuilder()
@@ -40,21 +45,21 @@ def users_list_kb(users, page: int, per_page: int) -> InlineKeyboardMarkup:
             builder.row(
                 InlineKeyboardButton(
                     text=f"{user['username'] or 'N/A'} (ID: {user['user_id']})",
-                    callback_data=f"admin_user_profile_{user['user_id']}"
+                    callback_data=AdminUserCb(action="profile", user_id=user['user_id']).pack()
                 )
             )
         
         nav_buttons = []
         if page > 0:
             nav_buttons.append(
-                InlineKeyboardButton(text="⬅️ Назад", callback_data=f"admin_users_page_{page-1}")
+                InlineKeyboardButton(text="⬅️ Назад", callback_data=AdminPageCb(section="users", page=page-1).pack())
             )
         nav_buttons.append(
             InlineKeyboardButton(text=f"Стр. {page+1}", callback_data="noop")
         )
         if len(users) == per_page:
             nav_buttons.append(
-                InlineKeyboardButton(text="Вперёд ➡️", callback_data=f"admin_users_page_{page+1}")
+                InlineKeyboardButton(text="Вперёд ➡️", callback_data=AdminPageCb(section="users", page=page+1).pack())
             )
         
         if nav_buttons:
@@ -78,20 +83,20 @@ def user_profile_kb(user_id: int, is_blacklisted: bool = False) -> InlineKeyboar
             builder.row(
                 InlineKeyboardButton(
                     text="🔓 Разблокировать",
-                    callback_data=f"admin_unblock_user_{user_id}"
+                    callback_data=AdminUserCb(action="unblock", user_id=user_id).pack()
                 )
             )
         else:
             builder.row(
                 InlineKeyboardButton(
                     text="🚫 Заблокировать",
-                    callback_data=f"admin_block_user_{user_id}"
+                    callback_data=AdminUserCb(action="block", user_id=user_id).pack()
                 )
             )
         builder.row(
             InlineKeyboardButton(
                 text="💰 Пополнить баланс",
-                callback_data=f"admin_add_balance_{user_id}"
+                callback_data=AdminUserCb(action="add_balance", user_id=user_id).pack()
             )
         )
         builder.row(
@@ -102,6 +107,7 @@ def user_profile_kb(user_id: int, is_blacklisted: bool = False) -> InlineKeyboar
         logger.error(f"Unexpected error in user_profile_kb: {e}")
         return InlineKeyboardMarkup()
 
+@cached_keyboard
 def keys_list_kb(keys, page: int, per_page: int) -> InlineKeyboardMarkup:
     try:
         builder = InlineKeyboardBuilder()
@@ -111,21 +117,21 @@ def keys_list_kb(keys, page: int, per_page: int) -> InlineKeyboardMarkup:
             builder.row(
                 InlineKeyboardButton(
                     text=f"Ключ: {vpn_key} ({status})",
-                    callback_data=f"admin_key_profile_{key['outline_key_id']}"
+                    callback_data=AdminKeyCb(action="profile", key_id=str(key['outline_key_id'])).pack()
                 )
             )
         
         nav_buttons = []
         if page > 0:
             nav_buttons.append(
-                InlineKeyboardButton(text="⬅️ Назад", callback_data=f"admin_keys_page_{page-1}")
+                InlineKeyboardButton(text="⬅️ Назад", callback_data=AdminPageCb(section="keys", page=page-1).pack())
             )
         nav_buttons.append(
             InlineKeyboardButton(text=f"Стр. {page+1}", callback_data="noop")
         )
         if len(keys) == per_page:
             nav_buttons.append(
-                InlineKeyboardButton(text="Вперёд ➡️", callback_data=f"admin_keys_page_{page+1}")
+                InlineKeyboardButton(text="Вперёд ➡️", callback_data=AdminPageCb(section="keys", page=page+1).pack())
             )
         
         if nav_buttons:
@@ -146,7 +152,7 @@ def key_profile_kb(vpn_key: str) -> InlineKeyboardMarkup:
     try:
         builder = InlineKeyboardBuilder()
         builder.row(
-            InlineKeyboardButton(text="📜 История", callback_data=f"admin_key_history_{vpn_key}")
+            InlineKeyboardButton(text="📜 История", callback_data=AdminKeyCb(action="history", key_id=vpn_key).pack())
         )
         builder.row(
             InlineKeyboardButton(text="🔙 К списку", callback_data="admin_back_to_keys")
@@ -156,6 +162,7 @@ def key_profile_kb(vpn_key: str) -> InlineKeyboardMarkup:
         logger.error(f"Unexpected error in key_profile_kb: {e}")
         return InlineKeyboardMarkup()
 
+@cached_keyboard(static=True)
 def finance_menu_kb() -> InlineKeyboardMarkup:
     try:
         builder = InlineKeyboardBuilder()
@@ -167,6 +174,7 @@ def finance_menu_kb() -> InlineKeyboardMarkup:
         logger.error(f"Unexpected error in finance_menu_kb: {e}")
         return InlineKeyboardMarkup()
 
+@cached_keyboard(static=True)
 def broadcast_menu_kb() -> InlineKeyboardMarkup:
     try:
         builder = InlineKeyboardBuilder()
@@ -185,7 +193,7 @@ def admins_list_kb(admins) -> InlineKeyboardMarkup:
             builder.row(
                 InlineKeyboardButton(
                     text=f"ID: {admin['user_id']} (Добавлен: {admin['added_at']})",
-                    callback_data=f"admin_remove_admin_{admin['user_id']}"
+                    callback_data=RemoveAdminCb(admin_id=admin['user_id']).pack()
                 )
             )
         builder.row(
@@ -202,6 +210,7 @@ def admins_list_kb(admins) -> InlineKeyboardMarkup:
         logger.error(f"Unexpected error in admins_list_kb: {e}")
         return InlineKeyboardMarkup()
 
+@cached_keyboard(static=True)
 def admin_add_kb() -> InlineKeyboardMarkup:
     try:
         builder = InlineKeyboardBuilder()
@@ -213,6 +222,7 @@ def admin_add_kb() -> InlineKeyboardMarkup:
         logger.error(f"Unexpected error in admin_add_kb: {e}")
         return InlineKeyboardMarkup()
 
+@cached_keyboard
 def promocodes_list_kb(promocodes, page: int, per_page: int) -> InlineKeyboardMarkup:
     try:
         builder = InlineKeyboardBuilder()
@@ -220,21 +230,21 @@ def promocodes_list_kb(promocodes, page: int, per_page: int) -> InlineKeyboardMa
             builder.row(
                 InlineKeyboardButton(
                     text=f"{promocode['code']} ({promocode['type']})",
-                    callback_data=f"admin_promocode_profile_{promocode['code']}"
+                    callback_data=AdminPromocodeCb(action="profile", code=promocode['code']).pack()
                 )
             )
         
         nav_buttons = []
         if page > 0:
             nav_buttons.append(
-                InlineKeyboardButton(text="⬅️ Назад", callback_data=f"admin_promocodes_page_{page-1}")
+                InlineKeyboardButton(text="⬅️ Назад", callback_data=AdminPageCb(section="promocodes", page=page-1).pack())
             )
         nav_buttons.append(
             InlineKeyboardButton(text=f"Стр. {page+1}", callback_data="noop")
         )
         if len(promocodes) == per_page:
             nav_buttons.append(
-                InlineKeyboardButton(text="Вперёд ➡️", callback_data=f"admin_promocodes_page_{page+1}")
+                InlineKeyboardButton(text="Вперёд ➡️", callback_data=AdminPageCb(section="promocodes", page=page+1).pack())
             )
         
         if nav_buttons:
@@ -261,11 +271,11 @@ def promocode_profile_kb(code: str, is_active: bool) -> InlineKeyboardMarkup:
             builder.row(
                 InlineKeyboardButton(
                     text="🔴 Деактивировать",
-                    callback_data=f"admin_deactivate_promocode_{code}"
+                    callback_data=AdminPromocodeCb(action="delete", code=code).pack()
                 )
             )
         builder.row(
-            InlineKeyboardButton(text="🔙 К списку", callback_data="admin_promocodes_page_0")
+            InlineKeyboardButton(text="🔙 К списку", callback_data=AdminPageCb(section="promocodes", page=0).pack())
         )
         return builder.as_markup()
     except Exception as e:
@@ -279,7 +289,7 @@ def outline_servers_kb(servers: list) -> InlineKeyboardMarkup:
         for server in servers:
             text = f"ID: {server['id']}. ({server['key_count']}/{server['key_limit']})"
             builder.row(
-                InlineKeyboardButton(text=text, callback_data=f"admin_view_server_{server['id']}"),
+                InlineKeyboardButton(text=text, callback_data=AdminServerCb(action="view", server_id=server['id']).pack()),
             )
         builder.row(InlineKeyboardButton(text="➕ Добавить сервер", callback_data="admin_add_outline_server"))
         builder.row(InlineKeyboardButton(text="🔙 Назад", callback_data="admin_menu"))
@@ -288,20 +298,21 @@ def outline_servers_kb(servers: list) -> InlineKeyboardMarkup:
         logger.error(f"Unexpected error in promocode_profile_kb: {e}")
         return InlineKeyboardMarkup()
 
-def outline_server_menu_kb(server_id: str) -> InlineKeyboardMarkup:
+def outline_server_menu_kb(server_id: int) -> InlineKeyboardMarkup:
     try:
         builder = InlineKeyboardBuilder()
         builder.row(
-            InlineKeyboardButton(text="✏️ Изменить лимит", callback_data=f"admin_edit_server_limit_{server_id}")
+            InlineKeyboardButton(text="✏️ Изменить лимит", callback_data=AdminServerCb(action="edit_limit", server_id=server_id).pack())
         )
         builder.row(
-                InlineKeyboardButton(text="🗑 Удалить", callback_data=f"admin_delete_outline_server_{server_id}")
+                InlineKeyboardButton(text="🗑 Удалить", callback_data=AdminServerCb(action="delete", server_id=server_id).pack())
         )
         return builder.as_markup()
     except Exception as e:
         logger.error(f"Unexpected error in promocode_profile_kb: {e}")
         return InlineKeyboardMarkup()
 
+@cached_keyboard(static=True)
 def broadcast_confirmation_kb() -> InlineKeyboardMarkup:
     try:
         builder = InlineKeyboardBuilder()
@@ -314,6 +325,7 @@ def broadcast_confirmation_kb() -> InlineKeyboardMarkup:
         logger.error(f"Unexpected error in promocode_profile_kb: {e}")
         return InlineKeyboardMarkup() 
 
+@cached_keyboard(static=True)
 def broadcast_image_kb() -> InlineKeyboardMarkup:
     try:
         builder = InlineKeyboardBuilder()
@@ -325,6 +337,7 @@ def broadcast_image_kb() -> InlineKeyboardMarkup:
         logger.error(f"Unexpected error in promocode_profile_kb: {e}")
         return InlineKeyboardMarkup()
 
+@cached_keyboard(static=True)
 def admin_raffle_menu_kb() -> InlineKeyboardMarkup:
     try:
         builder = InlineKeyboardBuilder()
@@ -344,18 +357,20 @@ def admin_raffle_menu_kb() -> InlineKeyboardMarkup:
         logger.error(f"Error in admin_raffle_menu_kb: {e}")
         return InlineKeyboardMarkup()
 
+@cached_keyboard(static=True)
 def raffle_type_kb() -> InlineKeyboardMarkup:
     try:
         builder = InlineKeyboardBuilder()
         builder.row(
-            InlineKeyboardButton(text="По подписке", callback_data="raffle_type_subscription"),
-            InlineKeyboardButton(text="По билетам", callback_data="raffle_type_ticket")
+            InlineKeyboardButton(text="По подписке", callback_data=RaffleTypeCb(kind="subscription").pack()),
+            InlineKeyboardButton(text="По билетам", callback_data=RaffleTypeCb(kind="ticket").pack())
         )
         return builder.as_markup()
     except Exception as e:
         logger.error(f"Error in raffle_type_kb: {e}")
         return InlineKeyboardMarkup()
 
+@cached_keyboard(static=True)
 def raffle_confirmation_kb() -> InlineKeyboardMarkup:
     try:
         builder = InlineKeyboardBuilder()
@@ -381,21 +396,21 @@ def raffle_participants_kb(
             builder.row(
                 InlineKeyboardButton(
                     text=f"{ticket['username'] or 'N/A'} (ID: {ticket['user_id']}, Билетов: {ticket['count']})",
-                    callback_data=f"admin_user_profile_{ticket['user_id']}"
+                    callback_data=AdminUserCb(action="profile", user_id=ticket['user_id']).pack()
                 )
             )
         
         nav_buttons = []
         if page > 0:
             nav_buttons.append(
-                InlineKeyboardButton(text="⬅️ Назад", callback_data=f"admin_participants_{raffle_id}_{page-1}")
+                InlineKeyboardButton(text="⬅️ Назад", callback_data=RaffleParticipantsCb(raffle_id=raffle_id, page=page-1).pack())
             )
         nav_buttons.append(
             InlineKeyboardButton(text=f"Стр. {page+1}", callback_data="noop")
         )
         if len(tickets) == per_page:
             nav_buttons.append(
-                InlineKeyboardButton(text="Вперёд ➡️", callback_data=f"admin_participants_{raffle_id}_{page+1}")
+                InlineKeyboardButton(text="Вперёд ➡️", callback_data=RaffleParticipantsCb(raffle_id=raffle_id, page=page+1).pack())
             )
         
         if nav_buttons:
@@ -2,9 +2,11 @@ import logging
 from aiogram.types import ReplyKeyboardMarkup, KeyboardButton
 from aiogram.utils.keyboard import ReplyKeyboardBuilder
 from fluentogram import TranslatorRunner
+from .cache import cached_keyboard
 
 logger = logging.getLogger(__name__)
 
+@cached_keyboard(static=True)
 def subscription_menu(i18n: TranslatorRunner) -> ReplyKeyboardMarkup:
     """
     Create a reply keyboard for the subscription menu.
@@ -0,0 +1,113 @@
+import inspect
+import logging
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Callable, Dict, Hashable, List, Tuple
+
+from fluentogram import TranslatorHub, TranslatorRunner
+
+logger = logging.getLogger(__name__)
+
+# Parameterized keyboards (device lists, balances) kept across all locales
+KEYBOARD_CACHE_SIZE = 2048
+
+
+def runner_locale(i18n: TranslatorRunner) -> str:
+    # The hub hands out a new runner per update; its first translator is the locale
+    return i18n.translators[0].locale
+
+
+def freeze(value: Any) -> Hashable:
+    """Hashable cache key part: lists become tuples, translators become their locale."""
+    if isinstance(value, TranslatorRunner):
+        return ("locale", runner_locale(value))
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, freeze(item)) for key, item in value.items()))
+    return value
+
+
+class KeyboardCache:
+    """
+    Bounded LRU of built markups.
+
+    Markups are shared between users, so callers must not modify a returned
+    markup; none of the handlers do.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.markups: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+
+    def get_or_build(self, key: Hashable, build: Callable[[], Any]) -> Any:
+        markup = self.markups.get(key)
+        if markup is not None:
+            self.markups.move_to_end(key)
+            self.hits += 1
+            return markup
+        self.misses += 1
+        markup = build()
+        self.markups[key] = markup
+        if len(self.markups) > self.maxsize:
+            self.markups.popitem(last=False)
+            self.evicted += 1
+        return markup
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "keyboards": len(self.markups),
+            "max_size": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evicted": self.evicted,
+        }
+
+
+keyboard_cache = KeyboardCache(KEYBOARD_CACHE_SIZE)
+# (keyboard, takes i18n) for warm_up_keyboards
+static_keyboards: List[Tuple[Callable[..., Any], bool]] = []
+
+
+def cached_keyboard(func: Callable[..., Any] = None, *, static: bool = False):
+    """
+    Memoize a keyboard builder on its arguments and the translator's locale.
+
+    A keyboard must depend only on its arguments and locale. With
+    `static=True` it takes only `i18n` (or nothing) and is built for every
+    locale by warm_up_keyboards at startup. The uncached builder stays
+    available as `__wrapped__`.
+    """
+    def decorator(builder: Callable[..., Any]) -> Callable[..., Any]:
+        name = f"{builder.__module__}.{builder.__qualname__}"
+
+        @wraps(builder)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            key = (name, freeze(args), freeze(kwargs))
+            return keyboard_cache.get_or_build(key, lambda: builder(*args, **kwargs))
+
+        if static:
+            static_keyboards.append((wrapper, "i18n" in inspect.signature(builder).parameters))
+        return wrapper
+
+    if func is not None:
+        return decorator(func)
+    return decorator
+
+
+def warm_up_keyboards(hub: TranslatorHub, locales: List[str]) -> None:
+    """Build every static keyboard for each locale, so first renders are cache hits."""
+    translators = [hub.get_translator_by_locale(locale) for locale in locales]
+    built = 0
+    for keyboard, localized in static_keyboards:
+        if not localized:
+            keyboard()
+            built += 1
+            continue
+        for i18n in translators:
+            keyboard(i18n)
+            built += 1
+    logger.info(f"Prebuilt {built} static keyboards")
@@ -0,0 +1,90 @@
+from aiogram.filters.callback_data import CallbackData
+
+# Short prefixes keep packed payloads well under Telegram's 64-byte limit.
+# Device names are free text and stay in plain prefixed strings, and so does
+# the raffle button, which lives on in broadcast posts.
+
+
+class BalanceAmountCb(CallbackData, prefix="bal"):
+    # Rubles, or "custom" to ask the user for an amount
+    amount: str
+
+
+class PaymentMethodCb(CallbackData, prefix="pay"):
+    # ukassa, crypto, stars or balance
+    method: str
+
+
+class PeriodCb(CallbackData, prefix="mon"):
+    months: int
+
+
+class ContactCb(CallbackData, prefix="ct"):
+    # email or phone
+    kind: str
+    # False when the user has no contact of this kind yet
+    known: bool
+
+
+class InstructionCb(CallbackData, prefix="ins"):
+    device_type: str
+
+
+class TicketCountCb(CallbackData, prefix="tc"):
+    count: int
+
+
+class AdminPageCb(CallbackData, prefix="apg"):
+    # users, keys or promocodes
+    section: str
+    page: int
+
+
+class AdminUserCb(CallbackData, prefix="au"):
+    # profile, block, unblock, add_balance, confirm_balance or delete
+    action: str
+    user_id: int
+
+
+class AdminKeyCb(CallbackData, prefix="ak"):
+    # profile or history
+    action: str
+    # Outline access key id
+    key_id: str
+
+
+class AdminPromocodeCb(CallbackData, prefix="apc"):
+    # profile or delete; codes are up to 50 letters and digits
+    action: str
+    code: str
+
+
+class AdminServerCb(CallbackData, prefix="asv"):
+    # view, edit_limit or delete
+    action: str
+    server_id: int
+
+
+class RemoveAdminCb(CallbackData, prefix="arm"):
+    admin_id: int
+
+
+class RaffleTypeCb(CallbackData, prefix="rtp"):
+    # subscription or ticket
+    kind: str
+
+
+class RaffleCb(CallbackData, prefix="raf"):
+    # edit, set_winner or add_tickets
+    action: str
+    raffle_id: int
+
+
+class RaffleFieldCb(CallbackData, prefix="rfl"):
+    # name, ticket_price, start_date, end_date, images or is_active
+    field: str
+
+
+class RaffleParticipantsCb(CallbackData, prefix="rpt"):
+    raffle_id: int
+    page: int = 0
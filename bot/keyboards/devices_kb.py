@@ -4,8 +4,12 @@ from aiogram.types import ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardMar
 from aiogram.utils.keyboard import ReplyKeyboardBuilder, InlineKeyboardBuilder
 from fluentogram import TranslatorRunner
 
+from .callbacks import InstructionCb, PeriodCb
+from .cache import cached_keyboard
+
 logger = logging.getLogger(__name__)
 
+@cached_keyboard
 def my_devices_kb(
     i18n: TranslatorRunner,
     devices: List[str],
@@ -56,6 +60,7 @@ def my_devices_kb(
         logger.error(f"Unexpected error in devices_kb: {e}")
         raise
 
+@cached_keyboard
 def device_kb(i18n: TranslatorRunner, device_name: str, device_type: str) -> InlineKeyboardMarkup:
     """
     Create an inline keyboard for a specific device.
@@ -78,7 +83,7 @@ def device_kb(i18n: TranslatorRunner, device_name: str, device_type: str) -> Inl
                 InlineKeyboardButton(text=i18n.rename.device.button(), callback_data=f"rename_device_{device_name}")
                 )
         builder.row(
-                InlineKeyboardButton(text=i18n.device.instruction.button(), callback_data=f"instruction_{device_type}"),
+                InlineKeyboardButton(text=i18n.device.instruction.button(), callback_data=InstructionCb(device_type=device_type).pack()),
                 InlineKeyboardButton(text=i18n.remove.device.button(), callback_data=f"remove_device_{device_name}")
                 )
         builder.row(InlineKeyboardButton(text=i18n.devices.button(), callback_data="devices_menu"))
@@ -91,6 +96,7 @@ def device_kb(i18n: TranslatorRunner, device_name: str, device_type: str) -> Inl
         logger.error(f"Unexpected error in device_kb: {e}")
         raise
 
+@cached_keyboard(static=True)
 def add_device_kb(i18n: TranslatorRunner) -> ReplyKeyboardMarkup:
     """
     Create a reply keyboard for selecting device type to add.
@@ -123,6 +129,7 @@ def add_device_kb(i18n: TranslatorRunner) -> ReplyKeyboardMarkup:
         logger.error(f"Unexpected error in add_device_kb: {e}")
         raise
 
+@cached_keyboard
 def devices_list_kb(i18n: TranslatorRunner, device_type: str, only: str = 'none') -> ReplyKeyboardMarkup:
     """
     Create a reply keyboard for selecting a specific device or combo cell.
@@ -186,6 +193,7 @@ def devices_list_kb(i18n: TranslatorRunner, device_type: str, only: str = 'none'
         logger.error(f"Unexpected error in devices_list_kb: {e}")
         raise
 
+@cached_keyboard(static=True)
 def period_select_kb(i18n: TranslatorRunner) -> InlineKeyboardMarkup:
     """
     Create an inline keyboard for selecting subscription period.
@@ -204,12 +212,12 @@ def period_select_kb(i18n: TranslatorRunner) -> InlineKeyboardMarkup:
     try:
         builder = InlineKeyboardBuilder()
         builder.row(
-            InlineKeyboardButton(text=i18n.one.month.button(), callback_data="month_1"),
-            InlineKeyboardButton(text=i18n.three.month.button(), callback_data="month_3")
+            InlineKeyboardButton(text=i18n.one.month.button(), callback_data=PeriodCb(months=1).pack()),
+            InlineKeyboardButton(text=i18n.three.month.button(), callback_data=PeriodCb(months=3).pack())
         )
         builder.row(
-            InlineKeyboardButton(text=i18n.six.month.button(), callback_data="month_6"),
-            InlineKeyboardButton(text=i18n.twelve.month.button(), callback_data="month_12")
+            InlineKeyboardButton(text=i18n.six.month.button(), callback_data=PeriodCb(months=6).pack()),
+            InlineKeyboardButton(text=i18n.twelve.month.button(), callback_data=PeriodCb(months=12).pack())
         )
         builder.row(InlineKeyboardButton(text=i18n.back.devices.button(), callback_data="add_device"))
         return builder.as_markup()
@@ -221,6 +229,7 @@ def period_select_kb(i18n: TranslatorRunner) -> InlineKeyboardMarkup:
         raise
 
 
+@cached_keyboard(static=True)
 def back_device_kb(i18n: TranslatorRunner) -> InlineKeyboardMarkup:
 
     try:
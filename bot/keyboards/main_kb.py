@@ -3,9 +3,11 @@ from datetime import datetime
 from aiogram.types import ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.utils.keyboard import ReplyKeyboardBuilder, InlineKeyboardBuilder
 from fluentogram import TranslatorRunner
+from .cache import cached_keyboard
 
 logger = logging.getLogger(__name__)
 
+@cached_keyboard
 def main_kb(
     i18n: TranslatorRunner,
     is_subscribed: bool,
@@ -78,6 +80,7 @@ def main_kb(
         logger.error(f"Unexpected error in main_kb: {e}")
         raise
 
+@cached_keyboard(static=True)
 def connect_vpn_inline_kb(i18n: TranslatorRunner) -> InlineKeyboardMarkup:
 
     try:
@@ -96,6 +99,7 @@ def connect_vpn_inline_kb(i18n: TranslatorRunner) -> InlineKeyboardMarkup:
         logger.error(f"Unexpected error in connect_vpn_inlnie_kb: {e}")
         raise
 
+@cached_keyboard(static=True)
 def back_to_devices_inline_kb(i18n: TranslatorRunner) -> InlineKeyboardMarkup:
     try:
         builder = InlineKeyboardBuilder()
@@ -114,6 +118,7 @@ def back_to_devices_inline_kb(i18n: TranslatorRunner) -> InlineKeyboardMarkup:
         logger.error(f"Unexpected error in back_inline_kb: {e}")
         raise
 
+@cached_keyboard(static=True)
 def back_inline_kb(i18n: TranslatorRunner) -> InlineKeyboardMarkup:
     """
     Create an inline keyboard with a "Back to Main Menu" button.
@@ -144,6 +149,7 @@ def back_inline_kb(i18n: TranslatorRunner) -> InlineKeyboardMarkup:
         logger.error(f"Unexpected error in back_inline_kb: {e}")
         raise
 
+@cached_keyboard(static=True)
 def back_kb(i18n: TranslatorRunner) -> ReplyKeyboardMarkup:
     """
     Create a reply keyboard with a "Back to Main Menu" button.
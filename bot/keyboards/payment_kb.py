@@ -3,11 +3,14 @@ from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, ReplyKeybo
 from aiogram.utils.keyboard import InlineKeyboardBuilder, ReplyKeyboardBuilder
 from fluentogram import TranslatorRunner
 from config import get_config, Channel
+from .callbacks import BalanceAmountCb, ContactCb, PaymentMethodCb
+from .cache import cached_keyboard
 channel = get_config(Channel, "channel")
 CHANNEL_ID = channel.id
 
 logger = logging.getLogger(__name__)
 
+@cached_keyboard(static=True)
 def add_balance_kb(i18n: TranslatorRunner) -> InlineKeyboardMarkup:
     """
     Create an inline keyboard for selecting balance top-up amounts.
@@ -22,27 +25,27 @@ def add_balance_kb(i18n: TranslatorRunner) -> InlineKeyboardMarkup:
     try:
         builder = InlineKeyboardBuilder()
         builder.row(
-            InlineKeyboardButton(text=i18n.add.balance50.button(), callback_data="add_balance_50"),
-            InlineKeyboardButton(text=i18n.add.balance100.button(), callback_data="add_balance_100"),
-            InlineKeyboardButton(text=i18n.add.balance200.button(), callback_data="add_balance_200"),
+            InlineKeyboardButton(text=i18n.add.balance50.button(), callback_data=BalanceAmountCb(amount="50").pack()),
+            InlineKeyboardButton(text=i18n.add.balance100.button(), callback_data=BalanceAmountCb(amount="100").pack()),
+            InlineKeyboardButton(text=i18n.add.balance200.button(), callback_data=BalanceAmountCb(amount="200").pack()),
         )
         builder.row(
-            InlineKeyboardButton(text=i18n.add.balance300.button(), callback_data="add_balance_300"),
-            InlineKeyboardButton(text=i18n.add.balance400.button(), callback_data="add_balance_400"),
-            InlineKeyboardButton(text=i18n.add.balance500.button(), callback_data="add_balance_500"),
+            InlineKeyboardButton(text=i18n.add.balance300.button(), callback_data=BalanceAmountCb(amount="300").pack()),
+            InlineKeyboardButton(text=i18n.add.balance400.button(), callback_data=BalanceAmountCb(amount="400").pack()),
+            InlineKeyboardButton(text=i18n.add.balance500.button(), callback_data=BalanceAmountCb(amount="500").pack()),
         )
         builder.row(
-            InlineKeyboardButton(text=i18n.add.balance650.button(), callback_data="add_balance_650"),
-            InlineKeyboardButton(text=i18n.add.balance750.button(), callback_data="add_balance_750"),
-            InlineKeyboardButton(text=i18n.add.balance900.button(), callback_data="add_balance_900"),
+            InlineKeyboardButton(text=i18n.add.balance650.button(), callback_data=BalanceAmountCb(amount="650").pack()),
+            InlineKeyboardButton(text=i18n.add.balance750.button(), callback_data=BalanceAmountCb(amount="750").pack()),
+            InlineKeyboardButton(text=i18n.add.balance900.button(), callback_data=BalanceAmountCb(amount="900").pack()),
         )
         builder.row(
-            InlineKeyboardButton(text=i18n.add.balance1000.button(), callback_data="add_balance_1000"),
-            InlineKeyboardButton(text=i18n.add.balance2000.button(), callback_data="add_balance_2000"),
-            InlineKeyboardButton(text=i18n.add.balance3000.button(), callback_data="add_balance_3000")
+            InlineKeyboardButton(text=i18n.add.balance1000.button(), callback_data=BalanceAmountCb(amount="1000").pack()),
+            InlineKeyboardButton(text=i18n.add.balance2000.button(), callback_data=BalanceAmountCb(amount="2000").pack()),
+            InlineKeyboardButton(text=i18n.add.balance3000.button(), callback_data=BalanceAmountCb(amount="3000").pack())
         )
         builder.row(
-            InlineKeyboardButton(text=i18n.payment.custom.button(), callback_data="add_balance_custom"),
+            InlineKeyboardButton(text=i18n.payment.custom.button(), callback_data=BalanceAmountCb(amount="custom").pack()),
             InlineKeyboardButton(text=i18n.main.menu.button(), callback_data="main_menu")
         )
         return builder.as_markup()
@@ -53,6 +56,7 @@ def add_balance_kb(i18n: TranslatorRunner) -> InlineKeyboardMarkup:
         logger.error(f"Unexpected error in add_balance_kb: {e}")
         raise
 
+@cached_keyboard(static=True)
 def decline_custom_payment(i18n: TranslatorRunner) -> InlineKeyboardMarkup:
     """
     Create an inline keyboard for canceling custom balance input.
@@ -81,6 +85,7 @@ def decline_custom_payment(i18n: TranslatorRunner) -> InlineKeyboardMarkup:
         logger.error(f"Unexpected error in decline_custom_payment: {e}")
         raise
 
+@cached_keyboard
 def payment_select(i18n: TranslatorRunner, payment_type: str) -> InlineKeyboardMarkup:
     """
     Create an inline keyboard for selecting payment methods.
@@ -100,15 +105,15 @@ def payment_select(i18n: TranslatorRunner, payment_type: str) -> InlineKeyboardM
     try:
         builder = InlineKeyboardBuilder()
         builder.row(
-            InlineKeyboardButton(text=i18n.payment.ukassa.button(), callback_data="payment_ukassa"),
-            InlineKeyboardButton(text=i18n.payment.crypto.button(), callback_data="payment_crypto")
+            InlineKeyboardButton(text=i18n.payment.ukassa.button(), callback_data=PaymentMethodCb(method="ukassa").pack()),
+            InlineKeyboardButton(text=i18n.payment.crypto.button(), callback_data=PaymentMethodCb(method="crypto").pack())
         )
         builder.row(
-            InlineKeyboardButton(text=i18n.payment.stars.button(), callback_data="payment_stars")
+            InlineKeyboardButton(text=i18n.payment.stars.button(), callback_data=PaymentMethodCb(method="stars").pack())
         )
         if payment_type == "buy_subscription":
             builder.row(
-                InlineKeyboardButton(text=i18n.payment.balance.button(), callback_data="payment_balance")
+                InlineKeyboardButton(text=i18n.payment.balance.button(), callback_data=PaymentMethodCb(method="balance").pack())
             )
         builder.row(
             InlineKeyboardButton(text=i18n.main.menu.button(), callback_data="main_menu")
@@ -127,8 +132,8 @@ def contact_select_kb(
     
     try:
         builder = InlineKeyboardBuilder()
-        callback_email = "add_contact_email" if email is None else "contact_email"
-        callback_phone = "add_contact_phone" if phone is None else "contact_phone"
+        callback_email = ContactCb(kind="email", known=email is not None).pack()
+        callback_phone = ContactCb(kind="phone", known=phone is not None).pack()
         builder.row(
             InlineKeyboardButton(text=i18n.email.button(), callback_data=callback_email),
             InlineKeyboardButton(text=i18n.phone.button(), callback_data=callback_phone)
@@ -144,6 +149,7 @@ def contact_select_kb(
         logger.error(f"Unexpected error in payment_select: {e}")
         raise
 
+@cached_keyboard(static=True)
 def get_phone_kb(i18n: TranslatorRunner) -> ReplyKeyboardMarkup:
 
     try:
@@ -176,6 +182,7 @@ def pay_inline(i18n: TranslatorRunner, invoice_url: str) -> InlineKeyboardMarkup
         logger.error(f"Unexpected error in payment_select: {e}")
         raise
        
+@cached_keyboard(static=True)
 def subscribe_channel_kb() -> InlineKeyboardMarkup:
     
     try: 
@@ -3,8 +3,12 @@ from aiogram.utils.keyboard import InlineKeyboardBuilder
 from fluentogram import TranslatorRunner
 import logging
 
+from .callbacks import TicketCountCb
+from .cache import cached_keyboard
+
 logger = logging.getLogger(__name__)
 
+@cached_keyboard
 def raffle_menu_kb(
         raffle_id: int, 
         raffle_type: str, 
@@ -24,18 +28,19 @@ def raffle_menu_kb(
         logger.error(f"Error in raffle_menu_kb: {e}")
         return InlineKeyboardMarkup()
 
+@cached_keyboard(static=True)
 def ticket_purchase_kb(i18n: TranslatorRunner) -> InlineKeyboardMarkup:
     try:
         builder = InlineKeyboardBuilder()
         
         builder.row(
-            InlineKeyboardButton(text=i18n.ticket.count1.button(), callback_data=f"ticket_count_1")
+            InlineKeyboardButton(text=i18n.ticket.count1.button(), callback_data=TicketCountCb(count=1).pack())
         )
         builder.row(
-            InlineKeyboardButton(text=i18n.ticket.count5.button(), callback_data=f"ticket_count_5")
+            InlineKeyboardButton(text=i18n.ticket.count5.button(), callback_data=TicketCountCb(count=5).pack())
         )
         builder.row(
-            InlineKeyboardButton(text=i18n.ticket.count10.button(), callback_data=f"ticket_count_10"),
+            InlineKeyboardButton(text=i18n.ticket.count10.button(), callback_data=TicketCountCb(count=10).pack()),
             )
         builder.row(
             InlineKeyboardButton(
@@ -1,2 +1,6 @@
 from .i18n import *
 from .blacklist import *
+from .ordering import *
+from .throttling import *
+from .metrics import *
+from .tracing import *
@@ -7,16 +7,11 @@ from aiogram.types import TelegramObject, User
 from fluentogram import TranslatorHub
 
 logger = logging.getLogger(__name__)
-    
-# Logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(filename)s:%(lineno)d #%(levelname)-8s '
-           '[%(asctime)s] - %(name)s - %(message)s'
-)
 
 
 class TranslatorRunnerMiddleware(BaseMiddleware):
+    """Puts a TranslatorRunner for the user's language into `data['i18n']`; the hub resolves the code by dict lookup."""
+
     async def __call__(
         self,
         handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
@@ -0,0 +1,73 @@
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.event.handler import HandlerObject
+from aiogram.fsm.context import FSMContext
+from aiogram.types import TelegramObject
+
+from utils.metrics import FSM_TRANSITIONS, HANDLER_DURATION, HANDLER_ERRORS
+from utils.tracing import current_span
+
+logger = logging.getLogger(__name__)
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """
+    Latency and errors per handler, and the FSM state changes they make.
+
+    Registered as the first inner middleware of every event type, so it
+    wraps throttling and the blacklist check and only sees updates a
+    handler matched; the handler is only known there, outer middlewares run
+    before the routers pick one. Label children are bound once per handler
+    function. The handler name is also put on the update's trace span.
+    """
+
+    def __init__(self):
+        # handler callback -> (name, duration child, errors child)
+        self.handlers: Dict[Callable, Any] = {}
+
+    def children(self, handler: HandlerObject) -> Any:
+        children = self.handlers.get(handler.callback)
+        if children is None:
+            callback = handler.callback
+            name = f"{callback.__module__.rsplit('.', 1)[-1]}.{getattr(callback, '__name__', type(callback).__name__)}"
+            children = self.handlers[callback] = (name, HANDLER_DURATION.labels(name), HANDLER_ERRORS.labels(name))
+        return children
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        handler_object: HandlerObject = data.get("handler")
+        if handler_object is None:
+            return await handler(event, data)
+        name, duration, errors = self.children(handler_object)
+        span = current_span.get()
+        if span is not None:
+            span.set_attribute("handler", name)
+
+        start = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            errors.inc()
+            raise
+        finally:
+            duration.observe(time.perf_counter() - start)
+            state: FSMContext = data.get("state")
+            if state is not None:
+                await self.record_transition(state, data.get("raw_state"))
+
+    @staticmethod
+    async def record_transition(state: FSMContext, before: Any) -> None:
+        try:
+            after = await state.get_state()
+        except Exception as e:
+            logger.debug(f"Could not read FSM state: {e}")
+            return
+        if after != before:
+            FSM_TRANSITIONS.labels(str(before), str(after)).inc()
@@ -0,0 +1,139 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import AsyncExitStack
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, Optional
+
+from aiogram import BaseMiddleware, Dispatcher
+from aiogram.types import TelegramObject
+
+logger = logging.getLogger(__name__)
+
+# Number of recent wait times kept for percentiles
+WAIT_SAMPLES = 1000
+
+
+def percentile_ms(values: list, q: float) -> float:
+    if not values:
+        return 0.0
+    return round(values[min(len(values) - 1, int(len(values) * q))] * 1000, 1)
+
+
+class KeyedQueue:
+    __slots__ = ("lock", "size")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.size = 0
+
+
+class UpdateOrderingMiddleware(BaseMiddleware):
+    """
+    Outer update middleware: concurrent across users, ordered per user.
+
+    Updates arrive as separate tasks (polling with handle_as_tasks, or the
+    webhook workers). Each one first waits in its user's FIFO queue, so a
+    user's updates and FSM transitions are handled strictly one at a time
+    and in arrival order, then takes one of `concurrency` slots shared by
+    all users. A user waiting on a slow backend call holds a single slot
+    and never blocks anybody else's queue. Updates without a user or chat
+    (e.g. poll answers from channels) only take a slot.
+
+    Must run before aiogram's FSMContextMiddleware, which reads the
+    user's state: register it with setup_update_ordering. Queues exist
+    only while they hold updates. Stats are available to handlers as the
+    `update_queue` argument.
+    """
+
+    def __init__(self, concurrency: int = 64):
+        self.concurrency = concurrency
+        self.slots = asyncio.Semaphore(concurrency)
+        self.queues: Dict[Hashable, KeyedQueue] = {}
+        self.waiting = 0
+        self.active = 0
+        self.processed = 0
+        self.max_queue = 0
+        self.waits: Deque[float] = deque(maxlen=WAIT_SAMPLES)
+        self.max_wait = 0.0
+
+    @staticmethod
+    def update_key(data: Dict[str, Any]) -> Optional[Hashable]:
+        # Filled in by aiogram's UserContextMiddleware, which runs first
+        user = data.get("event_from_user")
+        if user is not None:
+            return user.id
+        chat = data.get("event_chat")
+        if chat is not None:
+            return chat.id
+        return None
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        data["update_queue"] = self
+        key = self.update_key(data)
+        queue = None
+        if key is not None:
+            queue = self.queues.get(key)
+            if queue is None:
+                queue = self.queues[key] = KeyedQueue()
+            queue.size += 1
+            self.max_queue = max(self.max_queue, queue.size)
+
+        queued_at = time.monotonic()
+        self.waiting += 1
+        try:
+            async with AsyncExitStack() as stack:
+                try:
+                    if queue is not None:
+                        await stack.enter_async_context(queue.lock)
+                    await stack.enter_async_context(self.slots)
+                finally:
+                    self.waiting -= 1
+
+                wait = time.monotonic() - queued_at
+                self.waits.append(wait)
+                self.max_wait = max(self.max_wait, wait)
+                self.active += 1
+                try:
+                    return await handler(event, data)
+                finally:
+                    self.active -= 1
+                    self.processed += 1
+        finally:
+            if queue is not None:
+                queue.size -= 1
+                if not queue.size:
+                    del self.queues[key]
+
+    def stats(self) -> Dict[str, Any]:
+        waits = sorted(self.waits)
+        return {
+            "concurrency": self.concurrency,
+            "active": self.active,
+            "waiting": self.waiting,
+            "queues": len(self.queues),
+            "deepest_queue": max((queue.size for queue in self.queues.values()), default=0),
+            "max_queue_seen": self.max_queue,
+            "processed": self.processed,
+            "wait_p50_ms": percentile_ms(waits, 0.5),
+            "wait_p95_ms": percentile_ms(waits, 0.95),
+            "wait_max_ms": round(self.max_wait * 1000, 1),
+        }
+
+
+def setup_update_ordering(dispatcher: Dispatcher, middleware: UpdateOrderingMiddleware) -> None:
+    """
+    Add `middleware` to the update outer middlewares, ahead of FSMContextMiddleware.
+
+    The Dispatcher registers FSMContextMiddleware itself, so a middleware
+    added later would see the state loaded before the user's previous
+    update set the new one.
+    """
+    dispatcher.update.outer_middleware.unregister(dispatcher.fsm)
+    dispatcher.update.outer_middleware(middleware)
+    dispatcher.update.outer_middleware(dispatcher.fsm)
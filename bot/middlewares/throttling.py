@@ -0,0 +1,123 @@
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.flags import get_flag
+from aiogram.types import CallbackQuery, TelegramObject, User
+
+logger = logging.getLogger(__name__)
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """
+    Per-user token bucket in front of message and callback query handlers.
+
+    Each user gets `rate` tokens per second, at most `burst` saved up. A
+    handler costs `default_cost` tokens unless marked otherwise with
+    `@flags.throttle_cost(n)`; 0 exempts it (payments). Updates over the
+    limit are dropped; callback queries are answered so the client stops
+    its spinner. A callback query identical to one handled within
+    `duplicate_window` seconds (same user, message and data, i.e. repeated
+    taps) is answered and dropped without being charged.
+
+    Buckets and recent callbacks live in insertion-ordered dicts trimmed
+    from the oldest end, so memory stays within `max_users` entries each.
+    A user evicted from the buckets comes back with a full bucket, which
+    is what an idle user would have anyway.
+    """
+
+    def __init__(
+        self,
+        rate: float = 2,
+        burst: int = 10,
+        default_cost: int = 1,
+        duplicate_window: float = 1.0,
+        max_users: int = 100000
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.default_cost = default_cost
+        self.duplicate_window = duplicate_window
+        self.max_users = max_users
+        # user_id -> (tokens, updated_at), least recently active first
+        self.buckets: "OrderedDict[int, Tuple[float, float]]" = OrderedDict()
+        # (user_id, message_id, data) -> last seen, oldest first
+        self.recent_callbacks: "OrderedDict[Hashable, float]" = OrderedDict()
+        self.passed = 0
+        self.throttled = 0
+        self.coalesced = 0
+        self.evicted = 0
+
+    def take(self, user_id: int, cost: int, now: float) -> bool:
+        tokens, updated = self.buckets.pop(user_id, (float(self.burst), now))
+        tokens = min(float(self.burst), tokens + (now - updated) * self.rate)
+        allowed = tokens >= cost
+        if allowed:
+            tokens -= cost
+        self.buckets[user_id] = (tokens, now)
+        if len(self.buckets) > self.max_users:
+            self.buckets.popitem(last=False)
+            self.evicted += 1
+        return allowed
+
+    def seen_recently(self, key: Hashable, now: float) -> bool:
+        recent = self.recent_callbacks
+        while recent:
+            oldest_key, seen_at = next(iter(recent.items()))
+            if now - seen_at < self.duplicate_window and len(recent) <= self.max_users:
+                break
+            del recent[oldest_key]
+        return key in recent
+
+    def mark(self, key: Hashable) -> None:
+        self.recent_callbacks.pop(key, None)
+        self.recent_callbacks[key] = time.monotonic()
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        user: User = data.get("event_from_user")
+        cost = get_flag(data, "throttle_cost", default=self.default_cost)
+        if user is None or not cost:
+            return await handler(event, data)
+
+        now = time.monotonic()
+        if isinstance(event, CallbackQuery):
+            message_id = event.message.message_id if event.message else event.inline_message_id
+            key = (user.id, message_id, event.data)
+            if self.seen_recently(key, now):
+                self.coalesced += 1
+                await event.answer()
+                return None
+            self.mark(key)
+
+        if not self.take(user.id, cost, now):
+            self.throttled += 1
+            logger.debug(f"Throttled user {user.id}, cost {cost}")
+            if isinstance(event, CallbackQuery):
+                await event.answer()
+            return None
+
+        self.passed += 1
+        try:
+            return await handler(event, data)
+        finally:
+            if isinstance(event, CallbackQuery):
+                # Taps queued behind a slow handler count from when it finished
+                self.mark(key)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "users": len(self.buckets),
+            "max_users": self.max_users,
+            "passed": self.passed,
+            "throttled": self.throttled,
+            "coalesced": self.coalesced,
+            "recent_callbacks": len(self.recent_callbacks),
+            "evicted": self.evicted,
+        }
@@ -0,0 +1,37 @@
+import logging
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import Update, User
+
+from utils.tracing import KIND_SERVER, get_tracer
+
+logger = logging.getLogger(__name__)
+
+
+class TracingMiddleware(BaseMiddleware):
+    """
+    Outer update middleware opening the root span of each update.
+
+    Registered first, so the span covers the wait in the user's queue too.
+    Backend calls made while handling the update are its child spans and
+    carry its traceparent to the backend.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[Update, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any]
+    ) -> Any:
+        tracer = get_tracer()
+        if not tracer.enabled:
+            return await handler(event, data)
+
+        with tracer.span(f"update {event.event_type}", KIND_SERVER) as span:
+            if span.sampled:
+                span.set_attribute("update_id", event.update_id)
+                user: User = data.get("event_from_user")
+                if user is not None:
+                    span.set_attribute("user_id", user.id)
+            return await handler(event, data)
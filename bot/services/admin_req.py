@@ -5,17 +5,12 @@ import logging
 from typing import Dict, Optional, Tuple, Union
 
 from config import get_config, Backend
+from services.session import shared_session
 
 backend = get_config(Backend, "backend")
 api_key = backend.key
 url = backend.url
 
-# Configure logger
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(message)s",
-    handlers=[logging.StreamHandler()]
-)
 logger = logging.getLogger(__name__)
 
 # Base URL for the API
@@ -28,7 +23,7 @@ HEADERS = {
 async def has_admin_password(admin_id: int) -> bool:
     """GET /admin/has_password"""
     url = f"{BASE_URL}/admin/has_password?admin_id={admin_id}"
-    async with aiohttp.ClientSession() as session:
+    async with shared_session() as session:
         try:
             async with session.get(url, headers=HEADERS) as response:
                 status = response.status
@@ -43,7 +38,7 @@ async def set_admin_password(admin_id: int, password: str) -> bool:
     """POST /admin/set_password"""
     url = f"{BASE_URL}/admin/set_password"
     payload = {"admin_id": admin_id, "password": password}
-    async with aiohttp.ClientSession() as session:
+    async with shared_session() as session:
         try:
             async with session.post(url, json=payload, headers=HEADERS) as response:
                 status = response.status
@@ -57,7 +52,7 @@ async def check_admin_password(admin_id: int, password: str) -> bool:
     """POST /admin/check_password"""
     url = f"{BASE_URL}/admin/check_password"
     payload = {"admin_id": admin_id, "password": password}
-    async with aiohttp.ClientSession() as session:
+    async with shared_session() as session:
         try:
             async with session.post(url, json=payload, headers=HEADERS) as response:
                 status = response.status
@@ -71,7 +66,7 @@ async def reset_admin_passwords(user_id: int) -> dict:
     url = f"{BASE_URL}/admin/reset-passwords"
     payload = {"user_id": user_id}
     logger.debug(f"Sending POST request to {url} with payload: {payload}")
-    async with aiohttp.ClientSession() as session:
+    async with shared_session() as session:
         try:
             async with session.post(url, headers=HEADERS, json=payload) as response:
                 if response.status == 200:
@@ -88,7 +83,7 @@ async def reset_admin_passwords(user_id: int) -> dict:
 async def get_users_summary():
     """GET /admin/users/summary"""
     url = f"{BASE_URL}/admin/users/summary"
-    async with aiohttp.ClientSession() as session:
+    async with shared_session() as session:
         try:
             async with session.get(url, headers=HEADERS) as response:
                 return await response.json()
@@ -107,7 +102,7 @@ async def get_users(
         params["query"] = query
     
     url = f"{BASE_URL}/admin/users"
-    async with aiohttp.ClientSession() as session:
+    async with shared_session() as session:
         try:
             async with session.get(url, headers=HEADERS, params=params) as response:
                 if response.status == 200:
@@ -121,7 +116,7 @@ async def get_users(
 async def get_user_details(user_id: int):
     """GET /admin/users/{user_id}"""
     url = f"{BASE_URL}/admin/users/{user_id}"
-    async with aiohttp.ClientSession() as session:
+    async with shared_session() as session:
         try:
             async with session.get(url, headers=HEADERS) as response:
                 return await response.json()
@@ -132,7 +127,7 @@ async def get_user_details(user_id: int):
 async def block_user(user_id: int) -> bool:
     """POST /admin/users/{user_id}/block"""
     url = f"{BASE_URL}/admin/users/{user_id}/block"
-    async with aiohttp.ClientSession() as session:
+    async with shared_session() as session:
         try:
             async with session.post(url, headers=HEADERS) as response:
                 return response.status in (200, 201)
@@ -143,7 +138,7 @@ async def block_user(user_id: int) -> bool:
 async def remove_from_blacklist(user_id: int) -> bool:
     """DELETE /admin/blacklist/{user_id}"""
     url = f"{BASE_URL}/admin/blacklist/{user_id}"
-    async with aiohttp.ClientSession() as session:
+    async with shared_session() as session:
         try:
             async with session.delete(url, headers=HEADERS) as response:
                 if response.status in (200, 201):
@@ -158,7 +153,7 @@ async def remove_from_blacklist(user_id: int) -> bool:
 async def delete_user(user_id: int) -> bool:
     """DELETE /admin/users/{user_id}"""
     url = f"{BASE_URL}/admin/users/{user_id}"
-    async with aiohttp.ClientSession() as session:
+    async with shared_session() as session:
         try:
             async with session.delete(url, headers=HEADERS) as response:
                 return response.status == 204
@@ -169,7 +164,7 @@ async def delete_user(user_id: int) -> bool:
 async def check_blacklist(user_id: int) -> bool:
     """GET /admin/blacklist/check"""
     url = f"{BASE_URL}/admin/blacklist/check?user_id={user_id}"
-    async with aiohttp.ClientSession() as session:
+    async with shared_session() as session:
         try:
             async with session.get(url, headers=HEADERS) as response:
                 response_json = await response.json()
@@ -183,7 +178,7 @@ async def get_keys(skip: int = 0, limit: int = 20, vpn_key: Optional[str] = None
     url = f"{BASE_URL}/admin/devices?skip={skip}&limit={limit}"
     if vpn_key is not None:
         url += f"&vpn_key={vpn_key}"
-    async with aiohttp.ClientSession() as session:
+    async with shared_session() as session:
         try:
             async with session.get(url, headers=HEADERS) as response:
                 return await response.json()
@@ -194,7 +189,7 @@ async def get_keys(skip: int = 0, limit: int = 20, vpn_key: Optional[str] = None
 async def get_key_history(vpn_key: str):
     """GET /admin/devices/history"""
     url = f"{BASE_URL}/admin/devices/history?vpn_key={vpn_key}"
-    async with aiohttp.ClientSession() as session:
+    async with shared_session() as session:
         try:
             async with session.get(url, headers=HEADERS) as response:
                 return await response.json()
@@ -205,7 +200,7 @@ async def get_key_history(vpn_key: str):
 async def get_payments_summary():
     """GET /admin/payments/summary"""
     url = f"{BASE_URL}/admin/payments/summary"
-    async with aiohttp.ClientSession() as session:
+    async with shared_session() as session:
         try:
             async with session.get(url, headers=HEADERS) as response:
                 return await response.json()
@@ -216,7 +211,7 @@ async def get_payments_summary():
 async def get_all_users():
     """GET /admin/users/ids"""
     url = f"{BASE_URL}/admin/users/ids"
-    async with aiohttp.ClientSession() as session:
+    async with shared_session() as session:
         try:
             async with session.get(url, headers=HEADERS) as response:
                 return await response.json()
@@ -227,7 +222,7 @@ async def get_all_users():
 async def get_admins():
     """GET /admin/admins"""
     url = f"{BASE_URL}/admin/admins"
-    async with aiohttp.ClientSession() as session:
+    async with shared_session() as session:
         try:
             async with session.get(url, headers=HEADERS) as response:
                 return await response.json()
@@ -239,7 +234,7 @@ async def add_admin(user_id: int) -> bool:
     """POST /admin/admins"""
     url = f"{BASE_URL}/admin/admins"
     payload = {"user_id": user_id}
-    async with aiohttp.ClientSession() as session:
+    async with shared_session() as session:
         try:
             async with session.post(url, json=payload, headers=HEADERS) as response:
                 if response.status in (200, 201):
@@ -253,7 +248,7 @@ async def add_admin(user_id: int) -> bool:
 async def delete_admin(user_id: int) -> bool:
     """DELETE /admin/admins/{user_id}"""
     url = f"{BASE_URL}/admin/admins/{user_id}"
-    async with aiohttp.ClientSession() as session:
+    async with shared_session() as session:
         try:
             async with session.delete(url, headers=HEADERS) as response:
                 return response.status in (200, 204)
@@ -264,7 +259,7 @@ async def delete_admin(user_id: int) -> bool:
 async def check_admin(user_id: int) -> bool:
     """GET /admin/admins/check"""
     url = f"{BASE_URL}/admin/admins/check?user_id={user_id}"
-    async with aiohttp.ClientSession() as session:
+    async with shared_session() as session:
         try:
             async with session.get(url, headers=HEADERS) as response:
                 result = await response.json()
@@ -276,7 +271,7 @@ async def check_admin(user_id: int) -> bool:
 async def is_user_blacklisted(user_id: int) -> bool:
     """GET /admin/blacklist/check"""
     url = f"{BASE_URL}/admin/blacklist/check?user_id={user_id}"
-    async with aiohttp.ClientSession() as session:
+    async with shared_session() as session:
         try:
             async with session.get(url, headers=HEADERS) as response:
                 result = await response.json()
@@ -292,7 +287,7 @@ async def get_promocodes(skip: int = 0, limit: int = 20, code: Optional[str] = N
         params["code"] = code
     
     url = f"{BASE_URL}/admin/promocodes"
-    async with aiohttp.ClientSession() as session:
+    async with shared_session() as session:
         try:
             async with session.get(url, headers=HEADERS, params=params) as response:
                 if response.status == 200:
@@ -308,7 +303,7 @@ async def create_promocode(code: str, type: str, max_usage: int) -> dict:
     url = f"{BASE_URL}/admin/promocodes"
     payload = {"code": code, "type": type, "max_usage": max_usage}
     logger.debug(f"Sending POST request to {url} with payload: {payload}")
-    async with aiohttp.ClientSession() as session:
+    async with shared_session() as session:
         try:
             async with session.post(url, headers=HEADERS, json=payload) as response:
                 if response.status in (200, 201):
@@ -325,7 +320,7 @@ async def create_promocode(code: str, type: str, max_usage: int) -> dict:
 async def delete_promocode(code: str) -> dict:
     url = f"{BASE_URL}/admin/promocodes/{code}"
     logger.debug(f"Sending DELETE request to {url}")
-    async with aiohttp.ClientSession() as session:
+    async with shared_session() as session:
         try:
             async with session.delete(url, headers=HEADERS) as response:
                 if response.status in (200, 204):
@@ -344,7 +339,7 @@ async def log_promocode_usage(user_id: int, code: str) -> bool:
     """POST /promocodes/usage"""
     url = f"{BASE_URL}/admin/promocodes/usage"
     payload = {"user_id": user_id, "promocode_code": code}
-    async with aiohttp.ClientSession() as session:
+    async with shared_session() as session:
         try:
             async with session.post(url, headers=HEADERS, json=payload) as response:
                 if response.status in (200, 201):
@@ -365,7 +360,7 @@ async def create_outline_server(api_url: str, cert_sha256: str, key_limit: int)
             }
 
     logger.debug(f"Sending POST request to {url} with payload: {payload}")
-    async with aiohttp.ClientSession() as session:
+    async with shared_session() as session:
         try:
             async with session.post(url, headers=HEADERS, json=payload) as response:
                 if response.status in (200, 201):
@@ -383,7 +378,7 @@ async def create_outline_server(api_url: str, cert_sha256: str, key_limit: int)
 async def get_outline_servers() -> list:
     url = f"{BASE_URL}/admin/outline/servers"
     logger.debug(f"Sending GET request to {url}")
-    async with aiohttp.ClientSession() as session:
+    async with shared_session() as session:
         try:
             async with session.get(url, headers=HEADERS) as response:
                 if response.status == 200:
@@ -400,7 +395,7 @@ async def get_outline_servers() -> list:
 async def delete_outline_server(server_id: int) -> dict:
     url = f"{BASE_URL}/admin/outline/servers/{server_id}"
     logger.debug(f"Sending DELETE request to {url}")
-    async with aiohttp.ClientSession() as session:
+    async with shared_session() as session:
         try:
             async with session.delete(url, headers=HEADERS) as response:
                 if response.status in (200, 204):
@@ -418,7 +413,7 @@ async def update_outline_server_limit(server_id: int, key_limit: int) -> dict:
     url = f"{BASE_URL}/admin/outline/servers/{server_id}"
     payload = {"key_limit": key_limit}
     logger.debug(f"Sending PATCH request to {url} with payload: {payload}")
-    async with aiohttp.ClientSession() as session:
+    async with shared_session() as session:
         try:
             async with session.patch(url, headers=HEADERS, json=payload) as response:
                 if response.status == 200:
@@ -432,3 +427,36 @@ async def update_outline_server_limit(server_id: int, key_limit: int) -> dict:
         except Exception as e:
             logger.error(f"update_outline_server_limit {server_id}: {e}")
             return {"success": False, "error": str(e)}
+
+async def _profile_request(method: str, path: str, timeout: float = 30, params: Optional[dict] = None) -> dict:
+    url = f"{BASE_URL}/profile/{path}"
+    logger.debug(f"Sending {method} request to {url} with params: {params}")
+    async with shared_session() as session:
+        try:
+            async with session.request(
+                method, url, headers=HEADERS, params=params, timeout=aiohttp.ClientTimeout(total=timeout)
+            ) as response:
+                if response.status == 200:
+                    return {"success": True, "report": await response.text()}
+                else:
+                    error_detail = await response.json()
+                    logger.error(f"Failed to profile {path}: status {response.status}, detail={error_detail}")
+                    return {"success": False, "error": error_detail.get("detail", "Unknown error")}
+        except Exception as e:
+            logger.error(f"profile {path}: {e}")
+            return {"success": False, "error": str(e)}
+
+async def profile_cpu(seconds: float) -> dict:
+    """GET /profile/cpu, collapsed stacks of the backend worker answering"""
+    # The response only comes once the profile is recorded
+    return await _profile_request("GET", "cpu", timeout=seconds + 30, params={"seconds": seconds})
+
+async def profile_heap(action: str = "snapshot") -> dict:
+    """GET /profile/heap, or POST /profile/heap/start and /profile/heap/stop"""
+    if action == "snapshot":
+        return await _profile_request("GET", "heap")
+    return await _profile_request("POST", f"heap/{action}")
+
+async def profile_tasks() -> dict:
+    """GET /profile/tasks"""
+    return await _profile_request("GET", "tasks")
@@ -1,33 +1,27 @@
 import aiohttp
 import asyncio
 import json
+import time
 import uuid
 import logging
 
-from yookassa import Configuration, Payment
-from yookassa.domain.response import PaymentResponse
 from fluentogram import TranslatorRunner
 from typing import Dict, Optional, Any, List, Tuple
 from config import get_config, Backend, CryptoBot, Yookassa
+from services.session import get_session, shared_session
+from services.yookassa_client import YookassaClient
 
 backend = get_config(Backend, "backend")
 cryptobot = get_config(CryptoBot, "cryptobot")
 yookassa = get_config(Yookassa, "yookassa")
 if not yookassa.id or not yookassa.key:
     raise ValueError("ЮKassa configuration is missing shop_id or secret_key")
-Configuration.account_id = yookassa.id 
-Configuration.secret_key = yookassa.key 
+ukassa_client = YookassaClient(yookassa.id, yookassa.key, session_getter=get_session)
 api_key = backend.key
 url = backend.url
 cryptobot_api = cryptobot.key
 cryptobot_url = cryptobot.url
 
-# Configure logger
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(message)s",
-    handlers=[logging.StreamHandler()]
-)
 logger = logging.getLogger(__name__)
 
 # Base URL for the API
@@ -42,12 +36,15 @@ CRYPTOBOT_HEADERS = {
         "Content-Type": "application/json"
     }
 
+# CryptoBot getInvoices accepts a comma-separated list of ids per request
+CRYPTOBOT_BATCH_SIZE = 100
+
 async def get_subscriptions(user_id: int) -> Optional[Dict[str, Any]]:
     """GET /payments/subscriptions/{user_id}"""
     url = f"{BASE_URL}/payments/subscriptions/{user_id}"
     
     logger.info(f"Sending request to backend: GET {url}")
-    async with aiohttp.ClientSession() as session:
+    async with shared_session() as session:
         try:
             async with session.get(url, headers=HEADERS) as response:
                 status = response.status
@@ -78,8 +75,8 @@ async def payment_balance_process(
         "payment_type": str(payment_type),
         "method": str(method)
     }
-    logger.info(f"Sending request to backend: {json.dumps(payload, ensure_ascii=False)}")
-    async with aiohttp.ClientSession() as session:
+    logger.debug("Sending request to backend: %s", payload)
+    async with shared_session() as session:
         try:
             async with session.post(url, headers=HEADERS, json=payload) as response:
                 status = response.status
@@ -168,16 +165,17 @@ async def create_ukassa_invoice(
         }
     }
 
-    logger.info(f"Sending request to ЮKassa: {json.dumps(payment_data, ensure_ascii=False)}")
+    logger.debug("Sending request to ЮKassa: %s", payment_data)
     try:
-        payment: PaymentResponse = Payment.create(payment_data, idempotence_key)
-        if payment.status == "pending" and payment.confirmation:
-            invoice_url = payment.confirmation.confirmation_url
-            invoice_id = payment.id
+        payment = await ukassa_client.create_payment(payment_data, idempotence_key)
+        confirmation = payment.get("confirmation") or {}
+        if payment.get("status") == "pending" and confirmation.get("confirmation_url"):
+            invoice_url = confirmation["confirmation_url"]
+            invoice_id = payment["id"]
             # logger.info(f"ЮKassa Invoice created: ID={invoice_id}, URL={invoice_url}")
             return invoice_url, invoice_id
         else:
-            logger.error(f"ЮKassa Invoice creation failed: Status={payment.status}")
+            logger.error(f"ЮKassa Invoice creation failed: Status={payment.get('status')}")
             return None
     except Exception as e:
         logger.error(f"ЮKassa Invoice creation error: {e}, payment_data={json.dumps(payment_data, ensure_ascii=False)}")
@@ -186,16 +184,16 @@ async def create_ukassa_invoice(
 
 async def check_ukassa_invoice_status(invoice_id: str) -> Optional[Dict[str, Any]]:
     """Check the status of a ЮKassa payment."""
-    logger.info(f"Checking ЮKassa invoice status: ID={invoice_id}")
+    logger.debug(f"Checking ЮKassa invoice status: ID={invoice_id}")
     try:
-        payment: PaymentResponse = Payment.find_one(invoice_id)
+        payment = await ukassa_client.get_payment(invoice_id)
         result = {
-            "invoice_id": payment.id,
-            "status": payment.status,
-            "amount": float(payment.amount.value),
-            "currency": payment.amount.currency,
-            "payload": payment.metadata.get("payload", ""),
-            "paid": payment.paid
+            "invoice_id": payment["id"],
+            "status": payment["status"],
+            "amount": float(payment["amount"]["value"]),
+            "currency": payment["amount"]["currency"],
+            "payload": (payment.get("metadata") or {}).get("payload", ""),
+            "paid": payment.get("paid", False)
         }
         # logger.info(f"ЮKassa Invoice status: {json.dumps(result, ensure_ascii=False)}")
         return result
@@ -203,24 +201,75 @@ async def check_ukassa_invoice_status(invoice_id: str) -> Optional[Dict[str, Any
         logger.error(f"ЮKassa Invoice status check error: {e}")
         return None
 
-async def exchange_rate(currency: str) -> Optional[float]:
+# CryptoBot exchange rates, refreshed in the background by refresh_exchange_rates_loop
+RATE_REFRESH_INTERVAL = 60
+RATE_RETRY_INTERVAL = 10
+# Cached rates older than this are not used for new invoices
+RATE_MAX_AGE = 600
+
+# (source, target) -> (rate, monotonic time of the fetch)
+exchange_rates: Dict[Tuple[str, str], Tuple[float, float]] = {}
+
+async def refresh_exchange_rates() -> bool:
+    """
+    Reload the exchange rate table from CryptoBot getExchangeRates.
+
+    On failure the previously cached rates are kept.
+
+    Returns:
+        True if the cache was refreshed
+    """
     url = f"{cryptobot_url}/getExchangeRates"
-    async with aiohttp.ClientSession() as session:
+    async with shared_session() as session:
         try:
             async with session.get(url, headers=CRYPTOBOT_HEADERS) as resp:
                 data = await resp.json()
-                if not data.get("ok"):
+                if not isinstance(data, dict) or not data.get("ok"):
                     logger.error(f"CryptoBot error: {data}")
-                    raise Exception(f"CryptoBot error: {data}")
-                rates = data["result"]
-                for rate in rates:
-                    if rate["source"] == currency and rate["target"] == "RUB":
-                        return float(rate["rate"])
-                logger.error("USDT to RUB rate not found")
-                raise Exception("USDT to RUB rate not found")
-        except aiohttp.ClientError as e:
-            logger.error(f"Get Exchange Rate: Error - {e}")
-            return None
+                    return False
+        # A timeout is asyncio.TimeoutError, a broken JSON body a ValueError from json()
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            logger.error(f"Get Exchange Rates: Error - {type(e).__name__} {e}")
+            return False
+
+    fetched_at = time.monotonic()
+    try:
+        rates = {
+            (rate["source"], rate["target"]): (float(rate["rate"]), fetched_at)
+            for rate in data["result"] if rate.get("is_valid", True)
+        }
+    except (KeyError, TypeError, ValueError, AttributeError) as e:
+        logger.error(f"Get Exchange Rates: Unexpected response - {type(e).__name__} {e}")
+        return False
+    exchange_rates.update(rates)
+    return True
+
+def get_exchange_rate(source: str, target: str = "RUB") -> Optional[float]:
+    """
+    Return the cached exchange rate without any network round trip.
+
+    Returns:
+        The last good rate, or None if it is unknown or older than RATE_MAX_AGE
+    """
+    cached = exchange_rates.get((source, target))
+    if cached is None:
+        logger.error(f"{source} to {target} rate not found")
+        return None
+    rate, fetched_at = cached
+    if time.monotonic() - fetched_at > RATE_MAX_AGE:
+        logger.error(f"{source} to {target} rate is stale ({time.monotonic() - fetched_at:.0f}s old)")
+        return None
+    return rate
+
+async def refresh_exchange_rates_loop() -> None:
+    """Keep the exchange rate cache fresh, retrying sooner after a failure."""
+    while True:
+        try:
+            refreshed = await refresh_exchange_rates()
+        except Exception as e:
+            logger.error(f"Exchange rates refresh error: {e}")
+            refreshed = False
+        await asyncio.sleep(RATE_REFRESH_INTERVAL if refreshed else RATE_RETRY_INTERVAL)
 
 async def create_cryptobot_invoice(
     amount: float, asset: str, payload: str, description: Optional[str] = None
@@ -235,8 +284,8 @@ async def create_cryptobot_invoice(
     if description:
         payload_data["description"] = str(description)
 
-    logger.info(f"Sending request to CryptoBot: {json.dumps(payload_data, ensure_ascii=False)}")
-    async with aiohttp.ClientSession() as session:
+    logger.debug("Sending request to CryptoBot: %s", payload_data)
+    async with shared_session() as session:
         try:
             async with session.post(url, headers=CRYPTOBOT_HEADERS, json=payload_data) as response:
                 status = response.status
@@ -260,7 +309,7 @@ async def check_invoice_status(invoice_id: str) -> Optional[Dict[str, Any]]:
     params = {"invoice_ids": str(invoice_id)}
 
     logger.info(f"Sending request to CryptoBot: GET {url} with params {params}")
-    async with aiohttp.ClientSession() as session:
+    async with shared_session() as session:
         try:
             async with session.get(url, headers=CRYPTOBOT_HEADERS, params=params) as response:
                 status = response.status
@@ -280,6 +329,36 @@ async def check_invoice_status(invoice_id: str) -> Optional[Dict[str, Any]]:
             logger.error(f"Check Invoice Status: Error - {e}")
             return None
 
+async def check_invoices_status(invoice_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """GET /getInvoices from CryptoBot for many invoices, CRYPTOBOT_BATCH_SIZE ids per request"""
+    url = f"{cryptobot_url}/getInvoices"
+    invoice_ids = [str(invoice_id) for invoice_id in invoice_ids]
+    batches = [invoice_ids[i:i + CRYPTOBOT_BATCH_SIZE]
+               for i in range(0, len(invoice_ids), CRYPTOBOT_BATCH_SIZE)]
+    result: Dict[str, Dict[str, Any]] = {}
+
+    async def fetch_batch(session: aiohttp.ClientSession, batch: List[str]) -> None:
+        params = {"invoice_ids": ",".join(batch), "count": len(batch)}
+        try:
+            async with session.get(url, headers=CRYPTOBOT_HEADERS, params=params) as response:
+                status = response.status
+                response_json = await response.json()
+                if status in (200, 201) and response_json.get("ok"):
+                    for invoice in response_json["result"]["items"]:
+                        result[str(invoice["invoice_id"])] = invoice
+                else:
+                    logger.error(f"Check Invoices Status: Failed with status {status} for {len(batch)} invoices")
+        except aiohttp.ClientError as e:
+            logger.error(f"Check Invoices Status: Error - {e}")
+
+    if not batches:
+        return result
+
+    logger.info(f"Sending {len(batches)} getInvoices requests to CryptoBot for {len(invoice_ids)} invoices")
+    async with shared_session() as session:
+        await asyncio.gather(*(fetch_batch(session, batch) for batch in batches))
+    return result
+
 async def save_invoice(
     user_id: int, invoice_id: str, amount: float, currency: str, payload: str
 ) -> Optional[Dict[str, Any]]:
@@ -293,8 +372,8 @@ async def save_invoice(
         "status": "active",
         "payload": str(payload)
     }
-    logger.info(f"Sending request to backend: {json.dumps(payload_data, ensure_ascii=False)}")
-    async with aiohttp.ClientSession() as session:
+    logger.debug("Sending request to backend: %s", payload_data)
+    async with shared_session() as session:
         try:
             async with session.post(url, headers=HEADERS, json=payload_data) as response:
                 status = response.status
@@ -314,7 +393,7 @@ async def get_active_invoices() -> List[Dict[str, Any]]:
     """GET /payments/invoices?status=active"""
     url = f"{BASE_URL}/payments/invoices?status=active"
     # logger.info(f"Sending request to backend: GET {url}")
-    async with aiohttp.ClientSession() as session:
+    async with shared_session() as session:
         try:
             async with session.get(url, headers=HEADERS) as response:
                 status = response.status
@@ -330,12 +409,48 @@ async def get_active_invoices() -> List[Dict[str, Any]]:
             logger.error(f"Get Active Invoices: Error - {e}")
             return []
 
+async def complete_invoice(invoice_id: str) -> Optional[Dict[str, Any]]:
+    """POST /payments/invoices/{invoice_id}/complete"""
+    url = f"{BASE_URL}/payments/invoices/{invoice_id}/complete"
+    logger.info(f"Sending request to backend: POST {url}")
+    async with shared_session() as session:
+        try:
+            async with session.post(url, headers=HEADERS) as response:
+                status = response.status
+                response_json = await response.json()
+                if status in (200, 201):
+                    return response_json
+                else:
+                    logger.error(f"Complete Invoice: Failed with status {status}, response: {response_json}")
+                    return None
+        except aiohttp.ClientError as e:
+            logger.error(f"Complete Invoice: Error - {e}")
+            return None
+
+async def expire_invoices(older_than_minutes: int) -> List[Dict[str, Any]]:
+    """POST /payments/invoices/expire"""
+    url = f"{BASE_URL}/payments/invoices/expire"
+    payload = {"older_than_minutes": int(older_than_minutes)}
+    async with shared_session() as session:
+        try:
+            async with session.post(url, headers=HEADERS, json=payload) as response:
+                status = response.status
+                response_json = await response.json()
+                if status in (200, 201):
+                    return response_json
+                else:
+                    logger.error(f"Expire Invoices: Failed with status {status}")
+                    return []
+        except aiohttp.ClientError as e:
+            logger.error(f"Expire Invoices: Error - {e}")
+            return []
+
 async def update_invoice_status(invoice_id: str, status: str) -> Optional[Dict[str, Any]]:
     """PUT /payments/invoices/{invoice_id}"""
     url = f"{BASE_URL}/payments/invoices/{invoice_id}"
     payload = {"status": str(status)}
-    logger.info(f"Sending request to backend: {json.dumps(payload, ensure_ascii=False)}")
-    async with aiohttp.ClientSession() as session:
+    logger.debug("Sending request to backend: %s", payload)
+    async with shared_session() as session:
         try:
             async with session.put(url, headers=HEADERS, json=payload) as response:
                 status = response.status
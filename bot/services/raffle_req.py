@@ -2,17 +2,12 @@ import aiohttp
 from typing import Optional, Dict, List, Any
 import logging
 from config import get_config, Backend
+from services.session import shared_session
     
 backend = get_config(Backend, "backend")
 api_key = backend.key
 url = backend.url
 
-# Configure logger
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(message)s",
-    handlers=[logging.StreamHandler()]
-)
 logger = logging.getLogger(__name__)
 
 # Base URL for the API
@@ -25,7 +20,7 @@ HEADERS = {
 async def get_active_raffles(raffle_id: Optional[int] = None) -> Optional[List[Dict[str, Any]]]:
     """GET /raffles or /raffles/{raffle_id}"""
     url = f"{BASE_URL}/raffles" if raffle_id is None else f"{BASE_URL}/raffles/{raffle_id}"
-    async with aiohttp.ClientSession() as session:
+    async with shared_session() as session:
         try:
             async with session.get(url, headers=HEADERS) as response:
                 status = response.status
@@ -43,7 +38,7 @@ async def get_active_raffles(raffle_id: Optional[int] = None) -> Optional[List[D
 async def create_raffle(raffle: Dict[str, Any]) -> Optional[Dict[str, Any]]:
     """POST /raffles"""
     url = f"{BASE_URL}/raffles"
-    async with aiohttp.ClientSession() as session:
+    async with shared_session() as session:
         try:
             async with session.post(url, headers=HEADERS, json=raffle) as response:
                 status = response.status
@@ -60,7 +55,7 @@ async def create_raffle(raffle: Dict[str, Any]) -> Optional[Dict[str, Any]]:
 async def update_raffle(raffle_id: int, update_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
     """PATCH /raffles/{raffle_id}"""
     url = f"{BASE_URL}/raffles/{raffle_id}"
-    async with aiohttp.ClientSession() as session:
+    async with shared_session() as session:
         try:
             async with session.patch(url, headers=HEADERS, json=update_data) as response:
                 status = response.status
@@ -78,7 +73,7 @@ async def buy_tickets(raffle_id: int, user_id: int, count: int) -> Optional[Dict
     """POST /raffles/{raffle_id}/tickets"""
     url = f"{BASE_URL}/raffles/{raffle_id}/tickets"
     payload = {"user_id": user_id, "count": count}
-    async with aiohttp.ClientSession() as session:
+    async with shared_session() as session:
         try:
             async with session.post(url, headers=HEADERS, json=payload) as response:
                 status = response.status
@@ -95,7 +90,7 @@ async def buy_tickets(raffle_id: int, user_id: int, count: int) -> Optional[Dict
 async def set_winners(raffle_id: int, winner_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
     """POST /raffles/{raffle_id}/winners"""
     url = f"{BASE_URL}/raffles/{raffle_id}/winners"
-    async with aiohttp.ClientSession() as session:
+    async with shared_session() as session:
         try:
             async with session.post(url, headers=HEADERS, json=winner_data) as response:
                 status = response.status
@@ -112,7 +107,7 @@ async def set_winners(raffle_id: int, winner_data: Dict[str, Any]) -> Optional[D
 async def add_tickets(raffle_id: int, ticket_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
     """POST /raffles/{raffle_id}/add-tickets"""
     url = f"{BASE_URL}/raffles/{raffle_id}/add-tickets"
-    async with aiohttp.ClientSession() as session:
+    async with shared_session() as session:
         try:
             async with session.post(url, headers=HEADERS, json=ticket_data) as response:
                 status = response.status
@@ -129,7 +124,7 @@ async def add_tickets(raffle_id: int, ticket_data: Dict[str, Any]) -> Optional[D
 async def get_tickets(raffle_id: int, page: int = 0, per_page: int = 10) -> Optional[List[Dict[str, Any]]]:
     """GET /raffles/{raffle_id}/tickets"""
     url = f"{BASE_URL}/raffles/{raffle_id}/tickets?page={page}&per_page={per_page}"
-    async with aiohttp.ClientSession() as session:
+    async with shared_session() as session:
         try:
             async with session.get(url, headers=HEADERS) as response:
                 status = response.status
@@ -146,7 +141,7 @@ async def get_tickets(raffle_id: int, page: int = 0, per_page: int = 10) -> Opti
 async def get_user_tickets(raffle_id: int, user_id: int) -> Optional[Dict[str, Any]]:
     """GET /raffles/{raffle_id}/tickets/user/{user_id}"""
     url = f"{BASE_URL}/raffles/{raffle_id}/tickets/user/{user_id}"
-    async with aiohttp.ClientSession() as session:
+    async with shared_session() as session:
         try:
             async with session.get(url, headers=HEADERS) as response:
                 status = response.status
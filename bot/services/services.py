@@ -1,24 +1,22 @@
 import logging
 import re
 import asyncio
+import heapq
 import time
 
 from aiogram import Bot
-from aiogram.exceptions import TelegramAPIError
-from typing import Dict, Optional, List, Any
+from aiogram.methods import SendMessage
+from typing import Dict, Optional, List, Any, Tuple
 from datetime import datetime, timedelta, timezone
 from dateutil.parser import isoparse
 from services import user_req, payment_req
+from config import get_optional_config, Leader, Outbox, Payments, Sharding
+from utils.leader import run_as_leader
+from utils.outbox import Priority, enqueue, start_outbox, stop_outbox
+from utils.tracing import get_tracer
 
 logger = logging.getLogger(__name__)
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(filename)s:%(lineno)d #%(levelname)-8s '
-           '[%(asctime)s] - %(name)s - %(message)s'
-)
-
 # Subscription prices in rubles
 MONTH_PRICE = {
     "device": {"0": 0, "1": 100, "3": 240, "6": 420, "12": 600},
@@ -179,7 +177,7 @@ async def get_user_info(user_id: int) -> Optional[Dict]:
         month_price = 0.0
         active_remaining_days = []
         for sub in subscriptions:
-            logger.info(f'\n\n{sub}')
+            logger.debug("Subscription of user %s: %s", user_id, sub)
             if sub["paused_at"] is None:
                 month_price += (float(sub["monthly_price"]) * float(len(sub["device_type"])))
                 active_remaining_days.append(sub["remaining_days"])
@@ -192,7 +190,7 @@ async def get_user_info(user_id: int) -> Optional[Dict]:
         total_devices = devices_len + routers_len + combo_len
         durations = (device_duration, router_duration, combo_duration)
         all_list = {"devices": {**devices_list}, "routers": {**routers_list}, "combo": {**combo_list}}
-        logger.info(all_list)
+        logger.debug("Devices of user %s: %s", user_id, all_list)
         
         is_subscribed = device_duration + router_duration + combo_duration > 0
         
@@ -331,119 +329,373 @@ def escape_markdown_v2(text: str) -> str:
     reserved_chars = r'([_\*\[\]\(\)~`>\#\+\-=\|\{\}\.!\\])'
     return re.sub(reserved_chars, r'\\\1', text)
 
-async def poll_invoices(bot: Bot):
-    """Poll active invoices (ЮKassa and CryptoBot) every 10 seconds, expire after 15 minutes."""
-    INVOICE_TIMEOUT = timedelta(minutes=15)  # 15 минут
-
-    while True:
-        try:
-            active_invoices: List[Dict[str, Any]] = await payment_req.get_active_invoices()
-            logger.info(f'Polling {len(active_invoices)} active invoices')
-            for invoice in active_invoices:
-                invoice_id = invoice["invoice_id"]
-                user_id = invoice["user_id"]
-                default_amount = invoice["amount"]
-                default_payload = f"{user_id}:{default_amount}:0:balance:balance:add_balance:balance"
-                payload = invoice.get("payload", default_payload)
-                
-                try:
-                    _, amount, period, device_type, device, payment_type, method = payload.split(':')
-                except ValueError:
-                    logger.error(f"Invalid payload format for invoice {invoice_id}: {payload}")
-                    continue
-
-                # Проверка времени истечения
-                created_at = invoice.get("created_at")
-                if not created_at:
-                    logger.error(f"No created_at for invoice {invoice_id}, skipping timeout check")
-                    continue
-                
-                try:
-                    created_at = isoparse(created_at) if isinstance(created_at, str) else created_at
-                    if created_at.tzinfo is None:
-                        created_at = created_at.replace(tzinfo=timezone.utc)
-                    if datetime.now(timezone.utc) - created_at > INVOICE_TIMEOUT:
-                        logger.info(f"Invoice {invoice_id} expired after 15 minutes")
-                        await payment_req.update_invoice_status(invoice_id, "expired")
-                        try:
-                            await bot.send_message(user_id, text="Ваша ссылка на оплату истекла. Пожалуйста, создайте новую.")
-                            logger.info(f"Notified user {user_id} about expired invoice {invoice_id}")
-                        except TelegramAPIError as e:
-                            logger.error(f"Failed to notify user {user_id} for expired invoice {invoice_id}: {e}")
-                        continue
-                except Exception as e:
-                    logger.error(f"Error parsing created_at for invoice {invoice_id}: {e}")
-                    continue
-
-                # Разделение по методу платежной системы
-                if method == "ukassa":
-                    status_data = await payment_req.check_ukassa_invoice_status(invoice_id)
-                    if status_data:
-                        status = status_data["status"]
-                        if status == "succeeded" and status_data["paid"]:
-                            logger.info(f"ЮKassa invoice {invoice_id} paid for user {user_id}")
-                            try:
-                                logger.info(f"period: {period}; device_type: {device_type}; device: {device}; "
-                                           f"payment_type: {payment_type}; method: {method}")
-                                balance_response = await payment_req.payment_balance_process(
-                                    user_id=user_id, amount=amount, period=period, device_type=device_type,
-                                    device=device, payment_type=payment_type, method=method
-                                )
-                                if balance_response:
-                                    try:
-                                        await bot.send_message(user_id, text="Оплата успешна 🎉")
-                                        await payment_req.update_invoice_status(invoice_id, "completed")
-                                        logger.info(f"ЮKassa invoice {invoice_id} completed, notified user {user_id}")
-                                    except TelegramAPIError as e:
-                                        logger.error(f"Failed to notify user {user_id} for invoice {invoice_id}: {e}")
-                            except Exception as e:
-                                logger.error(f"Error processing ЮKassa payment for invoice {invoice_id}: {e}")
-                        elif status in ["canceled", "expired", "failed"]:
-                            logger.info(f"ЮKassa invoice {invoice_id} {status}, updating status")
-                            await payment_req.update_invoice_status(invoice_id, status)
-                elif method == "crypto":
-                    try:
-                        invoice_status = await payment_req.check_invoice_status(invoice_id)
-                        # logger.info(f"CryptoBot check for {invoice_id} took {time.time() - start_time:.2f} seconds")
-                        if invoice_status:
-                            status = invoice_status["status"]
-                            if status == "paid":
-                                logger.info(f"CryptoBot invoice {invoice_id} paid for user {user_id}")
-                                try:
-                                    logger.info(f"period: {period}; device_type: {device_type}; device: {device}; "
-                                               f"payment_type: {payment_type}; method: {method}")
-                                    balance_response = await payment_req.payment_balance_process(
-                                        user_id=user_id, amount=amount, period=period, device_type=device_type,
-                                        device=device, payment_type=payment_type, method=method
-                                    )
-                                    if balance_response:
-                                        try:
-                                            await bot.send_message(user_id, text="Оплата успешна 🎉")
-                                            await payment_req.update_invoice_status(invoice_id, "completed")
-                                            logger.info(f"CryptoBot invoice {invoice_id} completed, notified user {user_id}")
-                                        except TelegramAPIError as e:
-                                            logger.error(f"Failed to notify user {user_id} for invoice {invoice_id}: {e}")
-                                except Exception as e:
-                                    logger.error(f"Error processing CryptoBot payment for invoice {invoice_id}: {e}")
-                            elif status in ["expired", "failed"]:
-                                logger.info(f"CryptoBot invoice {invoice_id} {status}, updating status")
-                                await payment_req.update_invoice_status(invoice_id, status)
-                    except Exception as e:
-                        if "400" in str(e):
-                            logger.debug(f"CryptoBot invoice {invoice_id} not found, likely not a CryptoBot invoice")
-                        else:
-                            logger.error(f"Error checking CryptoBot invoice {invoice_id}: {e}")
-                else:
-                    logger.warning(f"Unknown payment method for invoice {invoice_id}: {method}")
-                    continue
+INVOICE_TIMEOUT = timedelta(minutes=15)
+POLL_ERROR_INTERVAL = 30
+# Upper bound for concurrent backend calls made while applying poll results
+POLL_BACKEND_CONCURRENCY = 20
+# Upper bound for concurrent ЮKassa status requests
+UKASSA_POLL_CONCURRENCY = 16
+# Active invoices are re-read from the backend this often (seconds)
+INVOICE_SYNC_INTERVAL = 10
+# Invoices older than INVOICE_TIMEOUT are expired by the backend this often (seconds)
+INVOICE_SWEEP_INTERVAL = 60
+
+# Delay before the next status check by invoice age: users who pay right away
+# are confirmed within seconds, older invoices are checked less and less often
+POLL_SCHEDULE = (
+    (timedelta(minutes=1), 3),
+    (timedelta(minutes=3), 5),
+    (timedelta(minutes=5), 10),
+    (timedelta(minutes=10), 30),
+)
+POLL_MAX_DELAY = 60
+
+# With provider webhooks the backend confirms payments itself and polling only
+# reconciles missed deliveries
+RECONCILE_SCHEDULE = (
+    (timedelta(minutes=5), 30),
+)
+RECONCILE_MAX_DELAY = 120
+
+if get_optional_config(Payments, "payments").webhooks:
+    POLL_SCHEDULE, POLL_MAX_DELAY = RECONCILE_SCHEDULE, RECONCILE_MAX_DELAY
+
+# Counters of the invoice scheduler and timing of its last check round
+poll_metrics: Dict[str, Any] = {
+    "tracked": 0,
+    "rounds": 0,
+    "checks": 0,
+    "crypto_requests": 0,
+    "completed": 0,
+    "expired": 0,
+    "errors": 0,
+    "last_round_at": None,
+    "last_round_checks": 0,
+    "last_round_seconds": 0.0,
+    "last_sync_seconds": 0.0,
+    "last_sweep_seconds": 0.0,
+}
+
+def parse_invoice(invoice: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Split an active invoice into the fields needed for polling.
+
+    Args:
+        invoice: Invoice as returned by GET /payments/invoices
+
+    Returns:
+        Dict with invoice_id, user_id, created_at and payload parts, or None if malformed
+    """
+    invoice_id = invoice["invoice_id"]
+    user_id = invoice["user_id"]
+    default_amount = invoice["amount"]
+    default_payload = f"{user_id}:{default_amount}:0:balance:balance:add_balance:balance"
+    payload = invoice.get("payload", default_payload)
+
+    try:
+        _, amount, period, device_type, device, payment_type, method = payload.split(':')
+    except ValueError:
+        logger.error(f"Invalid payload format for invoice {invoice_id}: {payload}")
+        return None
+
+    created_at = invoice.get("created_at")
+    if not created_at:
+        logger.error(f"No created_at for invoice {invoice_id}, skipping timeout check")
+        return None
+    try:
+        created_at = isoparse(created_at) if isinstance(created_at, str) else created_at
+        if created_at.tzinfo is None:
+            created_at = created_at.replace(tzinfo=timezone.utc)
+    except Exception as e:
+        logger.error(f"Error parsing created_at for invoice {invoice_id}: {e}")
+        return None
+
+    return {
+        "invoice_id": str(invoice_id),
+        "user_id": user_id,
+        "created_at": created_at,
+        "amount": amount,
+        "period": period,
+        "device_type": device_type,
+        "device": device,
+        "payment_type": payment_type,
+        "method": method,
+    }
+
+def notify_invoice_expired(user_id: int, invoice_id: str) -> None:
+    """Tell the user that their payment link has expired."""
+    enqueue(
+        SendMessage(chat_id=user_id, text="Ваша ссылка на оплату истекла. Пожалуйста, создайте новую."),
+        Priority.NOTIFICATION
+    )
+    logger.info(f"Queued expiry notice for user {user_id}, invoice {invoice_id}")
+
+async def complete_invoice(bot: Bot, invoice: Dict[str, Any], provider: str) -> bool:
+    """
+    Apply a paid invoice to the user's account and notify the user.
+
+    The backend applies each invoice at most once, so a payment already
+    delivered by a provider webhook is not applied or announced again.
+
+    Args:
+        bot: Aiogram Bot instance
+        invoice: Parsed invoice, see parse_invoice
+        provider: Provider name used in log messages
+
+    Returns:
+        True if the invoice is completed
+    """
+    invoice_id, user_id = invoice["invoice_id"], invoice["user_id"]
+    logger.info(f"{provider} invoice {invoice_id} paid for user {user_id}")
+    try:
+        logger.info(f"period: {invoice['period']}; device_type: {invoice['device_type']}; "
+                    f"device: {invoice['device']}; payment_type: {invoice['payment_type']}; "
+                    f"method: {invoice['method']}")
+        result = await payment_req.complete_invoice(invoice_id)
+        if not result:
+            return False
+        if not result.get("applied"):
+            logger.info(f"{provider} invoice {invoice_id} was already completed")
+            return True
+        enqueue(SendMessage(chat_id=user_id, text="Оплата успешна 🎉"), Priority.TRANSACTIONAL)
+        logger.info(f"{provider} invoice {invoice_id} completed, notifying user {user_id}")
+        return True
+    except Exception as e:
+        logger.error(f"Error processing {provider} payment for invoice {invoice_id}: {e}")
+        return False
+
+async def check_ukassa_invoices(invoice_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Check ЮKassa invoices concurrently, at most UKASSA_POLL_CONCURRENCY at a time."""
+    semaphore = asyncio.Semaphore(UKASSA_POLL_CONCURRENCY)
+    async def check(invoice_id: str) -> Optional[Dict[str, Any]]:
+        async with semaphore:
+            return await payment_req.check_ukassa_invoice_status(invoice_id)
+
+    results = await asyncio.gather(*(check(invoice_id) for invoice_id in invoice_ids))
+    return {invoice_id: status_data for invoice_id, status_data in zip(invoice_ids, results) if status_data}
+
+def next_check_delay(age: timedelta) -> int:
+    """Seconds until the next status check of an invoice of the given age."""
+    for max_age, delay in POLL_SCHEDULE:
+        if age < max_age:
+            return delay
+    return POLL_MAX_DELAY
+
+class InvoiceScheduler:
+    """
+    Polls payment providers for active invoices on a per-invoice schedule.
 
-        except Exception as e:
-            logger.error(f"Polling error: {e}")
-            await asyncio.sleep(30)
+    Invoices are kept in a min-heap keyed by the time of their next check, so
+    a round only touches invoices that are due. Fresh invoices are checked
+    every few seconds and older ones backed off, see POLL_SCHEDULE. Expiry is
+    left to the backend sweep (POST /payments/invoices/expire).
+    """
+
+    def __init__(self, bot: Bot):
+        self.bot = bot
+        self.invoices: Dict[str, Dict[str, Any]] = {}
+        self.heap: List[Tuple[float, str]] = []
+        self.next_sync = 0.0
+        self.next_sweep = 0.0
+
+    def track(self, invoice: Dict[str, Any]) -> None:
+        """Start polling a parsed invoice, see parse_invoice."""
+        invoice_id = invoice["invoice_id"]
+        if invoice_id in self.invoices:
+            return
+        self.invoices[invoice_id] = invoice
+        age = datetime.now(timezone.utc) - invoice["created_at"]
+        first_delay = max(0.0, next_check_delay(age) - age.total_seconds())
+        heapq.heappush(self.heap, (time.monotonic() + first_delay, invoice_id))
+
+    def untrack(self, invoice_id: str) -> None:
+        # Heap entries of untracked invoices are dropped lazily when popped
+        self.invoices.pop(invoice_id, None)
+
+    def reschedule(self, invoice: Dict[str, Any]) -> None:
+        age = datetime.now(timezone.utc) - invoice["created_at"]
+        if age > INVOICE_TIMEOUT:
+            # Left for the backend sweep, nothing to check anymore
+            return
+        heapq.heappush(self.heap, (time.monotonic() + next_check_delay(age), invoice["invoice_id"]))
+
+    async def sync(self) -> None:
+        """Pick up new active invoices and drop ones closed elsewhere."""
+        start = time.perf_counter()
+        active: List[Dict[str, Any]] = await payment_req.get_active_invoices()
+        active_ids = set()
+        for raw_invoice in active:
+            invoice = parse_invoice(raw_invoice)
+            if invoice is None:
+                continue
+            active_ids.add(invoice["invoice_id"])
+            self.track(invoice)
+        for invoice_id in list(self.invoices):
+            if invoice_id not in active_ids:
+                self.untrack(invoice_id)
+        poll_metrics["tracked"] = len(self.invoices)
+        poll_metrics["last_sync_seconds"] = time.perf_counter() - start
+
+    async def sweep(self) -> None:
+        """Expire old invoices on the backend and notify their owners."""
+        start = time.perf_counter()
+        older_than = int(INVOICE_TIMEOUT.total_seconds() // 60)
+        expired = await payment_req.expire_invoices(older_than)
+        for invoice in expired:
+            self.untrack(str(invoice["invoice_id"]))
+            logger.info(f"Invoice {invoice['invoice_id']} expired after 15 minutes")
+        for invoice in expired:
+            notify_invoice_expired(invoice["user_id"], invoice["invoice_id"])
+        poll_metrics["expired"] += len(expired)
+        poll_metrics["last_sweep_seconds"] = time.perf_counter() - start
+
+    def pop_due(self) -> List[Dict[str, Any]]:
+        now = time.monotonic()
+        due: Dict[str, Dict[str, Any]] = {}
+        while self.heap and self.heap[0][0] <= now:
+            _, invoice_id = heapq.heappop(self.heap)
+            invoice = self.invoices.get(invoice_id)
+            if invoice is not None:
+                due[invoice_id] = invoice
+        return list(due.values())
+
+    async def check(self, due: List[Dict[str, Any]]) -> None:
+        """Check due invoices with batched provider requests and apply the results."""
+        start = time.perf_counter()
+        crypto = {invoice["invoice_id"]: invoice for invoice in due if invoice["method"] == "crypto"}
+        ukassa = {invoice["invoice_id"]: invoice for invoice in due if invoice["method"] == "ukassa"}
+        for invoice in due:
+            if invoice["method"] not in ("crypto", "ukassa"):
+                logger.warning(f"Unknown payment method for invoice {invoice['invoice_id']}: {invoice['method']}")
+                self.untrack(invoice["invoice_id"])
+
+        crypto_statuses, ukassa_statuses = await asyncio.gather(
+            payment_req.check_invoices_status(list(crypto)),
+            check_ukassa_invoices(list(ukassa))
+        )
+
+        semaphore = asyncio.Semaphore(POLL_BACKEND_CONCURRENCY)
+        async def bounded(coro):
+            async with semaphore:
+                return await coro
+
+        tasks = []
+        for invoice_id, invoice in crypto.items():
+            invoice_status = crypto_statuses.get(invoice_id)
+            status = invoice_status["status"] if invoice_status else None
+            if status == "paid":
+                tasks.append(bounded(self.complete(invoice, "CryptoBot")))
+            elif status in ["expired", "failed"]:
+                logger.info(f"CryptoBot invoice {invoice_id} {status}, updating status")
+                self.untrack(invoice_id)
+                tasks.append(bounded(payment_req.update_invoice_status(invoice_id, status)))
+            else:
+                self.reschedule(invoice)
+
+        for invoice_id, invoice in ukassa.items():
+            status_data = ukassa_statuses.get(invoice_id)
+            status = status_data["status"] if status_data else None
+            if status == "succeeded" and status_data["paid"]:
+                tasks.append(bounded(self.complete(invoice, "ЮKassa")))
+            elif status in ["canceled", "expired", "failed"]:
+                logger.info(f"ЮKassa invoice {invoice_id} {status}, updating status")
+                self.untrack(invoice_id)
+                tasks.append(bounded(payment_req.update_invoice_status(invoice_id, status)))
+            else:
+                self.reschedule(invoice)
+
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error(f"Polling task failed: {result}")
+                poll_metrics["errors"] += 1
+
+        poll_metrics["rounds"] += 1
+        poll_metrics["checks"] += len(crypto) + len(ukassa)
+        poll_metrics["crypto_requests"] += -(-len(crypto) // payment_req.CRYPTOBOT_BATCH_SIZE)
+        poll_metrics["last_round_at"] = datetime.now(timezone.utc).isoformat()
+        poll_metrics["last_round_checks"] = len(crypto) + len(ukassa)
+        poll_metrics["last_round_seconds"] = time.perf_counter() - start
+
+    async def complete(self, invoice: Dict[str, Any], provider: str) -> None:
+        if await complete_invoice(self.bot, invoice, provider):
+            self.untrack(invoice["invoice_id"])
+            poll_metrics["completed"] += 1
         else:
-            await asyncio.sleep(10)
+            # Backend rejected or failed, retry on the regular schedule
+            poll_metrics["errors"] += 1
+            self.reschedule(invoice)
+
+    async def tick(self) -> None:
+        now = time.monotonic()
+        if now >= self.next_sweep:
+            self.next_sweep = now + INVOICE_SWEEP_INTERVAL
+            await self.sweep()
+        if now >= self.next_sync:
+            self.next_sync = now + INVOICE_SYNC_INTERVAL
+            await self.sync()
+        due = self.pop_due()
+        if due:
+            await self.check(due)
+        poll_metrics["tracked"] = len(self.invoices)
+
+    def sleep_time(self) -> float:
+        wake_at = min(self.next_sync, self.next_sweep)
+        if self.heap:
+            wake_at = min(wake_at, self.heap[0][0])
+        return max(0.5, wake_at - time.monotonic())
+
+    async def run(self) -> None:
+        while True:
+            try:
+                await self.tick()
+            except Exception as e:
+                logger.error(f"Polling error: {e}")
+                await asyncio.sleep(POLL_ERROR_INTERVAL)
+            else:
+                await asyncio.sleep(self.sleep_time())
+
+invoice_scheduler: Optional[InvoiceScheduler] = None
+
+async def poll_invoices(bot: Bot):
+    """Poll active invoices (ЮKassa and CryptoBot) on an adaptive schedule, expire after 15 minutes."""
+    global invoice_scheduler
+    invoice_scheduler = InvoiceScheduler(bot)
+    await invoice_scheduler.run()
 
 async def on_startup(bot: Bot):
+    # Telegram's limits are per bot, so shards split the global rate
+    outbox = get_optional_config(Outbox, "outbox")
+    shards = get_optional_config(Sharding, "sharding").shards
+    start_outbox(
+        bot,
+        rate=outbox.rate / shards,
+        burst=max(1, outbox.burst // shards),
+        chat_interval=outbox.chat_interval,
+        group_interval=outbox.group_interval,
+        concurrency=outbox.concurrency,
+        max_attempts=outbox.max_attempts,
+        max_queue=outbox.max_queue,
+        dead_letter_size=outbox.dead_letter_size
+    )
+    logger.info("Loading exchange rates")
+    if not await payment_req.refresh_exchange_rates():
+        logger.error("Exchange rates are not available yet, crypto payments will retry in background")
+    asyncio.create_task(payment_req.refresh_exchange_rates_loop(), name="refresh_exchange_rates")
     logger.info("Starting invoice polling")
-    asyncio.create_task(poll_invoices(bot), name="poll_invoices")
+    # Only one replica polls invoices, the others wait to take over
+    leader = get_optional_config(Leader, "leader")
+    asyncio.create_task(run_as_leader(
+        "invoice_poller",
+        lambda: poll_invoices(bot),
+        dsn=leader.dsn,
+        lock_dir=leader.lock_dir,
+        retry_interval=leader.retry_interval,
+        check_interval=leader.check_interval
+    ), name="invoice_poller_election")
     logger.info("Both polling tasks started")
+
+async def on_shutdown():
+    await stop_outbox(get_optional_config(Outbox, "outbox").drain_timeout)
+    # Flush spans still queued for export
+    await asyncio.to_thread(get_tracer().shutdown)
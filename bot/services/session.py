@@ -0,0 +1,128 @@
+import aiohttp
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from prometheus_client import Counter, Histogram
+from yarl import URL
+
+logger = logging.getLogger(__name__)
+
+# One connection pool for all outgoing HTTP calls of the bot process
+CONNECTION_LIMIT = 100
+CONNECTION_LIMIT_PER_HOST = 30
+KEEPALIVE_TIMEOUT = 30
+DEFAULT_TIMEOUT = aiohttp.ClientTimeout(total=30, connect=5)
+HTTP_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+# Distinct endpoints tracked; more are counted as "other"
+MAX_ENDPOINTS = 200
+OTHER_ENDPOINT = "other"
+
+HTTP_DURATION = Histogram(
+    "bot_http_request_duration_seconds", "Outgoing HTTP calls until response headers",
+    ["method", "host", "endpoint"], buckets=HTTP_BUCKETS
+)
+HTTP_RESPONSES = Counter(
+    "bot_http_responses_total", "Outgoing HTTP calls by status code, or \"error\" when no response came",
+    ["method", "host", "endpoint", "status"]
+)
+
+def endpoint_template(path: str) -> str:
+    # "/users/123" and "/payments/invoices/a1b2c3" -> "/users/{id}", "/payments/invoices/{id}"
+    return "/".join(
+        "{id}" if any(char.isdigit() for char in segment) else segment
+        for segment in path.split("/")
+    )
+
+class EndpointMetrics:
+    """Label children of one outgoing endpoint, bound on first use."""
+    __slots__ = ("labels", "duration", "responses")
+
+    def __init__(self, method: str, host: str, endpoint: str):
+        self.labels = (method, host, endpoint)
+        self.duration = HTTP_DURATION.labels(method, host, endpoint)
+        # status -> counter child
+        self.responses: Dict[str, Any] = {}
+
+    def observe(self, duration: float, status: str) -> None:
+        self.duration.observe(duration)
+        child = self.responses.get(status)
+        if child is None:
+            child = self.responses[status] = HTTP_RESPONSES.labels(*self.labels, status)
+        child.inc()
+
+# (method, host, endpoint template) -> children
+endpoints: Dict[Tuple[str, str, str], EndpointMetrics] = {}
+
+def endpoint_metrics(method: str, url: URL) -> EndpointMetrics:
+    key = (method, url.host or "", endpoint_template(url.path))
+    metrics = endpoints.get(key)
+    if metrics is None:
+        if len(endpoints) >= MAX_ENDPOINTS:
+            key = (method, url.host or "", OTHER_ENDPOINT)
+            metrics = endpoints.get(key)
+        if metrics is None:
+            metrics = endpoints[key] = EndpointMetrics(*key)
+    return metrics
+
+def create_trace_config() -> aiohttp.TraceConfig:
+    """Trace hooks timing every call made through a session, by endpoint and status."""
+    trace_config = aiohttp.TraceConfig()
+
+    async def on_request_start(session, context, params: aiohttp.TraceRequestStartParams) -> None:
+        context.start = time.perf_counter()
+
+    async def on_request_end(session, context, params: aiohttp.TraceRequestEndParams) -> None:
+        endpoint_metrics(params.method, params.url).observe(
+            time.perf_counter() - context.start, str(params.response.status)
+        )
+
+    async def on_request_exception(session, context, params: aiohttp.TraceRequestExceptionParams) -> None:
+        endpoint_metrics(params.method, params.url).observe(time.perf_counter() - context.start, "error")
+
+    trace_config.on_request_start.append(on_request_start)
+    trace_config.on_request_end.append(on_request_end)
+    trace_config.on_request_exception.append(on_request_exception)
+    return trace_config
+
+_session: Optional[aiohttp.ClientSession] = None
+# Hooks added by other modules (tracing), before the session is created
+_trace_configs: List[aiohttp.TraceConfig] = []
+
+def add_trace_config(trace_config: aiohttp.TraceConfig) -> None:
+    _trace_configs.append(trace_config)
+
+def get_session() -> aiohttp.ClientSession:
+    """
+    Return the shared aiohttp session, creating it on first use.
+
+    Must be called from a running event loop.
+    """
+    global _session
+    if _session is None or _session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=CONNECTION_LIMIT,
+            limit_per_host=CONNECTION_LIMIT_PER_HOST,
+            keepalive_timeout=KEEPALIVE_TIMEOUT,
+            ttl_dns_cache=300
+        )
+        _session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=DEFAULT_TIMEOUT,
+            trace_configs=[create_trace_config(), *_trace_configs]
+        )
+        logger.info("Shared HTTP session created")
+    return _session
+
+@asynccontextmanager
+async def shared_session() -> AsyncIterator[aiohttp.ClientSession]:
+    """Drop-in for `async with aiohttp.ClientSession()` that reuses pooled connections."""
+    yield get_session()
+
+async def close_session() -> None:
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+        logger.info("Shared HTTP session closed")
+    _session = None
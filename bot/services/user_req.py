@@ -5,17 +5,12 @@ import json
 import logging
 from typing import Dict, Optional, Any
 from config import get_config, Backend
+from services.session import shared_session
 
 backend = get_config(Backend, "backend")
 api_key = backend.key
 url = backend.url
 
-# Configure logger
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(message)s",
-    handlers=[logging.StreamHandler()]
-)
 logger = logging.getLogger(__name__)
 
 # Base URL for the API
@@ -28,7 +23,7 @@ HEADERS = {
 async def get_user(user_id: int) -> Optional[Dict[str, Any]]:
     """GET /users/{user_id}"""
     url = f"{BASE_URL}/users/{user_id}"
-    async with aiohttp.ClientSession() as session:
+    async with shared_session() as session:
         try:
             async with session.get(url, headers=HEADERS) as response:
                 status = response.status
@@ -57,7 +52,7 @@ async def create_user(
     }
     request_payload = payload if payload is not None else default_payload
 
-    async with aiohttp.ClientSession() as session:
+    async with shared_session() as session:
         try:
             async with session.post(url, headers=HEADERS, json=request_payload) as response:
                 status = response.status
@@ -84,7 +79,7 @@ async def add_referral(
     }
     request_payload = payload if payload is not None else default_payload
 
-    async with aiohttp.ClientSession() as session:
+    async with shared_session() as session:
         try:
             async with session.post(url, headers=HEADERS, json=request_payload) as response:
                 status = response.status
@@ -105,7 +100,7 @@ async def get_user_devices(user_id: int) -> Optional[Dict[str, Any]]:
     url = f"{BASE_URL}/devices/active/{user_id}"
     
     logger.info(f"Sending request to backend: GET {url}")
-    async with aiohttp.ClientSession() as session:
+    async with shared_session() as session:
         try:
             async with session.get(url, headers=HEADERS) as response:
                 status = response.status
@@ -129,7 +124,7 @@ async def get_user_contact(user_id: int) -> Optional[Dict[str, Any]]:
     url = f"{BASE_URL}/users/contact"
 
     logger.info(f"Sending GET request to {url} with params: {params}")
-    async with aiohttp.ClientSession() as session:
+    async with shared_session() as session:
         try:
             async with session.get(url, headers=HEADERS, params=params) as response:
                 status = response.status
@@ -181,7 +176,7 @@ async def update_user_contact(
 
     url = f"{BASE_URL}/users/contact"
 
-    async with aiohttp.ClientSession() as session:
+    async with shared_session() as session:
         try:
             async with session.post(url, headers=HEADERS, json=payload) as response:
                 status = response.status
@@ -5,17 +5,12 @@ import json
 from typing import Optional, Any
 from datetime import datetime
 from config import get_config, Backend
+from services.session import shared_session
 
 backend = get_config(Backend, "backend")
 api_key = backend.key
 url = backend.url
 
-# Configure logger
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(message)s",
-    handlers=[logging.StreamHandler()]
-)
 logger = logging.getLogger(__name__)
 
 # Base URL for the API
@@ -33,7 +28,7 @@ async def generate_device_key(user_id: int, device: str, device_name: str, slot:
         "device_name": device_name,
         "slot": slot
     }
-    async with aiohttp.ClientSession() as session:
+    async with shared_session() as session:
         try:
             async with session.post(url, headers=HEADERS, json=request_payload) as response:
                 status = response.status
@@ -57,7 +52,7 @@ async def get_device_key(user_id: int, device_name: str) -> Optional[Any]:
         "user_id": user_id,
         "device_name": device_name,
     }
-    async with aiohttp.ClientSession() as session:
+    async with shared_session() as session:
         try:
             async with session.get(url, headers=HEADERS, json=request_payload) as response:
                 status = response.status
@@ -80,7 +75,7 @@ async def rename_device(user_id: int, device_old_name: str, device_new_name: str
         "device_old_name": device_old_name,
         "device_new_name": device_new_name
     }
-    async with aiohttp.ClientSession() as session:
+    async with shared_session() as session:
         try:
             async with session.put(url, headers=HEADERS, json=request_payload) as response:
                 status = response.status
@@ -102,7 +97,7 @@ async def remove_device_key(user_id: int, device_name: str) -> Optional[Any]:
         "user_id": user_id,
         "device_name": device_name
     }
-    async with aiohttp.ClientSession() as session:
+    async with shared_session() as session:
         try:
             async with session.delete(url, headers=HEADERS, json=request_payload) as response:
                 status = response.status
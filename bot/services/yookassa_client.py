@@ -0,0 +1,83 @@
+import aiohttp
+import asyncio
+import logging
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+YOOKASSA_API_URL = "https://api.yookassa.ru/v3"
+YOOKASSA_TIMEOUT = aiohttp.ClientTimeout(total=15, connect=5)
+# Attempts for requests that failed on the network or with a 5xx; creation is
+# safe to retry because YooKassa deduplicates by Idempotence-Key
+YOOKASSA_ATTEMPTS = 3
+YOOKASSA_RETRY_DELAY = 0.5
+
+class YookassaError(Exception):
+    def __init__(self, status: int, body: Any):
+        super().__init__(f"ЮKassa API error {status}: {body}")
+        self.status = status
+        self.body = body
+
+class YookassaClient:
+    """
+    Minimal async client for the ЮKassa payments API.
+
+    Runs on an aiohttp session supplied by session_getter, so requests share
+    the process-wide connection pool instead of blocking the event loop like
+    the synchronous yookassa SDK.
+    """
+
+    def __init__(
+        self,
+        shop_id: str,
+        secret_key: str,
+        session_getter: Callable[[], aiohttp.ClientSession],
+        base_url: str = YOOKASSA_API_URL,
+        timeout: aiohttp.ClientTimeout = YOOKASSA_TIMEOUT
+    ):
+        self.auth = aiohttp.BasicAuth(str(shop_id), secret_key)
+        self.session_getter = session_getter
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    async def request(
+        self, method: str, path: str, json: Optional[Dict[str, Any]] = None,
+        idempotence_key: Optional[str] = None
+    ) -> Dict[str, Any]:
+        headers = {"Content-Type": "application/json"}
+        if idempotence_key:
+            headers["Idempotence-Key"] = idempotence_key
+        url = f"{self.base_url}{path}"
+
+        for attempt in range(1, YOOKASSA_ATTEMPTS + 1):
+            try:
+                async with self.session_getter().request(
+                    method, url, json=json, headers=headers, auth=self.auth, timeout=self.timeout
+                ) as response:
+                    # Proxies answer 502/504 with an HTML or empty body
+                    try:
+                        body = await response.json(content_type=None)
+                    except ValueError:
+                        body = None
+                    parsed = isinstance(body, dict)
+                    if not parsed:
+                        body = {"text": await response.text()}
+                    if response.status < 500:
+                        if response.status >= 400 or not parsed:
+                            raise YookassaError(response.status, body)
+                        return body
+                    error: Exception = YookassaError(response.status, body)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = e
+            if attempt < YOOKASSA_ATTEMPTS:
+                logger.warning(f"ЮKassa {method} {path} failed ({error}), retrying")
+                await asyncio.sleep(YOOKASSA_RETRY_DELAY * attempt)
+        raise error
+
+    async def create_payment(self, payment_data: Dict[str, Any], idempotence_key: str) -> Dict[str, Any]:
+        """POST /payments, payment_data may include a receipt"""
+        return await self.request("POST", "/payments", json=payment_data, idempotence_key=idempotence_key)
+
+    async def get_payment(self, payment_id: str) -> Dict[str, Any]:
+        """GET /payments/{payment_id}"""
+        return await self.request("GET", f"/payments/{payment_id}")
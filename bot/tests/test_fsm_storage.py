@@ -0,0 +1,97 @@
+import asyncio
+import importlib.util
+import os
+
+from aiogram.fsm.storage.base import StorageKey
+
+FSM_STORAGE_PATH = os.path.join(os.path.dirname(__file__), "..", "utils", "fsm_storage.py")
+KEY = StorageKey(bot_id=42, chat_id=1, user_id=1)
+
+
+def load_fsm_storage_module():
+    # Loaded by path: the utils package imports config, which needs bot/config.yaml
+    spec = importlib.util.spec_from_file_location("fsm_storage", FSM_STORAGE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class SlowDatabase:
+    """Holds every write until `release` is set; fetch returns what was written before."""
+
+    def __init__(self):
+        self.rows = {}
+        self.release = asyncio.Event()
+        self.writing = asyncio.Event()
+
+    async def connect(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    async def fetch(self, key):
+        return self.rows.get(key)
+
+    async def write(self, upserts, deletes) -> None:
+        self.writing.set()
+        await self.release.wait()
+        self.rows.update(upserts)
+        for key in deletes:
+            self.rows.pop(key, None)
+
+    async def delete_older_than(self, cutoff) -> int:
+        return 0
+
+
+def make_storage(db: SlowDatabase):
+    # No cache: every read goes past it to the pending writes or the database
+    storage = load_fsm_storage_module().SQLStorage(db, cache_size=0, flush_interval=3600)
+    storage.started = True
+    return storage
+
+
+def test_state_being_flushed_is_still_read():
+    async def scenario():
+        db = SlowDatabase()
+        storage = make_storage(db)
+        await storage.set_state(KEY, "Form:name")
+        flush = asyncio.create_task(storage.flush())
+        await db.writing.wait()
+        state = await storage.get_state(KEY)
+        db.release.set()
+        await flush
+        return state, await storage.get_state(KEY)
+
+    assert asyncio.run(scenario()) == ("Form:name", "Form:name")
+
+
+def test_cancelled_flush_is_written_on_close():
+    async def scenario():
+        db = SlowDatabase()
+        storage = make_storage(db)
+        await storage.set_state(KEY, "Form:name")
+        flush = asyncio.create_task(storage.flush())
+        storage.tasks = [flush]
+        await db.writing.wait()
+        db.release.set()
+        await storage.close()
+        return db.rows
+
+    rows = asyncio.run(scenario())
+    assert [row[0] for row in rows.values()] == ["Form:name"]
+
+
+def test_change_made_during_flush_wins_over_requeued_batch():
+    async def scenario():
+        db = SlowDatabase()
+        storage = make_storage(db)
+        await storage.set_state(KEY, "Form:name")
+        flush = asyncio.create_task(storage.flush())
+        await db.writing.wait()
+        await storage.set_state(KEY, "Form:phone")
+        flush.cancel()
+        await asyncio.gather(flush, return_exceptions=True)
+        return await storage.get_state(KEY)
+
+    assert asyncio.run(scenario()) == "Form:phone"
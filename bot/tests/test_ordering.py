@@ -0,0 +1,77 @@
+import asyncio
+import importlib.util
+import os
+from datetime import datetime
+
+from aiogram import Bot, Dispatcher, F, Router
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.types import Chat, Message, Update, User
+
+ORDERING_PATH = os.path.join(os.path.dirname(__file__), "..", "middlewares", "ordering.py")
+FAKE_TOKEN = "42:TEST"
+
+
+def load_ordering_module():
+    # Loaded by path: the middlewares package imports config, which needs bot/config.yaml
+    spec = importlib.util.spec_from_file_location("ordering", ORDERING_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def make_update(update_id: int, text: str) -> Update:
+    user = User(id=1, is_bot=False, first_name="Test")
+    return Update(update_id=update_id, message=Message(
+        message_id=update_id, date=datetime.now(), chat=Chat(id=1, type="private"), from_user=user, text=text
+    ))
+
+
+async def feed_two_updates(register_after_fsm: bool) -> list:
+    """The second update of the user arrives while the first one is about to set a state."""
+    ordering = load_ordering_module()
+    seen_states = []
+    router = Router()
+
+    @router.message(F.text == "/set")
+    async def set_state(message: Message, state: FSMContext) -> None:
+        await asyncio.sleep(0.05)
+        await state.set_state("Form:name")
+
+    @router.message(F.text == "name")
+    async def fallback(message: Message, raw_state: str) -> None:
+        seen_states.append(raw_state)
+
+    dp = Dispatcher(storage=MemoryStorage())
+    dp.include_router(router)
+    middleware = ordering.UpdateOrderingMiddleware(concurrency=8)
+    if register_after_fsm:
+        dp.update.outer_middleware(middleware)
+    else:
+        ordering.setup_update_ordering(dp, middleware)
+
+    bot = Bot(token=FAKE_TOKEN)
+    first = asyncio.create_task(dp.feed_update(bot, make_update(1, "/set")))
+    await asyncio.sleep(0)
+    await dp.feed_update(bot, make_update(2, "name"))
+    await first
+    await bot.session.close()
+    return seen_states
+
+
+def test_queued_update_sees_state_set_by_previous_update():
+    assert asyncio.run(feed_two_updates(register_after_fsm=False)) == ["Form:name"]
+
+
+def test_registering_after_fsm_middleware_reads_stale_state():
+    # What setup_update_ordering prevents
+    assert asyncio.run(feed_two_updates(register_after_fsm=True)) == [None]
+
+
+def test_ordering_middleware_runs_before_fsm_middleware():
+    ordering = load_ordering_module()
+    dp = Dispatcher(storage=MemoryStorage())
+    middleware = ordering.UpdateOrderingMiddleware()
+    ordering.setup_update_ordering(dp, middleware)
+    middlewares = list(dp.update.outer_middleware)
+    assert middlewares.index(middleware) == middlewares.index(dp.fsm) - 1
@@ -0,0 +1,40 @@
+import importlib.util
+import os
+
+SHARDING_PATH = os.path.join(os.path.dirname(__file__), "..", "utils", "sharding.py")
+
+
+def load_sharding_module():
+    # Loaded by path: the utils package imports config, which needs bot/config.yaml
+    spec = importlib.util.spec_from_file_location("sharding", SHARDING_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_chat_member_update_belongs_to_the_member():
+    sharding = load_sharding_module()
+    update = {"update_id": 1, "chat_member": {
+        "chat": {"id": -100, "type": "supergroup"},
+        "from": {"id": 7, "is_bot": False, "first_name": "Admin"},
+        "date": 0,
+        "old_chat_member": {"status": "left", "user": {"id": 42, "is_bot": False, "first_name": "New"}},
+        "new_chat_member": {"status": "member", "user": {"id": 42, "is_bot": False, "first_name": "New"}},
+    }}
+    assert sharding.update_owner(update) == 42
+
+
+def test_group_join_message_belongs_to_its_sender():
+    sharding = load_sharding_module()
+    joined = {"id": 42, "is_bot": False, "first_name": "New"}
+    # Telegram still sends the legacy new_chat_member field: a User, not a ChatMember
+    update = {"update_id": 2, "message": {
+        "message_id": 10,
+        "date": 0,
+        "chat": {"id": -100, "type": "group"},
+        "from": joined,
+        "new_chat_member": joined,
+        "new_chat_participant": joined,
+        "new_chat_members": [joined],
+    }}
+    assert sharding.update_owner(update) == 42
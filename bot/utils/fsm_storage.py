@@ -0,0 +1,458 @@
+import asyncio
+import json
+import logging
+import sys
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+
+logger = logging.getLogger(__name__)
+
+# Row as stored in the database: (state, data, updated_at)
+Row = Tuple[Optional[str], Dict[str, Any], float]
+
+
+def _encode(value: Any) -> Any:
+    # FSM data keeps datetimes (e.g. raffle start/end dates), JSON does not
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    if isinstance(value, date):
+        return {"__date__": value.isoformat()}
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _decode(obj: Dict[str, Any]) -> Any:
+    if "__datetime__" in obj:
+        return datetime.fromisoformat(obj["__datetime__"])
+    if "__date__" in obj:
+        return date.fromisoformat(obj["__date__"])
+    return obj
+
+
+def approx_size(value: Any) -> int:
+    """Rough deep size of FSM data in bytes (containers and their items)."""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(approx_size(k) + approx_size(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set)):
+        size += sum(approx_size(item) for item in value)
+    return size
+
+
+def dump_data(data: Dict[str, Any]) -> str:
+    return json.dumps(data, default=_encode, ensure_ascii=False)
+
+
+def load_data(raw: str) -> Dict[str, Any]:
+    return json.loads(raw, object_hook=_decode)
+
+
+class PostgresFSMDatabase:
+    """FSM table in Postgres, accessed through an asyncpg pool."""
+
+    def __init__(self, dsn: str, table: str = "fsm_states"):
+        self.dsn = dsn
+        self.table = table
+        self.pool = None
+
+    async def connect(self) -> None:
+        import asyncpg
+
+        self.pool = await asyncpg.create_pool(self.dsn, min_size=1, max_size=5)
+        async with self.pool.acquire() as conn:
+            await conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                "key TEXT PRIMARY KEY, state TEXT, data TEXT NOT NULL, "
+                "updated_at DOUBLE PRECISION NOT NULL)"
+            )
+            await conn.execute(
+                f"CREATE INDEX IF NOT EXISTS ix_{self.table}_updated_at ON {self.table} (updated_at)"
+            )
+
+    async def fetch(self, key: str) -> Optional[Row]:
+        row = await self.pool.fetchrow(
+            f"SELECT state, data, updated_at FROM {self.table} WHERE key = $1", key
+        )
+        if row is None:
+            return None
+        return row["state"], load_data(row["data"]), row["updated_at"]
+
+    async def write(self, upserts: List[Tuple[str, Row]], deletes: List[str]) -> None:
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                if upserts:
+                    await conn.executemany(
+                        f"INSERT INTO {self.table} (key, state, data, updated_at) VALUES ($1, $2, $3, $4) "
+                        "ON CONFLICT (key) DO UPDATE SET state = EXCLUDED.state, "
+                        "data = EXCLUDED.data, updated_at = EXCLUDED.updated_at",
+                        [(key, state, dump_data(data), updated_at) for key, (state, data, updated_at) in upserts]
+                    )
+                if deletes:
+                    await conn.execute(f"DELETE FROM {self.table} WHERE key = ANY($1::text[])", deletes)
+
+    async def delete_older_than(self, timestamp: float) -> int:
+        result = await self.pool.execute(f"DELETE FROM {self.table} WHERE updated_at < $1", timestamp)
+        return int(result.split()[-1])
+
+    async def close(self) -> None:
+        if self.pool is not None:
+            await self.pool.close()
+
+
+class SQLiteFSMDatabase:
+    """FSM table in a local SQLite file, for single-process development runs."""
+
+    def __init__(self, path: str, table: str = "fsm_states"):
+        self.path = path
+        self.table = table
+        self.conn = None
+
+    async def connect(self) -> None:
+        import aiosqlite
+
+        self.conn = await aiosqlite.connect(self.path)
+        await self.conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.table} ("
+            "key TEXT PRIMARY KEY, state TEXT, data TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        await self.conn.execute(
+            f"CREATE INDEX IF NOT EXISTS ix_{self.table}_updated_at ON {self.table} (updated_at)"
+        )
+        await self.conn.commit()
+
+    async def fetch(self, key: str) -> Optional[Row]:
+        async with self.conn.execute(
+            f"SELECT state, data, updated_at FROM {self.table} WHERE key = ?", (key,)
+        ) as cursor:
+            row = await cursor.fetchone()
+        if row is None:
+            return None
+        return row[0], load_data(row[1]), row[2]
+
+    async def write(self, upserts: List[Tuple[str, Row]], deletes: List[str]) -> None:
+        if upserts:
+            await self.conn.executemany(
+                f"INSERT INTO {self.table} (key, state, data, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET state = excluded.state, "
+                "data = excluded.data, updated_at = excluded.updated_at",
+                [(key, state, dump_data(data), updated_at) for key, (state, data, updated_at) in upserts]
+            )
+        if deletes:
+            await self.conn.executemany(f"DELETE FROM {self.table} WHERE key = ?", [(key,) for key in deletes])
+        await self.conn.commit()
+
+    async def delete_older_than(self, timestamp: float) -> int:
+        cursor = await self.conn.execute(f"DELETE FROM {self.table} WHERE updated_at < ?", (timestamp,))
+        await self.conn.commit()
+        return cursor.rowcount
+
+    async def close(self) -> None:
+        if self.conn is not None:
+            await self.conn.close()
+
+
+class MemoryRecord:
+    __slots__ = ("state", "data", "touched_at")
+
+    def __init__(self, state: Optional[str], data: Dict[str, Any], touched_at: float):
+        self.state = state
+        self.data = data
+        self.touched_at = touched_at
+
+
+class BoundedMemoryStorage(BaseStorage):
+    """
+    Drop-in replacement for aiogram's MemoryStorage with bounded memory.
+
+    Records are kept in order of last write and removed once not written
+    for `ttl` seconds or, oldest write first, when more than `max_size` users
+    hold a state. Reads neither reorder records nor extend their ttl. Reads of
+    unknown keys do not create records, and a cleared state with empty data
+    frees its record. Because the order is also the order of expiry, expired
+    records are always at the front and are dropped in O(expired) on every
+    write.
+    """
+
+    def __init__(self, ttl: float = 86400, max_size: int = 100000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.records: "OrderedDict[StorageKey, MemoryRecord]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evicted = 0
+
+    def expire(self, now: float) -> None:
+        records = self.records
+        while records:
+            key, record = next(iter(records.items()))
+            if now - record.touched_at <= self.ttl:
+                break
+            del records[key]
+            self.expired += 1
+
+    def get_record(self, key: StorageKey) -> Optional[MemoryRecord]:
+        record = self.records.get(key)
+        if record is None:
+            self.misses += 1
+            return None
+        if time.monotonic() - record.touched_at > self.ttl:
+            del self.records[key]
+            self.expired += 1
+            self.misses += 1
+            return None
+        self.hits += 1
+        return record
+
+    def put(self, key: StorageKey, state: Optional[str], data: Dict[str, Any]) -> None:
+        now = time.monotonic()
+        self.expire(now)
+        if state is None and not data:
+            self.records.pop(key, None)
+            return
+        self.records[key] = MemoryRecord(state, data, now)
+        self.records.move_to_end(key)
+        while len(self.records) > self.max_size:
+            self.records.popitem(last=False)
+            self.evicted += 1
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        record = self.get_record(key)
+        state = state.state if isinstance(state, State) else state
+        self.put(key, state, record.data if record else {})
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        record = self.get_record(key)
+        return record.state if record else None
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        record = self.get_record(key)
+        self.put(key, record.state if record else None, data.copy())
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        record = self.get_record(key)
+        return record.data.copy() if record else {}
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters and approximate memory use, computed on demand."""
+        self.expire(time.monotonic())
+        return {
+            "storage": type(self).__name__,
+            "records": len(self.records),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "with_state": sum(1 for record in self.records.values() if record.state),
+            "approx_bytes": sum(approx_size(record.data) + sys.getsizeof(record)
+                                for record in self.records.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "evicted": self.evicted,
+        }
+
+    async def close(self) -> None:
+        self.records.clear()
+
+
+class SQLStorage(BaseStorage):
+    """
+    FSM storage persisted in Postgres or SQLite.
+
+    Reads are served from a bounded in-process LRU cache and fall back to the
+    database. Writes update the cache immediately and are flushed to the
+    database in batches every `flush_interval` seconds (and on close), so a
+    crash loses at most that much of the latest changes. States untouched for
+    `state_ttl` seconds are treated as abandoned and deleted.
+
+    With several bot replicas, updates of one user should reach the same
+    replica (see the sharding mode), otherwise `cache_ttl` bounds how long a
+    replica may serve a state changed elsewhere.
+    """
+
+    def __init__(
+        self,
+        db: Any,
+        state_ttl: float = 86400,
+        cache_size: int = 10000,
+        cache_ttl: float = 60,
+        flush_interval: float = 0.5,
+        key_builder: Optional[KeyBuilder] = None
+    ):
+        self.db = db
+        self.state_ttl = state_ttl
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.flush_interval = flush_interval
+        self.key_builder = key_builder or DefaultKeyBuilder(with_bot_id=True, with_destiny=True)
+        # key -> (row, monotonic time it was cached)
+        self.cache: "OrderedDict[str, Tuple[Row, float]]" = OrderedDict()
+        self.dirty: Dict[str, Row] = {}
+        # Batch being written: still served to reads until the write commits
+        self.flushing: Dict[str, Row] = {}
+        self.started = False
+        self.start_lock = asyncio.Lock()
+        self.tasks: List[asyncio.Task] = []
+
+    async def start(self) -> None:
+        async with self.start_lock:
+            if self.started:
+                return
+            await self.db.connect()
+            self.tasks = [
+                asyncio.create_task(self.flush_loop(), name="fsm_flush"),
+                asyncio.create_task(self.sweep_loop(), name="fsm_sweep"),
+            ]
+            self.started = True
+            logger.info(f"FSM storage started with {type(self.db).__name__}")
+
+    def cache_put(self, key: str, row: Row) -> None:
+        self.cache[key] = (row, time.monotonic())
+        self.cache.move_to_end(key)
+        while len(self.cache) > self.cache_size:
+            # Evicted entries that are still dirty are served from self.dirty or self.flushing
+            self.cache.popitem(last=False)
+
+    async def get_row(self, key: StorageKey) -> Row:
+        if not self.started:
+            await self.start()
+        storage_key = self.key_builder.build(key)
+        cached = self.cache.get(storage_key)
+        if cached is not None and time.monotonic() - cached[1] <= self.cache_ttl:
+            self.cache.move_to_end(storage_key)
+            row = cached[0]
+        elif storage_key in self.dirty:
+            row = self.dirty[storage_key]
+        elif storage_key in self.flushing:
+            row = self.flushing[storage_key]
+        else:
+            row = await self.db.fetch(storage_key) or (None, {}, time.time())
+            self.cache_put(storage_key, row)
+        if time.time() - row[2] > self.state_ttl:
+            return None, {}, time.time()
+        return row
+
+    async def put_row(self, key: StorageKey, row: Row) -> None:
+        if not self.started:
+            await self.start()
+        storage_key = self.key_builder.build(key)
+        self.cache_put(storage_key, row)
+        self.dirty[storage_key] = row
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        _, data, _ = await self.get_row(key)
+        state = state.state if isinstance(state, State) else state
+        await self.put_row(key, (state, data, time.time()))
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return (await self.get_row(key))[0]
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        state, _, _ = await self.get_row(key)
+        await self.put_row(key, (state, data.copy(), time.time()))
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        return (await self.get_row(key))[1].copy()
+
+    async def flush(self) -> None:
+        if not self.dirty:
+            return
+        batch, self.dirty = self.dirty, {}
+        self.flushing = batch
+        upserts = [(key, row) for key, row in batch.items() if row[0] is not None or row[1]]
+        deletes = [key for key, row in batch.items() if row[0] is None and not row[1]]
+        try:
+            await self.db.write(upserts, deletes)
+        except Exception as e:
+            logger.error(f"FSM flush of {len(batch)} states failed, will retry: {e}")
+            self.requeue(batch)
+        except BaseException:
+            # Cancelled, at shutdown for instance: close() writes it again
+            self.requeue(batch)
+            raise
+        finally:
+            self.flushing = {}
+
+    def requeue(self, batch: Dict[str, Row]) -> None:
+        # Changes made while the batch was being written are newer and win
+        for key, row in batch.items():
+            self.dirty.setdefault(key, row)
+
+    async def flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def sweep_loop(self) -> None:
+        interval = min(self.state_ttl / 10, 600)
+        while True:
+            await asyncio.sleep(interval)
+            cutoff = time.time() - self.state_ttl
+            try:
+                deleted = await self.db.delete_older_than(cutoff)
+                if deleted:
+                    logger.info(f"Expired {deleted} abandoned FSM states")
+            except Exception as e:
+                logger.error(f"FSM sweep failed: {e}")
+            for key in [key for key, (row, _) in self.cache.items() if row[2] < cutoff]:
+                del self.cache[key]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "storage": f"{type(self).__name__}({type(self.db).__name__})",
+            "cached": len(self.cache),
+            "cache_size": self.cache_size,
+            "dirty": len(self.dirty),
+            "ttl": self.state_ttl,
+            "approx_bytes": sum(approx_size(row[1]) for row, _ in self.cache.values()),
+        }
+
+    async def close(self) -> None:
+        if not self.started:
+            return
+        for task in self.tasks:
+            task.cancel()
+        # Let an interrupted flush put its batch back before the final one
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        await self.flush()
+        await self.db.close()
+        self.started = False
+
+
+def create_fsm_storage(
+    backend: str,
+    dsn: Optional[str] = None,
+    state_ttl: float = 86400,
+    max_states: int = 100000,
+    cache_size: int = 10000,
+    cache_ttl: float = 60,
+    flush_interval: float = 0.5
+) -> BaseStorage:
+    """
+    Build the FSM storage selected in the bot config.
+
+    Args:
+        backend: "memory", "postgres" or "sqlite"
+        dsn: Postgres DSN or SQLite file path
+
+    Returns:
+        Storage instance for the Dispatcher
+    """
+    if backend == "memory":
+        return BoundedMemoryStorage(ttl=state_ttl, max_size=max_states)
+    if backend == "postgres":
+        db: Any = PostgresFSMDatabase(dsn)
+    elif backend == "sqlite":
+        db = SQLiteFSMDatabase(dsn or "bot/fsm.sqlite3")
+    else:
+        raise ValueError(f"Unknown FSM storage backend: {backend}")
+    return SQLStorage(
+        db,
+        state_ttl=state_ttl,
+        cache_size=cache_size,
+        cache_ttl=cache_ttl,
+        flush_interval=flush_interval
+    )
@@ -1,29 +1,230 @@
+import builtins
+import hashlib
+import logging
+import marshal
+import os
+from importlib.metadata import version
+from importlib.util import MAGIC_NUMBER
+from typing import Any, Dict, Iterable, List, Optional
+
+import babel
+import babel.plural
+from fluent_compiler import runtime
+from fluent_compiler.builtins import BUILTINS
 from fluent_compiler.bundle import FluentBundle
-from fluentogram import FluentTranslator, TranslatorHub
+from fluent_compiler.compiler import (LOCALE_NAME, PLURAL_FORM_FOR_NUMBER_NAME, _parse_resources,
+                                      messages_to_module)
+from fluent_compiler.resource import FtlResource
+from fluent_compiler.utils import TERM_SIGIL
+from fluentogram import FluentTranslator, TranslatorHub, TranslatorRunner
+
+logger = logging.getLogger(__name__)
+
+LOCALES_DIR = "bot/locales"
+# Compiled catalogs, one file per locale and catalog version; safe to delete
+CATALOG_CACHE_DIR = "bot/locales/.compiled"
+# locale -> Fluent (babel) locale of its catalog
+CATALOG_LOCALES = {
+    "ru": "ru-RU",
+    "en": "en-US",
+}
+# locale -> translators tried in order
+LOCALES_MAP = {
+    "ru": ("ru", "en"),
+    "en": ("en", "ru"),
+}
+ROOT_LOCALE = "en"
+
+
+def catalog_path(locale: str) -> str:
+    return os.path.join(LOCALES_DIR, locale, "LC_MESSAGES", "txt.ftl")
+
+
+def catalog_digest(bundle_locale: str, text: str) -> str:
+    # Generated code depends on the compiler and the bytecode format too
+    digest = hashlib.sha256()
+    for part in (bundle_locale, version("fluent_compiler"), MAGIC_NUMBER.hex(), text):
+        digest.update(part.encode())
+        digest.update(b"\0")
+    return digest.hexdigest()[:16]
+
+
+def catalog_globals(bundle_locale: str, functions: Dict[str, str]) -> Dict[str, Any]:
+    """Module globals the generated message functions run with, as set up by fluent_compiler."""
+    babel_locale = babel.Locale.parse(bundle_locale.replace("-", "_"))
+    plural_form_for_number_main = babel.plural.to_python(babel_locale.plural_form)
+
+    def plural_form_for_number(number):
+        try:
+            return plural_form_for_number_main(number)
+        except TypeError:
+            return None
+
+    module_globals = {name: getattr(runtime, name) for name in runtime.__all__}
+    module_globals.update(builtins.__dict__)
+    module_globals[LOCALE_NAME] = babel_locale
+    module_globals[PLURAL_FORM_FOR_NUMBER_NAME] = plural_form_for_number
+    for assigned_name, function_name in functions.items():
+        module_globals[assigned_name] = BUILTINS[function_name]
+    return module_globals
+
+
+def bundle_from_artifact(bundle_locale: str, artifact: Dict[str, Any]) -> FluentBundle:
+    module_globals = catalog_globals(bundle_locale, artifact["functions"])
+    for code in artifact["codes"]:
+        exec(code, module_globals)
+
+    bundle = FluentBundle.__new__(FluentBundle)
+    bundle.locale = bundle_locale
+    bundle._compiled_messages = {
+        message_id: module_globals[function_name]
+        for message_id, function_name in artifact["messages"].items()
+        if not message_id.startswith(TERM_SIGIL)
+    }
+    bundle._compilation_errors = []
+    return bundle
+
+
+def compile_artifact(bundle_locale: str, resource: FtlResource) -> Optional[Dict[str, Any]]:
+    """
+    Compile a catalog to marshalable code objects.
+
+    Returns None if the compiler set up globals catalog_globals cannot
+    rebuild, in which case the catalog is compiled on every start.
+    """
+    messages, errors = _parse_resources([resource])
+    babel_locale = babel.Locale.parse(bundle_locale.replace("-", "_"))
+    module, message_mapping, module_globals, compilation_errors = messages_to_module(
+        messages, babel_locale, functions=BUILTINS.copy()
+    )
+    for message_id, error in errors + compilation_errors:
+        description = error.args[0] if error.args else error
+        logger.warning(f"Catalog {bundle_locale}, message {message_id}: {description}")
+
+    functions = {
+        name: function_name
+        for name, value in module_globals.items()
+        for function_name, function in BUILTINS.items()
+        if value is function
+    }
+    if set(catalog_globals(bundle_locale, functions)) != set(module_globals):
+        logger.warning(f"Catalog {bundle_locale}: unexpected compiler globals, not caching")
+        return None
+
+    codes = []
+    for module_ast in module.as_multiple_module_ast():
+        filename = getattr(module_ast.body[0], "filename", "<string>")
+        codes.append(compile(module_ast, filename, "exec"))
+    return {"codes": codes, "messages": dict(message_mapping), "functions": functions}
 
 
-def create_translator_hub() -> TranslatorHub:
-    translator_hub = TranslatorHub(
-        {
-            "ru": ("ru", "en"),
-            "en": ("en", "ru")
-        },
+def load_bundle(locale: str, cache_dir: str = CATALOG_CACHE_DIR) -> FluentBundle:
+    """
+    Catalog of `locale`, from the compiled artifact when it is up to date.
+
+    Artifacts are keyed on the .ftl contents, so an edited catalog is
+    compiled again and stale artifacts are left for cleanup.
+    """
+    bundle_locale = CATALOG_LOCALES[locale]
+    resource = FtlResource.from_file(catalog_path(locale))
+    artifact_path = os.path.join(cache_dir, f"{locale}-{catalog_digest(bundle_locale, resource.text)}.bin")
+
+    try:
+        with open(artifact_path, "rb") as artifact_file:
+            return bundle_from_artifact(bundle_locale, marshal.load(artifact_file))
+    except FileNotFoundError:
+        pass
+    except (EOFError, ValueError, TypeError, KeyError) as e:
+        logger.warning(f"Broken compiled catalog {artifact_path}, recompiling: {e}")
+
+    artifact = compile_artifact(bundle_locale, resource)
+    if artifact is None:
+        return FluentBundle(bundle_locale, [resource])
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f"{artifact_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as artifact_file:
+            marshal.dump(artifact, artifact_file)
+        os.replace(tmp_path, artifact_path)
+        logger.info(f"Compiled catalog {locale} to {artifact_path}")
+    except OSError as e:
+        logger.warning(f"Could not write compiled catalog {artifact_path}: {e}")
+    return bundle_from_artifact(bundle_locale, artifact)
+
+
+def normalize_locale(language_code: Optional[str]) -> str:
+    # Telegram sends IETF tags: "en", "ru", "pt-br", sometimes nothing
+    if not language_code:
+        return ""
+    return language_code.replace("_", "-").split("-")[0].lower()
+
+
+class CachedTranslatorRunner(TranslatorRunner):
+    """
+    TranslatorRunner that formats each argument-free message once per locale.
+
+    Runners stay one per update (attribute access keeps state), only the
+    rendered texts are shared through `rendered`.
+    """
+
+    def __init__(self, translators: Iterable[FluentTranslator], rendered: Dict[str, str], separator: str = "-"):
+        super().__init__(translators, separator=separator)
+        self.rendered = rendered
+
+    def _get_translation(self, key, **kwargs):
+        if kwargs:
+            return super()._get_translation(key, **kwargs)
+        text = self.rendered.get(key)
+        if text is None:
+            text = super()._get_translation(key)
+            if text is not None:
+                self.rendered[key] = text
+        return text
+
+
+class CachedTranslatorHub(TranslatorHub):
+    """TranslatorHub resolving Telegram language codes by dict lookup, with a render cache per locale."""
+
+    def __init__(self, locales_map: Dict[str, Iterable[str]], translators: List[FluentTranslator],
+                 root_locale: str = ROOT_LOCALE, separator: str = "-"):
+        super().__init__(locales_map, translators, root_locale=root_locale, separator=separator)
+        self.rendered: Dict[str, Dict[str, str]] = {locale: {} for locale in self.translators_map}
+        # Raw language code -> locale; Telegram only sends a few dozen codes
+        self.resolved: Dict[Optional[str], str] = {}
+
+    def resolve(self, language_code: Optional[str]) -> str:
+        locale = self.resolved.get(language_code)
+        if locale is None:
+            locale = normalize_locale(language_code)
+            if locale not in self.translators_map:
+                locale = self.root_locale
+            self.resolved[language_code] = locale
+        return locale
+
+    def get_translator_by_locale(self, locale: Optional[str]) -> CachedTranslatorRunner:
+        locale = self.resolve(locale)
+        return CachedTranslatorRunner(self.translators_map[locale], self.rendered[locale], separator=self.separator)
+
+    def stats(self) -> Dict[str, int]:
+        stats = {f"rendered_{locale}": len(texts) for locale, texts in self.rendered.items()}
+        stats["language_codes"] = len(self.resolved)
+        return stats
+
+
+def create_translator_hub() -> CachedTranslatorHub:
+    translator_hub = CachedTranslatorHub(
+        LOCALES_MAP,
         [
-            FluentTranslator(
-                locale="ru",
-                translator=FluentBundle.from_files(
-                    locale="ru-RU",
-                    filenames=["bot/locales/ru/LC_MESSAGES/txt.ftl"]
-                )
-        ),
-            FluentTranslator(
-                locale="en",
-                translator=FluentBundle.from_files(
-                    locale="en-US",
-                    filenames=["bot/locales/en/LC_MESSAGES/txt.ftl"]
-                )
-            )
+            FluentTranslator(locale=locale, translator=load_bundle(locale))
+            for locale in CATALOG_LOCALES
         ]
     )
 
     return translator_hub
+
+
+if __name__ == "__main__":
+    # Build step: python bot/utils/i18n.py
+    logging.basicConfig(level=logging.INFO)
+    for locale in CATALOG_LOCALES:
+        load_bundle(locale)
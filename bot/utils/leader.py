@@ -0,0 +1,147 @@
+import asyncio
+import fcntl
+import hashlib
+import logging
+import os
+from typing import Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def lock_key(name: str) -> int:
+    """Stable signed 64-bit advisory lock key for a job name."""
+    return int.from_bytes(hashlib.sha256(name.encode()).digest()[:8], "big", signed=True)
+
+
+class PostgresLease:
+    """
+    Leadership held as a session-level Postgres advisory lock.
+
+    The lock lives as long as the connection: when the leader process dies,
+    Postgres drops the connection and releases the lock at once. TCP
+    keepalives bound how long a silently vanished host keeps it.
+    """
+
+    def __init__(self, dsn: str, name: str):
+        self.dsn = dsn
+        self.name = name
+        self.key = lock_key(name)
+        self.conn = None
+
+    async def acquire(self) -> bool:
+        import asyncpg
+
+        if self.conn is None or self.conn.is_closed():
+            self.conn = await asyncpg.connect(self.dsn, timeout=5, server_settings={
+                "application_name": f"leader:{self.name}",
+                "tcp_keepalives_idle": "5",
+                "tcp_keepalives_interval": "2",
+                "tcp_keepalives_count": "3",
+            })
+        return await self.conn.fetchval("SELECT pg_try_advisory_lock($1)", self.key)
+
+    async def check(self) -> bool:
+        # A session lock is held for as long as its session is alive
+        try:
+            return await self.conn.fetchval("SELECT 1", timeout=5) == 1
+        except Exception as e:
+            logger.error(f"Leader check for {self.name} failed: {e}")
+            return False
+
+    async def release(self) -> None:
+        # Closing the connection releases the lock even if unlock cannot be sent
+        if self.conn is not None:
+            try:
+                await self.conn.close(timeout=5)
+            except Exception:
+                self.conn.terminate()
+            self.conn = None
+
+
+class FileLease:
+    """Leadership held as an exclusive flock, for processes on one host."""
+
+    def __init__(self, lock_dir: str, name: str):
+        self.path = os.path.join(lock_dir, f"{name}.lock")
+        self.name = name
+        self.fd: Optional[int] = None
+
+    async def acquire(self) -> bool:
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        self.fd = fd
+        return True
+
+    async def check(self) -> bool:
+        # The kernel releases the lock only when the process exits
+        return self.fd is not None
+
+    async def release(self) -> None:
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+def create_lease(name: str, dsn: Optional[str], lock_dir: str):
+    if dsn:
+        return PostgresLease(dsn, name)
+    return FileLease(lock_dir, name)
+
+
+async def run_as_leader(
+    name: str,
+    job: Callable[[], Awaitable[None]],
+    dsn: Optional[str] = None,
+    lock_dir: str = "/tmp",
+    retry_interval: float = 5,
+    check_interval: float = 5
+) -> None:
+    """
+    Run `job` in exactly one process among all that call this with `name`.
+
+    Every process campaigns for the lease; the holder runs the job while the
+    others retry every `retry_interval` seconds, so a dead leader is replaced
+    within that time. The holder re-checks the lease every `check_interval`
+    seconds and cancels the job as soon as it can no longer confirm it.
+
+    Args:
+        name: Job name, the lock key is derived from it
+        job: Coroutine function with the job's main loop
+        dsn: Postgres DSN; without it a file lock in `lock_dir` is used
+        lock_dir: Directory for file locks
+        retry_interval: Seconds between attempts to become leader
+        check_interval: Seconds between lease checks while leading
+    """
+    lease = create_lease(name, dsn, lock_dir)
+    while True:
+        try:
+            acquired = await lease.acquire()
+        except Exception as e:
+            logger.error(f"Could not campaign for {name}: {e}")
+            await lease.release()
+            acquired = False
+        if not acquired:
+            await asyncio.sleep(retry_interval)
+            continue
+
+        logger.info(f"Became leader for {name}")
+        task = asyncio.create_task(job(), name=name)
+        try:
+            while not task.done():
+                await asyncio.wait({task}, timeout=check_interval)
+                if not task.done() and not await lease.check():
+                    logger.error(f"Lost leadership for {name}, stopping job")
+                    break
+        finally:
+            if not task.done():
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+            await lease.release()
+
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Job {name} failed: {task.exception()}")
+        await asyncio.sleep(retry_interval)
@@ -0,0 +1,161 @@
+import atexit
+import json
+import logging
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional, TextIO
+
+TEXT_FORMAT = ('%(filename)s:%(lineno)d #%(levelname)-8s '
+               '[%(asctime)s] - %(name)s - %(message)s')
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with the trace id when the record was made inside a sampled span."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "location": f"{record.filename}:{record.lineno}",
+        }
+        trace_id = getattr(record, "trace_id", None)
+        if trace_id:
+            entry["trace_id"] = trace_id
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        if record.stack_info:
+            entry["stack"] = record.stack_info
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps only a share of the records below WARNING of chatty loggers.
+
+    A ratio applies to the logger and its children ("aiogram" covers
+    "aiogram.event"), the most specific one winning; warnings and errors
+    always pass.
+    """
+
+    def __init__(self, ratios: Dict[str, float]):
+        super().__init__()
+        self.ratios = ratios
+        # logger name -> ratio, resolved on first use
+        self.resolved: Dict[str, float] = {}
+        self.dropped = 0
+
+    def ratio(self, name: str) -> float:
+        ratio = self.resolved.get(name)
+        if ratio is None:
+            ratio, candidate = 1.0, name
+            while candidate:
+                if candidate in self.ratios:
+                    ratio = self.ratios[candidate]
+                    break
+                candidate = candidate.rpartition(".")[0]
+            self.resolved[name] = ratio
+        return ratio
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        ratio = self.ratio(record.name)
+        if ratio >= 1 or random.random() < ratio:
+            return True
+        self.dropped += 1
+        return False
+
+
+class LazyQueueHandler(QueueHandler):
+    """
+    Hands records to the writer thread without formatting them.
+
+    The stock QueueHandler formats each record in the calling thread, that
+    is on the event loop; here only the message is merged with its args
+    (which may change once the call returns), and timestamps, JSON and
+    tracebacks are formatted by the listener. A full queue drops the record
+    rather than blocking.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.args:
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+listener: Optional[QueueListener] = None
+queue_handler: Optional[LazyQueueHandler] = None
+
+
+def configure_logging(level: str = "INFO", json_format: bool = False, sample: Optional[Dict[str, float]] = None,
+                      files: Optional[Dict[str, str]] = None, queue_size: int = 10000,
+                      stream: Optional[TextIO] = None) -> None:
+    """
+    Route every record through a queue to one writer thread.
+
+    Replaces the handlers of the root logger. Records go to stderr and,
+    for the loggers in `files` (and their children), also to that file;
+    loggers in `sample` keep only that share of their records below
+    WARNING. Whatever is still queued is written at exit.
+    """
+    global listener, queue_handler
+    stop_logging()
+
+    formatter = JsonFormatter() if json_format else logging.Formatter(TEXT_FORMAT)
+    handlers = [logging.StreamHandler(stream or sys.stderr)]
+    for name, path in (files or {}).items():
+        handler = logging.FileHandler(path, encoding="utf-8")
+        handler.addFilter(logging.Filter(name))
+        handlers.append(handler)
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+    queue_handler = LazyQueueHandler(log_queue)
+    if sample:
+        queue_handler.addFilter(SamplingFilter(sample))
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level.upper())
+
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+
+
+def stop_logging() -> None:
+    """Write out queued records and stop the writer thread."""
+    global listener
+    if listener is not None:
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+        listener = None
+
+
+atexit.register(stop_logging)
+
+
+def logging_stats() -> Dict[str, int]:
+    if queue_handler is None:
+        return {}
+    sampled_out = sum(log_filter.dropped for log_filter in queue_handler.filters
+                      if isinstance(log_filter, SamplingFilter))
+    return {"queued": queue_handler.queue.qsize(), "dropped": queue_handler.dropped, "sampled_out": sampled_out}
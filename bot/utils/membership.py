@@ -0,0 +1,142 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple, Union
+
+from aiogram import Bot
+from aiogram.types import Chat, ChatMember, ChatMemberUpdated
+
+from config import get_optional_config, Membership
+
+logger = logging.getLogger(__name__)
+
+MEMBER_STATUSES = ("member", "administrator", "creator")
+
+
+def is_member_status(member: ChatMember) -> bool:
+    # Restricted users are still subscribed while is_member is set
+    if member.status == "restricted":
+        return bool(getattr(member, "is_member", False))
+    return member.status in MEMBER_STATUSES
+
+
+def is_chat(chat: Chat, chat_id: Union[int, str]) -> bool:
+    """Whether `chat` is the chat configured as `chat_id`, a numeric id or an @username."""
+    if isinstance(chat_id, str) and chat_id.startswith("@"):
+        return (chat.username or "").lower() == chat_id[1:].lower()
+    return str(chat.id) == str(chat_id)
+
+
+class MembershipCache:
+    """
+    Channel membership of users, cached with separate TTLs for members and non-members.
+
+    Non-members expire quickly so that a user who just subscribed is not
+    turned away for long. When the bot is an admin of the channel, Telegram
+    sends chat_member updates on every join and leave and `update` keeps the
+    cache current, so the positive TTL can be long. Concurrent checks of one
+    user share a single getChatMember call.
+    """
+
+    def __init__(self, positive_ttl: float = 600, negative_ttl: float = 30, max_size: int = 100000):
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self.max_size = max_size
+        # user_id -> (is_member, expires_at), oldest first
+        self.entries: "OrderedDict[int, Tuple[bool, float]]" = OrderedDict()
+        self.pending: Dict[int, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.negative_rechecks = 0
+        self.coalesced = 0
+        self.updates = 0
+        self.api_calls = 0
+        self.api_errors = 0
+        self.evicted = 0
+
+    def get(self, user_id: int) -> Optional[bool]:
+        entry = self.entries.get(user_id)
+        if entry is None:
+            return None
+        if entry[1] <= time.monotonic():
+            del self.entries[user_id]
+            return None
+        return entry[0]
+
+    def set(self, user_id: int, is_member: bool) -> None:
+        ttl = self.positive_ttl if is_member else self.negative_ttl
+        self.entries[user_id] = (is_member, time.monotonic() + ttl)
+        self.entries.move_to_end(user_id)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self.evicted += 1
+
+    def update(self, event: ChatMemberUpdated) -> None:
+        """Apply a chat_member update of the channel."""
+        self.updates += 1
+        self.set(event.new_chat_member.user.id, is_member_status(event.new_chat_member))
+
+    async def fetch(self, bot: Bot, chat_id: Union[int, str], user_id: int) -> bool:
+        self.api_calls += 1
+        try:
+            member = await bot.get_chat_member(chat_id=chat_id, user_id=user_id)
+        except Exception:
+            self.api_errors += 1
+            raise
+        is_member = is_member_status(member)
+        self.set(user_id, is_member)
+        return is_member
+
+    async def is_member(self, bot: Bot, chat_id: Union[int, str], user_id: int, recheck_negative: bool = False) -> bool:
+        """
+        Whether the user is subscribed to the channel.
+
+        Args:
+            recheck_negative: Ask Telegram again if the user is cached as not
+                subscribed, for "I have subscribed" buttons
+
+        Raises:
+            TelegramAPIError: If getChatMember fails
+        """
+        cached = self.get(user_id)
+        if cached or (cached is False and not recheck_negative):
+            self.hits += 1
+            return cached
+        if cached is False:
+            self.negative_rechecks += 1
+        else:
+            self.misses += 1
+
+        pending = self.pending.get(user_id)
+        if pending is not None:
+            self.coalesced += 1
+            return await asyncio.shield(pending)
+        future = asyncio.ensure_future(self.fetch(bot, chat_id, user_id))
+        self.pending[user_id] = future
+        future.add_done_callback(lambda _: self.pending.pop(user_id, None))
+        return await asyncio.shield(future)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses + self.negative_rechecks
+        return {
+            "users": len(self.entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "negative_rechecks": self.negative_rechecks,
+            "coalesced": self.coalesced,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "chat_member_updates": self.updates,
+            "api_calls": self.api_calls,
+            "api_errors": self.api_errors,
+            "evicted": self.evicted,
+        }
+
+
+membership_config = get_optional_config(Membership, "membership")
+membership_cache = MembershipCache(
+    positive_ttl=membership_config.positive_ttl,
+    negative_ttl=membership_config.negative_ttl,
+    max_size=membership_config.max_size
+)
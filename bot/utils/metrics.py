@@ -0,0 +1,83 @@
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from prometheus_client import Counter, Histogram, disable_created_metrics, start_http_server
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# *_created series double the scrape size and nothing here uses them
+disable_created_metrics()
+
+HANDLER_DURATION = Histogram(
+    "bot_handler_duration_seconds", "Time to handle an update, throttling and blacklist check included",
+    ["handler"], buckets=LATENCY_BUCKETS
+)
+HANDLER_ERRORS = Counter("bot_handler_errors_total", "Handlers that raised", ["handler"])
+FSM_TRANSITIONS = Counter(
+    "bot_fsm_transitions_total", "FSM state changes made by handlers", ["from_state", "to_state"]
+)
+
+
+def start_metrics_server(host: str, port: int) -> None:
+    """Serve /metrics for Prometheus from a background thread."""
+    try:
+        start_http_server(port, addr=host)
+        logger.info(f"Metrics on http://{host}:{port}/metrics")
+    except OSError as e:
+        logger.error(f"Could not start metrics server on {host}:{port}: {e}")
+
+
+def histogram_summary(histogram: Histogram, errors: Optional[Counter] = None) -> List[Dict[str, Any]]:
+    """
+    Count, average and approximate p95 per label set of a histogram.
+
+    p95 is the upper bound of the bucket it falls in, so "≤ 250 ms" rather
+    than an exact value.
+    """
+    series: Dict[Tuple[str, ...], Dict[str, Any]] = {}
+    for metric in histogram.collect():
+        for sample in metric.samples:
+            labels = tuple(value for name, value in sample.labels.items() if name != "le")
+            entry = series.setdefault(labels, {"buckets": []})
+            if sample.name.endswith("_bucket"):
+                entry["buckets"].append((float(sample.labels["le"]), sample.value))
+            elif sample.name.endswith("_count"):
+                entry["count"] = sample.value
+            elif sample.name.endswith("_sum"):
+                entry["sum"] = sample.value
+
+    error_counts: Dict[Tuple[str, ...], float] = {}
+    if errors is not None:
+        for metric in errors.collect():
+            for sample in metric.samples:
+                if sample.name.endswith("_total"):
+                    error_counts[tuple(sample.labels.values())] = sample.value
+
+    summary = []
+    for labels, entry in series.items():
+        count = entry.get("count", 0)
+        if not count:
+            continue
+        p95 = next(bound for bound, cumulative in sorted(entry["buckets"]) if cumulative >= count * 0.95)
+        summary.append({
+            "name": " ".join(labels),
+            "count": int(count),
+            "errors": int(error_counts.get(labels, 0)),
+            "avg_ms": round(entry["sum"] / count * 1000, 1),
+            "p95_ms": p95 * 1000,
+            "total_s": round(entry["sum"], 1),
+        })
+    return sorted(summary, key=lambda item: -item["avg_ms"] * item["count"])
+
+
+def counter_totals(counter: Counter, label: str) -> Dict[str, int]:
+    """Sum of a counter per value of one of its labels."""
+    totals: Dict[str, int] = {}
+    for metric in counter.collect():
+        for sample in metric.samples:
+            if sample.name.endswith("_total"):
+                value = sample.labels[label]
+                totals[value] = totals.get(value, 0) + int(sample.value)
+    return totals
@@ -0,0 +1,311 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from collections import deque
+from enum import IntEnum
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+
+from aiogram import Bot
+from aiogram.exceptions import (TelegramAPIError, TelegramBadRequest, TelegramForbiddenError,
+                                TelegramNotFound, TelegramRetryAfter)
+from aiogram.methods import TelegramMethod
+
+logger = logging.getLogger(__name__)
+
+# Errors that will not go away on retry: blocked bot, deleted chat, bad payload
+PERMANENT_ERRORS = (TelegramBadRequest, TelegramForbiddenError, TelegramNotFound)
+# Delay before the n-th retry of a failed send
+RETRY_BACKOFF = (1, 5, 30)
+
+
+class Priority(IntEnum):
+    """Outbound lanes; a lower value is always sent first."""
+    TRANSACTIONAL = 0
+    NOTIFICATION = 1
+    MARKETING = 2
+
+
+class OutboundMessage:
+    __slots__ = ("method", "chat_id", "priority", "seq", "attempts", "enqueued_at", "result")
+
+    def __init__(self, method: TelegramMethod, chat_id: Any, priority: Priority, seq: int, result: asyncio.Future):
+        self.method = method
+        self.chat_id = chat_id
+        self.priority = priority
+        self.seq = seq
+        self.attempts = 0
+        self.enqueued_at = time.monotonic()
+        self.result = result
+
+    def __lt__(self, other: "OutboundMessage") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class TokenBucket:
+    """`rate` tokens per second, at most `burst` saved up."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def wait_time(self) -> float:
+        """Take a token if there is one, otherwise return seconds until there will be."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class Outbox:
+    """
+    Single outbound queue for messages the bot sends on its own.
+
+    Messages wait in a heap ordered by priority lane and arrival, so a
+    payment confirmation overtakes a queued broadcast. Sends are limited by a
+    global token bucket (Telegram allows about 30 messages per second) and a
+    minimum interval per chat, longer for groups and channels. A 429 pauses
+    the whole outbox for `retry_after` and requeues the message; other
+    failures are retried with backoff, and messages that cannot be delivered
+    end up in a bounded dead-letter queue.
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        rate: float = 25,
+        burst: int = 30,
+        chat_interval: float = 1.0,
+        group_interval: float = 3.0,
+        concurrency: int = 16,
+        max_attempts: int = 3,
+        max_queue: int = 100000,
+        dead_letter_size: int = 1000
+    ):
+        self.bot = bot
+        self.bucket = TokenBucket(rate, burst)
+        self.chat_interval = chat_interval
+        self.group_interval = group_interval
+        self.max_attempts = max_attempts
+        self.max_queue = max_queue
+        self.slots = asyncio.Semaphore(concurrency)
+        self.queue: List[OutboundMessage] = []
+        # (ready_at, message) for messages held back by chat limits, 429 or retry backoff
+        self.delayed: List[Tuple[float, OutboundMessage]] = []
+        self.chat_ready: Dict[Any, float] = {}
+        self.sending: Set[Any] = set()
+        self.paused_until = 0.0
+        self.dead_letters: Deque[Tuple[float, OutboundMessage, str]] = deque(maxlen=dead_letter_size)
+        self.wakeup = asyncio.Event()
+        self.seq = itertools.count()
+        self.task: Optional[asyncio.Task] = None
+        self.in_flight: Set[asyncio.Task] = set()
+        self.sent = {priority: 0 for priority in Priority}
+        self.failed = {priority: 0 for priority in Priority}
+        self.retried = 0
+        self.rate_limited = 0
+        self.max_latency = {priority: 0.0 for priority in Priority}
+
+    def send(self, method: TelegramMethod, priority: Priority = Priority.NOTIFICATION) -> asyncio.Future:
+        """
+        Queue a Telegram method (SendMessage, SendPhoto, ...) without waiting for it.
+
+        Returns:
+            Future set to True once delivered or False once dead-lettered;
+            callers are free to ignore it
+        """
+        result = asyncio.get_running_loop().create_future()
+        message = OutboundMessage(method, getattr(method, "chat_id", None), priority, next(self.seq), result)
+        if self.pending() >= self.max_queue:
+            self.dead_letter(message, "outbox full")
+            return result
+        heapq.heappush(self.queue, message)
+        self.wakeup.set()
+        return result
+
+    def pending(self) -> int:
+        return len(self.queue) + len(self.delayed)
+
+    def min_interval(self, chat_id: Any) -> float:
+        # Private chats have positive ids, groups and channels negative ids or @usernames
+        if isinstance(chat_id, int) and chat_id > 0:
+            return self.chat_interval
+        return self.group_interval
+
+    def delay(self, message: OutboundMessage, ready_at: float) -> None:
+        heapq.heappush(self.delayed, (ready_at, message))
+
+    def dead_letter(self, message: OutboundMessage, reason: str) -> None:
+        self.failed[message.priority] += 1
+        self.dead_letters.append((time.time(), message, reason))
+        logger.warning(f"Dead-lettered {type(message.method).__name__} to {message.chat_id} "
+                       f"after {message.attempts} attempts: {reason}")
+        if not message.result.done():
+            message.result.set_result(False)
+
+    def release_delayed(self, now: float) -> None:
+        while self.delayed and self.delayed[0][0] <= now:
+            heapq.heappush(self.queue, heapq.heappop(self.delayed)[1])
+
+    async def idle(self, now: float) -> None:
+        timeout = self.delayed[0][0] - now if self.delayed else None
+        self.wakeup.clear()
+        try:
+            await asyncio.wait_for(self.wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def run(self) -> None:
+        while True:
+            now = time.monotonic()
+            if now < self.paused_until:
+                await asyncio.sleep(self.paused_until - now)
+                continue
+            self.release_delayed(now)
+            if not self.queue:
+                await self.idle(now)
+                continue
+
+            message = heapq.heappop(self.queue)
+            chat_ready = self.chat_ready.get(message.chat_id, 0.0)
+            if message.chat_id in self.sending or chat_ready > now:
+                # Keeps per-chat order: the next message waits for the previous one
+                self.delay(message, max(chat_ready, now + self.min_interval(message.chat_id) / 4))
+                continue
+
+            wait = self.bucket.wait_time()
+            if wait:
+                heapq.heappush(self.queue, message)
+                await asyncio.sleep(wait)
+                continue
+
+            await self.slots.acquire()
+            self.sending.add(message.chat_id)
+            self.chat_ready[message.chat_id] = now + self.min_interval(message.chat_id)
+            task = asyncio.create_task(self.deliver(message))
+            self.in_flight.add(task)
+            task.add_done_callback(self.in_flight.discard)
+            self.forget_idle_chats(now)
+
+    def forget_idle_chats(self, now: float) -> None:
+        # chat_ready only matters for chats sent to in the last interval
+        if len(self.chat_ready) > 10000:
+            self.chat_ready = {chat_id: ready for chat_id, ready in self.chat_ready.items() if ready > now}
+
+    async def deliver(self, message: OutboundMessage) -> None:
+        message.attempts += 1
+        try:
+            await self.bot(message.method)
+        except TelegramRetryAfter as e:
+            # Flood control applies to the whole bot, not only this chat
+            self.rate_limited += 1
+            self.paused_until = max(self.paused_until, time.monotonic() + e.retry_after)
+            self.chat_ready[message.chat_id] = self.paused_until
+            message.attempts -= 1
+            logger.warning(f"Flood control, outbox paused for {e.retry_after}s")
+            self.delay(message, self.paused_until)
+        except PERMANENT_ERRORS as e:
+            self.dead_letter(message, str(e))
+        except (TelegramAPIError, OSError, asyncio.TimeoutError) as e:
+            if message.attempts >= self.max_attempts:
+                self.dead_letter(message, str(e))
+            else:
+                self.retried += 1
+                backoff = RETRY_BACKOFF[min(message.attempts, len(RETRY_BACKOFF)) - 1]
+                self.delay(message, time.monotonic() + backoff)
+        except Exception as e:
+            logger.error(f"Unexpected error sending to {message.chat_id}: {e}")
+            self.dead_letter(message, repr(e))
+        else:
+            self.sent[message.priority] += 1
+            latency = time.monotonic() - message.enqueued_at
+            self.max_latency[message.priority] = max(self.max_latency[message.priority], latency)
+            if not message.result.done():
+                message.result.set_result(True)
+        finally:
+            self.sending.discard(message.chat_id)
+            self.slots.release()
+            self.wakeup.set()
+
+    def start(self) -> None:
+        if self.task is None:
+            self.task = asyncio.create_task(self.run(), name="outbox")
+
+    async def stop(self, drain_timeout: float = 10) -> None:
+        """Send what is queued for up to `drain_timeout` seconds, then stop."""
+        deadline = time.monotonic() + drain_timeout
+        while (self.queue or self.delayed or self.in_flight) and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+        if self.in_flight:
+            await asyncio.gather(*self.in_flight, return_exceptions=True)
+        if self.pending():
+            logger.warning(f"Outbox stopped with {self.pending()} unsent messages")
+
+    def requeue_dead_letters(self) -> int:
+        """Queue all dead letters again; returns how many."""
+        count = 0
+        while self.dead_letters:
+            _, message, _ = self.dead_letters.popleft()
+            message.attempts = 0
+            message.result = asyncio.get_running_loop().create_future()
+            heapq.heappush(self.queue, message)
+            count += 1
+        self.wakeup.set()
+        return count
+
+    def stats(self) -> Dict[str, Any]:
+        queued = {priority: 0 for priority in Priority}
+        for message in itertools.chain(self.queue, (message for _, message in self.delayed)):
+            queued[message.priority] += 1
+        stats: Dict[str, Any] = {}
+        for priority in Priority:
+            lane = priority.name.lower()
+            stats[f"{lane}_queued"] = queued[priority]
+            stats[f"{lane}_sent"] = self.sent[priority]
+            stats[f"{lane}_failed"] = self.failed[priority]
+            stats[f"{lane}_max_latency_s"] = round(self.max_latency[priority], 2)
+        stats["in_flight"] = len(self.in_flight)
+        stats["retried"] = self.retried
+        stats["rate_limited"] = self.rate_limited
+        stats["dead_letters"] = len(self.dead_letters)
+        return stats
+
+
+outbox: Optional[Outbox] = None
+
+
+def start_outbox(bot: Bot, **limits: Any) -> Outbox:
+    global outbox
+    if outbox is None:
+        outbox = Outbox(bot, **limits)
+        outbox.start()
+        logger.info("Outbox started")
+    return outbox
+
+
+def get_outbox() -> Optional[Outbox]:
+    return outbox
+
+
+def enqueue(method: TelegramMethod, priority: Priority = Priority.NOTIFICATION) -> asyncio.Future:
+    """Queue a method on the process outbox; see Outbox.send."""
+    if outbox is None:
+        raise RuntimeError("Outbox is not started")
+    return outbox.send(method, priority)
+
+
+async def stop_outbox(drain_timeout: float = 10) -> None:
+    global outbox
+    if outbox is not None:
+        await outbox.stop(drain_timeout)
+        outbox = None
+        logger.info("Outbox stopped")
@@ -0,0 +1,161 @@
+from bisect import insort
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Tuple
+
+from aiogram import Router
+from aiogram.dispatcher.event.bases import UNHANDLED, SkipHandler
+from aiogram.dispatcher.event.handler import CallbackType, HandlerObject
+from aiogram.dispatcher.event.telegram import TelegramEventObserver
+from aiogram.filters import Filter
+from aiogram.filters.callback_data import CallbackQueryFilter
+from aiogram.types import CallbackQuery, Message, TelegramObject
+
+
+class IndexedFilter(Filter):
+    """
+    Exact or prefix match on a string field that the router can index.
+
+    `field` is "text" for messages and "data" for callback queries.
+    """
+    field: str = ""
+
+    def __init__(self, *values: str, prefix: bool = False):
+        self.prefix = prefix
+        self.values: FrozenSet[str] = frozenset(values)
+        self.prefixes: Tuple[str, ...] = tuple(values)
+
+    def match(self, value: Optional[str]) -> bool:
+        if value is None:
+            return False
+        if self.prefix:
+            return value.startswith(self.prefixes)
+        return value in self.values
+
+    def __str__(self) -> str:
+        kind = "prefix" if self.prefix else "exact"
+        return f"{type(self).__name__}({kind}: {', '.join(sorted(self.values))})"
+
+
+class Text(IndexedFilter):
+    """Message text equal to one of `values`."""
+    field = "text"
+
+    async def __call__(self, message: Message) -> bool:
+        return self.match(message.text)
+
+
+class TextPrefix(Text):
+    """Message text starting with one of `prefixes`."""
+
+    def __init__(self, *prefixes: str):
+        super().__init__(*prefixes, prefix=True)
+
+
+class Data(IndexedFilter):
+    """Callback data equal to one of `values`."""
+    field = "data"
+
+    async def __call__(self, callback: CallbackQuery) -> bool:
+        return self.match(callback.data)
+
+
+class DataPrefix(Data):
+    """Callback data starting with one of `prefixes`."""
+
+    def __init__(self, *prefixes: str):
+        super().__init__(*prefixes, prefix=True)
+
+
+def index_keys(field: str, filters: Tuple[CallbackType, ...]) -> Optional[Tuple[bool, FrozenSet[str]]]:
+    """(is_prefix, keys) of the first filter restricting `field`, if any."""
+    for item in filters:
+        if isinstance(item, IndexedFilter) and item.field == field:
+            return item.prefix, item.values
+        if isinstance(item, CallbackQueryFilter) and field == "data":
+            factory = item.callback_data
+            # A factory without fields packs to its bare prefix
+            if factory.model_fields:
+                return True, frozenset({factory.__prefix__ + factory.__separator__})
+            return False, frozenset({factory.__prefix__})
+    return None
+
+
+class IndexedEventObserver(TelegramEventObserver):
+    """
+    Event observer that only checks handlers able to match the event.
+
+    Handlers with an indexed filter (Text/Data, their prefix variants or a
+    CallbackData factory) are listed under their exact values and prefixes.
+    An event is then checked against the handlers found by one dict lookup
+    for its exact value and one per distinct prefix length, plus handlers
+    without an indexed filter, in registration order, so the outcome is
+    the same as with aiogram's linear scan.
+    """
+
+    def __init__(self, router: Router, event_name: str, field: str, key: Callable[[Any], Optional[str]]):
+        super().__init__(router=router, event_name=event_name)
+        self.field = field
+        self.key = key
+        self.exact: Dict[str, List[int]] = {}
+        self.prefixes: Dict[str, List[int]] = {}
+        self.prefix_lengths: List[int] = []
+        self.unindexed: List[int] = []
+
+    def register(self, callback: CallbackType, *filters: CallbackType,
+                 flags: Optional[Dict[str, Any]] = None, **kwargs: Any) -> CallbackType:
+        super().register(callback, *filters, flags=flags, **kwargs)
+        position = len(self.handlers) - 1
+        keys = index_keys(self.field, filters)
+        if keys is None:
+            self.unindexed.append(position)
+            return callback
+        is_prefix, values = keys
+        for value in values:
+            if is_prefix:
+                self.prefixes.setdefault(value, []).append(position)
+                if len(value) not in self.prefix_lengths:
+                    insort(self.prefix_lengths, len(value))
+            else:
+                self.exact.setdefault(value, []).append(position)
+        return callback
+
+    def candidates(self, event: TelegramObject) -> List[HandlerObject]:
+        value = self.key(event)
+        if value is None:
+            positions = self.unindexed
+        else:
+            positions = self.unindexed + self.exact.get(value, [])
+            for length in self.prefix_lengths:
+                if length > len(value):
+                    break
+                positions = positions + self.prefixes.get(value[:length], [])
+            if len(positions) > 1:
+                positions = sorted(set(positions))
+        return [self.handlers[position] for position in positions]
+
+    async def trigger(self, event: TelegramObject, **kwargs: Any) -> Any:
+        for handler in self.candidates(event):
+            kwargs["handler"] = handler
+            result, data = await handler.check(event, **kwargs)
+            if result:
+                kwargs.update(data)
+                try:
+                    wrapped_inner = self.outer_middleware.wrap_middlewares(
+                        self._resolve_middlewares(),
+                        handler.call,
+                    )
+                    return await wrapped_inner(event, kwargs)
+                except SkipHandler:
+                    continue
+
+        return UNHANDLED
+
+
+class IndexedRouter(Router):
+    """Router whose message and callback query handlers are looked up by index."""
+
+    def __init__(self, *, name: Optional[str] = None) -> None:
+        super().__init__(name=name)
+        self.message = IndexedEventObserver(self, "message", "text", lambda message: message.text)
+        self.callback_query = IndexedEventObserver(self, "callback_query", "data", lambda callback: callback.data)
+        self.observers["message"] = self.message
+        self.observers["callback_query"] = self.callback_query
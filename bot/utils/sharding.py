@@ -0,0 +1,179 @@
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import signal
+from typing import Any, Callable, Dict, List, Optional
+
+import aiohttp
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+# Forwarded updates are retried while a worker starts or is overloaded
+FORWARD_RETRY_INTERVAL = 0.5
+FORWARD_ATTEMPTS = 20
+SUPERVISE_INTERVAL = 1
+POLL_TIMEOUT = 30
+
+
+def update_owner(update: Dict[str, Any]) -> int:
+    """
+    User id an update belongs to, read from the raw update.
+
+    Every update type carries its payload under a single key; the owner is
+    the member a (my_)chat_member update is about, else the payload's sender
+    (`from`/`user`), else its chat, else 0.
+    """
+    for key, event in update.items():
+        if key == "update_id" or not isinstance(event, dict):
+            continue
+        # Join service messages carry a legacy new_chat_member too, a plain User
+        if key in ("chat_member", "my_chat_member"):
+            return event["new_chat_member"]["user"]["id"]
+        sender = event.get("from") or event.get("user")
+        if sender:
+            return sender["id"]
+        chat = event.get("chat")
+        if chat:
+            return chat["id"]
+    return 0
+
+
+def shard_of(update: Dict[str, Any], shards: int) -> int:
+    return update_owner(update) % shards
+
+
+def socket_path(socket_dir: str, shard: int) -> str:
+    return os.path.join(socket_dir, f"jeskovpn-bot-shard-{shard}.sock")
+
+
+class ShardRouter:
+    """
+    Front side of sharded mode: forwards raw updates to worker processes.
+
+    Updates go to the worker owning `user_id % shards` over its unix socket,
+    so each user's FSM state and caches always live in the same worker.
+    Workers are restarted if they exit.
+    """
+
+    def __init__(
+        self,
+        shards: int,
+        socket_dir: str,
+        secret_token: str,
+        worker_target: Callable[..., None],
+        worker_args: tuple = ()
+    ):
+        self.shards = shards
+        self.socket_dir = socket_dir
+        self.secret_token = secret_token
+        self.worker_target = worker_target
+        self.worker_args = worker_args
+        self.context = multiprocessing.get_context("spawn")
+        self.processes: List[Optional[multiprocessing.Process]] = [None] * shards
+        self.sessions: List[Optional[aiohttp.ClientSession]] = [None] * shards
+        self.forwarded = [0] * shards
+
+    def start_worker(self, shard: int) -> None:
+        process = self.context.Process(
+            target=self.worker_target,
+            args=(shard, self.shards, socket_path(self.socket_dir, shard), self.secret_token, *self.worker_args),
+            name=f"bot-shard-{shard}",
+            daemon=False
+        )
+        process.start()
+        self.processes[shard] = process
+        logger.info(f"Started shard {shard} (pid {process.pid})")
+
+    async def start(self) -> None:
+        for shard in range(self.shards):
+            self.start_worker(shard)
+            self.sessions[shard] = aiohttp.ClientSession(
+                connector=aiohttp.UnixConnector(path=socket_path(self.socket_dir, shard))
+            )
+
+    async def supervise(self) -> None:
+        while True:
+            await asyncio.sleep(SUPERVISE_INTERVAL)
+            for shard, process in enumerate(self.processes):
+                if process is not None and not process.is_alive():
+                    logger.error(f"Shard {shard} exited with code {process.exitcode}, restarting")
+                    self.start_worker(shard)
+
+    async def forward(self, raw: bytes, update: Dict[str, Any]) -> int:
+        """Deliver one update to its shard, return the worker's HTTP status."""
+        shard = shard_of(update, self.shards)
+        headers = {"X-Telegram-Bot-Api-Secret-Token": self.secret_token, "Content-Type": "application/json"}
+        for attempt in range(FORWARD_ATTEMPTS):
+            try:
+                async with self.sessions[shard].post("http://shard/update", data=raw, headers=headers) as response:
+                    if response.status != 503:
+                        self.forwarded[shard] += 1
+                        return response.status
+            except aiohttp.ClientConnectionError:
+                # Worker starting or restarting
+                pass
+            await asyncio.sleep(FORWARD_RETRY_INTERVAL)
+        logger.error(f"Shard {shard} did not accept update {update.get('update_id')}")
+        return 503
+
+    async def close(self) -> None:
+        for process in self.processes:
+            if process is not None and process.is_alive():
+                os.kill(process.pid, signal.SIGTERM)
+        # Workers drain their in-flight updates before exiting
+        for process in self.processes:
+            if process is not None:
+                await asyncio.to_thread(process.join)
+        for session in self.sessions:
+            if session is not None:
+                await session.close()
+
+
+async def run_front_polling(router: ShardRouter, token: str, allowed_updates: List[str]) -> None:
+    """Long-poll Telegram and forward each batch, keeping per-shard order."""
+    url = f"https://api.telegram.org/bot{token}/getUpdates"
+    offset = 0
+    timeout = aiohttp.ClientTimeout(total=POLL_TIMEOUT + 10)
+    async with aiohttp.ClientSession(timeout=timeout) as session:
+        while True:
+            try:
+                async with session.post(url, json={"offset": offset, "timeout": POLL_TIMEOUT,
+                                                   "allowed_updates": allowed_updates}) as response:
+                    payload = await response.json()
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logger.error(f"getUpdates failed: {e}")
+                await asyncio.sleep(FORWARD_RETRY_INTERVAL)
+                continue
+            if not payload.get("ok"):
+                logger.error(f"getUpdates error: {payload}")
+                await asyncio.sleep(payload.get("parameters", {}).get("retry_after", 1))
+                continue
+
+            batches: Dict[int, List[Dict[str, Any]]] = {}
+            for update in payload["result"]:
+                batches.setdefault(shard_of(update, router.shards), []).append(update)
+
+            async def forward_batch(updates: List[Dict[str, Any]]) -> None:
+                for update in updates:
+                    await router.forward(json.dumps(update).encode(), update)
+
+            await asyncio.gather(*(forward_batch(updates) for updates in batches.values()))
+            if payload["result"]:
+                offset = payload["result"][-1]["update_id"] + 1
+
+
+def create_front_app(router: ShardRouter, path: str, secret_token: str) -> web.Application:
+    """Webhook that only checks the secret, reads the owner and forwards."""
+    async def handle(request: web.Request) -> web.Response:
+        if request.headers.get("X-Telegram-Bot-Api-Secret-Token") != secret_token:
+            return web.Response(status=401)
+        raw = await request.read()
+        status = await router.forward(raw, json.loads(raw))
+        return web.Response(status=200 if status == 200 else 503)
+
+    app = web.Application()
+    app.router.add_post(path, handle)
+    return app
@@ -0,0 +1,316 @@
+import json
+import logging
+import queue
+import random
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+TRACEPARENT = "traceparent"
+# OTLP span kinds and status code
+KIND_INTERNAL = 1
+KIND_SERVER = 2
+KIND_CLIENT = 3
+STATUS_ERROR = 2
+
+
+def parse_traceparent(value: Optional[str]) -> Optional[tuple]:
+    """(trace_id, parent span_id, sampled) from a W3C traceparent header, None if malformed."""
+    if not value:
+        return None
+    parts = value.strip().split("-")
+    if len(parts) < 4 or len(parts[1]) != 32 or len(parts[2]) != 16 or parts[1] == "0" * 32:
+        return None
+    try:
+        flags = int(parts[3][:2], 16)
+        int(parts[1], 16), int(parts[2], 16)
+    except ValueError:
+        return None
+    return parts[1], parts[2], bool(flags & 1)
+
+
+def otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class Span:
+    """A timed operation; only sampled spans record attributes and get exported."""
+    __slots__ = ("tracer", "name", "kind", "trace_id", "span_id", "parent_id", "sampled", "start_ns", "attributes")
+
+    def __init__(self, tracer: "Tracer", name: str, kind: int, trace_id: str, parent_id: Optional[str],
+                 sampled: bool):
+        self.tracer = tracer
+        self.name = name
+        self.kind = kind
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.sampled = sampled
+        self.start_ns = time.time_ns()
+        self.attributes: Optional[Dict[str, Any]] = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        if self.sampled:
+            if self.attributes is None:
+                self.attributes = {}
+            self.attributes[key] = value
+
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def end(self, error: Optional[BaseException] = None) -> None:
+        if self.sampled:
+            self.tracer.export(self, time.time_ns(), error)
+
+
+class NoopSpan(Span):
+    """Returned while tracing is off; nothing is recorded or propagated."""
+
+    def __init__(self):
+        self.sampled = False
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def end(self, error: Optional[BaseException] = None) -> None:
+        pass
+
+
+NOOP_SPAN = NoopSpan()
+
+current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+class SpanExporter:
+    """
+    Writes finished spans from a background thread, so handlers never wait on I/O.
+
+    Spans go as OTLP JSON to a JSON lines file, an OTLP/HTTP collector
+    (".../v1/traces") or both, in batches. When the queue is full new spans
+    are dropped and counted.
+    """
+
+    def __init__(self, service_name: str, path: Optional[str] = None, otlp_endpoint: Optional[str] = None,
+                 max_queue: int = 10000, batch_size: int = 512, interval: float = 2.0):
+        self.service_name = service_name
+        self.path = path
+        self.otlp_endpoint = otlp_endpoint
+        self.batch_size = batch_size
+        self.interval = interval
+        self.queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(maxsize=max_queue)
+        self.exported = 0
+        self.dropped = 0
+        self.failed = 0
+        self.thread = threading.Thread(target=self.run, name="span-exporter", daemon=True)
+        self.thread.start()
+
+    def submit(self, span: Dict[str, Any]) -> None:
+        try:
+            self.queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def run(self) -> None:
+        stopping = False
+        while not stopping:
+            batch: List[Dict[str, Any]] = []
+            deadline = time.monotonic() + self.interval
+            while len(batch) < self.batch_size:
+                try:
+                    span = self.queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if span is None:
+                    stopping = True
+                    break
+                batch.append(span)
+            if batch:
+                self.write(batch)
+
+    def write(self, batch: List[Dict[str, Any]]) -> None:
+        try:
+            if self.path:
+                with open(self.path, "a", encoding="utf-8") as file:
+                    file.write("".join(json.dumps(span, ensure_ascii=False) + "\n" for span in batch))
+            if self.otlp_endpoint:
+                payload = {"resourceSpans": [{
+                    "resource": {"attributes": [
+                        {"key": "service.name", "value": {"stringValue": self.service_name}}
+                    ]},
+                    "scopeSpans": [{"scope": {"name": self.service_name}, "spans": batch}],
+                }]}
+                request = urllib.request.Request(
+                    self.otlp_endpoint,
+                    data=json.dumps(payload).encode(),
+                    headers={"Content-Type": "application/json"}
+                )
+                urllib.request.urlopen(request, timeout=5).close()
+            self.exported += len(batch)
+        except Exception as e:
+            self.failed += len(batch)
+            logger.warning(f"Could not export {len(batch)} spans: {e}")
+
+    def shutdown(self, timeout: float = 5) -> None:
+        try:
+            self.queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self.thread.join(timeout)
+
+
+class Tracer:
+    """
+    Creates spans in the current context and propagates them with traceparent.
+
+    The sampling decision is made once per trace, at the root span, and
+    travels with it to the backend.
+    """
+
+    def __init__(self, service_name: str = "bot", sample_ratio: float = 0.0,
+                 exporter: Optional[SpanExporter] = None):
+        self.service_name = service_name
+        self.sample_ratio = sample_ratio
+        self.exporter = exporter
+        self.enabled = exporter is not None
+        self.started = 0
+        self.sampled = 0
+
+    def start_span(self, name: str, kind: int = KIND_INTERNAL, traceparent: Optional[str] = None) -> Span:
+        """Child of the current span, of `traceparent`, or the root of a new trace."""
+        if not self.enabled:
+            return NOOP_SPAN
+        self.started += 1
+        parent = current_span.get()
+        if parent is not None and parent is not NOOP_SPAN:
+            return Span(self, name, kind, parent.trace_id, parent.span_id, parent.sampled)
+        remote = parse_traceparent(traceparent)
+        if remote is not None:
+            trace_id, parent_id, sampled = remote
+        else:
+            trace_id, parent_id = f"{random.getrandbits(128):032x}", None
+            sampled = random.random() < self.sample_ratio
+        self.sampled += sampled
+        return Span(self, name, kind, trace_id, parent_id, sampled)
+
+    @contextmanager
+    def span(self, name: str, kind: int = KIND_INTERNAL, traceparent: Optional[str] = None,
+             **attributes: Any) -> Iterator[Span]:
+        span = self.start_span(name, kind, traceparent)
+        if span.sampled:
+            for key, value in attributes.items():
+                span.set_attribute(key, value)
+        token = current_span.set(span)
+        error = None
+        try:
+            yield span
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            current_span.reset(token)
+            span.end(error)
+
+    def export(self, span: Span, end_ns: int, error: Optional[BaseException]) -> None:
+        record = {
+            "traceId": span.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            "kind": span.kind,
+            "startTimeUnixNano": str(span.start_ns),
+            "endTimeUnixNano": str(end_ns),
+        }
+        if span.parent_id:
+            record["parentSpanId"] = span.parent_id
+        if span.attributes:
+            record["attributes"] = [{"key": key, "value": otlp_value(value)} for key, value in span.attributes.items()]
+        if error is not None:
+            record["status"] = {"code": STATUS_ERROR, "message": f"{type(error).__name__}: {error}"[:300]}
+        self.exporter.submit(record)
+
+    def stats(self) -> Dict[str, Any]:
+        stats = {"enabled": self.enabled, "sample_ratio": self.sample_ratio,
+                 "spans_started": self.started, "traces_sampled": self.sampled}
+        if self.exporter is not None:
+            stats.update(exported=self.exporter.exported, dropped=self.exporter.dropped, failed=self.exporter.failed)
+        return stats
+
+    def shutdown(self) -> None:
+        if self.exporter is not None:
+            self.exporter.shutdown()
+
+
+tracer = Tracer()
+
+
+def add_trace_ids_to_logs() -> None:
+    """Put the trace id of the current sampled span on log records, for the JSON log format."""
+    factory = logging.getLogRecordFactory()
+    if getattr(factory, "adds_trace_ids", False):
+        return
+
+    def record_factory(*args, **kwargs) -> logging.LogRecord:
+        record = factory(*args, **kwargs)
+        span = current_span.get()
+        if span is not None and span.sampled:
+            record.trace_id = span.trace_id
+        return record
+
+    record_factory.adds_trace_ids = True
+    logging.setLogRecordFactory(record_factory)
+
+
+def setup_tracing(service_name: str, sample_ratio: float, path: Optional[str] = None,
+                  otlp_endpoint: Optional[str] = None) -> Tracer:
+    """Replace the process tracer; without a path or endpoint tracing stays off."""
+    global tracer
+    exporter = None
+    if path or otlp_endpoint:
+        exporter = SpanExporter(service_name, path=path, otlp_endpoint=otlp_endpoint)
+        add_trace_ids_to_logs()
+    tracer = Tracer(service_name, sample_ratio, exporter)
+    logger.info(f"Tracing {'on' if tracer.enabled else 'off'}, sample ratio {sample_ratio}")
+    return tracer
+
+
+def get_tracer() -> Tracer:
+    return tracer
+
+
+def create_tracing_config() -> aiohttp.TraceConfig:
+    """Trace hooks making every call of a session a client span and sending its traceparent."""
+    trace_config = aiohttp.TraceConfig()
+
+    async def on_request_start(session, context, params: aiohttp.TraceRequestStartParams) -> None:
+        span = tracer.start_span(f"HTTP {params.method}", KIND_CLIENT)
+        context.span = span
+        if span is NOOP_SPAN:
+            return
+        params.headers[TRACEPARENT] = span.traceparent()
+        if span.sampled:
+            span.set_attribute("http.method", params.method)
+            span.set_attribute("http.url", str(params.url.with_query(None)))
+
+    async def on_request_end(session, context, params: aiohttp.TraceRequestEndParams) -> None:
+        context.span.set_attribute("http.status_code", params.response.status)
+        context.span.end()
+
+    async def on_request_exception(session, context, params: aiohttp.TraceRequestExceptionParams) -> None:
+        context.span.end(params.exception)
+
+    trace_config.on_request_start.append(on_request_start)
+    trace_config.on_request_end.append(on_request_end)
+    trace_config.on_request_exception.append(on_request_exception)
+    return trace_config
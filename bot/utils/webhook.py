@@ -0,0 +1,161 @@
+import asyncio
+import logging
+import signal
+from typing import Any, Dict
+
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+
+class WorkerRequestHandler(SimpleRequestHandler):
+    """
+    Webhook handler that acknowledges updates immediately.
+
+    Updates are processed in background tasks; concurrency and per-user
+    ordering are enforced by UpdateOrderingMiddleware. When more than
+    `max_pending` updates are waiting, new ones are answered with 503 so
+    Telegram redelivers them later instead of them piling up in memory. On
+    shutdown, in-flight updates get `drain_timeout` seconds to finish
+    before the bot session is closed.
+    """
+
+    def __init__(
+        self,
+        dispatcher: Dispatcher,
+        bot: Bot,
+        secret_token: str,
+        max_pending: int,
+        drain_timeout: float,
+        **data: Any
+    ) -> None:
+        super().__init__(dispatcher=dispatcher, bot=bot, handle_in_background=True,
+                         secret_token=secret_token, **data)
+        self.max_pending = max_pending
+        self.drain_timeout = drain_timeout
+
+    async def _background_feed_update(self, bot: Bot, update: Dict[str, Any]) -> None:
+        try:
+            await super()._background_feed_update(bot=bot, update=update)
+        except Exception as e:
+            logger.error(f"Error processing update {update.get('update_id')}: {e}")
+
+    async def _handle_request_background(self, bot: Bot, request: web.Request) -> web.Response:
+        if len(self._background_feed_update_tasks) >= self.max_pending:
+            logger.warning(f"{len(self._background_feed_update_tasks)} updates pending, asking Telegram to retry")
+            return web.Response(status=503)
+        return await super()._handle_request_background(bot=bot, request=request)
+
+    async def close(self) -> None:
+        pending = set(self._background_feed_update_tasks)
+        if pending:
+            logger.info(f"Draining {len(pending)} in-flight updates")
+            _, not_done = await asyncio.wait(pending, timeout=self.drain_timeout)
+            if not_done:
+                logger.error(f"{len(not_done)} updates did not finish within {self.drain_timeout}s")
+        await super().close()
+
+
+def create_update_app(
+    bot: Bot,
+    dp: Dispatcher,
+    path: str,
+    secret_token: str,
+    max_pending: int,
+    drain_timeout: float,
+    **workflow_data: Any
+) -> web.Application:
+    app = web.Application()
+    handler = WorkerRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        secret_token=secret_token,
+        max_pending=max_pending,
+        drain_timeout=drain_timeout,
+        **workflow_data
+    )
+    # Registered before setup_application so updates drain before dispatcher shutdown
+    handler.register(app, path=path)
+    setup_application(app, dp, bot=bot, **workflow_data)
+    return app
+
+
+async def wait_for_stop_signal() -> None:
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    await stop.wait()
+
+
+async def serve_until_stopped(runner: web.AppRunner) -> None:
+    """Keep an already started app running until SIGINT/SIGTERM, then clean up."""
+    try:
+        await wait_for_stop_signal()
+    finally:
+        logger.info("Stopping update server")
+        await runner.cleanup()
+
+
+async def run_webhook(
+    bot: Bot,
+    dp: Dispatcher,
+    base_url: str,
+    path: str,
+    host: str,
+    port: int,
+    secret_token: str,
+    max_pending: int,
+    drain_timeout: float,
+    **workflow_data: Any
+) -> None:
+    """
+    Serve updates through an aiohttp webhook until SIGINT/SIGTERM.
+
+    Registers the webhook with Telegram on startup without dropping pending
+    updates, so nothing queued during a deploy is lost.
+    """
+    app = create_update_app(bot, dp, path, secret_token, max_pending, drain_timeout, **workflow_data)
+    webhook_url = f"{base_url.rstrip('/')}{path}"
+
+    async def set_webhook(_: web.Application) -> None:
+        await bot.set_webhook(
+            url=webhook_url,
+            secret_token=secret_token,
+            allowed_updates=dp.resolve_used_update_types(),
+            drop_pending_updates=False
+        )
+        logger.info(f"Webhook set to {webhook_url}")
+
+    app.on_startup.append(set_webhook)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host=host, port=port).start()
+    logger.info(f"Serving webhook on {host}:{port}{path}")
+    await serve_until_stopped(runner)
+
+
+async def run_socket_worker(
+    bot: Bot,
+    dp: Dispatcher,
+    socket_path: str,
+    secret_token: str,
+    max_pending: int,
+    drain_timeout: float,
+    **workflow_data: Any
+) -> None:
+    """
+    Serve updates forwarded by the shard front process on a unix socket.
+
+    Speaks the same protocol as Telegram's webhook, so the worker runs the
+    usual WorkerRequestHandler and the full Dispatcher.
+    """
+    app = create_update_app(bot, dp, "/update", secret_token, max_pending, drain_timeout, **workflow_data)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.UnixSite(runner, path=socket_path).start()
+    logger.info(f"Serving forwarded updates on {socket_path}")
+    await serve_until_stopped(runner)